@@ -4,7 +4,8 @@
 """
 See how fast deferreds are.
 
-This is mainly useful to compare cdefer.Deferred to defer.Deferred
+This is mainly useful to compare cdefer.Deferred to defer.Deferred, or
+changes to defer.Deferred with the version before them.
 """
 
 
@@ -133,6 +134,69 @@ def pauseUnpause(n):
     d.unpause()
 pauseUnpause = benchmarkNFunc(20, ns)(pauseUnpause)
 
+def succeedAddCallbacks():
+    """
+    Create an already fired deferred with L{defer.succeed} and add two
+    callbacks to it, which are run straight away.
+    """
+    def f(result):
+        return result
+    d = defer.succeed(1)
+    d.addCallback(f)
+    d.addCallback(f)
+succeedAddCallbacks = benchmarkFunc(100000)(succeedAddCallbacks)
+
+def chainFired(n):
+    """
+    Add the given number of callbacks to a deferred, each of which returns an
+    already fired deferred whose result is taken in its place.
+    """
+    d = defer.Deferred()
+    def f(result):
+        return defer.succeed(result)
+    for i in xrange(n):
+        d.addCallback(f)
+    d.callback(1)
+chainFired = benchmarkNFunc(20, ns)(chainFired)
+
+def chainUnfired(n):
+    """
+    Build a chain of the given number of deferreds, each waiting on the next,
+    and fire the last one.
+    """
+    first = current = defer.Deferred()
+    for i in xrange(n):
+        waitedOn = defer.Deferred()
+        current.addCallback(lambda ignored, waitedOn=waitedOn: waitedOn)
+        current.callback(None)
+        current = waitedOn
+    current.callback(1)
+    return first
+chainUnfired = benchmarkNFunc(20, ns)(chainUnfired)
+
+def inlineCallbacksResume(n):
+    """
+    Resume an L{defer.inlineCallbacks} generator the given number of times,
+    with results which are already available.
+    """
+    def run():
+        for i in xrange(n):
+            yield defer.succeed(i)
+    defer.inlineCallbacks(run)()
+inlineCallbacksResume = benchmarkNFunc(20, ns)(inlineCallbacksResume)
+
+def gatherResults(n):
+    """
+    Gather the results of the given number of deferreds with
+    L{defer.gatherResults}, firing them after they have been gathered.
+    """
+    deferreds = [defer.Deferred() for i in xrange(n)]
+    gathered = defer.gatherResults(deferreds)
+    for d in deferreds:
+        d.callback(1)
+    return gathered
+gatherResults = benchmarkNFunc(2, [100000])(gatherResults)
+
 def benchmark():
     """
     Run all of the benchmarks registered in the benchmarkFuncs list
@@ -0,0 +1,88 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Measure how many packets per second L{twisted.names.dns.Message} can encode
+and decode, for a query and for responses of a few common shapes.
+"""
+
+import time
+
+from twisted.names import dns
+
+
+def query():
+    m = dns.Message(id=1234, recDes=1)
+    m.addQuery('www.example.com', dns.A)
+    return m
+
+
+
+def answerA():
+    """
+    A response with a handful of address records, as for a busy web site.
+    """
+    m = query()
+    m.answer = m.auth = 1
+    for i in xrange(4):
+        m.answers.append(dns.RRHeader(
+            'www.example.com', dns.A, ttl=300,
+            payload=dns.Record_A('10.0.0.%d' % (i,), ttl=300)))
+    return m
+
+
+
+def answerMX():
+    """
+    A response with mail exchangers and their addresses, which compresses
+    names heavily.
+    """
+    m = dns.Message(id=1234, answer=1, auth=1)
+    m.addQuery('example.com', dns.MX)
+    for i in xrange(3):
+        host = 'mx%d.example.com' % (i,)
+        m.answers.append(dns.RRHeader(
+            'example.com', dns.MX, ttl=300,
+            payload=dns.Record_MX(10 * i, host, ttl=300)))
+        m.additional.append(dns.RRHeader(
+            host, dns.A, ttl=300,
+            payload=dns.Record_A('10.0.1.%d' % (i,), ttl=300)))
+    m.authority.append(dns.RRHeader(
+        'example.com', dns.SOA, ttl=300,
+        payload=dns.Record_SOA('ns1.example.com', 'hostmaster.example.com',
+                               2012010100, 3600, 600, 86400, 300)))
+    return m
+
+
+
+def encode(message, count):
+    before = time.time()
+    for i in xrange(count):
+        message.toStr()
+    return time.time() - before
+
+
+
+def decode(message, count):
+    data = message.toStr()
+    before = time.time()
+    for i in xrange(count):
+        dns.Message().fromStr(data)
+    return time.time() - before
+
+
+
+def main():
+    count = 20000
+    for build in query, answerA, answerMX:
+        message = build()
+        size = len(message.toStr())
+        encoding = encode(message, count)
+        decoding = decode(message, count)
+        print '%-10s %4d bytes  encode: %8d pps  decode: %8d pps' % (
+            build.__name__, size, count / encoding, count / decoding)
+
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Count the system calls made per request by L{EPollReactor} and
+L{EdgeTriggeredEPollReactor} when many connections exchange small requests
+and responses with an echo server, as HTTP keep-alive clients do.
+
+The epoll object and the sockets are wrapped so that the calls made through
+them can be counted; the wrapping makes both reactors slower, so only the
+counts are meaningful.
+"""
+
+import sys
+
+from twisted.internet.epollreactor import (
+    EPollReactor, EdgeTriggeredEPollReactor)
+from twisted.internet.protocol import Protocol, Factory, ClientCreator
+
+
+class Counter(object):
+    """
+    Counts calls by name.
+    """
+    def __init__(self):
+        self.counts = {}
+
+
+    def count(self, name):
+        self.counts[name] = self.counts.get(name, 0) + 1
+
+
+
+class CountingProxy(object):
+    """
+    Counts the calls made to some methods of an object.
+    """
+    def __init__(self, original, names, counter):
+        self._original = original
+        self._names = names
+        self._counter = counter
+
+
+    def __getattr__(self, name):
+        attr = getattr(self._original, name)
+        if name in self._names:
+            def counted(*args, **kwargs):
+                self._counter.count(name)
+                return attr(*args, **kwargs)
+            return counted
+        return attr
+
+
+
+SOCKET_CALLS = ('recv', 'recv_into', 'send')
+POLLER_CALLS = ('register', 'modify', 'unregister', 'poll')
+
+
+class CountingProtocol(Protocol):
+    def connectionMade(self):
+        self.transport.socket = CountingProxy(
+            self.transport.socket, SOCKET_CALLS, self.factory.counter)
+
+
+
+class Echo(CountingProtocol):
+    def dataReceived(self, data):
+        self.transport.write(data)
+
+
+
+class Requester(CountingProtocol):
+    """
+    Sends C{requests} requests of C{size} bytes, one at a time, each after
+    the whole response to the previous one has arrived.
+    """
+    def __init__(self, factory, requests, size, done):
+        self.factory = factory
+        self.remaining = requests
+        self.request = 'x' * size
+        self.done = done
+
+
+    def connectionMade(self):
+        CountingProtocol.connectionMade(self)
+        self.received = 0
+        self.transport.write(self.request)
+
+
+    def dataReceived(self, data):
+        self.received += len(data)
+        if self.received < len(self.request):
+            return
+        self.received = 0
+        self.remaining -= 1
+        if self.remaining:
+            self.transport.write(self.request)
+        else:
+            self.transport.loseConnection()
+            self.done()
+
+
+
+def benchmark(reactorType, connections, requests, size):
+    """
+    Run C{connections} clients which each make C{requests} requests.
+
+    @return: A C{dict} mapping the names of the calls made to how many times
+        they were made.
+    """
+    reactor = reactorType()
+    counter = Counter()
+    reactor._poller = CountingProxy(reactor._poller, POLLER_CALLS, counter)
+
+    factory = Factory()
+    factory.protocol = Echo
+    factory.counter = counter
+    port = reactor.listenTCP(0, factory, interface='127.0.0.1')
+
+    pending = [connections]
+    def done():
+        pending[0] -= 1
+        if not pending[0]:
+            reactor.callLater(0, reactor.stop)
+
+    creator = ClientCreator(reactor, Requester, factory, requests, size, done)
+    for i in xrange(connections):
+        creator.connectTCP('127.0.0.1', port.getHost().port)
+    reactor.run()
+    port.stopListening()
+    return counter.counts
+
+
+
+def main():
+    connections = 500
+    requests = 20
+    size = 100
+    if len(sys.argv) > 1:
+        connections = int(sys.argv[1])
+    total = connections * requests
+    print '%d connections, %d requests each, %d bytes per request' % (
+        connections, requests, size)
+    print '%-16s %10s %10s' % ('calls', 'epoll', 'epoll-et')
+    level = benchmark(EPollReactor, connections, requests, size)
+    edge = benchmark(EdgeTriggeredEPollReactor, connections, requests, size)
+    for name in POLLER_CALLS + SOCKET_CALLS:
+        print '%-16s %10.3f %10.3f' % (
+            name + '/req', level.get(name, 0) / float(total),
+            edge.get(name, 0) / float(total))
+    print '%-16s %10.3f %10.3f' % (
+        'total/req', sum(level.values()) / float(total),
+        sum(edge.values()) / float(total))
+
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Measure how many requests per second L{twisted.web.http.HTTPChannel} can
+parse and answer on a keep-alive connection, for small requests delivered
+one at a time, pipelined together, and split into small reads.
+"""
+
+import time
+
+from twisted.test.proto_helpers import StringTransport
+from twisted.web import http
+
+
+REQUEST = (
+    "GET /index.html HTTP/1.1\r\n"
+    "Host: www.example.com\r\n"
+    "User-Agent: benchmark/1.0\r\n"
+    "Accept: text/html,application/xhtml+xml\r\n"
+    "Accept-Encoding: gzip, deflate\r\n"
+    "Cookie: session=0123456789abcdef\r\n"
+    "\r\n")
+
+CHUNKED_REQUEST = (
+    "POST /submit HTTP/1.1\r\n"
+    "Host: www.example.com\r\n"
+    "Transfer-Encoding: chunked\r\n"
+    "\r\n"
+    "10\r\n0123456789abcdef\r\n"
+    "10\r\n0123456789abcdef\r\n"
+    "0\r\n\r\n")
+
+
+
+class SmallRequest(http.Request):
+    """
+    A request answered at once with a short body.
+    """
+    def process(self):
+        self.setHeader('content-type', 'text/plain')
+        self.write('hello')
+        self.finish()
+
+
+
+def channel():
+    """
+    Return an L{http.HTTPChannel} connected to a L{StringTransport}.
+    """
+    proto = http.HTTPChannel()
+    proto.requestFactory = SmallRequest
+    proto.makeConnection(StringTransport())
+    return proto
+
+
+
+def benchmark(name, request, count, perRead, readSize=None):
+    """
+    Deliver C{count} copies of C{request} to one channel, C{perRead} of them
+    in each call to C{dataReceived}, or in reads of C{readSize} bytes if it
+    is given.
+    """
+    data = request * perRead
+    if readSize is None:
+        reads = [data]
+    else:
+        reads = [data[i:i + readSize] for i in xrange(0, len(data), readSize)]
+    proto = channel()
+    transport = proto.transport
+
+    before = time.clock()
+    for i in xrange(count / perRead):
+        for read in reads:
+            proto.dataReceived(read)
+        transport.clear()
+    after = time.clock()
+
+    print '%s: %d requests, %d per read, %s byte reads: %d requests/sec' % (
+        name, count, perRead, readSize or len(data),
+        count / (after - before))
+
+
+
+def main():
+    for perRead in 1, 10, 100:
+        benchmark('GET', REQUEST, 20000, perRead)
+        benchmark('chunked POST', CHUNKED_REQUEST, 20000, perRead)
+    benchmark('GET', REQUEST, 20000, 1, 16)
+
+
+
+if __name__ == '__main__':
+    main()
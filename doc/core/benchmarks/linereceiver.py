@@ -7,6 +7,14 @@ class CollectingLineReceiver(basic.LineReceiver):
         self.lines = []
         self.lineReceived = self.lines.append
 
+class CollectingLineOnlyReceiver(basic.LineOnlyReceiver):
+    def __init__(self):
+        self.lines = []
+        self.lineReceived = self.lines.append
+
+class FakeTransport:
+    disconnecting = False
+
 def deliver(proto, chunks):
     map(proto.dataReceived, chunks)
 
@@ -32,6 +40,29 @@ def benchmark(chunkSize, lineLength, numLines):
 
 
 
+def pipelined(protocolClass, lineLength, numLines):
+    """
+    Deliver C{numLines} lines in a single call to C{dataReceived}, as when a
+    client pipelines many requests and they all arrive in one read.
+    """
+    bytes = ('x' * lineLength + '\r\n') * numLines
+    p = protocolClass()
+    p.transport = FakeTransport()
+    p.MAX_LENGTH = max(p.MAX_LENGTH, lineLength)
+
+    before = time.clock()
+    p.dataReceived(bytes)
+    after = time.clock()
+
+    assert len(p.lines) == numLines
+
+    print 'pipelined:', protocolClass.__name__,
+    print 'lineLength:', lineLength,
+    print 'numLines:', numLines,
+    print 'CPU Time: ', after - before
+
+
+
 def main():
     for numLines in 100, 1000:
         for lineLength in (10, 100, 1000):
@@ -43,5 +74,10 @@ def main():
             for chunkSize in (51, 500, 5000):
                 benchmark(chunkSize, lineLength, numLines)
 
+    for protocolClass in CollectingLineReceiver, CollectingLineOnlyReceiver:
+        for numLines in 1000, 10000, 100000:
+            for lineLength in (10, 100):
+                pipelined(protocolClass, lineLength, numLines)
+
 if __name__ == '__main__':
     main()
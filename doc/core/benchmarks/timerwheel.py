@@ -0,0 +1,118 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Compare the scheduling of timed calls in the default heap of
+L{twisted.internet.base.ReactorBase} with a L{TimerWheel}, under workloads
+where most calls are reset or cancelled before they run, like idle timeouts.
+"""
+
+import time
+
+from twisted.internet.base import ReactorBase, TimerWheel
+
+
+class BenchmarkReactor(ReactorBase):
+    """
+    A reactor with a settable clock which never does any I/O.
+    """
+    now = 0.0
+
+    def installWaker(self):
+        pass
+
+
+    def seconds(self):
+        return self.now
+
+
+
+def buildReactor(wheel):
+    reactor = BenchmarkReactor()
+    if wheel:
+        reactor.installTimerWheel(TimerWheel(0.01))
+    return reactor
+
+
+
+def schedule(reactor, count):
+    calls = []
+    for i in xrange(count):
+        calls.append(reactor.callLater(60 - (i % 1000) * 0.01, lambda: None))
+    reactor.runUntilCurrent()
+    return calls
+
+
+
+def resetLater(reactor, calls):
+    """
+    Push every call further into the future, as C{TimeoutMixin.resetTimeout}
+    does when data arrives.
+    """
+    for i in xrange(10):
+        reactor.now += 0.5
+        for call in calls:
+            call.reset(60)
+        reactor.runUntilCurrent()
+
+
+
+def resetSooner(reactor, calls):
+    """
+    Pull every call closer, as shortening a timeout does.
+    """
+    for call in calls:
+        call.reset(30)
+    reactor.runUntilCurrent()
+
+
+
+def cancel(reactor, calls):
+    """
+    Cancel every call, as happens when connections close before they time
+    out.
+    """
+    for call in calls:
+        call.cancel()
+    reactor.runUntilCurrent()
+
+
+
+def churn(reactor, calls):
+    """
+    Replace each call with a new one, the way timeouts are rescheduled per
+    request.
+    """
+    for i, call in enumerate(calls):
+        call.cancel()
+        calls[i] = reactor.callLater(60, lambda: None)
+        if i % 1000 == 0:
+            reactor.runUntilCurrent()
+    reactor.runUntilCurrent()
+
+
+
+def benchmark(workload, count, wheel):
+    reactor = buildReactor(wheel)
+    calls = schedule(reactor, count)
+    before = time.time()
+    workload(reactor, calls)
+    return time.time() - before
+
+
+
+def main():
+    for workload, counts in [(resetLater, [10000, 100000]),
+                             (resetSooner, [1000, 2000]),
+                             (cancel, [10000, 100000]),
+                             (churn, [10000, 100000])]:
+        for count in counts:
+            heap = benchmark(workload, count, False)
+            wheel = benchmark(workload, count, True)
+            print '%-12s calls: %7d  heap: %8.4fs  wheel: %8.4fs' % (
+                workload.__name__, count, heap, wheel)
+
+
+
+if __name__ == '__main__':
+    main()
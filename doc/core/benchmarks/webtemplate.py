@@ -0,0 +1,103 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Measure how many pages per second L{twisted.web.template} can flatten, for a
+page loaded with L{XMLString}, which is compiled the first time it is
+flattened, and for the same page loaded as a plain list, which is walked for
+every render.
+"""
+
+import time
+
+from twisted.web.template import (
+    Element, TagLoader, XMLString, renderer, flattenString)
+
+
+PAGE = """\
+<html xmlns:t="http://twistedmatrix.com/ns/twisted.web.template/0.1">
+  <head>
+    <meta charset="utf-8" />
+    <title>Recent orders</title>
+    <link rel="stylesheet" href="/static/site.css" />
+    <script src="/static/site.js"></script>
+  </head>
+  <body>
+    <div class="header">
+      <h1 t:render="title" />
+      <ul class="nav">
+        <li><a href="/">Home</a></li>
+        <li><a href="/products">Products</a></li>
+        <li><a href="/support">Support</a></li>
+        <li><a href="/about">About us</a></li>
+        <li><a href="/contact">Contact</a></li>
+      </ul>
+    </div>
+    <div class="content">
+      <p>Below are the orders placed in the last week, newest first.  Prices
+      include taxes &amp; shipping.</p>
+      <table class="orders">
+        <tr><th>Order</th><th>Customer</th><th>Total</th></tr>
+        <tr t:render="orders">
+          <td><a><t:attr name="href">/orders/<t:slot name="id" /></t:attr>
+            <t:slot name="id" /></a></td>
+          <td><t:slot name="customer" /></td>
+          <td class="total"><t:slot name="total" /></td>
+        </tr>
+      </table>
+    </div>
+    <div class="footer">
+      <p>Copyright &#169; Example Ltd.  All rights reserved.</p>
+      <p><a href="/privacy">Privacy</a> | <a href="/terms">Terms</a></p>
+    </div>
+  </body>
+</html>
+"""
+
+ORDERS = [(str(1000 + i), 'Customer <%d>' % (i,), '%d.%02d' % (i * 7, i))
+          for i in range(20)]
+
+
+
+class Page(Element):
+    """
+    A page listing some orders.
+    """
+    @renderer
+    def title(self, request, tag):
+        return tag('Recent orders')
+
+
+    @renderer
+    def orders(self, request, tag):
+        for id, customer, total in ORDERS:
+            yield tag.clone().fillSlots(id=id, customer=customer, total=total)
+
+
+
+def benchmark(name, loader, count):
+    """
+    Flatten a L{Page} using C{loader} C{count} times.
+    """
+    element = Page(loader=loader)
+    result = []
+    before = time.clock()
+    for i in xrange(count):
+        flattenString(None, element).addCallback(result.append)
+    after = time.clock()
+    assert len(result) == count
+
+    print '%s: %d renders of %d bytes: %d renders/sec' % (
+        name, count, len(result[0]), count / (after - before))
+
+
+
+def main():
+    loader = XMLString(PAGE)
+    benchmark('XMLString (compiled)', loader, 2000)
+    benchmark('plain list', TagLoader(list(loader.load())), 2000)
+
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Measure how long L{twisted.internet.abstract.FileDescriptor} takes to queue
+and flush output when the kernel accepts only part of it per write, as with a
+connection carrying large pipelined responses.  The same workloads are run
+against a descriptor which flattens the whole queue before every write, as
+C{FileDescriptor.doWrite} used to.
+"""
+
+import time
+
+from zope.interface import implements
+
+from twisted.internet.interfaces import IReactorFDSet
+from twisted.internet.abstract import FileDescriptor
+
+
+class NullReactor(object):
+    implements(IReactorFDSet)
+
+    addReader = addWriter = removeReader = removeWriter = (
+        lambda self, descriptor: None)
+
+
+
+class PartialWriter(FileDescriptor):
+    """
+    A descriptor whose writes accept at most C{accept} bytes.
+    """
+    connected = 1
+    accept = 64 * 1024
+
+    def __init__(self):
+        FileDescriptor.__init__(self, NullReactor())
+
+
+    def writeSomeData(self, data):
+        return min(len(data), self.accept)
+
+
+
+class FlatteningWriter(PartialWriter):
+    """
+    A descriptor which joins all queued data onto the unsent part of its
+    buffer before each write.
+    """
+    def _gatherDataBuffer(self):
+        self.dataBuffer = (buffer(self.dataBuffer, self.offset) +
+                           "".join(self._tempDataBuffer))
+        self.offset = 0
+        self._tempDataBuffer.clear()
+        self._tempDataLen = 0
+
+
+
+def drain(fd):
+    while fd.dataBuffer or fd._tempDataLen:
+        fd.doWrite()
+
+
+def smallWrites(fd, count):
+    """
+    Queue C{count} 100 byte writes, flushing after every 100 of them.
+    """
+    chunk = 'x' * 100
+    for i in xrange(count):
+        fd.write(chunk)
+        if i % 100 == 0:
+            fd.doWrite()
+    drain(fd)
+
+
+def backlog(fd, count):
+    """
+    Queue C{count} 100 byte writes without flushing, then flush them.
+    """
+    chunk = 'x' * 100
+    for i in xrange(count):
+        fd.write(chunk)
+    drain(fd)
+
+
+def largeWrites(fd, count):
+    """
+    Queue C{count} 1MB writes with C{writeSequence}, then flush them.
+    """
+    chunk = 'x' * (1024 * 1024)
+    fd.writeSequence([chunk] * count)
+    drain(fd)
+
+
+def benchmark(workload, count, writerType):
+    fd = writerType()
+    before = time.time()
+    workload(fd, count)
+    return time.time() - before
+
+
+def main():
+    for workload, counts in [(smallWrites, [10000, 100000]),
+                             (backlog, [10000, 100000]),
+                             (largeWrites, [4, 16])]:
+        for count in counts:
+            flattening = benchmark(workload, count, FlatteningWriter)
+            queued = benchmark(workload, count, PartialWriter)
+            print '%-12s writes: %7d  flattening: %8.4fs  queued: %8.4fs' % (
+                workload.__name__, count, flattening, queued)
+
+
+if __name__ == '__main__':
+    main()
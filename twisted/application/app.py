@@ -285,6 +285,36 @@ def fixPdb():
 
 
 
+def installReactorStats(reactor, interval):
+    """
+    Instrument C{reactor}'s main loop and log a report of what it measured,
+    starting afresh, every C{interval} seconds and when it shuts down.
+
+    @param reactor: The reactor to instrument.
+    @type reactor: L{twisted.internet.base.ReactorBase}
+
+    @param interval: The number of seconds between reports.
+    @type interval: C{float}
+
+    @return: The L{LoopInstrumentation} installed.
+    """
+    from twisted.internet.base import LoopInstrumentation
+    from twisted.internet.task import LoopingCall
+    instrumentation = LoopInstrumentation()
+    reactor.installInstrumentation(instrumentation)
+
+    def report():
+        log.msg("Reactor loop statistics:\n" + instrumentation.report())
+        instrumentation.reset()
+
+    call = LoopingCall(report)
+    call.clock = reactor
+    call.start(interval, now=False)
+    reactor.addSystemEventTrigger('before', 'shutdown', report)
+    return instrumentation
+
+
+
 def runReactorWithLogging(config, oldstdout, oldstderr, profiler=None, reactor=None):
     """
     Start the reactor, using profiling if specified by the configuration, and
@@ -307,6 +337,8 @@ def runReactorWithLogging(config, oldstdout, oldstderr, profiler=None, reactor=N
     """
     if reactor is None:
         from twisted.internet import reactor
+    if config.get('reactor-stats'):
+        installReactorStats(reactor, config['reactor-stats'])
     try:
         if config['profile']:
             if profiler is not None:
@@ -568,7 +600,11 @@ class ServerOptions(usage.Options, ReactorSelectionMixin):
                      ['source', 's', None,
                       "Read an application from a .tas file (AOT format)."],
                      ['rundir','d','.',
-                      'Change to a supplied directory before running']]
+                      'Change to a supplied directory before running'],
+                     ['reactor-stats', None, None,
+                      "Log histograms of reactor loop lag and callback times, "
+                      "and the slowest callbacks, every given number of "
+                      "seconds.", float]]
 
     compData = usage.Completions(
         mutuallyExclusive=[("file", "python", "source")],
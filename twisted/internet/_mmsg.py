@@ -0,0 +1,205 @@
+# -*- test-case-name: twisted.test.test_udp -*-
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Very low-level ctypes-based interface to Linux recvmmsg(2) and sendmmsg(2),
+which receive and send several datagrams with one system call.
+
+ctypes and a version of libc which provides both functions are required.
+"""
+
+import os
+import socket
+import struct
+import ctypes
+import ctypes.util
+
+
+
+class _IOVec(ctypes.Structure):
+    _fields_ = [
+        ("iov_base", ctypes.c_void_p),
+        ("iov_len", ctypes.c_size_t)]
+
+
+
+class _MsgHdr(ctypes.Structure):
+    _fields_ = [
+        ("msg_name", ctypes.c_void_p),
+        ("msg_namelen", ctypes.c_uint32),
+        ("msg_iov", ctypes.c_void_p),
+        ("msg_iovlen", ctypes.c_size_t),
+        ("msg_control", ctypes.c_void_p),
+        ("msg_controllen", ctypes.c_size_t),
+        ("msg_flags", ctypes.c_int)]
+
+
+
+class _MMsgHdr(ctypes.Structure):
+    _fields_ = [
+        ("msg_hdr", _MsgHdr),
+        ("msg_len", ctypes.c_uint)]
+
+
+
+# The size of a struct sockaddr_storage.
+_ADDR_LEN = 128
+
+
+
+def _error():
+    """
+    Return a C{socket.error} for the errno of the last failed call.
+    """
+    err = ctypes.get_errno()
+    return socket.error(err, os.strerror(err))
+
+
+
+def _packAddress(address):
+    """
+    Pack an IPv4 or IPv6 address, as accepted by C{socket.sendto}, into a
+    C{struct sockaddr}.
+    """
+    host = address[0]
+    if ':' in host:
+        family = socket.AF_INET6
+        host, port, flowinfo, scopeid = (tuple(address) + (0, 0))[:4]
+        return struct.pack("=H", family) + struct.pack(
+            "!HI16s", port, flowinfo, socket.inet_pton(family, host)) + (
+            struct.pack("=I", scopeid))
+    return struct.pack("=H", socket.AF_INET) + struct.pack(
+        "!H4s8x", address[1], socket.inet_aton(host))
+
+
+
+def _unpackAddress(raw):
+    """
+    Unpack a C{struct sockaddr} into an address like those returned by
+    C{socket.recvfrom}.
+    """
+    family, = struct.unpack("=H", raw[:2])
+    if family == socket.AF_INET:
+        port, host = struct.unpack("!H4s", raw[2:8])
+        return (socket.inet_ntoa(host), port)
+    elif family == socket.AF_INET6:
+        port, flowinfo, host = struct.unpack("!HI16s", raw[2:24])
+        scopeid, = struct.unpack("=I", raw[24:28])
+        return (socket.inet_ntop(family, host), port, flowinfo, scopeid)
+    raise ValueError("Unsupported address family %r" % (family,))
+
+
+
+class Receiver(object):
+    """
+    Buffers for receiving up to C{count} datagrams of up to C{size} bytes at
+    once, which are reused by every call to L{recv}.
+    """
+
+    def __init__(self, count, size):
+        self.count = count
+        self.size = size
+        self._data = ctypes.create_string_buffer(count * size)
+        self._names = ctypes.create_string_buffer(count * _ADDR_LEN)
+        self._iovecs = (_IOVec * count)()
+        self._msgs = (_MMsgHdr * count)()
+        data = ctypes.addressof(self._data)
+        names = ctypes.addressof(self._names)
+        iovecs = ctypes.addressof(self._iovecs)
+        for i in xrange(count):
+            self._iovecs[i].iov_base = data + i * size
+            self._iovecs[i].iov_len = size
+            hdr = self._msgs[i].msg_hdr
+            hdr.msg_name = names + i * _ADDR_LEN
+            hdr.msg_iov = iovecs + i * ctypes.sizeof(_IOVec)
+            hdr.msg_iovlen = 1
+
+
+    def recv(self, fd):
+        """
+        Receive the datagrams waiting on the socket C{fd}, up to C{count} of
+        them.
+
+        @return: A C{list} of two-tuples of the data and the address of each
+            datagram.
+
+        @raise socket.error: If no datagram could be received.
+        """
+        msgs = self._msgs
+        for i in xrange(self.count):
+            msgs[i].msg_hdr.msg_namelen = _ADDR_LEN
+        received = libc.recvmmsg(fd, msgs, self.count, 0, None)
+        if received < 0:
+            raise _error()
+        data = ctypes.addressof(self._data)
+        names = ctypes.addressof(self._names)
+        size = self.size
+        stringAt = ctypes.string_at
+        return [
+            (stringAt(data + i * size, msgs[i].msg_len),
+             _unpackAddress(stringAt(names + i * _ADDR_LEN,
+                                     msgs[i].msg_hdr.msg_namelen)))
+            for i in xrange(received)]
+
+
+
+def send(fd, datagrams, connected=False):
+    """
+    Send several datagrams on the socket C{fd} with one system call.
+
+    @param datagrams: A C{list} of two-tuples of the data and the address of
+        each datagram.  The addresses are ignored if C{connected} is true.
+
+    @return: The number of datagrams sent, from the start of C{datagrams}.
+
+    @raise socket.error: If the first datagram could not be sent.
+    """
+    count = len(datagrams)
+    msgs = (_MMsgHdr * count)()
+    iovecs = (_IOVec * count)()
+    # Keep the packed addresses alive until the call returns.
+    names = []
+    for i, (data, addr) in enumerate(datagrams):
+        iovecs[i].iov_base = ctypes.cast(
+            ctypes.c_char_p(data), ctypes.c_void_p).value
+        iovecs[i].iov_len = len(data)
+        hdr = msgs[i].msg_hdr
+        hdr.msg_iov = ctypes.addressof(iovecs[i])
+        hdr.msg_iovlen = 1
+        if not connected:
+            packed = _packAddress(addr)
+            name = ctypes.create_string_buffer(packed, len(packed))
+            names.append(name)
+            hdr.msg_name = ctypes.addressof(name)
+            hdr.msg_namelen = len(packed)
+    sent = libc.sendmmsg(fd, msgs, count, 0)
+    if sent < 0:
+        raise _error()
+    return sent
+
+
+
+def initializeModule(libc):
+    """
+    Intialize the module, checking if the expected APIs exist and setting the
+    argtypes and restype for C{recvmmsg} and C{sendmmsg}.
+    """
+    for function in ("recvmmsg", "sendmmsg"):
+        if getattr(libc, function, None) is None:
+            raise ImportError("libc with %s needed" % (function,))
+    libc.recvmmsg.argtypes = [
+        ctypes.c_int, ctypes.POINTER(_MMsgHdr), ctypes.c_uint, ctypes.c_int,
+        ctypes.c_void_p]
+    libc.recvmmsg.restype = ctypes.c_int
+    libc.sendmmsg.argtypes = [
+        ctypes.c_int, ctypes.POINTER(_MMsgHdr), ctypes.c_uint, ctypes.c_int]
+    libc.sendmmsg.restype = ctypes.c_int
+
+
+
+name = ctypes.util.find_library('c')
+if not name:
+    raise ImportError("Can't find C library.")
+libc = ctypes.CDLL(name, use_errno=True)
+initializeModule(libc)
@@ -52,6 +52,10 @@ class _TLSMixin:
     readBlockedOnWrite = 0
     _userWantRead = _userWantWrite = True
 
+    # OpenSSL may buffer data which has already been read from the socket, so
+    # reads do not use up the socket's readiness.
+    _reportsWouldBlock = False
+
     def getPeerCertificate(self):
         return self.socket.get_peer_certificate()
 
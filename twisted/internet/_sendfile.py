@@ -0,0 +1,58 @@
+# -*- test-case-name: twisted.internet.test.test_tcp -*-
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Very low-level ctypes-based interface to Linux sendfile(2), which copies data
+from a file to a socket without passing it through userspace.
+
+ctypes, Linux and a version of libc which provides sendfile64 are required.
+"""
+
+import os
+import sys
+import ctypes
+import ctypes.util
+
+
+
+def sendfile(outFD, inFD, offset, count):
+    """
+    Send up to C{count} bytes of the file C{inFD}, starting at C{offset}, to
+    the socket C{outFD}, like C{os.sendfile} on newer Pythons.
+
+    @return: The number of bytes sent, which is C{0} at the end of the file.
+
+    @raise OSError: If nothing could be sent.
+    """
+    position = ctypes.c_int64(offset)
+    sent = libc.sendfile64(outFD, inFD, ctypes.byref(position), count)
+    if sent < 0:
+        err = ctypes.get_errno()
+        raise OSError(err, os.strerror(err))
+    return sent
+
+
+
+def initializeModule(libc):
+    """
+    Initialize the module, checking if the expected API exists and setting the
+    argtypes and restype for C{sendfile64}.
+    """
+    if getattr(libc, "sendfile64", None) is None:
+        raise ImportError("libc with sendfile64 needed")
+    libc.sendfile64.argtypes = [
+        ctypes.c_int, ctypes.c_int, ctypes.POINTER(ctypes.c_int64),
+        ctypes.c_size_t]
+    libc.sendfile64.restype = ctypes.c_ssize_t
+
+
+
+# sendfile on the BSDs and OS X takes different arguments.
+if not sys.platform.startswith('linux'):
+    raise ImportError("sendfile(2) is only supported on Linux")
+name = ctypes.util.find_library('c')
+if not name:
+    raise ImportError("Can't find C library.")
+libc = ctypes.CDLL(name, use_errno=True)
+initializeModule(libc)
@@ -0,0 +1,73 @@
+# -*- test-case-name: twisted.internet.test.test_tcp -*-
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Very low-level ctypes-based interface to writev(2), which writes several
+buffers to a file descriptor with one system call, without joining them.
+
+ctypes, Linux and a version of libc which provides writev are required.
+"""
+
+import os
+import sys
+import ctypes
+import ctypes.util
+
+
+
+class _IOVec(ctypes.Structure):
+    _fields_ = [
+        ("iov_base", ctypes.c_void_p),
+        ("iov_len", ctypes.c_size_t)]
+
+
+
+def writev(fd, chunks, offset=0):
+    """
+    Write the C{str}s in C{chunks}, skipping the first C{offset} bytes of the
+    first one, to the file descriptor C{fd} with one system call.
+
+    @return: The number of bytes written.
+
+    @raise OSError: If nothing could be written.
+    """
+    count = len(chunks)
+    iovecs = (_IOVec * count)()
+    for i, chunk in enumerate(chunks):
+        # The chunks are kept alive by the caller until the call returns.
+        iovecs[i].iov_base = ctypes.cast(
+            ctypes.c_char_p(chunk), ctypes.c_void_p).value
+        iovecs[i].iov_len = len(chunk)
+    iovecs[0].iov_base += offset
+    iovecs[0].iov_len -= offset
+    written = libc.writev(fd, iovecs, count)
+    if written < 0:
+        err = ctypes.get_errno()
+        raise OSError(err, os.strerror(err))
+    return written
+
+
+
+def initializeModule(libc):
+    """
+    Initialize the module, checking if the expected API exists and setting the
+    argtypes and restype for C{writev}.
+    """
+    if getattr(libc, "writev", None) is None:
+        raise ImportError("libc with writev needed")
+    libc.writev.argtypes = [
+        ctypes.c_int, ctypes.POINTER(_IOVec), ctypes.c_int]
+    libc.writev.restype = ctypes.c_ssize_t
+
+
+
+# Other platforms keep joining the chunks into one string before sending
+# them.
+if not sys.platform.startswith('linux'):
+    raise ImportError("writev(2) is only used on Linux")
+name = ctypes.util.find_library('c')
+if not name:
+    raise ImportError("Can't find C library.")
+libc = ctypes.CDLL(name, use_errno=True)
+initializeModule(libc)
@@ -7,6 +7,7 @@
 Support for generic select()able objects.
 """
 
+from collections import deque
 from socket import AF_INET6, inet_pton, error
 
 from zope.interface import implements
@@ -144,6 +145,24 @@ class FileDescriptor(_ConsumerMixin, _LogOwner):
     This is an abstract superclass of all objects which may be notified when
     they are readable or writable; e.g. they have a file-descriptor that is
     valid to be passed to select(2).
+
+    Data passed to L{write} and L{writeSequence} is queued chunk by chunk in
+    C{_tempDataBuffer}, a C{deque}.  Before each write, L{doWrite} gathers
+    chunks from the front of the queue into C{dataBuffer} until there are
+    C{SEND_LIMIT} bytes or C{IOV_MAX} chunks.  If L{_canWriteVectors} says so,
+    the gathered chunks are passed to C{_writeSomeVectors} as they are;
+    otherwise they are joined, so each byte is copied at most once however
+    much is queued.  A chunk of C{SEND_LIMIT} bytes or more is always sent on
+    its own, without being copied.
+
+    @ivar IOV_MAX: The largest number of queued chunks to gather into a single
+        write.
+
+    @ivar _queuedSegments: The number of objects other than C{str} which a
+        subclass has queued in C{_tempDataBuffer}, such as the file segments
+        of L{twisted.internet.tcp.Connection.sendFile}.  Gathering stops at
+        such an object, and the subclass's C{doWrite} must send it once it
+        reaches the front of the queue.
     """
     connected = 0
     disconnected = 0
@@ -154,6 +173,8 @@ class FileDescriptor(_ConsumerMixin, _LogOwner):
     offset = 0
 
     SEND_LIMIT = 128*1024
+    IOV_MAX = 1024
+    _queuedSegments = 0
 
     implements(interfaces.IPushProducer, interfaces.IReadWriteDescriptor,
                interfaces.IConsumer, interfaces.ITransport, interfaces.IHalfCloseableDescriptor)
@@ -162,7 +183,7 @@ class FileDescriptor(_ConsumerMixin, _LogOwner):
         if not reactor:
             from twisted.internet import reactor
         self.reactor = reactor
-        self._tempDataBuffer = [] # will be added to dataBuffer in doWrite
+        self._tempDataBuffer = deque() # will be added to dataBuffer in doWrite
         self._tempDataLen = 0
 
 
@@ -219,16 +240,20 @@ class FileDescriptor(_ConsumerMixin, _LogOwner):
         indicates no write was done, and a result of None indicates that a
         write was done.
         """
-        if len(self.dataBuffer) - self.offset < self.SEND_LIMIT:
+        chunks = None
+        if (self._tempDataBuffer and
+                len(self.dataBuffer) - self.offset < self.SEND_LIMIT):
             # If there is currently less than SEND_LIMIT bytes left to send
-            # in the string, extend it with the array data.
-            self.dataBuffer = buffer(self.dataBuffer, self.offset) + "".join(self._tempDataBuffer)
-            self.offset = 0
-            self._tempDataBuffer = []
-            self._tempDataLen = 0
+            # in the string, send queued data along with it.
+            chunks, offset = self._gatherChunks()
+            if len(chunks) < 2 or not self._canWriteVectors():
+                self._joinChunks(chunks, offset)
+                chunks = None
 
         # Send as much data as you can.
-        if self.offset:
+        if chunks is not None:
+            l = self._writeSomeVectors(chunks, offset)
+        elif self.offset:
             l = self.writeSomeData(buffer(self.dataBuffer, self.offset))
         else:
             l = self.writeSomeData(self.dataBuffer)
@@ -238,14 +263,20 @@ class FileDescriptor(_ConsumerMixin, _LogOwner):
         # integers meant connection lost.  Keep supporting this here,
         # although it may be worth deprecating and removing at some point.
         if l < 0 or isinstance(l, Exception):
+            if chunks is not None:
+                self._requeueChunks(chunks, offset)
             return l
-        if l == 0 and self.dataBuffer:
+        if l == 0 and (chunks or self.dataBuffer):
             result = 0
         else:
             result = None
-        self.offset += l
+        if chunks is not None:
+            self._requeueChunks(chunks, offset + l)
+        else:
+            self.offset += l
         # If there is nothing left to send,
-        if self.offset == len(self.dataBuffer) and not self._tempDataLen:
+        if (self.offset == len(self.dataBuffer) and not self._tempDataLen and
+                not self._queuedSegments):
             self.dataBuffer = ""
             self.offset = 0
             # stop writing.
@@ -270,6 +301,110 @@ class FileDescriptor(_ConsumerMixin, _LogOwner):
                 return result
         return result
 
+    def _gatherChunks(self):
+        """
+        Move chunks from the front of C{_tempDataBuffer} after the unsent part
+        of C{dataBuffer}, stopping before C{SEND_LIMIT} bytes or C{IOV_MAX}
+        chunks would be exceeded.  A chunk is never split.
+
+        C{dataBuffer} is left empty until L{_joinChunks} or L{_requeueChunks}
+        is called with the result.
+
+        @return: A two-tuple of the C{list} of chunks to send next, starting
+            with C{dataBuffer} if some of it is unsent, and the number of
+            bytes at the start of the first chunk which have already been
+            sent.
+        """
+        pending = self._tempDataBuffer
+        chunks = []
+        offset = 0
+        size = len(self.dataBuffer) - self.offset
+        if size:
+            chunks.append(self.dataBuffer)
+            offset = self.offset
+        self.dataBuffer = ""
+        self.offset = 0
+        limit = self.SEND_LIMIT
+        maxChunks = self.IOV_MAX
+        segments = self._queuedSegments
+        if (not segments and size + self._tempDataLen <= limit and
+                len(chunks) + len(pending) <= maxChunks):
+            # Everything fits in one write.
+            chunks.extend(pending)
+            pending.clear()
+            self._tempDataLen = 0
+        while pending and len(chunks) < maxChunks:
+            chunk = pending[0]
+            if segments and not isinstance(chunk, str):
+                break
+            chunkSize = len(chunk)
+            if chunks and size + chunkSize > limit:
+                break
+            chunks.append(pending.popleft())
+            size += chunkSize
+            self._tempDataLen -= chunkSize
+        return chunks, offset
+
+
+    def _joinChunks(self, chunks, offset):
+        """
+        Make the chunks returned by L{_gatherChunks} the new C{dataBuffer}.
+        One chunk on its own becomes C{dataBuffer} without being copied.
+        """
+        if len(chunks) == 1:
+            self.dataBuffer = chunks[0]
+            self.offset = offset
+        else:
+            if offset:
+                chunks[0] = chunks[0][offset:]
+            self.dataBuffer = "".join(chunks)
+            self.offset = 0
+
+
+    def _requeueChunks(self, chunks, position):
+        """
+        Put back the chunks returned by L{_gatherChunks} once the first
+        C{position} bytes of them have been sent: the chunk sending stopped
+        in becomes C{dataBuffer}, and those after it go back to the front of
+        C{_tempDataBuffer}.
+        """
+        for i, chunk in enumerate(chunks):
+            if position < len(chunk):
+                break
+            position -= len(chunk)
+        else:
+            return
+        self.dataBuffer = chunk
+        self.offset = position
+        rest = chunks[i + 1:]
+        self._tempDataBuffer.extendleft(reversed(rest))
+        for chunk in rest:
+            self._tempDataLen += len(chunk)
+
+
+    def _canWriteVectors(self):
+        """
+        Determine whether L{doWrite} may pass several chunks to
+        L{_writeSomeVectors} rather than joining them for L{writeSomeData}.
+
+        @return: C{False}; subclasses which can write several buffers with
+            one call override this.
+        """
+        return False
+
+
+    def _writeSomeVectors(self, chunks, offset):
+        """
+        Write as much as possible of the given C{str}s, skipping the first
+        C{offset} bytes of the first one, immediately.
+
+        This is called instead of L{writeSomeData} when L{_canWriteVectors}
+        returns true, and its result is interpreted in the same way.
+        """
+        raise NotImplementedError("%s does not implement _writeSomeVectors" %
+                                  reflect.qual(self.__class__))
+
+
     def _postLoseConnection(self):
         """Called after a loseConnection(), when all data has been written.
 
@@ -341,13 +476,12 @@ class FileDescriptor(_ConsumerMixin, _LogOwner):
         """
         Reliably write a sequence of data.
 
-        Currently, this is a convenience method roughly equivalent to::
+        This is equivalent to::
 
             for chunk in iovec:
                 fd.write(chunk)
 
-        It may have a more efficient implementation at a later time or in a
-        different reactor.
+        The chunks are queued individually; they are not concatenated.
 
         As with the C{write()} method, if a buffer size limit is reached and a
         streaming producer is registered, it will be paused until the buffered
@@ -11,12 +11,13 @@ from zope.interface import implements, classImplements
 
 import sys
 import warnings
-from heapq import heappush, heappop, heapify
+from heapq import heappush, heappop, heapify, heapreplace
 
 import traceback
 
 from twisted.python.compat import set
 from twisted.python.util import unsignedID
+from twisted.python.histogram import Histogram
 from twisted.internet.interfaces import IReactorCore, IReactorTime, IReactorThreads
 from twisted.internet.interfaces import IResolverSimple, IReactorPluggableResolver
 from twisted.internet.interfaces import IConnector, IDelayedCall
@@ -206,6 +207,317 @@ class DelayedCall(styles.Ephemeral):
 
 
 
+class TimerWheel(object):
+    """
+    A hashed timing wheel for storing L{DelayedCall} instances.
+
+    Calls are hashed into buckets by the integer number of C{resolution}
+    length ticks between the epoch and the time at which they are scheduled.
+    Buckets live in a C{dict} keyed on that absolute tick, so the wheel never
+    needs to be walked in rounds and there is no upper bound on how far in the
+    future a call may be scheduled.  The distinct ticks which have at least
+    one call in them are kept in a heap, to find the next bucket to expire.
+    Removing a call, and adding one to a tick which already has a bucket, are
+    constant time operations.  Adding a call to a new tick pushes the tick
+    onto the heap, which takes time logarithmic in the number of distinct
+    ticks, not in the number of calls.
+
+    Calls are never run early: a bucket which is only partially due gives up
+    just those of its calls which are, and the calls handed back by
+    L{expire} are sorted by their scheduled time.
+
+    A L{TimerWheel} is used by a reactor after it is passed to
+    L{ReactorBase.installTimerWheel}.
+
+    @ivar resolution: The length, in seconds, of one tick of the wheel.
+
+    @ivar _buckets: A C{dict} mapping ticks to C{set}s of the L{DelayedCall}s
+        scheduled during that tick.
+
+    @ivar _ticks: A C{dict} mapping each L{DelayedCall} in the wheel to the
+        tick of the bucket it is in.
+
+    @ivar _tickHeap: A heap of ticks for which a bucket has been created.  It
+        may contain ticks whose bucket has since been emptied and removed;
+        these are discarded when they reach the top of the heap.
+    """
+
+    def __init__(self, resolution=0.01):
+        if resolution <= 0:
+            raise ValueError(
+                "resolution must be positive, not %r" % (resolution,))
+        self.resolution = resolution
+        self._buckets = {}
+        self._ticks = {}
+        self._tickHeap = []
+
+
+    def __len__(self):
+        """
+        Return the number of calls in the wheel.
+        """
+        return len(self._ticks)
+
+
+    def __contains__(self, call):
+        """
+        Determine whether C{call} is currently in the wheel.
+        """
+        return call in self._ticks
+
+
+    def _tickFor(self, time):
+        """
+        Return the tick which contains the absolute time C{time}.
+        """
+        return int(time // self.resolution)
+
+
+    def add(self, call):
+        """
+        Add C{call} to the bucket for its current scheduled C{time}.
+
+        @type call: L{DelayedCall}
+        """
+        tick = self._tickFor(call.time)
+        bucket = self._buckets.get(tick)
+        if bucket is None:
+            bucket = self._buckets[tick] = set()
+            heappush(self._tickHeap, tick)
+            if len(self._tickHeap) > 2 * len(self._buckets) + 64:
+                self._compact()
+        bucket.add(call)
+        self._ticks[call] = tick
+
+
+    def remove(self, call):
+        """
+        Remove C{call} from the wheel, if it is in it.
+
+        @type call: L{DelayedCall}
+        """
+        tick = self._ticks.pop(call, None)
+        if tick is None:
+            return
+        bucket = self._buckets[tick]
+        bucket.discard(call)
+        if not bucket:
+            del self._buckets[tick]
+
+
+    def reschedule(self, call):
+        """
+        Move C{call} to the bucket for its current scheduled C{time}, if it is
+        in the wheel.  This should be called after the C{time} of a call has
+        been changed.
+
+        @type call: L{DelayedCall}
+        """
+        tick = self._ticks.get(call)
+        if tick is not None and tick != self._tickFor(call.time):
+            self.remove(call)
+            self.add(call)
+
+
+    def _compact(self):
+        """
+        Rebuild the tick heap from the ticks which still have a bucket.
+        """
+        self._tickHeap = self._buckets.keys()
+        heapify(self._tickHeap)
+
+
+    def _firstBucket(self):
+        """
+        Return the earliest non-empty bucket and its tick, discarding any stale
+        ticks at the top of the heap along the way.
+
+        @return: A two-tuple of the tick and the C{set} of calls in it, or
+            C{(None, None)} if the wheel is empty.
+        """
+        heap = self._tickHeap
+        buckets = self._buckets
+        while heap:
+            tick = heap[0]
+            bucket = buckets.get(tick)
+            if bucket is not None:
+                return tick, bucket
+            heappop(heap)
+        return None, None
+
+
+    def nextTime(self):
+        """
+        Return the scheduled time of the earliest call in the wheel, or
+        C{None} if the wheel is empty.
+        """
+        tick, bucket = self._firstBucket()
+        if bucket is None:
+            return None
+        return min([call.time for call in bucket])
+
+
+    def expire(self, now):
+        """
+        Remove and return every call scheduled at or before C{now}.
+
+        @param now: The current time, in seconds since the epoch.
+
+        @return: A C{list} of L{DelayedCall}s, sorted by their scheduled time.
+        """
+        nowTick = self._tickFor(now)
+        ticks = self._ticks
+        buckets = self._buckets
+        due = []
+        while True:
+            tick, bucket = self._firstBucket()
+            if bucket is None or tick > nowTick:
+                break
+            if tick < nowTick:
+                ready = list(bucket)
+                bucket.clear()
+            else:
+                ready = [call for call in bucket if call.time <= now]
+                bucket.difference_update(ready)
+            due.extend(ready)
+            for call in ready:
+                del ticks[call]
+            if bucket:
+                break
+            heappop(self._tickHeap)
+            del buckets[tick]
+        due.sort()
+        return due
+
+
+    def getDelayedCalls(self):
+        """
+        Return a C{list} of all of the calls in the wheel, in no particular
+        order.
+        """
+        return self._ticks.keys()
+
+
+
+class LoopInstrumentation(object):
+    """
+    Histograms of how long the parts of a reactor's main loop take, and a
+    record of the slowest callbacks, for use with
+    L{ReactorBase.installInstrumentation}.
+
+    @ivar lag: A L{Histogram} of how long after their scheduled time timed
+        calls were run.
+
+    @ivar runUntilCurrent: A L{Histogram} of the time spent in each call to
+        L{ReactorBase.runUntilCurrent}.
+
+    @ivar doIteration: A L{Histogram} of the time spent in each call to
+        C{doIteration}, including the time spent waiting for events.
+
+    @ivar timers: A L{Histogram} of the time taken by each timed call.
+
+    @ivar selectables: A L{Histogram} of the time taken to service each ready
+        reader or writer.
+
+    @ivar slowest: The number of slowest callbacks to keep.
+
+    @ivar _slowest: A heap of three-tuples of the duration, kind (C{"timer"}
+        or C{"selectable"}) and C{repr} of the slowest callbacks.
+    """
+
+    def __init__(self, slowest=10):
+        self.slowest = slowest
+        self.lag = Histogram()
+        self.runUntilCurrent = Histogram()
+        self.doIteration = Histogram()
+        self.timers = Histogram()
+        self.selectables = Histogram()
+        self._slowest = []
+
+
+    def reset(self):
+        """
+        Forget everything recorded so far.
+        """
+        for histogram in self._histograms():
+            histogram.reset()
+        self._slowest = []
+
+
+    def _histograms(self):
+        return [self.lag, self.runUntilCurrent, self.doIteration,
+                self.timers, self.selectables]
+
+
+    def _callbackTimed(self, duration, kind, callback):
+        """
+        Remember C{callback} if it is one of the slowest seen so far.
+        """
+        slowest = self._slowest
+        if len(slowest) < self.slowest:
+            heappush(slowest, (duration, kind, repr(callback)))
+        elif slowest and duration > slowest[0][0]:
+            heapreplace(slowest, (duration, kind, repr(callback)))
+
+
+    def runUntilCurrentTimed(self, duration):
+        self.runUntilCurrent.record(duration)
+
+
+    def doIterationTimed(self, duration):
+        self.doIteration.record(duration)
+
+
+    def timedCallRun(self, call, lag, duration):
+        self.lag.record(lag)
+        self.timers.record(duration)
+        self._callbackTimed(duration, "timer", call)
+
+
+    def selectableRun(self, selectable, duration):
+        self.selectables.record(duration)
+        self._callbackTimed(duration, "selectable", selectable)
+
+
+    def getSlowest(self):
+        """
+        Return the slowest callbacks seen so far, slowest first.
+
+        @return: A C{list} of three-tuples of the duration in seconds, the kind
+            of callback (C{"timer"} or C{"selectable"}) and its C{repr}.
+        """
+        return sorted(self._slowest, reverse=True)
+
+
+    def report(self):
+        """
+        Summarise the histograms and the slowest callbacks.
+
+        @rtype: C{str}
+        """
+        lines = []
+        for name, histogram in [("lag", self.lag),
+                                ("runUntilCurrent", self.runUntilCurrent),
+                                ("doIteration", self.doIteration),
+                                ("timers", self.timers),
+                                ("selectables", self.selectables)]:
+            if not histogram.count:
+                lines.append("%s: no samples" % (name,))
+                continue
+            lines.append(
+                "%s: count=%d p50=%.3fms p90=%.3fms p99=%.3fms max=%.3fms" % (
+                    name, histogram.count,
+                    histogram.percentile(50) * 1000,
+                    histogram.percentile(90) * 1000,
+                    histogram.percentile(99) * 1000,
+                    histogram.max * 1000))
+        for duration, kind, description in self.getSlowest():
+            lines.append("slow %s %.3fms: %s" % (
+                    kind, duration * 1000, description))
+        return "\n".join(lines)
+
+
+
 class ThreadedResolver(object):
     """
     L{ThreadedResolver} uses a reactor, a threadpool, and
@@ -456,12 +768,21 @@ class ReactorBase(object):
     @ivar _registerAsIOThread: A flag controlling whether the reactor will
         register the thread it is running in as the I/O thread when it starts.
         If C{True}, registration will be done, otherwise it will not be.
+
+    @ivar _timerWheel: C{None} if timed calls are kept in the
+        C{_pendingTimedCalls} heap, otherwise the L{TimerWheel} installed by
+        L{installTimerWheel} which holds them instead.
+
+    @ivar _instrumentation: C{None}, or the L{LoopInstrumentation} installed by
+        L{installInstrumentation} which the main loop is reporting to.
     """
     implements(IReactorCore, IReactorTime, IReactorPluggableResolver)
 
     _registerAsIOThread = True
 
     _stopped = True
+    _timerWheel = None
+    _instrumentation = None
     installed = False
     usingThreads = False
     resolver = BlockingResolver()
@@ -709,7 +1030,109 @@ class ReactorBase(object):
         self._newTimedCalls.append(tple)
         return tple
 
+    def installTimerWheel(self, wheel):
+        """
+        Keep the timed calls of this reactor in C{wheel} rather than in a heap.
+
+        Adding, cancelling and rescheduling a L{DelayedCall} all take constant
+        time with a timer wheel, which pays off when a great many calls are
+        outstanding and most of them are cancelled or reset before they run,
+        as is the case with idle timeouts.  Any calls which are already
+        scheduled are moved into C{wheel}.
+
+        @type wheel: L{TimerWheel}
+        """
+        self._insertNewDelayedCalls()
+        for call in self._pendingTimedCalls:
+            if not call.cancelled:
+                wheel.add(call)
+        self._pendingTimedCalls = []
+        self._cancellations = 0
+        self._timerWheel = wheel
+
+
+    _instrumentedMethods = (
+        "_doReadOrWrite", "_doEdgeReadOrWrite", "_doWriteOrRead",
+        "_callEventCallback")
+
+    def installInstrumentation(self, instrumentation):
+        """
+        Report how long each part of the main loop takes to
+        C{instrumentation}, or stop reporting if it is C{None}.
+
+        The timing is done by wrappers which are installed as instance
+        attributes over L{runUntilCurrent}, C{doIteration}, the running of
+        each timed call and the reactor's dispatch of each ready reader and
+        writer, so a reactor without instrumentation runs exactly the code it
+        would otherwise.
+
+        @param instrumentation: An object like L{LoopInstrumentation}, with
+            C{runUntilCurrentTimed(duration)}, C{doIterationTimed(duration)},
+            C{timedCallRun(call, lag, duration)} and
+            C{selectableRun(selectable, duration)} methods, all durations
+            being in seconds; or C{None}.
+        """
+        names = ("runUntilCurrent", "doIteration", "_runDelayedCall") + (
+            self._instrumentedMethods)
+        for name in names:
+            self.__dict__.pop(name, None)
+        self._instrumentation = instrumentation
+        if instrumentation is None:
+            return
+
+        seconds = self.seconds
+
+        def timed(method, report):
+            def wrapper(*args):
+                start = seconds()
+                try:
+                    return method(*args)
+                finally:
+                    report(seconds() - start)
+            return wrapper
+
+        self.runUntilCurrent = timed(
+            self.runUntilCurrent, instrumentation.runUntilCurrentTimed)
+        self.doIteration = timed(
+            self.doIteration, instrumentation.doIterationTimed)
+
+        runDelayedCall = self._runDelayedCall
+        def timedCall(call):
+            start = seconds()
+            try:
+                return runDelayedCall(call)
+            finally:
+                instrumentation.timedCallRun(
+                    call, start - call.getTime(), seconds() - start)
+        self._runDelayedCall = timedCall
+
+        def dispatcher(method, selectableOf):
+            def wrapper(*args):
+                start = seconds()
+                try:
+                    return method(*args)
+                finally:
+                    instrumentation.selectableRun(
+                        selectableOf(args), seconds() - start)
+            return wrapper
+
+        for name in self._instrumentedMethods:
+            method = getattr(self, name, None)
+            if method is None:
+                continue
+            if name == "_callEventCallback":
+                # Completion reactors pass the event, whose owner is the
+                # transport, last.
+                selectableOf = lambda args: args[-1].owner
+            else:
+                selectableOf = lambda args: args[0]
+            setattr(self, name, dispatcher(method, selectableOf))
+
+
     def _moveCallLaterSooner(self, tple):
+        if self._timerWheel is not None:
+            self._timerWheel.reschedule(tple)
+            return
         # Linear time find: slow.
         heap = self._pendingTimedCalls
         try:
@@ -730,7 +1153,10 @@ class ReactorBase(object):
             pass
 
     def _cancelCallLater(self, tple):
-        self._cancellations+=1
+        if self._timerWheel is not None:
+            self._timerWheel.remove(tple)
+        else:
+            self._cancellations+=1
 
 
     def getDelayedCalls(self):
@@ -738,21 +1164,36 @@ class ReactorBase(object):
         They are returned in no particular order.
         This method is not efficient -- it is really only meant for
         test cases."""
-        return [x for x in (self._pendingTimedCalls + self._newTimedCalls) if not x.cancelled]
+        if self._timerWheel is not None:
+            pending = self._timerWheel.getDelayedCalls()
+        else:
+            pending = self._pendingTimedCalls
+        return [x for x in (pending + self._newTimedCalls) if not x.cancelled]
 
     def _insertNewDelayedCalls(self):
+        wheel = self._timerWheel
         for call in self._newTimedCalls:
             if call.cancelled:
-                self._cancellations-=1
+                if wheel is None:
+                    self._cancellations-=1
             else:
                 call.activate_delay()
-                heappush(self._pendingTimedCalls, call)
+                if wheel is None:
+                    heappush(self._pendingTimedCalls, call)
+                else:
+                    wheel.add(call)
         self._newTimedCalls = []
 
     def timeout(self):
         # insert new delayed calls to make sure to include them in timeout value
         self._insertNewDelayedCalls()
 
+        if self._timerWheel is not None:
+            nextTime = self._timerWheel.nextTime()
+            if nextTime is None:
+                return None
+            return max(0, nextTime - self.seconds())
+
         if not self._pendingTimedCalls:
             return None
 
@@ -784,6 +1225,8 @@ class ReactorBase(object):
         self._insertNewDelayedCalls()
 
         now = self.seconds()
+        if self._timerWheel is not None:
+            self._runTimerWheelCalls(now)
         while self._pendingTimedCalls and (self._pendingTimedCalls[0].time <= now):
             call = heappop(self._pendingTimedCalls)
             if call.cancelled:
@@ -795,19 +1238,7 @@ class ReactorBase(object):
                 heappush(self._pendingTimedCalls, call)
                 continue
 
-            try:
-                call.called = 1
-                call.func(*call.args, **call.kw)
-            except:
-                log.deferr()
-                if hasattr(call, "creator"):
-                    e = "\n"
-                    e += " C: previous exception occurred in " + \
-                         "a DelayedCall created here:\n"
-                    e += " C:"
-                    e += "".join(call.creator).rstrip().replace("\n","\n C:")
-                    e += "\n"
-                    log.msg(e)
+            self._runDelayedCall(call)
 
 
         if (self._cancellations > 50 and
@@ -821,6 +1252,43 @@ class ReactorBase(object):
             self._justStopped = False
             self.fireSystemEvent("shutdown")
 
+
+    def _runTimerWheelCalls(self, now):
+        """
+        Run the calls in the installed L{TimerWheel} which are due at C{now}.
+
+        Calls which were cancelled by an earlier call in the same batch are
+        skipped, and calls which have been delayed are put back in the wheel.
+        """
+        wheel = self._timerWheel
+        for call in wheel.expire(now):
+            if call.cancelled:
+                continue
+            if call.delayed_time > 0:
+                call.activate_delay()
+                wheel.add(call)
+                continue
+            self._runDelayedCall(call)
+
+
+    def _runDelayedCall(self, call):
+        """
+        Mark C{call} as called and run it, logging any exception it raises.
+        """
+        try:
+            call.called = 1
+            call.func(*call.args, **call.kw)
+        except:
+            log.deferr()
+            if hasattr(call, "creator"):
+                e = "\n"
+                e += " C: previous exception occurred in " + \
+                     "a DelayedCall created here:\n"
+                e += " C:"
+                e += "".join(call.creator).rstrip().replace("\n","\n C:")
+                e += "\n"
+                log.msg(e)
+
     # IReactorProcess
 
     def _checkProcessArgs(self, args, env):
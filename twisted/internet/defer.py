@@ -69,7 +69,12 @@ def succeed(result):
     @rtype: L{Deferred}
     """
     d = Deferred()
-    d.callback(result)
+    if Deferred.debug or isinstance(result, failure.Failure):
+        d.callback(result)
+    else:
+        # There are no callbacks to run yet, so just store the result.
+        d.called = True
+        d.result = result
     return d
 
 
@@ -176,9 +181,13 @@ def getDebugging():
 _NO_RESULT = object()
 _CONTINUE = object()
 
+# A callbacks list entry which returns the current result unchanged, used to
+# hand a Deferred returned by a callback back to Deferred._runCallbacks.
+_returnResult = ((passthru, None, None), (passthru, None, None))
+
 
 
-class Deferred:
+class Deferred(object):
     """
     This is a callback which will be put off until later.
 
@@ -222,22 +231,17 @@ class Deferred:
         Deferred, this is a reference to the other Deferred.  Otherwise, C{None}.
     """
 
-    called = False
-    paused = 0
-    _debugInfo = None
-    _suppressAlreadyCalled = False
-
-    # Are we currently running a user-installed callback?  Meant to prevent
-    # recursive running of callbacks when a reentrant call to add a callback is
-    # used.
-    _runningCallbacks = False
+    # Every attribute a Deferred uses itself has a slot, so that most
+    # Deferreds never need an instance dictionary.  One is still created for
+    # code which sets other attributes on a Deferred.
+    __slots__ = ('callbacks', 'result', 'called', 'paused', '_canceller',
+                 '_debugInfo', '_suppressAlreadyCalled', '_runningCallbacks',
+                 '_chainedTo', '__dict__', '__weakref__')
 
     # Keep this class attribute for now, for compatibility with code that
     # sets it directly.
     debug = False
 
-    _chainedTo = None
-
     def __init__(self, canceller=None):
         """
         Initialize a L{Deferred}.
@@ -264,6 +268,15 @@ class Deferred:
         """
         self.callbacks = []
         self._canceller = canceller
+        self.called = False
+        self.paused = 0
+        self._suppressAlreadyCalled = False
+        # Are we currently running a user-installed callback?  Meant to
+        # prevent recursive running of callbacks when a reentrant call to add
+        # a callback is used.
+        self._runningCallbacks = False
+        self._chainedTo = None
+        self._debugInfo = None
         if self.debug:
             self._debugInfo = DebugInfo()
             self._debugInfo.creator = traceback.format_stack()[:-1]
@@ -282,6 +295,16 @@ class Deferred:
         """
         assert callable(callback)
         assert errback == None or callable(errback)
+        if (self.called and not self.callbacks and not self.paused and
+            not self._runningCallbacks):
+            result = self.result
+            if not isinstance(result, (failure.Failure, Deferred)):
+                # The result is already here and nothing else is waiting to
+                # process it: call the callback straight away.
+                self._runCallbackNow(
+                    callback, callbackArgs, callbackKeywords)
+                return self
+
         cbs = ((callback, callbackArgs, callbackKeywords),
                (errback or (passthru), errbackArgs, errbackKeywords))
         self.callbacks.append(cbs)
@@ -291,6 +314,35 @@ class Deferred:
         return self
 
 
+    def _runCallbackNow(self, callback, args, kw):
+        """
+        Call C{callback} with the current result, which is neither a
+        L{failure.Failure} nor a L{Deferred}, and make its return value the
+        new result, without going through L{_runCallbacks}.
+
+        If C{callback} fails, returns a L{Deferred} or adds more callbacks,
+        L{_runCallbacks} is left to deal with the new result.
+        """
+        self._runningCallbacks = True
+        try:
+            try:
+                result = callback(self.result, *(args or ()), **(kw or {}))
+            finally:
+                self._runningCallbacks = False
+        except:
+            self.result = failure.Failure(captureVars=self.debug)
+            self._runCallbacks()
+            return
+        if isinstance(result, Deferred):
+            # Have _runCallbacks take the other Deferred's result, or wait for
+            # it, as if a callback it ran had returned it.
+            self.callbacks.insert(0, _returnResult)
+        self.result = result
+        # Callbacks may also have been added by the one just run.
+        if self.callbacks or isinstance(result, failure.Failure):
+            self._runCallbacks()
+
+
     def addCallback(self, callback, *args, **kw):
         """
         Convenience method for adding just a callback.
@@ -461,7 +513,12 @@ class Deferred:
             self._debugInfo.invoker = traceback.format_stack()[:-2]
         self.called = True
         self.result = result
-        self._runCallbacks()
+        if self.callbacks or isinstance(result, failure.Failure):
+            self._runCallbacks()
+        elif not self.paused:
+            # Nothing to run; just stop waiting on whatever this was chained
+            # to, as _runCallbacks would have.
+            self._chainedTo = None
 
 
     def _continuation(self):
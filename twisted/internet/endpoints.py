@@ -241,7 +241,7 @@ class _TCPServerEndpoint(object):
     """
     implements(interfaces.IStreamServerEndpoint)
 
-    def __init__(self, reactor, port, backlog, interface):
+    def __init__(self, reactor, port, backlog, interface, reuseport=False):
         """
         @param reactor: An L{IReactorTCP} provider.
 
@@ -253,22 +253,33 @@ class _TCPServerEndpoint(object):
 
         @param interface: The hostname to bind to
         @type interface: str
+
+        @param reuseport: Whether to let other processes listen on the same
+            port, see L{PosixReactorBase.listenTCP
+            <twisted.internet.posixbase.PosixReactorBase.listenTCP>}.
+        @type reuseport: bool
         """
         self._reactor = reactor
         self._port = port
         self._backlog = backlog
         self._interface = interface
+        self._reuseport = reuseport
 
 
     def listen(self, protocolFactory):
         """
         Implement L{IStreamServerEndpoint.listen} to listen on a TCP socket
         """
+        kwargs = {}
+        if self._reuseport:
+            # Only reactors which support it accept this argument.
+            kwargs['reuseport'] = True
         return defer.execute(self._reactor.listenTCP,
                              self._port,
                              protocolFactory,
                              backlog=self._backlog,
-                             interface=self._interface)
+                             interface=self._interface,
+                             **kwargs)
 
 
 
@@ -276,7 +287,8 @@ class TCP4ServerEndpoint(_TCPServerEndpoint):
     """
     Implements TCP server endpoint with an IPv4 configuration
     """
-    def __init__(self, reactor, port, backlog=50, interface=''):
+    def __init__(self, reactor, port, backlog=50, interface='',
+                 reuseport=False):
         """
         @param reactor: An L{IReactorTCP} provider.
 
@@ -288,8 +300,13 @@ class TCP4ServerEndpoint(_TCPServerEndpoint):
 
         @param interface: The hostname to bind to, defaults to '' (all)
         @type interface: str
+
+        @param reuseport: Whether to set I{SO_REUSEPORT} on the listening
+            socket, defaults to C{False}
+        @type reuseport: bool
         """
-        _TCPServerEndpoint.__init__(self, reactor, port, backlog, interface)
+        _TCPServerEndpoint.__init__(
+            self, reactor, port, backlog, interface, reuseport)
 
 
 
@@ -297,7 +314,8 @@ class TCP6ServerEndpoint(_TCPServerEndpoint):
     """
     Implements TCP server endpoint with an IPv6 configuration
     """
-    def __init__(self, reactor, port, backlog=50, interface='::'):
+    def __init__(self, reactor, port, backlog=50, interface='::',
+                 reuseport=False):
         """
         @param reactor: An L{IReactorTCP} provider.
 
@@ -309,8 +327,13 @@ class TCP6ServerEndpoint(_TCPServerEndpoint):
 
         @param interface: The hostname to bind to, defaults to '' (all)
         @type interface: str
+
+        @param reuseport: Whether to set I{SO_REUSEPORT} on the listening
+            socket, defaults to C{False}
+        @type reuseport: bool
         """
-        _TCPServerEndpoint.__init__(self, reactor, port, backlog, interface)
+        _TCPServerEndpoint.__init__(
+            self, reactor, port, backlog, interface, reuseport)
 
 
 
@@ -652,7 +675,7 @@ class AdoptedStreamServerEndpoint(object):
 
 
 
-def _parseTCP(factory, port, interface="", backlog=50):
+def _parseTCP(factory, port, interface="", backlog=50, reuseport=False):
     """
     Internal parser function for L{_parseServer} to convert the string
     arguments for a TCP(IPv4) stream endpoint into the structured arguments.
@@ -670,12 +693,19 @@ def _parseTCP(factory, port, interface="", backlog=50):
     @param backlog: the length of the listen queue
     @type backlog: C{str}
 
+    @param reuseport: A string '0' or '1', mapping to False and True; whether
+        to set I{SO_REUSEPORT} on the listening socket.  Only passed on when
+        true, since not every L{IReactorTCP.listenTCP} accepts it.
+    @type reuseport: C{str}
+
     @return: a 2-tuple of (args, kwargs), describing  the parameters to
         L{IReactorTCP.listenTCP} (or, modulo argument 2, the factory, arguments
         to L{TCP4ServerEndpoint}.
     """
-    return (int(port), factory), {'interface': interface,
-                                  'backlog': int(backlog)}
+    kw = {'interface': interface, 'backlog': int(backlog)}
+    if int(reuseport):
+        kw['reuseport'] = True
+    return (int(port), factory), kw
 
 
 
@@ -845,7 +875,8 @@ class _TCP6ServerParser(object):
 
     prefix = "tcp6"     # Used in _parseServer to identify the plugin with the endpoint type
 
-    def _parseServer(self, reactor, port, backlog=50, interface='::'):
+    def _parseServer(self, reactor, port, backlog=50, interface='::',
+                     reuseport=False):
         """
         Internal parser function for L{_parseServer} to convert the string
         arguments into structured arguments for the L{TCP6ServerEndpoint}
@@ -860,10 +891,14 @@ class _TCP6ServerParser(object):
 
         @param interface: The hostname to bind to
         @type interface: str
+
+        @param reuseport: A string '0' or '1'; whether to set I{SO_REUSEPORT}
+        @type reuseport: str
         """
         port = int(port)
         backlog = int(backlog)
-        return TCP6ServerEndpoint(reactor, port, backlog, interface)
+        reuseport = bool(int(reuseport))
+        return TCP6ServerEndpoint(reactor, port, backlog, interface, reuseport)
 
 
     def parseStreamServer(self, reactor, *args, **kwargs):
@@ -1046,6 +1081,11 @@ def serverFromString(reactor, description):
 
         serverFromString(reactor, "tcp:80:interface=127.0.0.1")
 
+    To let several processes listen on the same TCP port, each with its own
+    socket, set C{reuseport}::
+
+        serverFromString(reactor, "tcp:80:reuseport=1")
+
     SSL server endpoints may be specified with the 'ssl' prefix, and the
     private key and certificate files may be specified by the C{privateKey} and
     C{certKey} arguments::
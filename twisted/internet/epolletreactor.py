@@ -0,0 +1,27 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+An edge-triggered epoll() based implementation of the twisted main loop.
+
+To install the event loop (and you should do this before any connections,
+listeners or connectors are added)::
+
+    from twisted.internet import epolletreactor
+    epolletreactor.install()
+"""
+
+from twisted.internet.epollreactor import EdgeTriggeredEPollReactor
+
+
+
+def install():
+    """
+    Install the edge-triggered epoll() reactor.
+    """
+    p = EdgeTriggeredEPollReactor()
+    from twisted.internet.main import installReactor
+    installReactor(p)
+
+
+__all__ = ["EdgeTriggeredEPollReactor", "install"]
@@ -12,10 +12,11 @@ listeners or connectors are added)::
 """
 
 import errno
+import sys
 
 from zope.interface import implements
 
-from twisted.internet.interfaces import IReactorFDSet
+from twisted.internet.interfaces import IReactorFDSet, IReactorDaemonize
 
 from twisted.python import log
 from twisted.internet import posixbase
@@ -195,7 +196,7 @@ class EPollReactor(posixbase.PosixReactorBase, posixbase._PollLikeMixin):
         file descriptors (e.g. filesytem files) that are not supported by
         C{epoll(7)}.
     """
-    implements(IReactorFDSet)
+    implements(IReactorFDSet, IReactorDaemonize)
 
     # Attributes for _PollLikeMixin
     _POLL_DISCONNECTED = (_epoll.EPOLLHUP | _epoll.EPOLLERR)
@@ -218,6 +219,32 @@ class EPollReactor(posixbase.PosixReactorBase, posixbase._PollLikeMixin):
         posixbase.PosixReactorBase.__init__(self)
 
 
+    def beforeDaemonize(self):
+        """
+        Implement L{IReactorDaemonize.beforeDaemonize}.
+        """
+        # An epoll instance is shared by every process forked after it is
+        # created, so registrations made by one of them would show up in all
+        # of the others.  Close it here and create a new one in each process
+        # in afterDaemonize.
+        self._poller.close()
+        self._poller = None
+
+
+    def afterDaemonize(self):
+        """
+        Implement L{IReactorDaemonize.afterDaemonize}.
+        """
+        self._poller = _epoll.epoll(1024)
+        for fd in self._selectables:
+            flags = 0
+            if fd in self._reads:
+                flags |= _epoll.EPOLLIN
+            if fd in self._writes:
+                flags |= _epoll.EPOLLOUT
+            self._poller.register(fd, flags)
+
+
     def _add(self, xer, primary, other, selectables, event, antievent):
         """
         Private method for adding a descriptor from the event loop.
@@ -381,6 +408,229 @@ class EPollReactor(posixbase.PosixReactorBase, posixbase._PollLikeMixin):
     doIteration = doPoll
 
 
+class EdgeTriggeredEPollReactor(EPollReactor):
+    """
+    A reactor that uses epoll(7) in edge-triggered mode for the descriptors
+    which support it.
+
+    Such a descriptor is registered for C{EPOLLIN | EPOLLOUT | EPOLLET} once,
+    when it is first added as a reader or writer, and is unregistered only
+    when it is removed as both.  Starting and stopping reading or writing in
+    between only changes C{_reads} and C{_writes}, so it makes no system
+    calls.
+
+    Because the kernel reports each change in readiness only once, readiness
+    is remembered in C{_readable} and C{_writable} until the descriptor
+    reports that it has used it up.  Every iteration calls C{doRead} or
+    C{doWrite} on each descriptor which is both ready and of interest, and
+    does not block in C{epoll_wait} while there are any.
+
+    A descriptor supports edge-triggered mode if it has a true
+    C{_reportsWouldBlock} attribute.  This means that C{doRead} returns C{0}
+    once it has read everything available, for example when a read fails
+    with C{EAGAIN}, and that C{doWrite} returns C{0} when nothing could be
+    written, as L{twisted.internet.abstract.FileDescriptor.doWrite} does.
+    Other descriptors are registered level-triggered, as L{EPollReactor}
+    does.
+
+    @ivar _edgeTriggered: A C{set} of the file descriptors registered in
+        edge-triggered mode.
+
+    @ivar _readable: A C{set} of the edge-triggered file descriptors which
+        may have data to read.
+
+    @ivar _writable: A C{set} of the edge-triggered file descriptors which
+        may have space to write.
+    """
+    _EDGE_FLAGS = _epoll.EPOLLIN | _epoll.EPOLLOUT | _epoll.EPOLLET
+
+    def __init__(self):
+        self._edgeTriggered = set()
+        self._readable = set()
+        self._writable = set()
+        EPollReactor.__init__(self)
+
+
+    def afterDaemonize(self):
+        """
+        Implement L{IReactorDaemonize.afterDaemonize}.
+        """
+        self._poller = _epoll.epoll(1024)
+        for fd in self._selectables:
+            if fd in self._edgeTriggered:
+                self._poller.register(fd, self._EDGE_FLAGS)
+                continue
+            flags = 0
+            if fd in self._reads:
+                flags |= _epoll.EPOLLIN
+            if fd in self._writes:
+                flags |= _epoll.EPOLLOUT
+            self._poller.register(fd, flags)
+
+
+    def _addEdgeTriggered(self, xer, primary):
+        """
+        Add C{xer} to C{primary}, registering it in edge-triggered mode if it
+        is not registered yet.
+
+        @return: C{False} if C{xer} does not support edge-triggered mode or
+            epoll does not support it, C{True} otherwise.
+        """
+        if not getattr(xer, '_reportsWouldBlock', False):
+            return False
+        fd = xer.fileno()
+        if fd in primary:
+            return True
+        if fd not in self._edgeTriggered:
+            if fd in self._selectables:
+                # Registered level-triggered by an earlier descriptor which
+                # has not been removed yet.
+                return False
+            try:
+                self._poller.register(fd, self._EDGE_FLAGS)
+            except IOError, e:
+                if e.errno == errno.EPERM:
+                    return False
+                raise
+            self._edgeTriggered.add(fd)
+        primary[fd] = 1
+        self._selectables[fd] = xer
+        return True
+
+
+    def addReader(self, reader):
+        """
+        Add a FileDescriptor for notification of data available to read.
+        """
+        if not self._addEdgeTriggered(reader, self._reads):
+            EPollReactor.addReader(self, reader)
+
+
+    def addWriter(self, writer):
+        """
+        Add a FileDescriptor for notification of data available to write.
+        """
+        if not self._addEdgeTriggered(writer, self._writes):
+            EPollReactor.addWriter(self, writer)
+
+
+    def _remove(self, xer, primary, other, selectables, event, antievent):
+        """
+        Remove a descriptor from C{primary}, unregistering it if it was
+        edge-triggered and is now in neither C{_reads} nor C{_writes}.
+        Level-triggered descriptors are handled by L{EPollReactor._remove}.
+        """
+        fd = xer.fileno()
+        if fd == -1:
+            for fd, fdes in selectables.items():
+                if xer is fdes:
+                    break
+            else:
+                return
+        if fd not in self._edgeTriggered:
+            EPollReactor._remove(
+                self, xer, primary, other, selectables, event, antievent)
+            return
+        if fd in primary:
+            del primary[fd]
+            if fd not in other:
+                del selectables[fd]
+                self._edgeTriggered.remove(fd)
+                self._readable.discard(fd)
+                self._writable.discard(fd)
+                self._poller.unregister(fd)
+
+
+    def _ready(self):
+        """
+        Return a C{set} of the edge-triggered file descriptors which are
+        ready for reading or writing and are being read from or written to.
+        """
+        reads = self._reads
+        writable = self._writable
+        ready = set([fd for fd in self._readable if fd in reads])
+        ready.update([fd for fd in self._writes if fd in writable])
+        return ready
+
+
+    def doPoll(self, timeout):
+        """
+        Poll the poller for new events, then dispatch events to the
+        descriptors which are ready.
+        """
+        if timeout is None:
+            timeout = -1  # Wait indefinitely.
+        if self._ready():
+            timeout = 0
+
+        try:
+            l = self._poller.poll(timeout, len(self._selectables))
+        except IOError, err:
+            if err.errno == errno.EINTR:
+                return
+            raise
+
+        _drdw = self._doReadOrWrite
+        edgeTriggered = self._edgeTriggered
+        readable = self._readable
+        writable = self._writable
+        for fd, event in l:
+            try:
+                selectable = self._selectables[fd]
+            except KeyError:
+                continue
+            if fd not in edgeTriggered:
+                log.callWithLogger(selectable, _drdw, selectable, fd, event)
+            elif event & self._POLL_DISCONNECTED and not event & self._POLL_IN:
+                # Dispatch a disconnection straight away, as EPollReactor
+                # does.
+                log.callWithLogger(selectable, _drdw, selectable, fd, event)
+            else:
+                if event & self._POLL_IN:
+                    readable.add(fd)
+                if event & (self._POLL_OUT | self._POLL_DISCONNECTED):
+                    writable.add(fd)
+
+        _dedrdw = self._doEdgeReadOrWrite
+        for fd in self._ready():
+            try:
+                selectable = self._selectables[fd]
+            except KeyError:
+                continue
+            log.callWithLogger(selectable, _dedrdw, selectable, fd)
+
+    doIteration = doPoll
+
+
+    def _doEdgeReadOrWrite(self, selectable, fd):
+        """
+        Call C{doRead} and C{doWrite} on C{selectable} as it is ready for, and
+        forget the readiness it reports having used up.
+        """
+        why = None
+        inRead = False
+        try:
+            if selectable.fileno() == -1:
+                why = posixbase._NO_FILEDESC
+            else:
+                if fd in self._readable and fd in self._reads:
+                    why = selectable.doRead()
+                    inRead = True
+                    if why is not None and not why:
+                        self._readable.discard(fd)
+                if not why and fd in self._writable and fd in self._writes:
+                    why = selectable.doWrite()
+                    inRead = False
+                    if why is not None and not why:
+                        self._writable.discard(fd)
+        except:
+            why = sys.exc_info()[1]
+            log.err()
+        if why:
+            self._disconnectSelectable(selectable, why, inRead)
+
+
+
 def install():
     """
     Install the epoll() reactor.
@@ -390,5 +640,5 @@ def install():
     installReactor(p)
 
 
-__all__ = ["EPollReactor", "install"]
+__all__ = ["EPollReactor", "EdgeTriggeredEPollReactor", "install"]
 
@@ -979,8 +979,10 @@ class IReactorDaemonize(Interface):
     Notes:
        - This interface SHOULD NOT be called by applications.
        - This interface should only be implemented by reactors as a workaround
-         (in particular, it's implemented currently only by kqueue()).
-         For details please see the comments on ticket #1918.
+         (in particular, it's implemented currently only by kqueue() and
+         epoll()).  For details please see the comments on ticket #1918.
+       - twistd also uses these hooks around forking worker processes, in
+         which case L{afterDaemonize} is called in each of them.
     """
 
     def beforeDaemonize():
@@ -1526,6 +1528,55 @@ class IFileDescriptorReceiver(Interface):
 
 
 
+class IBufferReceiver(Interface):
+    """
+    Protocols may implement L{IBufferReceiver} to be given the data received
+    by their transport as a view of the transport's receive buffer, rather
+    than as a newly allocated string.
+
+    Transports which support this read into a buffer which is reused for
+    later reads, possibly by other connections, so the view must not be used
+    once L{bufferReceived} returns.  Transports which do not support it call
+    C{dataReceived} as usual, so protocols implementing this must still
+    implement C{dataReceived}.
+    """
+    def bufferReceived(view):
+        """
+        Called with some data received over the connection, in place of
+        C{dataReceived}.
+
+        @param view: The data received.  It is only valid until this method
+            returns; copy any part of it which is needed later, for example
+            with C{view[start:end].tobytes()}.
+        @type view: C{memoryview}
+
+        @return: C{None}
+        """
+
+
+
+class IDatagramBatchReceiver(Interface):
+    """
+    Datagram protocols may implement L{IDatagramBatchReceiver} to be given
+    all of the datagrams their transport received with one system call
+    together, rather than one at a time.
+
+    Transports which do not support this call C{datagramReceived} as usual,
+    so protocols implementing this must still implement C{datagramReceived}.
+    """
+    def datagramsReceived(datagrams):
+        """
+        Called with some datagrams, in the order they were received, in place
+        of calling C{datagramReceived} with each of them.
+
+        @param datagrams: A non-empty C{list} of two-tuples of the contents of
+            a datagram, as a C{str}, and the address it came from.
+
+        @return: C{None}
+        """
+
+
+
 class IProtocolFactory(Interface):
     """
     Interface for protocol factories.
@@ -1712,6 +1763,40 @@ class IUNIXTransport(ITransport):
 
 
 
+class IFileTransport(Interface):
+    """
+    A transport which can send part of a file itself, using the kernel's
+    C{sendfile} where the platform provides it, so that the file's contents
+    need not be read into Python strings.
+    """
+
+    def sendFile(fileObject, offset, count):
+        """
+        Send C{count} bytes of C{fileObject}, starting at C{offset}.
+
+        The bytes are sent after any data already written to the transport,
+        and before any data written after this call.  The file position of
+        C{fileObject} is unspecified afterwards.
+
+        @param fileObject: A file object with a C{fileno} method.  It must not
+            be closed until the returned L{Deferred} has fired.
+
+        @param offset: The offset in C{fileObject} of the first byte to send.
+        @type offset: C{int}
+
+        @param count: The number of bytes to send.
+        @type count: C{int}
+
+        @raise RuntimeError: If the transport cannot send files itself at the
+            moment, for example because TLS has been started on it.
+
+        @return: A L{Deferred} which fires with C{None} once all the bytes
+            have been sent, or fails if the connection is lost first or the
+            file has fewer than C{offset + count} bytes.
+        """
+
+
+
 class ITLSTransport(ITCPTransport):
     """
     A TCP transport that supports switching to TLS midstream.
@@ -1879,6 +1964,24 @@ class IUDPTransport(Interface):
 
 
 
+class IUDPBatchTransport(IUDPTransport):
+    """
+    A UDP transport which can send several datagrams with one system call.
+    """
+
+    def writeDatagrams(datagrams):
+        """
+        Write several datagrams, in order.
+
+        @param datagrams: A C{list} of two-tuples of a packet and an address,
+            each as would be passed to L{IUDPTransport.write}.
+
+        @raise twisted.internet.error.MessageLengthError: One of the packets
+            was too long.  The other packets have still been sent.
+        """
+
+
+
 class IUNIXDatagramTransport(Interface):
     """
     Transport for UDP PacketProtocols.
@@ -469,10 +469,16 @@ class PosixReactorBase(_SignalReactorMixin, _DisconnectSelectableMixin,
 
     # IReactorTCP
 
-    def listenTCP(self, port, factory, backlog=50, interface=''):
+    def listenTCP(self, port, factory, backlog=50, interface='',
+                  reuseport=False):
         """@see: twisted.internet.interfaces.IReactorTCP.listenTCP
+
+        @param reuseport: If true, set I{SO_REUSEPORT} on the listening socket
+            so that other processes may listen on the same address and port,
+            with the kernel spreading connections between them.  Raises
+            L{CannotListenError} where this is not supported.
         """
-        p = tcp.Port(port, factory, backlog, interface, self)
+        p = tcp.Port(port, factory, backlog, interface, self, reuseport)
         p.startListening()
         return p
 
@@ -86,7 +86,7 @@ else:
     from os import strerror
 
 
-from errno import errorcode
+from errno import errorcode, ENOPROTOOPT
 
 # Twisted Imports
 from twisted.internet import base, address, fdesc
@@ -94,11 +94,32 @@ from twisted.internet.task import deferLater
 from twisted.python import log, failure, reflect
 from twisted.python.util import unsignedID, untilConcludes
 from twisted.internet.error import CannotListenError
-from twisted.internet import abstract, main, interfaces, error
+from twisted.internet import abstract, main, interfaces, error, defer
 
 # Not all platforms have, or support, this flag.
 _AI_NUMERICSERV = getattr(socket, "AI_NUMERICSERV", 0)
 
+# Without sendfile(2), the file segments queued by Connection.sendFile are
+# read and sent from userspace.
+try:
+    from twisted.internet._sendfile import sendfile as _sendfile
+except ImportError:
+    _sendfile = None
+
+try:
+    from twisted.internet._writev import writev as _writev
+except ImportError:
+    _writev = None
+
+# The socket module only exposes SO_REUSEPORT on newer Pythons, so fall back
+# to the value from the system headers on the platforms known to support it.
+_SO_REUSEPORT = getattr(socket, "SO_REUSEPORT", None)
+if _SO_REUSEPORT is None:
+    if sys.platform.startswith('linux'):
+        _SO_REUSEPORT = 15
+    elif sys.platform.startswith(('darwin', 'freebsd', 'netbsd', 'openbsd')):
+        _SO_REUSEPORT = 0x200
+
 
 
 class _SocketCloser(object):
@@ -157,6 +178,66 @@ class _AbortingMixin(object):
 
 
 
+class _BufferPool(object):
+    """
+    A free list of C{bytearray}s for connections to receive data into.
+
+    Data in a buffer is only handed to an L{interfaces.IBufferReceiver} for the
+    duration of one call, so a handful of buffers is enough for any number of
+    connections; more than one is only needed when a read happens while
+    another is being handled.
+
+    @ivar maxFree: The largest number of unused buffers to keep.
+    """
+    maxFree = 8
+
+    def __init__(self):
+        self._free = []
+
+
+    def acquire(self, size):
+        """
+        Return a C{bytearray} of at least C{size} bytes, reusing a released
+        one if possible.
+        """
+        free = self._free
+        while free:
+            buf = free.pop()
+            if len(buf) >= size:
+                return buf
+        return bytearray(size)
+
+
+    def release(self, buf):
+        """
+        Return C{buf}, obtained from L{acquire}, to the pool.
+        """
+        if len(self._free) < self.maxFree:
+            self._free.append(buf)
+
+
+
+_receiveBuffers = _BufferPool()
+
+
+
+class _FileSegment(object):
+    """
+    Part of a file queued for sending by L{Connection.sendFile}.
+
+    @ivar fileObject: The file to send from.
+    @ivar offset: The offset in C{fileObject} of the next byte to send.
+    @ivar remaining: The number of bytes still to send.
+    @ivar deferred: The L{Deferred} returned by L{Connection.sendFile}.
+    """
+    def __init__(self, fileObject, offset, count):
+        self.fileObject = fileObject
+        self.offset = offset
+        self.remaining = count
+        self.deferred = defer.Deferred()
+
+
+
 class Connection(_TLSConnectionMixin, abstract.FileDescriptor, _SocketCloser,
                  _AbortingMixin):
     """
@@ -167,8 +248,15 @@ class Connection(_TLSConnectionMixin, abstract.FileDescriptor, _SocketCloser,
 
     @ivar logstr: prefix used when logging events related to this connection.
     @type logstr: C{str}
+
+    @ivar _reportsWouldBlock: C{True}, indicating that C{doRead} returns C{0}
+        when there is no data left to read, so that the connection can be
+        used with L{twisted.internet.epollreactor.EdgeTriggeredEPollReactor}.
     """
-    implements(interfaces.ITCPTransport, interfaces.ISystemHandle)
+    implements(interfaces.ITCPTransport, interfaces.ISystemHandle,
+               interfaces.IFileTransport)
+
+    _reportsWouldBlock = True
 
 
     def __init__(self, skt, protocol, reactor=None):
@@ -190,19 +278,47 @@ class Connection(_TLSConnectionMixin, abstract.FileDescriptor, _SocketCloser,
         This reads up to self.bufferSize bytes of data from its socket, then
         calls self.dataReceived(data) to process it.  If the connection is not
         lost through an error in the physical recv(), this function will return
-        the result of the dataReceived call.
+        the result of the dataReceived call, or C{0} if the read would have
+        blocked.
+
+        If the protocol provides L{interfaces.IBufferReceiver}, the data is
+        read into a pooled buffer instead and a view of it is passed to the
+        protocol's C{bufferReceived}.
         """
+        if not self.TLS and interfaces.IBufferReceiver.providedBy(self.protocol):
+            return self._doReadInto()
         try:
             data = self.socket.recv(self.bufferSize)
         except socket.error, se:
             if se.args[0] == EWOULDBLOCK:
-                return
+                return 0
             else:
                 return main.CONNECTION_LOST
 
         return self._dataReceived(data)
 
 
+    def _doReadInto(self):
+        """
+        Read up to self.bufferSize bytes into a buffer from L{_receiveBuffers}
+        and pass a view of them to the protocol's C{bufferReceived}.
+        """
+        buf = _receiveBuffers.acquire(self.bufferSize)
+        try:
+            try:
+                size = self.socket.recv_into(buf, self.bufferSize)
+            except socket.error, se:
+                if se.args[0] == EWOULDBLOCK:
+                    return 0
+                else:
+                    return main.CONNECTION_LOST
+            if not size:
+                return main.CONNECTION_DONE
+            self.protocol.bufferReceived(memoryview(buf)[:size])
+        finally:
+            _receiveBuffers.release(buf)
+
+
     def _dataReceived(self, data):
         if not data:
             return main.CONNECTION_DONE
@@ -240,6 +356,135 @@ class Connection(_TLSConnectionMixin, abstract.FileDescriptor, _SocketCloser,
                 return main.CONNECTION_LOST
 
 
+    def _canWriteVectors(self):
+        """
+        Determine whether queued chunks can be written with C{writev}, which
+        is only used if it is available and TLS has not been started.
+        """
+        return _writev is not None and not self.TLS
+
+
+    def _writeSomeVectors(self, chunks, offset):
+        """
+        Write as much as possible of the given chunks to this TCP connection
+        with one call to C{writev}.
+
+        @see: L{abstract.FileDescriptor._writeSomeVectors}
+        """
+        try:
+            return untilConcludes(
+                _writev, self.socket.fileno(), chunks, offset)
+        except (IOError, OSError), e:
+            if e.errno in (EWOULDBLOCK, EAGAIN, ENOBUFS):
+                return 0
+            else:
+                return main.CONNECTION_LOST
+
+
+    def sendFile(self, fileObject, offset, count):
+        """
+        Queue C{count} bytes of C{fileObject}, starting at C{offset}, to be
+        sent with C{sendfile} if it is available, or read and sent in chunks
+        of at most C{SEND_LIMIT} bytes otherwise.
+
+        @see: L{interfaces.IFileTransport.sendFile}
+        """
+        if self.TLS:
+            raise RuntimeError("Cannot send files directly over TLS")
+        if not self.connected or self._writeDisconnected:
+            return defer.fail(error.ConnectionLost())
+        segment = _FileSegment(fileObject, offset, count)
+        if count:
+            self._tempDataBuffer.append(segment)
+            self._queuedSegments += 1
+            self.startWriting()
+        else:
+            segment.deferred.callback(None)
+        return segment.deferred
+
+
+    def doWrite(self):
+        """
+        Send the file segment at the front of the output queue once all the
+        data before it has been written, and otherwise write data as usual.
+        """
+        if (self._queuedSegments and self.offset == len(self.dataBuffer) and
+                isinstance(self._tempDataBuffer[0], _FileSegment)):
+            segment = self._tempDataBuffer[0]
+            if _sendfile is None:
+                self._readFileSegment(segment)
+            else:
+                result = self._sendFileSegment(segment)
+                if result is not None or segment.remaining:
+                    return result
+        return abstract.FileDescriptor.doWrite(self)
+
+
+    def _readFileSegment(self, segment):
+        """
+        Read up to C{SEND_LIMIT} bytes of C{segment} into C{dataBuffer}, to be
+        written as usual.
+        """
+        try:
+            segment.fileObject.seek(segment.offset)
+            data = segment.fileObject.read(
+                min(segment.remaining, self.SEND_LIMIT))
+        except (IOError, OSError):
+            self._failFileSegment(failure.Failure())
+            return
+        self.dataBuffer = data
+        self.offset = 0
+        self._advanceFileSegment(segment, len(data))
+
+
+    def _sendFileSegment(self, segment):
+        """
+        Send up to C{SEND_LIMIT} bytes of C{segment} with C{sendfile}.
+
+        @return: C{0} if the socket's buffer is full, L{main.CONNECTION_LOST}
+            if sending failed, or C{None} otherwise.
+        """
+        try:
+            sent = untilConcludes(
+                _sendfile, self.socket.fileno(), segment.fileObject.fileno(),
+                segment.offset, min(segment.remaining, self.SEND_LIMIT))
+        except (IOError, OSError), e:
+            if e.errno in (EWOULDBLOCK, EAGAIN):
+                return 0
+            self._failFileSegment(failure.Failure())
+            return main.CONNECTION_LOST
+        self._advanceFileSegment(segment, sent)
+
+
+    def _advanceFileSegment(self, segment, sent):
+        """
+        Account for C{sent} bytes of C{segment} having been sent, removing it
+        from the output queue once it is finished.  Sending nothing means the
+        file ended early.
+        """
+        if not sent:
+            self._failFileSegment(failure.Failure(IOError(
+                "File ended with %d bytes left to send" % (
+                    segment.remaining,))))
+            return
+        segment.offset += sent
+        segment.remaining -= sent
+        if not segment.remaining:
+            self._tempDataBuffer.popleft()
+            self._queuedSegments -= 1
+            segment.deferred.callback(None)
+
+
+    def _failFileSegment(self, reason):
+        """
+        Remove the file segment at the front of the output queue and fail its
+        L{Deferred} with C{reason}.
+        """
+        segment = self._tempDataBuffer.popleft()
+        self._queuedSegments -= 1
+        segment.deferred.errback(reason)
+
+
     def _closeWriteConnection(self):
         try:
             getattr(self.socket, self._socketShutdownMethod)(1)
@@ -280,6 +525,13 @@ class Connection(_TLSConnectionMixin, abstract.FileDescriptor, _SocketCloser,
             return
         abstract.FileDescriptor.connectionLost(self, reason)
         self._closeSocket(not reason.check(error.ConnectionAborted))
+        if self._queuedSegments:
+            segments = [chunk for chunk in self._tempDataBuffer
+                        if isinstance(chunk, _FileSegment)]
+            self._tempDataBuffer.clear()
+            self._queuedSegments = 0
+            for segment in segments:
+                segment.deferred.errback(reason)
         protocol = self.protocol
         del self.protocol
         del self.socket
@@ -875,6 +1127,28 @@ class Port(base.BasePort, _SocketCloser):
         was created and initialized outside of the reactor and will be used to
         listen for connections (instead of a new socket being created by this
         L{Port}).
+
+    @ivar reuseport: If true, I{SO_REUSEPORT} is set on the listening socket
+        so that several processes can each bind their own socket to the same
+        address and port, and have the kernel balance incoming connections
+        between them.
+    @type reuseport: C{bool}
+
+    @ivar connectionsAccepted: The number of connections accepted by this port.
+    @type connectionsAccepted: C{int}
+
+    @ivar acceptFailures: The number of times a connection could not be
+        accepted for lack of file descriptors, memory or buffers.  Such
+        connections are left in the listen queue, and once it is full the
+        kernel starts dropping new ones, so a growing count means the backlog
+        is overflowing.
+    @type acceptFailures: C{int}
+
+    @ivar acceptsSaturated: The number of times this port accepted as many
+        connections as it allows itself per reactor iteration without emptying
+        the listen queue, meaning connections are arriving faster than they
+        are accepted.
+    @type acceptsSaturated: C{int}
     """
 
     implements(interfaces.IListeningPort)
@@ -888,6 +1162,9 @@ class Port(base.BasePort, _SocketCloser):
 
     _type = 'TCP'
 
+    # doRead returns 0 once accept would block; see Connection.
+    _reportsWouldBlock = True
+
     # Actual port number being listened on, only set to a non-None
     # value when we are actually listening.
     _realPortNumber = None
@@ -899,13 +1176,20 @@ class Port(base.BasePort, _SocketCloser):
     addressFamily = socket.AF_INET
     _addressType = address.IPv4Address
 
-    def __init__(self, port, factory, backlog=50, interface='', reactor=None):
+    reuseport = False
+    connectionsAccepted = 0
+    acceptFailures = 0
+    acceptsSaturated = 0
+
+    def __init__(self, port, factory, backlog=50, interface='', reactor=None,
+                 reuseport=False):
         """Initialize with a numeric port to listen on.
         """
         base.BasePort.__init__(self, reactor=reactor)
         self.port = port
         self.factory = factory
         self.backlog = backlog
+        self.reuseport = reuseport
         if abstract.isIPv6Address(interface):
             self.addressFamily = socket.AF_INET6
             self._addressType = address.IPv6Address
@@ -947,6 +1231,12 @@ class Port(base.BasePort, _SocketCloser):
         s = base.BasePort.createInternetSocket(self)
         if platformType == "posix" and sys.platform != "cygwin":
             s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if self.reuseport:
+            if platformType != "posix" or _SO_REUSEPORT is None:
+                s.close()
+                raise socket.error(
+                    ENOPROTOOPT, "SO_REUSEPORT is not supported on this platform")
+            s.setsockopt(socket.SOL_SOCKET, _SO_REUSEPORT, 1)
         return s
 
 
@@ -1002,7 +1292,7 @@ class Port(base.BasePort, _SocketCloser):
         """Called when my socket is ready for reading.
 
         This accepts a connection and calls self.protocol() to handle the
-        wire-level protocol.
+        wire-level protocol.  C{0} is returned if C{accept} would block.
         """
         try:
             if platformType == "posix":
@@ -1021,13 +1311,14 @@ class Port(base.BasePort, _SocketCloser):
                 except socket.error, e:
                     if e.args[0] in (EWOULDBLOCK, EAGAIN):
                         self.numberAccepts = i
-                        break
+                        return 0
                     elif e.args[0] == EPERM:
                         # Netfilter on Linux may have rejected the
                         # connection, but we get told to try to accept()
                         # anyway.
                         continue
                     elif e.args[0] in (EMFILE, ENOBUFS, ENFILE, ENOMEM, ECONNABORTED):
+                        self.acceptFailures += 1
 
                         # Linux gives EMFILE when a process is not allowed
                         # to allocate any more file descriptors.  *BSD and
@@ -1049,6 +1340,7 @@ class Port(base.BasePort, _SocketCloser):
                     raise
 
                 fdesc._setCloseOnExec(skt.fileno())
+                self.connectionsAccepted += 1
                 protocol = self.factory.buildProtocol(self._buildAddr(addr))
                 if protocol is None:
                     skt.close()
@@ -1058,6 +1350,8 @@ class Port(base.BasePort, _SocketCloser):
                 transport = self.transport(skt, protocol, addr, self, s, self.reactor)
                 protocol.makeConnection(transport)
             else:
+                if numAccepts:
+                    self.acceptsSaturated += 1
                 self.numberAccepts = self.numberAccepts+20
         except:
             # Note that in TLS mode, this will possibly catch SSL.Errors
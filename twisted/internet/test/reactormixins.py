@@ -226,8 +226,12 @@ class ReactorBuilder:
         else:
             _reactors.extend([
                     "twisted.internet.pollreactor.PollReactor",
-                    "twisted.internet.epollreactor.EPollReactor"])
-            if not platform.isLinux():
+                    "twisted.internet.epollreactor.EPollReactor",
+                    "twisted.internet.epollreactor.EdgeTriggeredEPollReactor"])
+            if platform.isLinux():
+                _reactors.append(
+                    "twisted.internet.uringreactor.reactor.URingReactor")
+            else:
                 # Presumably Linux is not going to start supporting kqueue, so
                 # skip even trying this configuration.
                 _reactors.extend([
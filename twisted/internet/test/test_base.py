@@ -15,6 +15,8 @@ from twisted.python.util import setIDFunction
 from twisted.internet.interfaces import IReactorTime, IReactorThreads
 from twisted.internet.error import DNSLookupError
 from twisted.internet.base import ThreadedResolver, DelayedCall
+from twisted.internet.base import ReactorBase, TimerWheel
+from twisted.internet.base import LoopInstrumentation
 from twisted.internet.task import Clock
 from twisted.trial.unittest import TestCase
 
@@ -270,3 +272,346 @@ class DelayedCallTests(TestCase):
         self.assertTrue(self.zero != self.one)
         self.assertFalse(self.zero != self.zero)
         self.assertFalse(self.one != self.one)
+
+
+
+class TimerWheelTests(TestCase):
+    """
+    Tests for L{TimerWheel}.
+    """
+    def _getDelayedCallAt(self, time):
+        """
+        Get a L{DelayedCall} instance at a given C{time}.
+        """
+        def noop(call):
+            pass
+        return DelayedCall(time, lambda: None, (), {}, noop, noop, None)
+
+
+    def test_invalidResolution(self):
+        """
+        L{TimerWheel.__init__} raises L{ValueError} if passed a resolution
+        which is not positive.
+        """
+        self.assertRaises(ValueError, TimerWheel, 0)
+        self.assertRaises(ValueError, TimerWheel, -1)
+
+
+    def test_add(self):
+        """
+        L{TimerWheel.add} puts a call in the wheel.
+        """
+        wheel = TimerWheel(1)
+        call = self._getDelayedCallAt(3.5)
+        wheel.add(call)
+        self.assertEqual(len(wheel), 1)
+        self.assertIn(call, wheel)
+        self.assertEqual(wheel.getDelayedCalls(), [call])
+
+
+    def test_remove(self):
+        """
+        L{TimerWheel.remove} takes a call out of the wheel, and does nothing
+        if the call is not in it.
+        """
+        wheel = TimerWheel(1)
+        call = self._getDelayedCallAt(3.5)
+        wheel.add(call)
+        wheel.remove(call)
+        wheel.remove(call)
+        self.assertEqual(len(wheel), 0)
+        self.assertNotIn(call, wheel)
+        self.assertIdentical(wheel.nextTime(), None)
+
+
+    def test_nextTime(self):
+        """
+        L{TimerWheel.nextTime} returns the exact scheduled time of the
+        earliest call in the wheel, even when it shares a bucket with others.
+        """
+        wheel = TimerWheel(1)
+        for time in [7.25, 3.75, 3.5, 12]:
+            wheel.add(self._getDelayedCallAt(time))
+        self.assertEqual(wheel.nextTime(), 3.5)
+
+
+    def test_expire(self):
+        """
+        L{TimerWheel.expire} removes and returns the calls scheduled at or
+        before the given time, sorted by time, and leaves later calls in the
+        wheel, including later calls in the current bucket.
+        """
+        wheel = TimerWheel(1)
+        calls = [self._getDelayedCallAt(time)
+                 for time in [5.5, 1.5, 5.25, 3, 1.25, 5.75]]
+        for call in calls:
+            wheel.add(call)
+        due = wheel.expire(5.5)
+        self.assertEqual([call.time for call in due], [1.25, 1.5, 3, 5.25, 5.5])
+        self.assertEqual(wheel.getDelayedCalls(), [calls[-1]])
+        self.assertEqual(wheel.nextTime(), 5.75)
+        self.assertEqual(wheel.expire(5.6), [])
+
+
+    def test_reschedule(self):
+        """
+        L{TimerWheel.reschedule} moves a call whose time has changed to the
+        bucket for its new time.
+        """
+        wheel = TimerWheel(1)
+        call = self._getDelayedCallAt(10)
+        wheel.add(call)
+        call.time = 2
+        wheel.reschedule(call)
+        self.assertEqual(wheel.nextTime(), 2)
+        self.assertEqual(wheel.expire(2), [call])
+        self.assertEqual(len(wheel), 0)
+
+
+    def test_rescheduleAbsent(self):
+        """
+        L{TimerWheel.reschedule} does not add a call which is not in the
+        wheel.
+        """
+        wheel = TimerWheel(1)
+        wheel.reschedule(self._getDelayedCallAt(10))
+        self.assertEqual(len(wheel), 0)
+
+
+    def test_staleTicksCompacted(self):
+        """
+        Repeatedly emptying and refilling buckets does not grow the heap of
+        ticks without bound.
+        """
+        wheel = TimerWheel(1)
+        for i in range(1000):
+            call = self._getDelayedCallAt(i)
+            wheel.add(call)
+            wheel.remove(call)
+        self.assertTrue(len(wheel._tickHeap) < 200)
+
+
+
+class TimerWheelReactor(ReactorBase):
+    """
+    A L{ReactorBase} with a settable clock and no waker, for testing the
+    scheduling of timed calls.
+    """
+    now = 0
+
+    def installWaker(self):
+        pass
+
+
+    def seconds(self):
+        return self.now
+
+
+
+class ReactorTimerWheelTests(TestCase):
+    """
+    Tests for L{ReactorBase} with a L{TimerWheel} installed.
+    """
+    def setUp(self):
+        self.reactor = TimerWheelReactor()
+        self.reactor.installTimerWheel(TimerWheel(1))
+        self.calls = []
+
+
+    def test_installMovesCalls(self):
+        """
+        L{ReactorBase.installTimerWheel} moves calls which were already
+        scheduled into the wheel, and drops cancelled ones.
+        """
+        reactor = TimerWheelReactor()
+        first = reactor.callLater(1, lambda: None)
+        reactor.runUntilCurrent()
+        second = reactor.callLater(2, lambda: None)
+        reactor.callLater(3, lambda: None).cancel()
+        wheel = TimerWheel(1)
+        reactor.installTimerWheel(wheel)
+        self.assertEqual(set(wheel.getDelayedCalls()), set([first, second]))
+        self.assertEqual(set(reactor.getDelayedCalls()), set([first, second]))
+
+
+    def test_runInOrder(self):
+        """
+        Timed calls are run in order of their scheduled time once it has
+        passed, and not before.
+        """
+        reactor = self.reactor
+        reactor.callLater(2.5, self.calls.append, "b")
+        reactor.callLater(2.25, self.calls.append, "a")
+        reactor.callLater(4, self.calls.append, "c")
+        self.assertEqual(reactor.timeout(), 2.25)
+        reactor.now = 2.4
+        reactor.runUntilCurrent()
+        self.assertEqual(self.calls, ["a"])
+        reactor.now = 10
+        reactor.runUntilCurrent()
+        self.assertEqual(self.calls, ["a", "b", "c"])
+        self.assertEqual(reactor.getDelayedCalls(), [])
+        self.assertIdentical(reactor.timeout(), None)
+
+
+    def test_cancel(self):
+        """
+        A cancelled call is removed from the wheel and is not run.
+        """
+        reactor = self.reactor
+        call = reactor.callLater(1, self.calls.append, "a")
+        reactor.runUntilCurrent()
+        call.cancel()
+        self.assertEqual(len(reactor._timerWheel), 0)
+        reactor.now = 2
+        reactor.runUntilCurrent()
+        self.assertEqual(self.calls, [])
+
+
+    def test_cancelledByEarlierCall(self):
+        """
+        A call which is due but is cancelled by a call run before it in the
+        same iteration is not run.
+        """
+        reactor = self.reactor
+        later = reactor.callLater(2, self.calls.append, "b")
+        reactor.callLater(1, later.cancel)
+        reactor.now = 3
+        reactor.runUntilCurrent()
+        self.assertEqual(self.calls, [])
+
+
+    def test_resetLater(self):
+        """
+        A call reset to a later time is run at that time.
+        """
+        reactor = self.reactor
+        call = reactor.callLater(1, self.calls.append, "a")
+        reactor.runUntilCurrent()
+        call.reset(5)
+        reactor.now = 2
+        reactor.runUntilCurrent()
+        self.assertEqual(self.calls, [])
+        self.assertEqual(reactor.timeout(), 3)
+        reactor.now = 5
+        reactor.runUntilCurrent()
+        self.assertEqual(self.calls, ["a"])
+
+
+    def test_resetSooner(self):
+        """
+        A call reset to an earlier time is run at that time.
+        """
+        reactor = self.reactor
+        call = reactor.callLater(10, self.calls.append, "a")
+        reactor.runUntilCurrent()
+        call.reset(2)
+        self.assertEqual(reactor.timeout(), 2)
+        reactor.now = 2
+        reactor.runUntilCurrent()
+        self.assertEqual(self.calls, ["a"])
+
+
+    def test_callLaterZeroDuringIteration(self):
+        """
+        A call scheduled with no delay by a timed call is not run until the
+        next iteration.
+        """
+        reactor = self.reactor
+        def scheduleAnother():
+            self.calls.append("a")
+            reactor.callLater(0, self.calls.append, "b")
+        reactor.callLater(0, scheduleAnother)
+        reactor.runUntilCurrent()
+        self.assertEqual(self.calls, ["a"])
+        reactor.runUntilCurrent()
+        self.assertEqual(self.calls, ["a", "b"])
+
+
+
+class InstrumentedReactor(TimerWheelReactor):
+    """
+    A L{TimerWheelReactor} whose iterations and dispatches of ready
+    selectables take a settable amount of time.
+    """
+    iterationTime = 0
+
+    def doIteration(self, delay):
+        self.now += self.iterationTime
+
+
+    def _doReadOrWrite(self, selectable, fd, event):
+        self.now += selectable
+
+
+
+class LoopInstrumentationTests(TestCase):
+    """
+    Tests for L{LoopInstrumentation} and L{ReactorBase.installInstrumentation}.
+    """
+    def setUp(self):
+        self.reactor = InstrumentedReactor()
+        self.instrumentation = LoopInstrumentation(slowest=2)
+        self.reactor.installInstrumentation(self.instrumentation)
+
+
+    def test_timedCalls(self):
+        """
+        The lag and duration of each timed call are recorded, as is the time
+        spent in L{ReactorBase.runUntilCurrent}.
+        """
+        reactor = self.reactor
+        def slow():
+            reactor.now += 2
+        reactor.callLater(1, slow)
+        reactor.now = 4
+        reactor.runUntilCurrent()
+        self.assertEqual(self.instrumentation.lag.max, 3)
+        self.assertEqual(self.instrumentation.timers.max, 2)
+        self.assertEqual(self.instrumentation.runUntilCurrent.max, 2)
+
+
+    def test_doIteration(self):
+        """
+        The time spent in C{doIteration} is recorded.
+        """
+        self.reactor.iterationTime = 3
+        self.reactor.doIteration(None)
+        self.assertEqual(self.instrumentation.doIteration.count, 1)
+        self.assertEqual(self.instrumentation.doIteration.max, 3)
+
+
+    def test_slowest(self):
+        """
+        Only the slowest selectables and timed calls are kept, slowest first,
+        with their C{repr}.
+        """
+        for duration in [1, 5, 2, 4]:
+            self.reactor._doReadOrWrite(duration, None, None)
+        self.assertEqual(self.instrumentation.selectables.count, 4)
+        self.assertEqual(
+            self.instrumentation.getSlowest(),
+            [(5, "selectable", "5"), (4, "selectable", "4")])
+        self.assertIn("slow selectable 5000.000ms: 5",
+                      self.instrumentation.report())
+
+
+    def test_uninstall(self):
+        """
+        Installing C{None} removes the timing wrappers.
+        """
+        self.reactor.installInstrumentation(None)
+        self.assertNotIn("doIteration", self.reactor.__dict__)
+        self.assertNotIn("_doReadOrWrite", self.reactor.__dict__)
+        self.reactor.doIteration(None)
+        self.assertEqual(self.instrumentation.doIteration.count, 0)
+
+
+    def test_reset(self):
+        """
+        L{LoopInstrumentation.reset} forgets every measurement.
+        """
+        self.reactor._doReadOrWrite(1, None, None)
+        self.instrumentation.reset()
+        self.assertEqual(self.instrumentation.getSlowest(), [])
+        self.assertIn("selectables: no samples", self.instrumentation.report())
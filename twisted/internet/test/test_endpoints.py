@@ -1254,6 +1254,20 @@ class ParserTestCase(unittest.TestCase):
                                  {'interface':'', 'backlog':6}))
 
 
+    def test_reuseportTCP(self):
+        """
+        TCP port descriptions parse their 'reuseport' argument as a boolean,
+        which is only included when true.
+        """
+        self.assertEqual(self.parse('tcp:80:reuseport=1', self.f),
+                         ('TCP', (80, self.f),
+                                 {'interface':'', 'backlog':50,
+                                  'reuseport':True}))
+        self.assertEqual(self.parse('tcp:80:reuseport=0', self.f),
+                         ('TCP', (80, self.f),
+                                 {'interface':'', 'backlog':50}))
+
+
     def test_simpleUNIX(self):
         """
         L{endpoints._parseServer} returns a C{'UNIX'} port description with
@@ -1358,6 +1372,24 @@ class ServerStringTests(unittest.TestCase):
         self.assertEqual(server._port, 1234)
         self.assertEqual(server._backlog, 12)
         self.assertEqual(server._interface, "10.0.0.1")
+        self.assertFalse(server._reuseport)
+
+
+    def test_tcpReuseport(self):
+        """
+        When passed a TCP strports description with C{reuseport=1},
+        L{endpoints.serverFromString} returns a L{TCP4ServerEndpoint} which
+        passes C{reuseport=True} on to C{listenTCP}.
+        """
+        reactor = MemoryReactor()
+        calls = []
+        def listenTCP(port, factory, backlog=50, interface='', **kw):
+            calls.append(kw)
+        reactor.listenTCP = listenTCP
+        server = endpoints.serverFromString(reactor, "tcp:1234:reuseport=1")
+        self.assertTrue(server._reuseport)
+        server.listen(object())
+        self.assertEqual(calls, [{'reuseport': True}])
 
 
     def test_ssl(self):
@@ -1978,6 +2010,17 @@ class TCP6ServerEndpointPluginTests(unittest.TestCase):
         self.assertEqual(ep._port, 8080)
         self.assertEqual(ep._backlog, 12)
         self.assertEqual(ep._interface, '::1')
+        self.assertFalse(ep._reuseport)
+
+
+    def test_stringDescriptionReuseport(self):
+        """
+        The C{reuseport} argument of a 'tcp6' endpoint string description is
+        parsed as a boolean.
+        """
+        ep = endpoints.serverFromString(MemoryReactor(),
+            "tcp6:8080:reuseport=1")
+        self.assertTrue(ep._reuseport)
 
 
 
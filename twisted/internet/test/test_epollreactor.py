@@ -5,11 +5,14 @@
 Tests for L{twisted.internet.epollreactor}.
 """
 
+import socket
+
 from twisted.trial.unittest import TestCase
 try:
-    from twisted.internet.epollreactor import _ContinuousPolling
+    from twisted.internet.epollreactor import (
+        _ContinuousPolling, EPollReactor, EdgeTriggeredEPollReactor)
 except ImportError:
-    _ContinuousPolling = None
+    _ContinuousPolling = EPollReactor = EdgeTriggeredEPollReactor = None
 from twisted.internet.task import Clock
 from twisted.internet.error import ConnectionDone
 
@@ -244,3 +247,200 @@ class ContinuousPollingTests(TestCase):
 
     if _ContinuousPolling is None:
         skip = "epoll not supported in this environment."
+
+
+
+class EPollReactorDaemonizeTests(TestCase):
+    """
+    Tests for the L{IReactorDaemonize} implementation of L{EPollReactor}.
+    """
+    if EPollReactor is None:
+        skip = "epoll is not supported in this environment."
+
+    def test_afterDaemonizeNewPoller(self):
+        """
+        L{EPollReactor.afterDaemonize} replaces the epoll instance closed by
+        L{EPollReactor.beforeDaemonize} with a new one, in which all of the
+        descriptors of the reactor are registered again.
+        """
+        reactor = EPollReactor()
+        self.addCleanup(reactor._poller.close)
+        old = reactor._poller
+        reactor.beforeDaemonize()
+        self.assertTrue(old.closed)
+        reactor.afterDaemonize()
+        self.addCleanup(reactor._poller.close)
+        self.assertFalse(reactor._poller.closed)
+
+        reactor.wakeUp()
+        events = reactor._poller.poll(0)
+        self.assertEqual([fd for fd, event in events], [reactor.waker.fileno()])
+        reactor.waker.connectionLost(None)
+
+
+
+
+class RecordingPoller(object):
+    """
+    Wraps an epoll object, recording the calls which change its registrations.
+
+    @ivar calls: A C{list} of the names of the methods called and their
+        arguments.
+    """
+
+    def __init__(self, poller):
+        self._poller = poller
+        self.calls = []
+
+
+    def register(self, fd, eventmask):
+        self.calls.append(("register", fd, eventmask))
+        self._poller.register(fd, eventmask)
+
+
+    def modify(self, fd, eventmask):
+        self.calls.append(("modify", fd, eventmask))
+        self._poller.modify(fd, eventmask)
+
+
+    def unregister(self, fd):
+        self.calls.append(("unregister", fd))
+        self._poller.unregister(fd)
+
+
+    def __getattr__(self, name):
+        return getattr(self._poller, name)
+
+
+
+class SocketDescriptor(object):
+    """
+    Reads from a non-blocking socket one byte at a time, reporting when the
+    read would block, as C{tcp.Connection} does.
+
+    @ivar received: A C{list} of the bytes read.
+    """
+    _reportsWouldBlock = True
+
+    def __init__(self, skt):
+        self.socket = skt
+        self.received = []
+
+
+    def fileno(self):
+        return self.socket.fileno()
+
+
+    def logPrefix(self):
+        return "SocketDescriptor"
+
+
+    def doRead(self):
+        try:
+            data = self.socket.recv(1)
+        except socket.error:
+            return 0
+        self.received.append(data)
+
+
+    def doWrite(self):
+        return 0
+
+
+    def connectionLost(self, reason):
+        pass
+
+
+
+class EdgeTriggeredEPollReactorTests(TestCase):
+    """
+    Tests for L{EdgeTriggeredEPollReactor}.
+    """
+    if EdgeTriggeredEPollReactor is None:
+        skip = "epoll is not supported in this environment."
+
+    def setUp(self):
+        self.reactor = EdgeTriggeredEPollReactor()
+        self.addCleanup(self.reactor._poller.close)
+        self.addCleanup(self.reactor.waker.connectionLost, None)
+        self.poller = self.reactor._poller = RecordingPoller(
+            self.reactor._poller)
+        self.client, self.server = socket.socketpair()
+        self.addCleanup(self.client.close)
+        self.addCleanup(self.server.close)
+        self.server.setblocking(False)
+
+
+    def test_registeredOnce(self):
+        """
+        A descriptor which reports when it would block is registered for
+        reading and writing once, when it is first added.  Starting and
+        stopping reading or writing after that makes no change to the epoll
+        registration until it is removed as both a reader and a writer.
+        """
+        descriptor = SocketDescriptor(self.server)
+        fd = descriptor.fileno()
+        self.reactor.addReader(descriptor)
+        self.reactor.addWriter(descriptor)
+        self.reactor.removeWriter(descriptor)
+        self.reactor.addWriter(descriptor)
+        self.reactor.removeReader(descriptor)
+        self.assertEqual(
+            self.poller.calls,
+            [("register", fd, EdgeTriggeredEPollReactor._EDGE_FLAGS)])
+        self.reactor.removeWriter(descriptor)
+        self.assertEqual(self.poller.calls[1:], [("unregister", fd)])
+        self.assertNotIn(descriptor, self.reactor.getReaders())
+        self.assertNotIn(descriptor, self.reactor.getWriters())
+
+
+    def test_readinessRemembered(self):
+        """
+        A descriptor which has been reported readable is read from on every
+        iteration until its C{doRead} returns C{0}, even though epoll reports
+        the data arriving only once.
+        """
+        descriptor = SocketDescriptor(self.server)
+        self.reactor.addReader(descriptor)
+        self.client.send("abc")
+        for i in range(3):
+            self.reactor.doPoll(0)
+        self.assertEqual(descriptor.received, ["a", "b", "c"])
+        self.assertIn(descriptor.fileno(), self.reactor._readable)
+        self.reactor.doPoll(0)
+        self.assertNotIn(descriptor.fileno(), self.reactor._readable)
+
+
+    def test_readinessWhileNotReading(self):
+        """
+        Readiness reported while a descriptor is not being read from is used
+        once it is read from again.
+        """
+        descriptor = SocketDescriptor(self.server)
+        self.reactor.addReader(descriptor)
+        self.reactor.addWriter(descriptor)
+        self.reactor.removeReader(descriptor)
+        self.client.send("a")
+        self.reactor.doPoll(0)
+        self.assertEqual(descriptor.received, [])
+        self.reactor.addReader(descriptor)
+        self.reactor.doPoll(0)
+        self.assertEqual(descriptor.received, ["a"])
+
+
+    def test_levelTriggeredFallback(self):
+        """
+        A descriptor which does not report when it would block is registered
+        level-triggered, as L{EPollReactor} would.
+        """
+        descriptor = SocketDescriptor(self.server)
+        descriptor._reportsWouldBlock = False
+        self.reactor.addReader(descriptor)
+        self.client.send("ab")
+        self.reactor.doPoll(0)
+        self.reactor.doPoll(0)
+        self.assertEqual(descriptor.received, ["a", "b"])
+        self.assertNotIn(descriptor.fileno(), self.reactor._edgeTriggered)
+        self.assertEqual(
+            self.poller.calls,
+            [("register", descriptor.fileno(), self.reactor._POLL_IN)])
@@ -286,11 +286,14 @@ class ReactorFDSetTestsBuilder(ReactorBuilder):
         reactor = self.buildReactor()
 
         name = reactor.__class__.__name__
-        if name in ('EPollReactor', 'KQueueReactor', 'CFReactor'):
+        if name in ('EPollReactor', 'EdgeTriggeredEPollReactor', 'KQueueReactor',
+                    'CFReactor', 'URingReactor'):
             # Closing a file descriptor immediately removes it from the epoll
             # set without generating a notification.  That means epollreactor
             # will not call any methods on Victim after the close, so there's
-            # no chance to notice the socket is no longer valid.
+            # no chance to notice the socket is no longer valid.  The poll
+            # operations of URingReactor keep the original socket open, so
+            # it never notices either.
             raise SkipTest("%r cannot detect lost file descriptors" % (name,))
 
         client, server = self._connectedPair()
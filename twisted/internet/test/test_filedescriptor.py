@@ -5,14 +5,49 @@
 Whitebox tests for L{twisted.internet.abstract.FileDescriptor}.
 """
 
+from zope.interface import implements
 from zope.interface.verify import verifyClass
 
 from twisted.internet.abstract import FileDescriptor
-from twisted.internet.interfaces import IPushProducer
+from twisted.internet.interfaces import IPushProducer, IReactorFDSet
 from twisted.trial.unittest import TestCase
 
 
 
+class NullFDSetReactor(object):
+    """
+    An L{IReactorFDSet} which ignores all adds and removes.
+    """
+    implements(IReactorFDSet)
+
+    addReader = addWriter = removeReader = removeWriter = (
+        lambda self, descriptor: None)
+
+
+
+class RecordingFileDescriptor(FileDescriptor):
+    """
+    A L{FileDescriptor} which records the data passed to C{writeSomeData} and
+    accepts at most C{accept} bytes of it per call.
+
+    @ivar written: A C{list} of the objects passed to C{writeSomeData}.
+    """
+    connected = 1
+    accept = None
+
+    def __init__(self):
+        FileDescriptor.__init__(self, NullFDSetReactor())
+        self.written = []
+
+
+    def writeSomeData(self, data):
+        self.written.append(data)
+        if self.accept is None:
+            return len(data)
+        return min(len(data), self.accept)
+
+
+
 class FileDescriptorTests(TestCase):
     """
     Tests for L{FileDescriptor}.
@@ -39,3 +74,177 @@ class FileDescriptorTests(TestCase):
         L{FileDescriptor} should implement L{IPushProducer}.
         """
         self.assertTrue(verifyClass(IPushProducer, FileDescriptor))
+
+
+
+class FileDescriptorWriteTests(TestCase):
+    """
+    Tests for the output queue of L{FileDescriptor}.
+    """
+    def test_writeSequenceKeepsChunks(self):
+        """
+        L{FileDescriptor.writeSequence} queues each chunk separately.
+        """
+        fd = RecordingFileDescriptor()
+        fd.writeSequence(["foo", "bar"])
+        self.assertEqual(list(fd._tempDataBuffer), ["foo", "bar"])
+        self.assertEqual(fd._tempDataLen, 6)
+
+
+    def test_gatherSmallChunks(self):
+        """
+        L{FileDescriptor.doWrite} joins queued chunks which are smaller than
+        C{SEND_LIMIT} and writes them with one call to C{writeSomeData}.
+        """
+        fd = RecordingFileDescriptor()
+        fd.write("foo")
+        fd.writeSequence(["bar", "baz"])
+        fd.doWrite()
+        self.assertEqual(fd.written, ["foobarbaz"])
+        self.assertEqual(len(fd._tempDataBuffer), 0)
+        self.assertEqual(fd._tempDataLen, 0)
+
+
+    def test_gatherLimit(self):
+        """
+        L{FileDescriptor.doWrite} gathers no more than C{SEND_LIMIT} bytes into
+        a single write, and leaves the remaining chunks queued.
+        """
+        fd = RecordingFileDescriptor()
+        fd.SEND_LIMIT = 6
+        fd.writeSequence(["foo", "bar", "baz"])
+        fd.doWrite()
+        self.assertEqual(fd.written, ["foobar"])
+        self.assertEqual(list(fd._tempDataBuffer), ["baz"])
+        self.assertEqual(fd._tempDataLen, 3)
+        fd.doWrite()
+        self.assertEqual(fd.written, ["foobar", "baz"])
+
+
+    def test_gatherChunkCountLimit(self):
+        """
+        L{FileDescriptor.doWrite} gathers no more than C{IOV_MAX} chunks into a
+        single write.
+        """
+        fd = RecordingFileDescriptor()
+        fd.IOV_MAX = 2
+        fd.writeSequence(["a", "b", "c"])
+        fd.doWrite()
+        self.assertEqual(fd.written, ["ab"])
+        fd.doWrite()
+        self.assertEqual(fd.written, ["ab", "c"])
+
+
+    def test_largeChunkNotCopied(self):
+        """
+        A chunk of at least C{SEND_LIMIT} bytes is passed to C{writeSomeData}
+        on its own, as the same object which was written.
+        """
+        fd = RecordingFileDescriptor()
+        fd.SEND_LIMIT = 4
+        large = "x" * 10
+        fd.writeSequence(["foo", large])
+        fd.doWrite()
+        fd.doWrite()
+        self.assertEqual(fd.written[0], "foo")
+        self.assertIdentical(fd.written[1], large)
+
+
+    def test_partialWrite(self):
+        """
+        Data not accepted by C{writeSomeData} is written before any chunks
+        queued after it.
+        """
+        fd = RecordingFileDescriptor()
+        fd.accept = 2
+        fd.writeSequence(["foo", "bar"])
+        fd.doWrite()
+        fd.accept = None
+        fd.write("baz")
+        fd.doWrite()
+        self.assertEqual([str(data) for data in fd.written],
+                         ["foobar", "obarbaz"])
+        self.assertEqual(fd.dataBuffer, "")
+        self.assertEqual(fd.offset, 0)
+
+
+
+class VectorFileDescriptor(RecordingFileDescriptor):
+    """
+    A L{RecordingFileDescriptor} which can write several chunks at once, and
+    records the chunks and offsets passed to C{_writeSomeVectors}.
+    """
+    def _canWriteVectors(self):
+        return True
+
+
+    def _writeSomeVectors(self, chunks, offset):
+        self.written.append((list(chunks), offset))
+        size = sum(map(len, chunks)) - offset
+        if self.accept is None:
+            return size
+        return min(size, self.accept)
+
+
+
+class FileDescriptorVectorTests(TestCase):
+    """
+    Tests for the writing of several queued chunks at once by
+    L{FileDescriptor.doWrite}.
+    """
+    def test_writeVectors(self):
+        """
+        If C{_canWriteVectors} returns true, L{FileDescriptor.doWrite} passes
+        the gathered chunks to C{_writeSomeVectors} without joining them.
+        """
+        fd = VectorFileDescriptor()
+        fd.write("foo")
+        fd.writeSequence(["bar", "baz"])
+        fd.doWrite()
+        self.assertEqual(fd.written, [(["foo", "bar", "baz"], 0)])
+        self.assertEqual(fd.dataBuffer, "")
+        self.assertEqual(len(fd._tempDataBuffer), 0)
+        self.assertEqual(fd._tempDataLen, 0)
+
+
+    def test_singleChunk(self):
+        """
+        A single chunk is passed to C{writeSomeData}.
+        """
+        fd = VectorFileDescriptor()
+        fd.write("foo")
+        fd.doWrite()
+        self.assertEqual(fd.written, ["foo"])
+
+
+    def test_partialWrite(self):
+        """
+        The chunk C{_writeSomeVectors} stopped in becomes C{dataBuffer}, and
+        the chunks after it are queued again in front of any written later.
+        """
+        fd = VectorFileDescriptor()
+        fd.accept = 4
+        fd.writeSequence(["foo", "bar", "baz"])
+        fd.doWrite()
+        self.assertEqual((fd.dataBuffer, fd.offset), ("bar", 1))
+        self.assertEqual(list(fd._tempDataBuffer), ["baz"])
+        self.assertEqual(fd._tempDataLen, 3)
+        fd.accept = None
+        fd.write("quux")
+        fd.doWrite()
+        self.assertEqual(fd.written, [(["foo", "bar", "baz"], 0),
+                                      (["bar", "baz", "quux"], 1)])
+        self.assertEqual((fd.dataBuffer, fd.offset), ("", 0))
+
+
+    def test_nothingWritten(self):
+        """
+        L{FileDescriptor.doWrite} returns C{0} if C{_writeSomeVectors} writes
+        nothing, and the chunks stay queued.
+        """
+        fd = VectorFileDescriptor()
+        fd.accept = 0
+        fd.writeSequence(["foo", "bar"])
+        self.assertEqual(fd.doWrite(), 0)
+        self.assertEqual(fd.dataBuffer, "foo")
+        self.assertEqual(list(fd._tempDataBuffer), ["bar"])
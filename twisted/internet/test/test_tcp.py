@@ -11,6 +11,7 @@ __metaclass__ = type
 import socket, errno
 
 from zope.interface import implements
+from zope.interface.verify import verifyObject
 
 from twisted.python.runtime import platform
 from twisted.python.failure import Failure
@@ -22,9 +23,10 @@ from twisted.internet.test.reactormixins import ConnectableProtocol
 from twisted.internet.test.reactormixins import runProtocolsWithReactor
 from twisted.internet.error import (
     ConnectionLost, UserError, ConnectionRefusedError, ConnectionDone,
-    ConnectionAborted)
+    ConnectionAborted, CannotListenError)
 from twisted.internet.interfaces import (
-    ILoggingContext, IConnector, IReactorFDSet, IReactorSocket, IReactorTCP)
+    ILoggingContext, IConnector, IReactorFDSet, IReactorSocket, IReactorTCP,
+    IBufferReceiver, IFileTransport)
 from twisted.internet.address import IPv4Address, IPv6Address
 from twisted.internet.defer import (
     Deferred, DeferredList, maybeDeferred, gatherResults)
@@ -33,7 +35,8 @@ from twisted.internet.endpoints import (
 from twisted.internet.protocol import ServerFactory, ClientFactory, Protocol
 from twisted.internet.interfaces import (
     IPushProducer, IPullProducer, IHalfCloseableProtocol)
-from twisted.internet.tcp import Connection, Server, _resolveIPv6
+from twisted.internet.tcp import Connection, Server, Port, _resolveIPv6
+from twisted.internet import tcp, main
 
 from twisted.internet.test.connectionmixins import (
     LogObserverMixin, ConnectionTestsMixin, TCPClientTestsMixin, findFreePort)
@@ -117,6 +120,17 @@ class FakeSocket(object):
     def recv(self, size):
         return self.data
 
+
+    def recv_into(self, buffer, size):
+        """
+        Copy at most C{size} bytes of C{self.data} into C{buffer}.
+
+        @return: The number of bytes copied.
+        """
+        data = self.data[:size]
+        buffer[:len(data)] = data
+        return len(data)
+
     def send(self, bytes):
         """
         I{Send} all of C{bytes} by accumulating it into C{self.sendBuffer}.
@@ -178,6 +192,17 @@ class TestFakeSocket(TestCase):
         self.assertEqual(skt.recv(10), "someData")
 
 
+    def test_recvInto(self):
+        """
+        L{FakeSocket.recv_into} copies its data into the given buffer and
+        returns the number of bytes copied.
+        """
+        skt = FakeSocket("someData")
+        buf = bytearray(10)
+        self.assertEqual(skt.recv_into(buf, 10), 8)
+        self.assertEqual(buf[:8], "someData")
+
+
     def test_send(self):
         """
         L{FakeSocket.send} accepts the entire string passed to it, adds it to
@@ -203,6 +228,22 @@ class FakeProtocol(Protocol):
 
 
 
+class BufferProtocol(Protocol):
+    """
+    An L{IBufferReceiver} which records the contents of the views passed to
+    its C{bufferReceived} method.
+    """
+    implements(IBufferReceiver)
+
+    def __init__(self):
+        self.buffers = []
+
+
+    def bufferReceived(self, view):
+        self.buffers.append((type(view), view.tobytes()))
+
+
+
 class _FakeFDSetReactor(object):
     """
     A no-op implementation of L{IReactorFDSet}, which ignores all adds and
@@ -270,6 +311,90 @@ class TCPServerTests(TestCase):
 
 
 
+class FakeListeningSocket(object):
+    """
+    A fake for a listening L{socket.socket}, which accepts a fixed number of
+    connections and then fails.
+
+    @ivar pending: The number of connections left to accept.
+
+    @ivar error: The errno of the L{socket.error} raised by C{accept} once
+        there are no more pending connections.
+    """
+    def __init__(self, pending, error=errno.EAGAIN):
+        self.pending = pending
+        self.error = error
+
+
+    def accept(self):
+        """
+        Return a new, unconnected socket if any connections are pending,
+        otherwise raise C{socket.error} with C{self.error}.
+        """
+        if not self.pending:
+            raise socket.error(self.error, "accept failed")
+        self.pending -= 1
+        return socket.socket(), ('127.0.0.1', 12345)
+
+
+
+class RefusingFactory(ServerFactory):
+    """
+    A factory which refuses every connection.
+    """
+    def buildProtocol(self, addr):
+        return None
+
+
+
+class TCPPortAcceptTests(TestCase):
+    """
+    Whitebox tests for the accept statistics of L{twisted.internet.tcp.Port}.
+    """
+    def setUp(self):
+        self.port = Port(0, RefusingFactory(), reactor=_FakeFDSetReactor())
+        self.port.numberAccepts = 10
+
+
+    def test_connectionsAccepted(self):
+        """
+        L{Port.connectionsAccepted} counts every connection accepted, whether
+        or not the factory builds a protocol for it.
+        """
+        self.port.socket = FakeListeningSocket(3)
+        self.port.doRead()
+        self.assertEqual(self.port.connectionsAccepted, 3)
+        self.assertEqual(self.port.acceptsSaturated, 0)
+        self.assertEqual(self.port.acceptFailures, 0)
+
+
+    def test_acceptsSaturated(self):
+        """
+        L{Port.acceptsSaturated} counts the reads which accepted as many
+        connections as allowed without emptying the listen queue.
+        """
+        self.port.socket = FakeListeningSocket(15)
+        self.port.doRead()
+        self.assertEqual(self.port.connectionsAccepted, 10)
+        self.assertEqual(self.port.acceptsSaturated, 1)
+        self.port.doRead()
+        self.assertEqual(self.port.connectionsAccepted, 15)
+        self.assertEqual(self.port.acceptsSaturated, 1)
+
+
+    def test_acceptFailures(self):
+        """
+        L{Port.acceptFailures} counts the connections which could not be
+        accepted for lack of resources.
+        """
+        self.port.socket = FakeListeningSocket(0, errno.EMFILE)
+        self.port.doRead()
+        self.port.doRead()
+        self.assertEqual(self.port.acceptFailures, 2)
+        self.assertEqual(self.port.connectionsAccepted, 0)
+
+
+
 class TCPConnectionTests(TestCase):
     """
     Whitebox tests for L{twisted.internet.tcp.Connection}.
@@ -319,6 +444,413 @@ class TCPConnectionTests(TestCase):
         test_tlsAfterStartTLS.skip = "No SSL support available"
 
 
+    def test_doReadIntoBuffer(self):
+        """
+        If the protocol provides L{IBufferReceiver}, L{Connection.doRead}
+        receives into a pooled buffer and passes a C{memoryview} of the bytes
+        read to C{bufferReceived}.
+        """
+        skt = FakeSocket("someData")
+        protocol = BufferProtocol()
+        conn = Connection(skt, protocol)
+        self.assertEqual(conn.doRead(), None)
+        self.assertEqual(protocol.buffers, [(memoryview, "someData")])
+
+
+    def test_doReadIntoBufferConnectionDone(self):
+        """
+        L{Connection.doRead} returns L{main.CONNECTION_DONE} without calling
+        C{bufferReceived} when the socket reports end of file.
+        """
+        skt = FakeSocket("")
+        protocol = BufferProtocol()
+        conn = Connection(skt, protocol)
+        self.assertIdentical(conn.doRead(), main.CONNECTION_DONE)
+        self.assertEqual(protocol.buffers, [])
+
+
+    def test_doReadIntoBufferReleasesBuffer(self):
+        """
+        The buffer used by L{Connection.doRead} is returned to the pool once
+        C{bufferReceived} returns, even if it raises.
+        """
+        pool = tcp._BufferPool()
+        self.patch(tcp, '_receiveBuffers', pool)
+        skt = FakeSocket("someData")
+        protocol = BufferProtocol()
+        def bufferReceived(view):
+            raise RuntimeError()
+        protocol.bufferReceived = bufferReceived
+        conn = Connection(skt, protocol)
+        self.assertRaises(RuntimeError, conn.doRead)
+        self.assertEqual(len(pool._free), 1)
+
+
+    def _makeFile(self, contents):
+        """
+        Return a file object open for reading C{contents}.
+        """
+        path = self.mktemp()
+        fObj = open(path, 'wb')
+        fObj.write(contents)
+        fObj.close()
+        fObj = open(path, 'rb')
+        self.addCleanup(fObj.close)
+        return fObj
+
+
+    def _makeWritingConnection(self):
+        """
+        Return a connected L{Connection} using a L{FakeSocket}.
+        """
+        conn = Connection(
+            FakeSocket(""), Protocol(), reactor=_FakeFDSetReactor())
+        conn.connected = True
+        return conn
+
+
+    def test_sendFileProvided(self):
+        """
+        L{Connection} provides L{IFileTransport}.
+        """
+        self.assertTrue(verifyObject(
+                IFileTransport, self._makeWritingConnection()))
+
+
+    def test_sendFileWithoutSendfile(self):
+        """
+        When C{sendfile} is not available, L{Connection.sendFile} reads the
+        requested part of the file in chunks of at most C{SEND_LIMIT} bytes and
+        sends them between the data written before and after it.
+        """
+        self.patch(tcp, '_sendfile', None)
+        self.patch(tcp, '_writev', None)
+        fObj = self._makeFile("0123456789")
+        conn = self._makeWritingConnection()
+        conn.SEND_LIMIT = 3
+        conn.write("a")
+        result = []
+        conn.sendFile(fObj, 2, 5).addCallback(result.append)
+        conn.write("b")
+        while conn.dataBuffer or conn._tempDataBuffer:
+            conn.doWrite()
+        self.assertEqual(result, [None])
+        self.assertEqual("".join(map(str, conn.socket.sendBuffer)),
+                         "a23456b")
+
+
+    def test_sendFileWithSendfile(self):
+        """
+        When C{sendfile} is available, L{Connection.sendFile} uses it to send
+        the requested part of the file after the data written before it.
+        """
+        calls = []
+        def sendfile(outFD, inFD, offset, count):
+            calls.append((outFD, inFD, offset, count))
+            return min(count, 2)
+        self.patch(tcp, '_sendfile', sendfile)
+        fObj = self._makeFile("0123456789")
+        conn = self._makeWritingConnection()
+        conn.write("a")
+        result = []
+        conn.sendFile(fObj, 2, 5).addCallback(result.append)
+        conn.write("b")
+        while conn.dataBuffer or conn._tempDataBuffer:
+            conn.doWrite()
+        self.assertEqual(result, [None])
+        self.assertEqual(calls, [(1, fObj.fileno(), 2, 5),
+                                 (1, fObj.fileno(), 4, 3),
+                                 (1, fObj.fileno(), 6, 1)])
+        self.assertEqual("".join(map(str, conn.socket.sendBuffer)), "ab")
+
+
+    def test_sendFileSendfileWouldBlock(self):
+        """
+        If C{sendfile} fails with C{EAGAIN}, L{Connection.doWrite} returns
+        C{0} and tries again later.
+        """
+        def sendfile(outFD, inFD, offset, count):
+            raise OSError(errno.EAGAIN, "")
+        self.patch(tcp, '_sendfile', sendfile)
+        conn = self._makeWritingConnection()
+        conn.sendFile(self._makeFile("0123456789"), 0, 10)
+        self.assertEqual(conn.doWrite(), 0)
+        self.assertEqual(conn._queuedSegments, 1)
+
+
+    def test_sendFileSendfileFails(self):
+        """
+        If C{sendfile} fails with another error, L{Connection.doWrite} reports
+        the connection lost and the L{Deferred} returned by
+        L{Connection.sendFile} fails.
+        """
+        def sendfile(outFD, inFD, offset, count):
+            raise OSError(errno.EPIPE, "")
+        self.patch(tcp, '_sendfile', sendfile)
+        conn = self._makeWritingConnection()
+        d = conn.sendFile(self._makeFile("0123456789"), 0, 10)
+        self.assertIdentical(conn.doWrite(), main.CONNECTION_LOST)
+        self.assertEqual(conn._queuedSegments, 0)
+        return self.assertFailure(d, OSError)
+
+
+    def test_sendFileShortFile(self):
+        """
+        The L{Deferred} returned by L{Connection.sendFile} fails with
+        C{IOError} if the file ends before the requested number of bytes has
+        been sent.
+        """
+        self.patch(tcp, '_sendfile', None)
+        conn = self._makeWritingConnection()
+        d = conn.sendFile(self._makeFile("0123"), 2, 5)
+        while conn.dataBuffer or conn._tempDataBuffer:
+            conn.doWrite()
+        self.assertEqual(str(conn.socket.sendBuffer[0]), "23")
+        return self.assertFailure(d, IOError)
+
+
+    def test_sendFileConnectionLost(self):
+        """
+        The L{Deferred}s returned by L{Connection.sendFile} for file segments
+        which have not been sent fail when the connection is lost.
+        """
+        conn = self._makeWritingConnection()
+        conn.protocol = Protocol()
+        d = conn.sendFile(self._makeFile("0123456789"), 0, 10)
+        conn.connectionLost(Failure(ConnectionLost()))
+        self.assertEqual(len(conn._tempDataBuffer), 0)
+        self.assertEqual(conn._queuedSegments, 0)
+        return self.assertFailure(d, ConnectionLost)
+
+
+    def test_sendFileEmpty(self):
+        """
+        L{Connection.sendFile} returns an already fired L{Deferred} when asked
+        to send no bytes.
+        """
+        conn = self._makeWritingConnection()
+        result = []
+        conn.sendFile(self._makeFile(""), 0, 0).addCallback(result.append)
+        self.assertEqual(result, [None])
+        self.assertEqual(conn._queuedSegments, 0)
+
+
+    def test_sendFileTLS(self):
+        """
+        L{Connection.sendFile} raises C{RuntimeError} once TLS has been
+        started.
+        """
+        conn = self._makeWritingConnection()
+        conn.TLS = True
+        self.assertRaises(
+            RuntimeError, conn.sendFile, self._makeFile(""), 0, 0)
+
+
+    def test_writeVectors(self):
+        """
+        When C{writev} is available, L{Connection.doWrite} passes the queued
+        chunks to it without joining them, and sends what it did not write
+        next time.
+        """
+        calls = []
+        def writev(fd, chunks, offset):
+            calls.append((fd, list(chunks), offset))
+            return min(5, sum(map(len, chunks)) - offset)
+        self.patch(tcp, '_writev', writev)
+        conn = self._makeWritingConnection()
+        conn.writeSequence(["foo", "bar", "baz"])
+        conn.doWrite()
+        conn.doWrite()
+        self.assertEqual(calls, [(1, ["foo", "bar", "baz"], 0),
+                                 (1, ["bar", "baz"], 2)])
+        self.assertEqual(conn.socket.sendBuffer, [])
+        self.assertEqual(conn.dataBuffer, "")
+        self.assertEqual(len(conn._tempDataBuffer), 0)
+
+
+    def test_writeVectorsWouldBlock(self):
+        """
+        If C{writev} fails with C{EAGAIN}, L{Connection.doWrite} returns C{0}
+        and keeps the chunks queued.
+        """
+        def writev(fd, chunks, offset):
+            raise OSError(errno.EAGAIN, "")
+        self.patch(tcp, '_writev', writev)
+        conn = self._makeWritingConnection()
+        conn.writeSequence(["foo", "bar"])
+        self.assertEqual(conn.doWrite(), 0)
+        self.assertEqual(conn.dataBuffer, "foo")
+        self.assertEqual(list(conn._tempDataBuffer), ["bar"])
+        self.assertEqual(conn._tempDataLen, 3)
+
+
+    def test_writeVectorsFails(self):
+        """
+        If C{writev} fails with another error, L{Connection.doWrite} reports
+        the connection lost.
+        """
+        def writev(fd, chunks, offset):
+            raise OSError(errno.EPIPE, "")
+        self.patch(tcp, '_writev', writev)
+        conn = self._makeWritingConnection()
+        conn.writeSequence(["foo", "bar"])
+        self.assertIdentical(conn.doWrite(), main.CONNECTION_LOST)
+
+
+    def test_writeVectorsTLS(self):
+        """
+        Once TLS has been started, L{Connection.doWrite} joins the queued
+        chunks rather than using C{writev}.
+        """
+        self.patch(tcp, '_writev', lambda fd, chunks, offset: self.fail())
+        conn = self._makeWritingConnection()
+        conn.TLS = True
+        conn.writeSequence(["foo", "bar"])
+        conn.doWrite()
+        self.assertEqual(map(str, conn.socket.sendBuffer), ["foobar"])
+
+
+
+class SendfileTests(TestCase):
+    """
+    Tests for L{tcp._sendfile}, the binding of sendfile(2) used by
+    L{Connection.sendFile}.
+    """
+    if tcp._sendfile is None:
+        skip = "sendfile(2) is not available on this platform"
+
+    def setUp(self):
+        self.reader, self.writer = socket.socketpair()
+        self.addCleanup(self.reader.close)
+        self.addCleanup(self.writer.close)
+        path = self.mktemp()
+        fObj = open(path, 'wb')
+        fObj.write("0123456789")
+        fObj.close()
+        self.file = open(path, 'rb')
+        self.addCleanup(self.file.close)
+
+
+    def test_send(self):
+        """
+        L{tcp._sendfile} sends the requested part of a file to a socket and
+        returns the number of bytes sent, without moving the file's position.
+        """
+        sent = tcp._sendfile(
+            self.writer.fileno(), self.file.fileno(), 2, 5)
+        self.assertEqual(sent, 5)
+        self.assertEqual(self.reader.recv(10), "23456")
+        self.assertEqual(self.file.tell(), 0)
+
+
+    def test_endOfFile(self):
+        """
+        L{tcp._sendfile} sends what is left of the file, and returns C{0} once
+        the offset is at its end.
+        """
+        fd = self.file.fileno()
+        self.assertEqual(tcp._sendfile(self.writer.fileno(), fd, 8, 5), 2)
+        self.assertEqual(tcp._sendfile(self.writer.fileno(), fd, 10, 5), 0)
+        self.assertEqual(self.reader.recv(10), "89")
+
+
+    def test_error(self):
+        """
+        L{tcp._sendfile} raises C{OSError} with the C{errno} set by
+        sendfile(2) when it fails.
+        """
+        error = self.assertRaises(
+            OSError, tcp._sendfile, -1, self.file.fileno(), 0, 5)
+        self.assertEqual(error.errno, errno.EBADF)
+
+
+
+class WritevTests(TestCase):
+    """
+    Tests for L{tcp._writev}, the binding of writev(2) used by
+    L{Connection.doWrite}.
+    """
+    if tcp._writev is None:
+        skip = "writev(2) is not used on this platform"
+
+    def setUp(self):
+        self.reader, self.writer = socket.socketpair()
+        self.addCleanup(self.reader.close)
+        self.addCleanup(self.writer.close)
+
+
+    def test_write(self):
+        """
+        L{tcp._writev} writes the chunks to a socket, skipping the given
+        number of bytes of the first one, and returns the number of bytes
+        written.
+        """
+        written = tcp._writev(self.writer.fileno(), ["foo", "bar", "baz"], 2)
+        self.assertEqual(written, 7)
+        self.assertEqual(self.reader.recv(10), "obarbaz")
+
+
+    def test_error(self):
+        """
+        L{tcp._writev} raises C{OSError} with the C{errno} set by writev(2)
+        when it fails.
+        """
+        error = self.assertRaises(OSError, tcp._writev, -1, ["foo"], 0)
+        self.assertEqual(error.errno, errno.EBADF)
+
+
+
+class BufferPoolTests(TestCase):
+    """
+    Tests for L{tcp._BufferPool}.
+    """
+    def test_acquireNew(self):
+        """
+        L{tcp._BufferPool.acquire} returns a new C{bytearray} of the requested
+        size when no buffers have been released.
+        """
+        buf = tcp._BufferPool().acquire(10)
+        self.assertIsInstance(buf, bytearray)
+        self.assertEqual(len(buf), 10)
+
+
+    def test_reuse(self):
+        """
+        A buffer passed to L{tcp._BufferPool.release} is returned by the next
+        call to L{tcp._BufferPool.acquire} for which it is large enough.
+        """
+        pool = tcp._BufferPool()
+        buf = pool.acquire(10)
+        pool.release(buf)
+        self.assertIdentical(pool.acquire(5), buf)
+        self.assertNotIdentical(pool.acquire(5), buf)
+
+
+    def test_tooSmall(self):
+        """
+        Released buffers smaller than the requested size are discarded rather
+        than returned by L{tcp._BufferPool.acquire}.
+        """
+        pool = tcp._BufferPool()
+        small = pool.acquire(5)
+        pool.release(small)
+        buf = pool.acquire(10)
+        self.assertNotIdentical(buf, small)
+        self.assertEqual(len(buf), 10)
+        self.assertEqual(pool._free, [])
+
+
+    def test_maxFree(self):
+        """
+        L{tcp._BufferPool.release} keeps at most C{maxFree} buffers.
+        """
+        pool = tcp._BufferPool()
+        pool.maxFree = 2
+        for i in range(3):
+            pool.release(bytearray(1))
+        self.assertEqual(len(pool._free), 2)
+
+
 
 class TCPCreator(EndpointCreator):
     """
@@ -968,6 +1500,52 @@ class TCPPortTestsBuilder(ReactorBuilder, ListenTCPMixin, TCPPortTestsMixin,
 
 
 
+class TCPReusePortTestsBuilder(ReactorBuilder):
+    """
+    Tests for listening on TCP ports with I{SO_REUSEPORT}.
+    """
+    requiredInterfaces = (IReactorTCP,)
+
+    def setUp(self):
+        if tcp._SO_REUSEPORT is None:
+            raise SkipTest("SO_REUSEPORT is not supported on this platform")
+        ReactorBuilder.setUp(self)
+
+
+    def _listen(self, reactor, port, reuseport):
+        try:
+            return reactor.listenTCP(
+                port, ServerFactory(), interface='127.0.0.1',
+                reuseport=reuseport)
+        except TypeError:
+            raise SkipTest("%r does not support reuseport" % (reactor,))
+
+
+    def test_reuseport(self):
+        """
+        Several ports listening with C{reuseport=True} can share the same
+        address and port number.
+        """
+        reactor = self.buildReactor()
+        first = self._listen(reactor, 0, True)
+        portNumber = first.getHost().port
+        second = self._listen(reactor, portNumber, True)
+        self.assertEqual(second.getHost().port, portNumber)
+
+
+    def test_withoutReuseport(self):
+        """
+        A port listening without C{reuseport} does not share its port number
+        with another port.
+        """
+        reactor = self.buildReactor()
+        first = self._listen(reactor, 0, False)
+        self.assertRaises(
+            CannotListenError,
+            self._listen, reactor, first.getHost().port, True)
+
+
+
 class TCPFDPortTestsBuilder(ReactorBuilder, SocketTCPMixin, TCPPortTestsMixin,
                             ObjectModelIntegrationMixin,
                             StreamTransportTestsMixin):
@@ -1106,6 +1684,52 @@ class TCPConnectionTestsBuilder(ReactorBuilder):
         self.assertEqual(pauser.events, ["paused", "resumed", "lost"])
 
 
+    def test_sendFile(self):
+        """
+        The bytes of a file passed to L{IFileTransport.sendFile} are received
+        by the peer between data written before and after the call.
+        """
+        contents = ''.join([chr(i % 256) for i in range(300000)])
+        path = self.mktemp()
+        fObj = open(path, 'wb')
+        fObj.write(contents)
+        fObj.close()
+        fileObject = open(path, 'rb')
+        self.addCleanup(fileObject.close)
+        results = []
+
+        class Sender(ConnectableProtocol):
+            def connectionMade(self):
+                if not IFileTransport.providedBy(self.transport):
+                    results.append("unsupported")
+                    self.transport.loseConnection()
+                    return
+                self.transport.write("before")
+                d = self.transport.sendFile(fileObject, 10, 250000)
+                d.addCallback(results.append)
+                self.transport.write("after")
+                self.transport.loseConnection()
+
+        class Receiver(ConnectableProtocol):
+            def __init__(self):
+                self.received = []
+
+            def dataReceived(self, data):
+                self.received.append(data)
+
+        receiver = Receiver()
+        reactor = runProtocolsWithReactor(
+            self, Sender(), receiver, TCPCreator())
+        if results == ["unsupported"]:
+            raise SkipTest("%s transports do not provide IFileTransport" % (
+                    reactor.__class__.__name__,))
+        self.assertEqual(results, [None])
+        received = ''.join(receiver.received)
+        self.assertEqual(len(received), len("before") + 250000 + len("after"))
+        self.assertEqual(received,
+                         "before" + contents[10:250010] + "after")
+
+
     def test_doubleHalfClose(self):
         """
         If one side half-closes its connection, and then the other side of the
@@ -1488,6 +2112,7 @@ globals().update(TCP4ClientTestsBuilder.makeTestCaseClasses())
 globals().update(TCP6ClientTestsBuilder.makeTestCaseClasses())
 globals().update(TCPPortTestsBuilder.makeTestCaseClasses())
 globals().update(TCPFDPortTestsBuilder.makeTestCaseClasses())
+globals().update(TCPReusePortTestsBuilder.makeTestCaseClasses())
 globals().update(TCPConnectionTestsBuilder.makeTestCaseClasses())
 globals().update(TCP4ConnectorTestsBuilder.makeTestCaseClasses())
 globals().update(TCP6ConnectorTestsBuilder.makeTestCaseClasses())
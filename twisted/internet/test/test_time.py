@@ -8,8 +8,10 @@ Tests for implementations of L{IReactorTime}.
 __metaclass__ = type
 
 from twisted.python.runtime import platform
+from twisted.trial.unittest import SkipTest
 from twisted.internet.test.reactormixins import ReactorBuilder
 from twisted.internet.interfaces import IReactorTime
+from twisted.internet.base import ReactorBase, TimerWheel
 
 
 class TimeTestsBuilder(ReactorBuilder):
@@ -27,6 +29,25 @@ class TimeTestsBuilder(ReactorBuilder):
         reactor.run()
 
 
+    def test_timerWheel(self):
+        """
+        Timed calls run in order on a reactor which keeps them in a
+        L{TimerWheel}, and cancelled calls do not run.
+        """
+        reactor = self.buildReactor()
+        if not isinstance(reactor, ReactorBase):
+            raise SkipTest("%r does not support timer wheels" % (reactor,))
+        reactor.installTimerWheel(TimerWheel(0.01))
+        result = []
+        reactor.callLater(0.02, result.append, 2)
+        reactor.callLater(0.01, result.append, 1)
+        cancelled = reactor.callLater(0.025, result.append, 3)
+        reactor.callLater(0.015, cancelled.cancel)
+        reactor.callLater(0.03, reactor.stop)
+        self.runReactor(reactor, 5)
+        self.assertEqual(result, [1, 2])
+
+
 
 class GlibTimeTestsBuilder(ReactorBuilder):
     """
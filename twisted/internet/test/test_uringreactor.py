@@ -0,0 +1,247 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Tests for L{twisted.internet.uringreactor}.
+"""
+
+import socket
+from select import POLLIN, POLLOUT
+
+from zope.interface.verify import verifyClass
+
+from twisted.trial.unittest import TestCase
+from twisted.internet.interfaces import IReactorFDSet, IReactorTCP
+
+try:
+    from twisted.internet.uringreactor import uringsupport as _uring
+    from twisted.internet.uringreactor.reactor import URingReactor
+except ImportError:
+    skip = 'This test only applies to URingReactor'
+else:
+    try:
+        _uring.Ring(entries=2, completions=4).close()
+    except _uring.URingError, e:
+        skip = str(e)
+
+try:
+    socket.socket(socket.AF_INET6, socket.SOCK_STREAM).close()
+except socket.error, e:
+    ipv6Skip = str(e)
+else:
+    ipv6Skip = None
+
+
+
+class Descriptor(object):
+    """
+    Records reads and writes, as if it were a C{FileDescriptor}.
+    """
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.events = []
+
+
+    def fileno(self):
+        return self.sock.fileno()
+
+
+    def doRead(self):
+        self.events.append("read")
+
+
+    def doWrite(self):
+        self.events.append("write")
+
+
+    def connectionLost(self, reason):
+        self.events.append(reason)
+
+
+
+class SupportTests(TestCase):
+    """
+    Tests for L{twisted.internet.uringreactor.uringsupport}, low-level
+    reactor implementation helpers.
+    """
+
+    def setUp(self):
+        self.ring = _uring.Ring(entries=8, completions=16)
+        self.addCleanup(self.ring.close)
+        self.client, self.server = socket.socketpair()
+        self.addCleanup(self.client.close)
+        self.addCleanup(self.server.close)
+
+
+    def _addressTest(self, family, address):
+        """
+        L{_uring.parsesockaddr} returns the address packed by
+        L{_uring.makesockaddr}.
+        """
+        buff, length = _uring.makesockaddr(family, address)
+        self.assertEqual(_uring.parsesockaddr(buff), address)
+
+
+    def test_ipv4Address(self):
+        """
+        IPv4 addresses are two-tuples of a dotted decimal host and a port.
+        """
+        self._addressTest(socket.AF_INET, ('127.0.0.1', 1234))
+
+
+    def test_ipv6Address(self):
+        """
+        IPv6 addresses are four-tuples of a host, port, flow info and scope
+        id.
+        """
+        self._addressTest(socket.AF_INET6, ('::1', 1234, 0, 0))
+    if ipv6Skip:
+        test_ipv6Address.skip = ipv6Skip
+
+
+    def test_ipv6ScopedAddress(self):
+        """
+        The host of a link-local IPv6 address names its scope, as the hosts
+        of the addresses of sockets do, as well as its scope id giving it.
+        """
+        address = socket.getaddrinfo(
+            'fe80::1%lo', 1234, socket.AF_INET6, 0, 0,
+            socket.AI_NUMERICHOST)[0][4]
+        self.assertEqual(address[0], 'fe80::1%lo')
+        self._addressTest(socket.AF_INET6, address)
+    if ipv6Skip:
+        test_ipv6ScopedAddress.skip = ipv6Skip
+
+
+    def test_sendAndReceive(self):
+        """
+        A send and a receive prepared before the same call to L{Ring.submit}
+        both complete, with the number of bytes transferred as their results.
+        """
+        buff = _uring.AllocateReadBuffer(10)
+        received = _uring.Event(None, None)
+        sent = _uring.Event(None, None)
+        self.ring.recv(self.server.fileno(), buff, 10, received)
+        self.ring.send(self.client.fileno(), "xxhelloxx", 2, 5, sent)
+        self.assertEqual(self.ring.pending, 2)
+        completed = []
+        while len(completed) < 2:
+            completed.extend(self.ring.submit(1))
+        self.assertEqual(self.ring.pending, 0)
+        self.assertEqual(
+            sorted([(evt is sent, rc) for rc, evt in completed]),
+            [(False, 5), (True, 5)])
+        self.assertEqual(buff.raw[:5], "hello")
+
+
+    def test_pollAndCancel(self):
+        """
+        A poll completes with the events which occurred, and a cancelled
+        operation completes with C{-ECANCELED}.
+        """
+        readable = _uring.Event(None, None)
+        self.ring.poll(self.server.fileno(), POLLIN, readable)
+        self.assertEqual(self.ring.submit(0), [])
+        self.ring.cancel(readable)
+        self.assertEqual(self.ring.submit(1), [(-_uring.ECANCELED, readable)])
+
+        writable = _uring.Event(None, None)
+        self.ring.poll(self.server.fileno(), POLLOUT, writable)
+        self.assertEqual(self.ring.submit(1), [(POLLOUT, writable)])
+
+
+    def test_timeout(self):
+        """
+        L{Ring.submit} returns an empty list if nothing completes before the
+        timeout.
+        """
+        self.assertEqual(self.ring.submit(0.01), [])
+
+
+
+class URingReactorTests(TestCase):
+    """
+    Tests for the L{IReactorFDSet} implementation of L{URingReactor}, which
+    watches descriptors with poll operations.
+    """
+
+    def setUp(self):
+        self.reactor = URingReactor()
+        self.addCleanup(self.reactor.ring.close)
+        self.client, self.server = socket.socketpair()
+        self.addCleanup(self.client.close)
+        self.addCleanup(self.server.close)
+        self.descriptor = Descriptor(self.server)
+
+
+    def test_interfaces(self):
+        """
+        L{URingReactor} implements L{IReactorFDSet} and L{IReactorTCP}.
+        """
+        verifyClass(IReactorFDSet, URingReactor)
+        verifyClass(IReactorTCP, URingReactor)
+
+
+    def test_pollCoversInterest(self):
+        """
+        A new poll is only started when the one in progress does not cover
+        every event a descriptor is interested in.
+        """
+        fd = self.server.fileno()
+        self.reactor.addReader(self.descriptor)
+        readPoll = self.reactor._polls[fd]
+        self.assertEqual(readPoll.mask, POLLIN)
+
+        self.reactor.addWriter(self.descriptor)
+        bothPoll = self.reactor._polls[fd]
+        self.assertNotIdentical(bothPoll, readPoll)
+        self.assertEqual(bothPoll.mask, POLLIN | POLLOUT)
+
+        self.reactor.removeWriter(self.descriptor)
+        self.assertIdentical(self.reactor._polls[fd], bothPoll)
+
+
+    def test_removeCancelsPoll(self):
+        """
+        Removing the last interest in a descriptor cancels its poll and
+        forgets the descriptor.
+        """
+        fd = self.server.fileno()
+        # The reactor polls its waker too.
+        polls = self.reactor._polls.copy()
+        readers = self.reactor.getReaders()
+        self.reactor.addReader(self.descriptor)
+        self.reactor.removeReader(self.descriptor)
+        self.assertEqual(self.reactor._polls, polls)
+        self.assertNotIn(fd, self.reactor._selectables)
+        self.assertEqual(self.reactor.getReaders(), readers)
+
+
+    def test_unwantedEvents(self):
+        """
+        Events a descriptor is no longer interested in are ignored, and the
+        poll is started again for the events it still is interested in.
+        """
+        fd = self.server.fileno()
+        self.reactor.addReader(self.descriptor)
+        self.reactor.addWriter(self.descriptor)
+        self.reactor.removeWriter(self.descriptor)
+        self.reactor.doIteration(1)
+        self.assertEqual(self.descriptor.events, [])
+        self.assertEqual(self.reactor._polls[fd].mask, POLLIN)
+
+        self.client.send("x")
+        self.reactor.doIteration(1)
+        self.assertEqual(self.descriptor.events, ["read"])
+
+
+    def test_staleCompletion(self):
+        """
+        The completion of a poll which has been replaced is ignored.
+        """
+        self.reactor.addReader(self.descriptor)
+        stale = self.reactor._polls[self.server.fileno()]
+        self.reactor.addWriter(self.descriptor)
+        self.reactor._cbPoll(POLLIN, stale)
+        self.assertEqual(self.descriptor.events, [])
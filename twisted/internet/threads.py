@@ -9,12 +9,87 @@ For basic support see reactor threading API docs.
 Maintainer: Itamar Shtull-Trauring
 """
 
-import Queue
+import Queue, threading, weakref
 
-from twisted.python import failure
+from twisted.python import failure, log
 from twisted.internet import defer
 
 
+
+class _ResultDelivery(object):
+    """
+    Deliver the results of calls run in threads to their L{defer.Deferred}s
+    in the reactor thread, in batches, so that the reactor is woken up once
+    for all of the results which arrive while it is busy rather than once for
+    each.
+
+    @ivar _lock: A lock protecting C{_pending}.
+
+    @ivar _pending: A C{list} of three-tuples of a L{defer.Deferred}, whether
+        the call succeeded and its result or failure, which have not been
+        delivered yet.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = []
+
+
+    def deliver(self, reactor, d, success, result):
+        """
+        Arrange for C{d} to be fired with C{result} in the thread C{reactor}
+        runs in.  May be called from any thread.
+        """
+        self._lock.acquire()
+        try:
+            self._pending.append((d, success, result))
+            # Only the first result of a batch needs to wake the reactor;
+            # the rest are delivered by the same call to _flush.
+            first = len(self._pending) == 1
+        finally:
+            self._lock.release()
+        if first:
+            reactor.callFromThread(self._flush)
+
+
+    def _flush(self):
+        """
+        Fire the L{defer.Deferred}s of every result which has arrived.
+        """
+        self._lock.acquire()
+        try:
+            pending, self._pending = self._pending, []
+        finally:
+            self._lock.release()
+        for d, success, result in pending:
+            try:
+                if success:
+                    d.callback(result)
+                else:
+                    d.errback(result)
+            except:
+                log.err()
+
+
+
+_deliveries = weakref.WeakKeyDictionary()
+
+def _getDelivery(reactor):
+    """
+    Return the L{_ResultDelivery} for C{reactor}, creating it if need be.
+    """
+    try:
+        return _deliveries[reactor]
+    except KeyError:
+        delivery = _ResultDelivery()
+        _deliveries[reactor] = delivery
+        return delivery
+    except TypeError:
+        # The reactor cannot be weakly referenced, so do without batching.
+        return _ResultDelivery()
+
+
+
 def deferToThreadPool(reactor, threadpool, f, *args, **kwargs):
     """
     Call the function C{f} using a thread from the given threadpool and return
@@ -36,15 +111,14 @@ def deferToThreadPool(reactor, threadpool, f, *args, **kwargs):
 
     @return: A Deferred which fires a callback with the result of f, or an
         errback with a L{twisted.python.failure.Failure} if f throws an
-        exception.
+        exception.  Results which arrive together are delivered with a single
+        call to C{reactor.callFromThread}.
     """
     d = defer.Deferred()
+    deliver = _getDelivery(reactor).deliver
 
     def onResult(success, result):
-        if success:
-            reactor.callFromThread(d.callback, result)
-        else:
-            reactor.callFromThread(d.errback, result)
+        deliver(reactor, d, success, result)
 
     threadpool.callInThreadWithCallback(onResult, f, *args, **kwargs)
 
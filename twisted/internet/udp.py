@@ -50,18 +50,36 @@ from twisted.internet import base, defer, address
 from twisted.python import log, failure
 from twisted.internet import abstract, error, interfaces
 
+try:
+    from twisted.internet import _mmsg
+except ImportError:
+    _mmsg = None
+
 
 class Port(base.BasePort):
     """
     UDP port, listening for packets.
+
+    If the protocol provides L{interfaces.IDatagramBatchReceiver} and the
+    platform has C{recvmmsg}, up to C{batchSize} datagrams are received with
+    each system call and passed to the protocol's C{datagramsReceived}
+    together.
+
+    @ivar batchSize: The largest number of datagrams received or sent with
+        one system call.
+
+    @ivar _receiver: The L{_mmsg.Receiver} datagrams are received with, or
+        C{None} if they are received one at a time.
     """
     implements(
-        interfaces.IListeningPort, interfaces.IUDPTransport,
+        interfaces.IListeningPort, interfaces.IUDPBatchTransport,
         interfaces.ISystemHandle)
 
     addressFamily = socket.AF_INET
     socketType = socket.SOCK_DGRAM
     maxThroughput = 256 * 1024 # max bytes we read in one eventloop iteration
+    batchSize = 32
+    _receiver = None
 
     # Actual port number being listened on, only set to a non-None
     # value when we are actually listening.
@@ -120,6 +138,10 @@ class Port(base.BasePort):
         self.fileno = self.socket.fileno
 
     def _connectToProtocol(self):
+        if (_mmsg is not None and
+            self.addressFamily in (socket.AF_INET, socket.AF_INET6) and
+            interfaces.IDatagramBatchReceiver.providedBy(self.protocol)):
+            self._receiver = _mmsg.Receiver(self.batchSize, self.maxPacketSize)
         self.protocol.makeConnection(self)
         self.startReading()
 
@@ -128,6 +150,8 @@ class Port(base.BasePort):
         """
         Called when my socket is ready for reading.
         """
+        if self._receiver is not None:
+            return self._doReadBatch()
         read = 0
         while read < self.maxThroughput:
             try:
@@ -149,6 +173,36 @@ class Port(base.BasePort):
                     log.err()
 
 
+    def _doReadBatch(self):
+        """
+        Receive datagrams with C{recvmmsg} and pass each batch to the
+        protocol's C{datagramsReceived}.
+        """
+        read = 0
+        while read < self.maxThroughput:
+            try:
+                datagrams = self._receiver.recv(self.socket.fileno())
+            except socket.error, se:
+                no = se.args[0]
+                if no in _sockErrReadIgnore:
+                    return
+                if no in _sockErrReadRefuse:
+                    if self._connectedAddr:
+                        self.protocol.connectionRefused()
+                    return
+                raise
+            else:
+                for data, addr in datagrams:
+                    read += len(data)
+                try:
+                    self.protocol.datagramsReceived(datagrams)
+                except:
+                    log.err()
+                if len(datagrams) < self._receiver.count:
+                    # The socket has been drained.
+                    return
+
+
     def write(self, datagram, addr=None):
         """
         Write a datagram.
@@ -199,6 +253,44 @@ class Port(base.BasePort):
     def writeSequence(self, seq, addr):
         self.write("".join(seq), addr)
 
+
+    def writeDatagrams(self, datagrams):
+        """
+        Write several datagrams, with C{sendmmsg} where the platform has it.
+
+        A datagram C{sendmmsg} cannot send is written with L{write}, so that
+        errors are handled in the same way.  An error writing one datagram
+        does not stop the others from being written; the first such error is
+        raised once they have been, and any others are logged.
+
+        @see: L{interfaces.IUDPBatchTransport.writeDatagrams}
+        """
+        connected = self._connectedAddr is not None
+        firstError = None
+        i = 0
+        while i < len(datagrams):
+            if _mmsg is not None and len(datagrams) - i > 1:
+                batch = datagrams[i:i + self.batchSize]
+                if connected or all(
+                    abstract.isIPAddress(addr[0]) or
+                    abstract.isIPv6Address(addr[0])
+                    for data, addr in batch):
+                    try:
+                        i += _mmsg.send(self.socket.fileno(), batch, connected)
+                        continue
+                    except socket.error:
+                        pass
+            try:
+                self.write(*datagrams[i])
+            except:
+                if firstError is None:
+                    firstError = failure.Failure()
+                else:
+                    log.err()
+            i += 1
+        if firstError is not None:
+            firstError.raiseException()
+
     def connect(self, host, port):
         """
         'Connect' to remote server.
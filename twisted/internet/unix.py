@@ -146,6 +146,15 @@ class _SendmsgMixin(object):
             return result
 
 
+    def _canWriteVectors(self):
+        """
+        Queued chunks are only written with C{writev} while there are no file
+        descriptors to send, since those are sent by L{writeSomeData}.
+        """
+        return (not self._sendmsgQueue and
+                self._writeSomeDataBase._canWriteVectors(self))
+
+
     def doRead(self):
         """
         Calls L{IFileDescriptorReceiver.fileDescriptorReceived} and
@@ -161,7 +170,7 @@ class _SendmsgMixin(object):
                 sendmsg.recv1msg, self.socket.fileno(), 0, self.bufferSize)
         except socket.error, se:
             if se.args[0] == EWOULDBLOCK:
-                return
+                return 0
             else:
                 return main.CONNECTION_LOST
 
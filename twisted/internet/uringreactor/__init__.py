@@ -0,0 +1,10 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Linux io_uring completion reactor
+"""
+
+from twisted.internet.uringreactor.reactor import install
+
+__all__ = ['install']
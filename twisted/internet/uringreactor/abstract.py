@@ -0,0 +1,422 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Abstract file handle class
+"""
+
+import errno
+from collections import deque
+
+from zope.interface import implements
+
+from twisted.internet import main, error, interfaces
+from twisted.internet.abstract import _ConsumerMixin, _LogOwner
+from twisted.python import failure
+
+from twisted.internet.uringreactor import uringsupport as _uring
+
+
+
+class FileHandle(_ConsumerMixin, _LogOwner):
+    """
+    File handle that can read and write asynchronously.
+
+    At most one read and one write are in progress at a time.  A read into
+    C{_readBuffer} is started whenever the handle is reading and none is in
+    progress; the result of a read which completes after reading has been
+    stopped is kept until reading is resumed.  A write of up to C{SEND_LIMIT}
+    bytes of the queued data is started whenever there is data to write and
+    none is in progress.
+
+    @ivar readBufferSize: The size of the next read.  It starts small and is
+        doubled, up to C{maxReadBufferSize}, whenever a read fills it.
+
+    @ivar _readEvent: The L{_uring.Event} of the read in progress, or
+        C{None}.
+
+    @ivar _readResult: The result and L{_uring.Event} of a read which
+        completed while the handle was not reading, or C{None}.
+
+    @ivar _writeEvent: The L{_uring.Event} of the write in progress, or
+        C{None}.
+    """
+    implements(interfaces.IPushProducer, interfaces.IConsumer,
+               interfaces.ITransport, interfaces.IHalfCloseableDescriptor)
+    # read stuff
+    readBufferSize = 4096
+    maxReadBufferSize = 65536
+    dynamicReadBuffers = True
+    reading = False
+    _readBuffer = None
+    _readScheduled = None
+    _readEvent = None
+    _readResult = None
+
+
+    def startReading(self):
+        self.reactor.addActiveHandle(self)
+        if not self._readScheduled and not self.reading:
+            self.reading = True
+            self._readScheduled = self.reactor.callLater(0,
+                                                         self._resumeReading)
+
+
+    def stopReading(self):
+        if self._readScheduled:
+            self._readScheduled.cancel()
+            self._readScheduled = None
+        self.reading = False
+
+
+    def _resumeReading(self):
+        self._readScheduled = None
+        if self._readEvent is not None:
+            # The read in progress will be handled when it completes.
+            return
+        result, self._readResult = self._readResult, None
+        if result is None or self._handleRead(*result):
+            self.doRead()
+
+
+    def _cbRead(self, rc, evt):
+        self._readEvent = None
+        if self.disconnected:
+            return
+        if not self.reading:
+            self._readResult = (rc, evt)
+        elif self._handleRead(rc, evt):
+            self.doRead()
+
+
+    def _handleRead(self, rc, evt):
+        """
+        Returns False if we should stop reading for now
+        """
+        # graceful disconnection
+        if rc == 0:
+            self.reactor.removeActiveHandle(self)
+            self.readConnectionLost(failure.Failure(main.CONNECTION_DONE))
+            return False
+        elif rc == -_uring.ECANCELED:
+            # The read was cancelled by stopping it with removeReader; start
+            # another if reading has been resumed since.
+            return self.reading and not self.disconnected
+        elif rc < 0:
+            self.connectionLost(failure.Failure(
+                                error.ConnectionLost("read error -- %s (%s)" %
+                                    (errno.errorcode.get(-rc, 'unknown'), -rc))))
+            return False
+        else:
+            self.dataReceived(self._readBuffer, rc)
+            if (self.dynamicReadBuffers and rc == self.readBufferSize and
+                self.readBufferSize < self.maxReadBufferSize):
+                # we filled the buffer, so use a bigger one
+                self.readBufferSize *= 2
+                self._readBuffer = None
+            return self.reading and not self.disconnected
+
+
+    def doRead(self):
+        if self._readBuffer is None:
+            self._readBuffer = _uring.AllocateReadBuffer(self.readBufferSize)
+        self._readEvent = evt = _uring.Event(self._cbRead, self)
+        self.readFromHandle(self._readBuffer, self.readBufferSize, evt)
+
+
+    def _cancelRead(self):
+        """
+        Stop reading and cancel the read in progress, if any, so that nothing
+        more is read from the handle until reading is started again.
+        """
+        self.stopReading()
+        if self._readEvent is not None:
+            self.reactor.cancelOperation(self._readEvent, flush=True)
+
+
+    def readFromHandle(self, buff, size, evt):
+        raise NotImplementedError()
+
+
+    def dataReceived(self, buff, size):
+        raise NotImplementedError
+
+
+    def readConnectionLost(self, reason):
+        self.connectionLost(reason)
+
+
+    # write stuff
+    dataBuffer = ''
+    offset = 0
+    writing = False
+    _writeScheduled = None
+    _writeEvent = None
+    _writeDisconnecting = False
+    _writeDisconnected = False
+    writeBufferSize = 2**2**2**2
+
+
+    def loseWriteConnection(self):
+        self._writeDisconnecting = True
+        self.startWriting()
+
+
+    def _closeWriteConnection(self):
+        # override in subclasses
+        pass
+
+
+    def writeConnectionLost(self, reason):
+        # in current code should never be called
+        self.connectionLost(reason)
+
+
+    def startWriting(self):
+        self.reactor.addActiveHandle(self)
+        self.writing = True
+        if not self._writeScheduled:
+            self._writeScheduled = self.reactor.callLater(0,
+                                                          self._resumeWriting)
+
+
+    def stopWriting(self):
+        if self._writeScheduled:
+            self._writeScheduled.cancel()
+            self._writeScheduled = None
+        self.writing = False
+
+
+    def _resumeWriting(self):
+        self._writeScheduled = None
+        if self._writeEvent is None:
+            self.doWrite()
+
+
+    def _cbWrite(self, rc, evt):
+        self._writeEvent = None
+        if self._handleWrite(rc, evt):
+            self.doWrite()
+
+
+    def _handleWrite(self, rc, evt):
+        """
+        Returns false if we should stop writing for now
+        """
+        if self.disconnected or self._writeDisconnected:
+            return False
+        if rc == -_uring.ECANCELED:
+            return False
+        if rc < 0:
+            self.connectionLost(failure.Failure(
+                                error.ConnectionLost("write error -- %s (%s)" %
+                                    (errno.errorcode.get(-rc, 'unknown'), -rc))))
+            return False
+        else:
+            self.offset += rc
+            # If there is nothing left to send,
+            if self.offset == len(self.dataBuffer) and not self._tempDataLen:
+                self.dataBuffer = ""
+                self.offset = 0
+                # stop writing
+                self.stopWriting()
+                # If I've got a producer who is supposed to supply me with data
+                if self.producer is not None and ((not self.streamingProducer)
+                                                  or self.producerPaused):
+                    # tell them to supply some more.
+                    self.producerPaused = True
+                    self.producer.resumeProducing()
+                elif self.disconnecting:
+                    # But if I was previously asked to let the connection die,
+                    # do so.
+                    self.connectionLost(failure.Failure(main.CONNECTION_DONE))
+                elif self._writeDisconnecting:
+                    # I was previously asked to to half-close the connection.
+                    self._writeDisconnected = True
+                    self._closeWriteConnection()
+                return False
+            else:
+                return True
+
+
+    def doWrite(self):
+        if len(self.dataBuffer) - self.offset < self.SEND_LIMIT:
+            # If there is currently less than SEND_LIMIT bytes left to send
+            # in the string, extend it with the queued data.
+            self._tempDataBuffer.appendleft(self.dataBuffer[self.offset:])
+            self.dataBuffer = "".join(self._tempDataBuffer)
+            self.offset = 0
+            self._tempDataBuffer.clear()
+            self._tempDataLen = 0
+
+        if not self.dataBuffer:
+            # Nothing to send; finish up as if an empty write completed.
+            self._handleWrite(0, None)
+            return
+
+        self._writeEvent = evt = _uring.Event(self._cbWrite, self)
+        self.writeToHandle(
+            self.dataBuffer, self.offset,
+            min(len(self.dataBuffer) - self.offset, self.SEND_LIMIT), evt)
+
+
+    def writeToHandle(self, data, offset, size, evt):
+        raise NotImplementedError()
+
+
+    def write(self, data):
+        """Reliably write some data.
+
+        The data is buffered until his file descriptor is ready for writing.
+        """
+        if isinstance(data, unicode): # no, really, I mean it
+            raise TypeError("Data must not be unicode")
+        if not self.connected or self._writeDisconnected:
+            return
+        if data:
+            self._tempDataBuffer.append(data)
+            self._tempDataLen += len(data)
+            if self.producer is not None and self.streamingProducer:
+                if (len(self.dataBuffer) + self._tempDataLen
+                    > self.writeBufferSize):
+                    self.producerPaused = True
+                    self.producer.pauseProducing()
+            self.startWriting()
+
+
+    def writeSequence(self, iovec):
+        for i in iovec:
+            if isinstance(i, unicode): # no, really, I mean it
+                raise TypeError("Data must not be unicode")
+        if not self.connected or not iovec or self._writeDisconnected:
+            return
+        self._tempDataBuffer.extend(iovec)
+        for i in iovec:
+            self._tempDataLen += len(i)
+        if self.producer is not None and self.streamingProducer:
+            if len(self.dataBuffer) + self._tempDataLen > self.writeBufferSize:
+                self.producerPaused = True
+                self.producer.pauseProducing()
+        self.startWriting()
+
+
+    # general stuff
+    connected = False
+    disconnected = False
+    disconnecting = False
+    logstr = "Uninitialized"
+
+    SEND_LIMIT = 128*1024
+
+
+    def __init__(self, reactor = None):
+        if not reactor:
+            from twisted.internet import reactor
+        self.reactor = reactor
+        self._tempDataBuffer = deque() # will be added to dataBuffer in doWrite
+        self._tempDataLen = 0
+
+
+    def connectionLost(self, reason):
+        """
+        The connection was lost.
+
+        This is called when the connection on a selectable object has been
+        lost.  It will be called whether the connection was closed explicitly,
+        an exception occurred in an event handler, or the other end of the
+        connection closed it first.
+
+        Clean up state here, but make sure to call back up to FileHandle.
+        """
+
+        self.disconnected = True
+        self.connected = False
+        if self.producer is not None:
+            self.producer.stopProducing()
+            self.producer = None
+        self.stopReading()
+        self.stopWriting()
+        self._cancelOperations()
+        self.reactor.removeActiveHandle(self)
+
+
+    def _cancelOperations(self):
+        """
+        Cancel the read and write in progress, if any, so that the kernel
+        lets go of the handle before it is closed.
+        """
+        events = [evt for evt in (self._readEvent, self._writeEvent)
+                  if evt is not None]
+        for evt in events:
+            self.reactor.cancelOperation(evt, flush=evt is events[-1])
+
+
+    def getFileHandle(self):
+        return -1
+
+
+    def fileno(self):
+        """
+        Return the file descriptor of the handle, so that it can be given to
+        the methods of L{interfaces.IReactorFDSet}.
+        """
+        return self.getFileHandle()
+
+
+    def loseConnection(self, _connDone=failure.Failure(main.CONNECTION_DONE)):
+        """
+        Close the connection at the next available opportunity.
+
+        Call this to cause this FileHandle to lose its connection.  It will
+        first write any data that it has buffered.
+
+        If there is data buffered yet to be written, this method will cause the
+        transport to lose its connection as soon as it's done flushing its
+        write buffer.  If you have a producer registered, the connection won't
+        be closed until the producer is finished. Therefore, make sure you
+        unregister your producer when it's finished, or the connection will
+        never close.
+        """
+
+        if self.connected and not self.disconnecting:
+            if self._writeDisconnected:
+                # doWrite won't trigger the connection close anymore
+                self.stopReading()
+                self.stopWriting()
+                self.connectionLost(_connDone)
+            else:
+                self.stopReading()
+                self.startWriting()
+                self.disconnecting = 1
+
+
+    # Producer/consumer implementation
+
+    def stopConsuming(self):
+        """
+        Stop consuming data.
+
+        This is called when a producer has lost its connection, to tell the
+        consumer to go lose its connection (and break potential circular
+        references).
+        """
+        self.unregisterProducer()
+        self.loseConnection()
+
+
+    # producer interface implementation
+
+    def resumeProducing(self):
+        assert self.connected and not self.disconnecting
+        self.startReading()
+
+
+    def pauseProducing(self):
+        self.stopReading()
+
+
+    def stopProducing(self):
+        self.loseConnection()
+
+
+__all__ = ['FileHandle']
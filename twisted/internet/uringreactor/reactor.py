@@ -0,0 +1,336 @@
+# -*- test-case-name: twisted.internet.test.test_uringreactor -*-
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Reactor that uses Linux io_uring completion queues.
+
+TCP and UDP sockets are serviced by accept, connect, recv and send
+operations, which are started on the reactor's L{uringsupport.Ring} and all
+submitted to the kernel, together with the wait for completions, with one
+system call per iteration.  Every other file descriptor added with
+L{IReactorFDSet} is watched with a one-shot poll operation on the same ring.
+"""
+
+import socket, sys
+from select import POLLIN, POLLOUT, POLLHUP, POLLERR, POLLNVAL
+
+from zope.interface import implements
+
+from twisted.internet import posixbase, main, fdesc, error
+from twisted.internet.interfaces import IReactorFDSet
+from twisted.python import log, failure
+
+from twisted.internet.uringreactor import uringsupport as _uring
+from twisted.internet.uringreactor import abstract, tcp, udp
+
+
+
+class URingReactor(posixbase.PosixReactorBase, posixbase._PollLikeMixin):
+    """
+    A reactor that uses io_uring(7).
+
+    @ivar ring: The L{_uring.Ring} every operation is started on.
+
+    @ivar handles: A C{set} of the L{abstract.FileHandle}s and ports which
+        have operations in progress or scheduled.
+
+    @ivar _selectables: A dictionary mapping integer file descriptors to
+        the L{IReadDescriptor}s and L{IWriteDescriptor}s which have been added
+        for them.
+
+    @ivar _reads: A dictionary mapping integer file descriptors to arbitrary
+        values (this is essentially a set) of descriptors which are read
+        from.
+
+    @ivar _writes: A dictionary mapping integer file descriptors to arbitrary
+        values (this is essentially a set) of descriptors which are written
+        to.
+
+    @ivar _polls: A dictionary mapping integer file descriptors to the
+        L{_uring.Event} of the poll in progress for them.
+    """
+    implements(IReactorFDSet)
+
+    _POLL_DISCONNECTED = (POLLHUP | POLLERR | POLLNVAL)
+    _POLL_IN = POLLIN
+    _POLL_OUT = POLLOUT
+
+    def __init__(self):
+        self.ring = _uring.Ring()
+        self.handles = set()
+        self._selectables = {}
+        self._reads = {}
+        self._writes = {}
+        self._polls = {}
+        posixbase.PosixReactorBase.__init__(self)
+
+
+    def addActiveHandle(self, handle):
+        self.handles.add(handle)
+
+
+    def removeActiveHandle(self, handle):
+        self.handles.discard(handle)
+
+
+    def cancelOperation(self, evt, flush=False):
+        """
+        Cancel the operation started with C{evt}.
+
+        @param flush: If true, submit the cancellation straight away rather
+            than with the next iteration, so that the kernel has let go of
+            the file descriptor the operation was using when this returns.
+        """
+        self.ring.cancel(evt)
+        if flush:
+            self.ring.flush()
+
+
+    def createSocket(self, af, stype):
+        skt = socket.socket(af, stype)
+        skt.setblocking(0)
+        fdesc._setCloseOnExec(skt.fileno())
+        return skt
+
+
+    def doIteration(self, timeout):
+        """
+        Submit the operations started since the last iteration, wait for
+        some to complete and call their callbacks.
+        """
+        for rc, evt in self.ring.submit(timeout):
+            if getattr(evt.owner, 'logPrefix', None) is None:
+                # Not every IReadDescriptor or IWriteDescriptor is a
+                # log owner.
+                self._callEventCallback(rc, evt)
+            else:
+                log.callWithLogger(evt.owner, self._callEventCallback, rc, evt)
+
+
+    def _callEventCallback(self, rc, evt):
+        try:
+            evt.callback(rc, evt)
+        except:
+            why = sys.exc_info()[1]
+            log.err()
+            evt.owner.loseConnection(failure.Failure(why))
+
+
+    def _updateRegistration(self, fd):
+        """
+        Start, replace or cancel the poll for C{fd} so that it matches the
+        events it is being read from and written to for.
+        """
+        mask = 0
+        if fd in self._reads:
+            mask |= POLLIN
+        if fd in self._writes:
+            mask |= POLLOUT
+        evt = self._polls.get(fd)
+        if evt is not None:
+            if mask and evt.mask & mask == mask:
+                # The poll in progress covers all of the events; any which
+                # are no longer wanted are ignored when it completes.
+                return
+            del self._polls[fd]
+            self.cancelOperation(evt, flush=not mask)
+        if mask:
+            evt = _uring.Event(self._cbPoll, self._selectables[fd])
+            evt.fd = fd
+            evt.mask = mask
+            self._polls[fd] = evt
+            self.ring.poll(fd, mask, evt)
+        else:
+            self._selectables.pop(fd, None)
+
+
+    def _cbPoll(self, rc, evt):
+        fd = evt.fd
+        if self._polls.get(fd) is not evt:
+            # It was cancelled or replaced by another poll.
+            return
+        del self._polls[fd]
+        if rc < 0:
+            event = POLLNVAL
+        else:
+            event = rc
+        wanted = self._POLL_DISCONNECTED
+        if fd in self._reads:
+            wanted |= POLLIN
+        if fd in self._writes:
+            wanted |= POLLOUT
+        if event & wanted:
+            self._doReadOrWrite(evt.owner, fd, event & wanted)
+        if fd not in self._polls:
+            self._updateRegistration(fd)
+
+
+    def _dictRemove(self, selectable, mdict):
+        try:
+            # the easy way
+            fd = selectable.fileno()
+            # make sure the fd is actually real.  In some situations we can get
+            # -1 here.
+            mdict[fd]
+        except:
+            # the hard way: necessary because fileno() may disappear at any
+            # moment, thanks to python's underlying sockets impl
+            for fd, fdes in self._selectables.items():
+                if selectable is fdes:
+                    break
+            else:
+                # Hmm, maybe not the right course of action?  This method can't
+                # fail, because it happens inside error detection...
+                return
+        if fd in mdict:
+            del mdict[fd]
+            self._updateRegistration(fd)
+
+
+    def addReader(self, reader):
+        """
+        Add a FileDescriptor for notification of data available to read.
+
+        An L{abstract.FileHandle} reads with operations of its own, so adding
+        one starts it reading instead.
+        """
+        if isinstance(reader, abstract.FileHandle):
+            reader.startReading()
+            return
+        fd = reader.fileno()
+        if fd not in self._reads:
+            self._selectables[fd] = reader
+            self._reads[fd] = 1
+            self._updateRegistration(fd)
+
+
+    def addWriter(self, writer):
+        """
+        Add a FileDescriptor for notification of data available to write.
+
+        An L{abstract.FileHandle} is started writing instead.
+        """
+        if isinstance(writer, abstract.FileHandle):
+            writer.startWriting()
+            return
+        fd = writer.fileno()
+        if fd not in self._writes:
+            self._selectables[fd] = writer
+            self._writes[fd] = 1
+            self._updateRegistration(fd)
+
+
+    def removeReader(self, reader):
+        """
+        Remove a Selectable for notification of data available to read.
+
+        An L{abstract.FileHandle} is stopped reading instead, and its read in
+        progress is cancelled, so that the file descriptor can be handed to
+        something else, as with L{adoptStreamConnection}.
+        """
+        if isinstance(reader, abstract.FileHandle):
+            reader._cancelRead()
+            return
+        return self._dictRemove(reader, self._reads)
+
+
+    def removeWriter(self, writer):
+        """
+        Remove a Selectable for notification of data available to write.
+
+        An L{abstract.FileHandle} is stopped writing instead.
+        """
+        if isinstance(writer, abstract.FileHandle):
+            writer.stopWriting()
+            return
+        return self._dictRemove(writer, self._writes)
+
+
+    def removeAll(self):
+        """
+        Remove all selectables and active handles, and return a list of them.
+        """
+        removed = self._removeAll(
+            [self._selectables[fd] for fd in self._reads],
+            [self._selectables[fd] for fd in self._writes])
+        handles = list(self.handles)
+        self.handles.clear()
+        return removed + handles
+
+
+    def getReaders(self):
+        return [self._selectables[fd] for fd in self._reads]
+
+
+    def getWriters(self):
+        return [self._selectables[fd] for fd in self._writes]
+
+
+    def listenTCP(self, port, factory, backlog=50, interface='',
+                  reuseport=False):
+        """
+        @see: twisted.internet.interfaces.IReactorTCP.listenTCP
+        """
+        p = tcp.Port(port, factory, backlog, interface, self, reuseport)
+        p.startListening()
+        return p
+
+
+    def connectTCP(self, host, port, factory, timeout=30, bindAddress=None):
+        """
+        @see: twisted.internet.interfaces.IReactorTCP.connectTCP
+        """
+        c = tcp.Connector(host, port, factory, timeout, bindAddress, self)
+        c.connect()
+        return c
+
+
+    def adoptStreamConnection(self, fileDescriptor, addressFamily, factory):
+        """
+        @see:
+            L{twisted.internet.interfaces.IReactorSocket.adoptStreamConnection}
+        """
+        if addressFamily not in (socket.AF_INET, socket.AF_INET6):
+            raise error.UnsupportedAddressFamily(addressFamily)
+
+        return tcp.Server._fromConnectedSocket(
+            fileDescriptor, addressFamily, factory, self)
+
+
+    def listenUDP(self, port, protocol, interface='', maxPacketSize=8192):
+        """
+        Connects a given L{DatagramProtocol} to the given numeric UDP port.
+
+        @returns: object conforming to L{IListeningPort}.
+        """
+        p = udp.Port(port, protocol, interface, maxPacketSize, self)
+        p.startListening()
+        return p
+
+
+    def listenMulticast(self, port, protocol, interface='', maxPacketSize=8192,
+                        listenMultiple=False):
+        """
+        Connects a given DatagramProtocol to the given numeric UDP port.
+
+        EXPERIMENTAL.
+
+        @returns: object conforming to IListeningPort.
+        """
+        p = udp.MulticastPort(port, protocol, interface, maxPacketSize, self,
+                              listenMultiple)
+        p.startListening()
+        return p
+
+
+
+def install():
+    """
+    Install the io_uring reactor.
+    """
+    r = URingReactor()
+    main.installReactor(r)
+
+
+__all__ = ['URingReactor', 'install']
@@ -0,0 +1,615 @@
+# -*- test-case-name: twisted.internet.test.test_uringreactor -*-
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Very low-level ctypes-based interface to Linux io_uring(7).
+
+Operations are described by submission queue entries which are only handed
+to the kernel, all together, the next time L{Ring.submit} is called.  Each
+one completes later with an entry on the completion queue, which
+L{Ring.submit} returns along with the L{Event} the operation was started
+with.
+
+ctypes and Linux 5.11 or newer are required.
+"""
+
+import os
+import errno
+import socket
+import struct
+import ctypes
+import ctypes.util
+
+
+# Operations.
+IORING_OP_POLL_ADD = 6
+IORING_OP_RECVMSG = 10
+IORING_OP_ACCEPT = 13
+IORING_OP_ASYNC_CANCEL = 14
+IORING_OP_CONNECT = 16
+IORING_OP_SEND = 26
+IORING_OP_RECV = 27
+
+# Flags for io_uring_setup.
+IORING_SETUP_CQSIZE = 1 << 3
+
+# Features reported by io_uring_setup.
+IORING_FEAT_SINGLE_MMAP = 1 << 0
+IORING_FEAT_NODROP = 1 << 1
+IORING_FEAT_EXT_ARG = 1 << 8
+
+# Flags for io_uring_enter.
+IORING_ENTER_GETEVENTS = 1 << 0
+IORING_ENTER_EXT_ARG = 1 << 3
+
+# Offsets to mmap the rings at.
+IORING_OFF_SQ_RING = 0
+IORING_OFF_SQES = 0x10000000
+
+# System call numbers, which are the same on every architecture.
+SYS_io_uring_setup = 425
+SYS_io_uring_enter = 426
+
+MSG_NOSIGNAL = 0x4000
+# Python 2's errno module does not define ECANCELED.
+ECANCELED = getattr(errno, 'ECANCELED', 125)
+SOCK_CLOEXEC = 02000000
+
+PROT_READ = 0x1
+PROT_WRITE = 0x2
+MAP_SHARED = 0x01
+MAP_POPULATE = 0x08000
+
+
+
+class URingError(Exception):
+    """
+    An io_uring instance could not be created or used.
+    """
+
+
+
+class _SQRingOffsets(ctypes.Structure):
+    _fields_ = [
+        ("head", ctypes.c_uint32),
+        ("tail", ctypes.c_uint32),
+        ("ring_mask", ctypes.c_uint32),
+        ("ring_entries", ctypes.c_uint32),
+        ("flags", ctypes.c_uint32),
+        ("dropped", ctypes.c_uint32),
+        ("array", ctypes.c_uint32),
+        ("resv1", ctypes.c_uint32),
+        ("user_addr", ctypes.c_uint64)]
+
+
+
+class _CQRingOffsets(ctypes.Structure):
+    _fields_ = [
+        ("head", ctypes.c_uint32),
+        ("tail", ctypes.c_uint32),
+        ("ring_mask", ctypes.c_uint32),
+        ("ring_entries", ctypes.c_uint32),
+        ("overflow", ctypes.c_uint32),
+        ("cqes", ctypes.c_uint32),
+        ("flags", ctypes.c_uint32),
+        ("resv1", ctypes.c_uint32),
+        ("user_addr", ctypes.c_uint64)]
+
+
+
+class _Params(ctypes.Structure):
+    _fields_ = [
+        ("sq_entries", ctypes.c_uint32),
+        ("cq_entries", ctypes.c_uint32),
+        ("flags", ctypes.c_uint32),
+        ("sq_thread_cpu", ctypes.c_uint32),
+        ("sq_thread_idle", ctypes.c_uint32),
+        ("features", ctypes.c_uint32),
+        ("wq_fd", ctypes.c_uint32),
+        ("resv", ctypes.c_uint32 * 3),
+        ("sq_off", _SQRingOffsets),
+        ("cq_off", _CQRingOffsets)]
+
+
+
+class _SQE(ctypes.Structure):
+    _fields_ = [
+        ("opcode", ctypes.c_uint8),
+        ("flags", ctypes.c_uint8),
+        ("ioprio", ctypes.c_uint16),
+        ("fd", ctypes.c_int32),
+        ("off", ctypes.c_uint64),
+        ("addr", ctypes.c_uint64),
+        ("len", ctypes.c_uint32),
+        ("op_flags", ctypes.c_uint32),
+        ("user_data", ctypes.c_uint64),
+        ("buf_index", ctypes.c_uint16),
+        ("personality", ctypes.c_uint16),
+        ("splice_fd_in", ctypes.c_int32),
+        ("addr3", ctypes.c_uint64),
+        ("pad", ctypes.c_uint64)]
+
+
+
+class _CQE(ctypes.Structure):
+    _fields_ = [
+        ("user_data", ctypes.c_uint64),
+        ("res", ctypes.c_int32),
+        ("flags", ctypes.c_uint32)]
+
+
+
+class _Timespec(ctypes.Structure):
+    _fields_ = [
+        ("tv_sec", ctypes.c_int64),
+        ("tv_nsec", ctypes.c_int64)]
+
+
+
+class _GetEventsArg(ctypes.Structure):
+    _fields_ = [
+        ("sigmask", ctypes.c_uint64),
+        ("sigmask_sz", ctypes.c_uint32),
+        ("pad", ctypes.c_uint32),
+        ("ts", ctypes.c_uint64)]
+
+
+
+class _IOVec(ctypes.Structure):
+    _fields_ = [
+        ("iov_base", ctypes.c_void_p),
+        ("iov_len", ctypes.c_size_t)]
+
+
+
+class _MsgHdr(ctypes.Structure):
+    _fields_ = [
+        ("msg_name", ctypes.c_void_p),
+        ("msg_namelen", ctypes.c_uint32),
+        ("msg_iov", ctypes.POINTER(_IOVec)),
+        ("msg_iovlen", ctypes.c_size_t),
+        ("msg_control", ctypes.c_void_p),
+        ("msg_controllen", ctypes.c_size_t),
+        ("msg_flags", ctypes.c_int)]
+
+
+
+# Big enough for a struct sockaddr_in6.
+MAX_ADDR_LEN = 28
+
+
+
+def AllocateReadBuffer(size):
+    """
+    Allocate a buffer for the kernel to read into.
+    """
+    return ctypes.create_string_buffer(size)
+
+
+
+def _address(buff):
+    """
+    Return the address of the first byte of C{buff}, a C{str} or a ctypes
+    object.
+    """
+    if isinstance(buff, str):
+        return ctypes.cast(ctypes.c_char_p(buff), ctypes.c_void_p).value
+    return ctypes.addressof(buff)
+
+
+
+def makesockaddr(family, address):
+    """
+    Pack an address, as accepted by C{socket.connect}, into a ctypes buffer
+    holding a C{struct sockaddr}.
+
+    @return: A two-tuple of the buffer and the length of the address in it.
+    """
+    if family == socket.AF_INET:
+        host, port = address[:2]
+        packed = struct.pack("=H", family) + struct.pack(
+            "!H4s8x", port, socket.inet_pton(family, host))
+    elif family == socket.AF_INET6:
+        host, port, flowinfo, scopeid = (tuple(address) + (0, 0))[:4]
+        # getaddrinfo leaves the scope in the host as well as in scopeid.
+        host = host.split('%', 1)[0]
+        packed = struct.pack("=H", family) + struct.pack(
+            "!HI16s", port, flowinfo, socket.inet_pton(family, host)) + (
+            struct.pack("=I", scopeid))
+    else:
+        raise ValueError("Unsupported address family %r" % (family,))
+    buff = ctypes.create_string_buffer(packed, MAX_ADDR_LEN)
+    return buff, len(packed)
+
+
+
+def parsesockaddr(buff):
+    """
+    Unpack the C{struct sockaddr} in a buffer filled by the kernel into an
+    address like those returned by C{socket.getpeername}.
+    """
+    raw = ctypes.string_at(ctypes.addressof(buff), MAX_ADDR_LEN)
+    family, = struct.unpack("=H", raw[:2])
+    if family == socket.AF_INET:
+        port, host = struct.unpack("!H4s", raw[2:8])
+        return (socket.inet_ntop(family, host), port)
+    elif family == socket.AF_INET6:
+        port, flowinfo, host = struct.unpack("!HI16s", raw[2:24])
+        scopeid, = struct.unpack("=I", raw[24:28])
+        host = socket.inet_ntop(family, host)
+        if scopeid:
+            # Name the scope in the host, as socket.getpeername does.
+            host = socket.getnameinfo(
+                (host, port, flowinfo, scopeid),
+                socket.NI_NUMERICHOST | socket.NI_NUMERICSERV)[0]
+        return (host, port, flowinfo, scopeid)
+    raise ValueError("Unsupported address family %r" % (family,))
+
+
+
+class Event(object):
+    """
+    An operation submitted to a L{Ring}.
+
+    Anything which must stay alive until the operation completes, like the
+    buffer it reads into, should be set as an attribute of its L{Event}.
+
+    @ivar callback: Called with the result of the operation, a non-negative
+        C{int} on success or a negated errno value on failure, and the
+        L{Event}.
+
+    @ivar owner: The object the operation was started for, used as the
+        logging context while C{callback} runs.
+    """
+
+    def __init__(self, callback, owner):
+        self.callback = callback
+        self.owner = owner
+
+
+
+class _RingMemory(object):
+    """
+    The file descriptor and memory mappings of an io_uring instance, which are
+    released when this object is garbage collected.
+
+    This is kept apart from L{Ring} so that it holds no references to the
+    events and their owners, and so can never be part of a reference cycle.
+    """
+    fd = -1
+    mappings = ()
+
+    def __init__(self, fd):
+        self.fd = fd
+        self.mappings = []
+
+
+    def map(self, size, offset):
+        """
+        Map C{size} bytes of the ring at C{offset} and return their address.
+        """
+        address = libc.mmap(None, size, PROT_READ | PROT_WRITE,
+                            MAP_SHARED | MAP_POPULATE, self.fd, offset)
+        if address in (None, ctypes.c_void_p(-1).value):
+            raise URingError(os.strerror(ctypes.get_errno()))
+        self.mappings.append((address, size))
+        return address
+
+
+    def close(self):
+        """
+        Unmap the rings and close the file descriptor, which cancels any
+        operations still in progress.
+        """
+        for address, size in self.mappings:
+            libc.munmap(address, size)
+        self.mappings = []
+        if self.fd != -1:
+            os.close(self.fd)
+            self.fd = -1
+
+    __del__ = close
+
+
+
+class Ring(object):
+    """
+    An io_uring instance.
+
+    @ivar pending: The number of operations prepared since the last call to
+        L{submit}.
+
+    @ivar _events: A C{dict} mapping the C{user_data} of every operation in
+        progress to its L{Event}.
+    """
+
+    def __init__(self, entries=1024, completions=8192):
+        params = _Params()
+        params.flags = IORING_SETUP_CQSIZE
+        params.cq_entries = completions
+        fd = libc.syscall(SYS_io_uring_setup, ctypes.c_long(entries),
+                          ctypes.byref(params))
+        if fd < 0:
+            raise URingError(os.strerror(ctypes.get_errno()))
+        self._memory = memory = _RingMemory(fd)
+        required = (IORING_FEAT_SINGLE_MMAP | IORING_FEAT_NODROP |
+                    IORING_FEAT_EXT_ARG)
+        if params.features & required != required:
+            memory.close()
+            raise URingError("Linux 5.11 or newer is required")
+
+        sqOff = params.sq_off
+        cqOff = params.cq_off
+        size = max(sqOff.array + params.sq_entries * 4,
+                   cqOff.cqes + params.cq_entries * ctypes.sizeof(_CQE))
+        ring = memory.map(size, IORING_OFF_SQ_RING)
+        sqes = memory.map(params.sq_entries * ctypes.sizeof(_SQE),
+                          IORING_OFF_SQES)
+
+        u32 = ctypes.c_uint32
+        self._sqHead = u32.from_address(ring + sqOff.head)
+        self._sqTail = u32.from_address(ring + sqOff.tail)
+        self._sqMask = u32.from_address(ring + sqOff.ring_mask).value
+        self._sqEntries = params.sq_entries
+        self._sqArray = (u32 * params.sq_entries).from_address(
+            ring + sqOff.array)
+        self._sqes = (_SQE * params.sq_entries).from_address(sqes)
+        self._cqHead = u32.from_address(ring + cqOff.head)
+        self._cqTail = u32.from_address(ring + cqOff.tail)
+        self._cqMask = u32.from_address(ring + cqOff.ring_mask).value
+        self._cqes = (_CQE * params.cq_entries).from_address(
+            ring + cqOff.cqes)
+
+        self._timespec = _Timespec()
+        self._arg = _GetEventsArg()
+        self._arg.ts = ctypes.addressof(self._timespec)
+        self._argSize = ctypes.sizeof(self._arg)
+
+        self._events = {}
+        self._nextToken = 1
+        self.pending = 0
+
+
+    def fileno(self):
+        """
+        Return the file descriptor of the io_uring instance.
+        """
+        return self._memory.fd
+
+
+    def close(self):
+        """
+        Close the io_uring instance, cancelling every operation in progress.
+        """
+        self._memory.close()
+        self._events.clear()
+
+
+    def _enter(self, toSubmit, minComplete, flags, arg):
+        """
+        Call io_uring_enter, retrying if it is interrupted.
+
+        @return: The number of operations submitted, or C{None} if a signal
+            interrupted a wait for completions.
+        """
+        # syscall(2) is variadic, so every argument is passed as a full
+        # register width value; the kernel reads the last one as a size_t.
+        long = ctypes.c_long
+        while True:
+            result = libc.syscall(
+                SYS_io_uring_enter, long(self._memory.fd), long(toSubmit),
+                long(minComplete), long(flags), ctypes.c_void_p(arg),
+                long(self._argSize if arg else 0))
+            if result >= 0:
+                return result
+            err = ctypes.get_errno()
+            if err == errno.EINTR:
+                if minComplete:
+                    return None
+            elif err == errno.ETIME:
+                return 0
+            elif err in (errno.EAGAIN, errno.EBUSY):
+                # The completion queue is full; completions must be reaped
+                # before anything more is submitted.
+                return 0
+            else:
+                raise OSError(err, os.strerror(err))
+
+
+    def _prepare(self, opcode, fd, evt):
+        """
+        Claim the next submission queue entry, submitting every entry
+        prepared so far first if the queue is full.
+        """
+        if self.pending == self._sqEntries:
+            self.flush()
+            if self.pending == self._sqEntries:
+                raise URingError("Submission queue is full")
+        tail = self._sqTail.value
+        index = tail & self._sqMask
+        sqe = self._sqes[index]
+        ctypes.memset(ctypes.addressof(sqe), 0, ctypes.sizeof(_SQE))
+        sqe.opcode = opcode
+        sqe.fd = fd
+        if evt is not None:
+            token = self._nextToken
+            self._nextToken += 1
+            self._events[token] = evt
+            evt.token = token
+            sqe.user_data = token
+        self._sqArray[index] = index
+        self._sqTail.value = (tail + 1) & 0xffffffff
+        self.pending += 1
+        return sqe
+
+
+    def flush(self):
+        """
+        Submit every prepared operation without waiting for any to complete.
+        """
+        if self.pending:
+            self.pending -= self._enter(self.pending, 0, 0, None)
+
+
+    def submit(self, timeout=None):
+        """
+        Submit every prepared operation, wait up to C{timeout} seconds for at
+        least one operation to complete, and return the completed operations.
+
+        @param timeout: The longest time to wait, in seconds, or C{None} to
+            wait indefinitely.
+
+        @return: A C{list} of two-tuples of the result and L{Event} of each
+            completed operation.
+        """
+        if timeout is None or timeout > 0:
+            flags = IORING_ENTER_GETEVENTS
+            arg = None
+            if timeout is not None:
+                seconds = int(timeout)
+                self._timespec.tv_sec = seconds
+                self._timespec.tv_nsec = int((timeout - seconds) * 1e9)
+                flags |= IORING_ENTER_EXT_ARG
+                arg = ctypes.addressof(self._arg)
+            if self._cqHead.value == self._cqTail.value:
+                submitted = self._enter(self.pending, 1, flags, arg)
+                if submitted:
+                    self.pending -= submitted
+        self.flush()
+        return self.reap()
+
+
+    def reap(self):
+        """
+        Return the operations which have completed, without submitting or
+        waiting.
+        """
+        completed = []
+        head = self._cqHead.value
+        tail = self._cqTail.value
+        mask = self._cqMask
+        cqes = self._cqes
+        events = self._events
+        while head != tail:
+            cqe = cqes[head & mask]
+            evt = events.pop(cqe.user_data, None)
+            if evt is not None:
+                completed.append((cqe.res, evt))
+            head = (head + 1) & 0xffffffff
+        self._cqHead.value = head
+        return completed
+
+
+    def poll(self, fd, mask, evt):
+        """
+        Wait for C{fd} to become ready for the poll(2) events in C{mask}.
+        The result is the events which occurred.
+        """
+        sqe = self._prepare(IORING_OP_POLL_ADD, fd, evt)
+        sqe.op_flags = mask
+
+
+    def recv(self, fd, buff, size, evt):
+        """
+        Receive up to C{size} bytes from the socket C{fd} into C{buff}.  The
+        result is the number of bytes received.
+        """
+        evt.buff = buff
+        sqe = self._prepare(IORING_OP_RECV, fd, evt)
+        sqe.addr = _address(buff)
+        sqe.len = size
+
+
+    def send(self, fd, data, offset, size, evt):
+        """
+        Send up to C{size} bytes of the C{str} C{data}, starting at
+        C{offset}, on the socket C{fd}.  The result is the number of bytes
+        sent.
+        """
+        evt.buff = data
+        sqe = self._prepare(IORING_OP_SEND, fd, evt)
+        sqe.addr = _address(data) + offset
+        sqe.len = size
+        sqe.op_flags = MSG_NOSIGNAL
+
+
+    def accept(self, fd, evt):
+        """
+        Accept a connection on the listening socket C{fd}.  The result is the
+        new file descriptor, which is closed on exec, and C{evt.addr_buff}
+        holds the address of the peer.
+        """
+        evt.addr_buff = AllocateReadBuffer(MAX_ADDR_LEN)
+        evt.addr_len_buff = ctypes.c_uint32(MAX_ADDR_LEN)
+        sqe = self._prepare(IORING_OP_ACCEPT, fd, evt)
+        sqe.addr = ctypes.addressof(evt.addr_buff)
+        sqe.off = ctypes.addressof(evt.addr_len_buff)
+        sqe.op_flags = SOCK_CLOEXEC
+
+
+    def connect(self, fd, family, address, evt):
+        """
+        Connect the socket C{fd} to C{address}.  The result is zero on
+        success.
+        """
+        evt.addr_buff, length = makesockaddr(family, address)
+        sqe = self._prepare(IORING_OP_CONNECT, fd, evt)
+        sqe.addr = ctypes.addressof(evt.addr_buff)
+        sqe.off = length
+
+
+    def recvfrom(self, fd, buff, size, evt):
+        """
+        Receive a datagram of up to C{size} bytes from the socket C{fd} into
+        C{buff}.  The result is the size of the datagram and
+        C{evt.addr_buff} holds the address it came from.
+        """
+        evt.buff = buff
+        evt.addr_buff = AllocateReadBuffer(MAX_ADDR_LEN)
+        evt.iovec = _IOVec(ctypes.addressof(buff), size)
+        evt.msghdr = msghdr = _MsgHdr()
+        msghdr.msg_name = ctypes.addressof(evt.addr_buff)
+        msghdr.msg_namelen = MAX_ADDR_LEN
+        msghdr.msg_iov = ctypes.pointer(evt.iovec)
+        msghdr.msg_iovlen = 1
+        sqe = self._prepare(IORING_OP_RECVMSG, fd, evt)
+        sqe.addr = ctypes.addressof(msghdr)
+        sqe.len = 1
+
+
+    def cancel(self, evt):
+        """
+        Cancel the operation started with C{evt}, if it is still in progress.
+        It completes with C{-ECANCELED} unless it had already completed.
+        """
+        token = getattr(evt, 'token', None)
+        if token in self._events:
+            sqe = self._prepare(IORING_OP_ASYNC_CANCEL, -1, None)
+            sqe.addr = token
+
+
+
+def initializeModule(libc):
+    """
+    Intialize the module, checking if the expected APIs exist and setting the
+    argtypes and restype for C{syscall}, C{mmap} and C{munmap}.
+    """
+    for function in ("syscall", "mmap", "munmap"):
+        if getattr(libc, function, None) is None:
+            raise ImportError("libc with %s needed" % (function,))
+    libc.syscall.restype = ctypes.c_long
+    libc.mmap.argtypes = [
+        ctypes.c_void_p, ctypes.c_size_t, ctypes.c_int, ctypes.c_int,
+        ctypes.c_int, ctypes.c_long]
+    libc.mmap.restype = ctypes.c_void_p
+    libc.munmap.argtypes = [ctypes.c_void_p, ctypes.c_size_t]
+    libc.munmap.restype = ctypes.c_int
+
+
+
+name = ctypes.util.find_library('c')
+if not name:
+    raise ImportError("Can't find C library.")
+libc = ctypes.CDLL(name, use_errno=True)
+initializeModule(libc)
@@ -61,13 +61,35 @@ def getSerial(filename = '/tmp/twisted-names.serial'):
 
 
 class FileAuthority(common.ResolverBase):
-    """An Authority that is loaded from a file."""
+    """
+    An Authority that is loaded from a file.
+
+    Lookups are answered from an index of the records, which is built the
+    first time the zone is queried after C{records} or C{soa} are replaced.
+
+    @ivar _reloadObservers: A C{list} of callables to call with no arguments
+        when the records of the zone are replaced.
+
+    @ivar _index: A C{dict} mapping each lowercased owner name in C{records}
+        to a C{dict} mapping record types to C{list}s of C{(ttl, record)}
+        tuples, in the order of C{records}.  The records of every type are
+        also listed under L{dns.ALL_RECORDS}.
+
+    @ivar _indexed: The C{(records, soa)} tuple C{_index} was built from.
+
+    @ivar _defaultTTL: The TTL of records which do not have their own, as
+        given by the I{SOA} record when C{_index} was built.
+    """
 
     soa = None
     records = None
+    filename = None
+    _reloadObservers = ()
+    _indexed = None
 
     def __init__(self, filename):
         common.ResolverBase.__init__(self)
+        self.filename = filename
         self.loadFile(filename)
         self._cache = {}
 
@@ -76,63 +98,172 @@ class FileAuthority(common.ResolverBase):
         self.__dict__ = state
 #        print 'setstate ', self.soa
 
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for name in ['_reloadObservers', '_index', '_indexed']:
+            state.pop(name, None)
+        return state
+
+
+    def addReloadObserver(self, observer):
+        """
+        Call C{observer} with no arguments whenever the records of this zone
+        are replaced, so that anything derived from them can be discarded.
+        """
+        self._reloadObservers = list(self._reloadObservers) + [observer]
+
+
+    def _zoneReloaded(self):
+        """
+        Tell the reload observers that the records of this zone have been
+        replaced.
+        """
+        for observer in self._reloadObservers:
+            observer()
+
+
+    def reload(self):
+        """
+        Load the zone from C{filename} again, replacing its records.
+        """
+        self.loadFile(self.filename)
+        self._zoneReloaded()
+
+
+    def applyDiff(self, removed, added):
+        """
+        Change some of the records of this zone, as an incremental zone
+        transfer would, keeping the index of the owners which are not
+        changed.
+
+        @param removed: A C{list} of C{(name, record)} tuples to remove from
+            C{records}.
+
+        @param added: A C{list} of C{(name, record)} tuples to add to
+            C{records}.  An I{SOA} record replaces C{soa}.
+        """
+        index = self._getIndex()
+        changed = set()
+        for name, record in removed:
+            name = name.lower()
+            owner = self.records.get(name, [])
+            if record in owner:
+                owner.remove(record)
+                if not owner:
+                    del self.records[name]
+                changed.add(name)
+        for name, record in added:
+            name = name.lower()
+            self.records.setdefault(name, []).append(record)
+            changed.add(name)
+            if record.TYPE == dns.SOA:
+                self.soa = (name, record)
+
+        if self._indexed[1] is not self.soa:
+            # The default TTL may have changed.
+            self._indexed = None
+        else:
+            for name in changed:
+                index.pop(name, None)
+                self._indexOwner(index, name, self.records.get(name))
+        self._zoneReloaded()
+
+
+    def _getIndex(self):
+        """
+        Return the index of the records of this zone, building it if
+        C{records} or C{soa} have been replaced since it was last built.
+        """
+        indexed = self._indexed
+        if (indexed is None or indexed[0] is not self.records
+            or indexed[1] is not self.soa):
+            self._defaultTTL = max(self.soa[1].minimum, self.soa[1].expire)
+            self._index = index = {}
+            for name, records in self.records.iteritems():
+                self._indexOwner(index, name.lower(), records)
+            self._indexed = (self.records, self.soa)
+        return self._index
+
+
+    def _indexOwner(self, index, name, records):
+        """
+        Add the records owned by C{name} to C{index}.
+        """
+        if not records:
+            return
+        owner = index[name] = {dns.ALL_RECORDS: []}
+        for record in records:
+            if record.ttl is not None:
+                ttl = record.ttl
+            else:
+                ttl = self._defaultTTL
+            entry = (ttl, record)
+            owner[dns.ALL_RECORDS].append(entry)
+            owner.setdefault(record.TYPE, []).append(entry)
+
+
     def _lookup(self, name, cls, type, timeout = None):
-        cnames = []
+        index = self._getIndex()
+        default_ttl = self._defaultTTL
+        lowerName = name.lower()
+
+        owner = index.get(lowerName)
+        if owner is None:
+            if lowerName.endswith(self.soa[0].lower()):
+                # We are the authority and we didn't find it.  Goodbye.
+                return defer.fail(failure.Failure(dns.AuthoritativeDomainError(name)))
+            return defer.fail(failure.Failure(dns.DomainError(name)))
+
         results = []
         authority = []
         additional = []
-        default_ttl = max(self.soa[1].minimum, self.soa[1].expire)
+        referral = lowerName != self.soa[0].lower()
 
-        domain_records = self.records.get(name.lower())
-
-        if domain_records:
-            for record in domain_records:
-                if record.ttl is not None:
-                    ttl = record.ttl
-                else:
-                    ttl = default_ttl
-
-                if record.TYPE == dns.NS and name.lower() != self.soa[0].lower():
-                    # NS record belong to a child zone: this is a referral.  As
-                    # NS records are authoritative in the child zone, ours here
-                    # are not.  RFC 2181, section 6.1.
-                    authority.append(
-                        dns.RRHeader(name, record.TYPE, dns.IN, ttl, record, auth=False)
-                    )
-                elif record.TYPE == type or type == dns.ALL_RECORDS:
-                    results.append(
-                        dns.RRHeader(name, record.TYPE, dns.IN, ttl, record, auth=True)
-                    )
-                if record.TYPE == dns.CNAME:
-                    cnames.append(
-                        dns.RRHeader(name, record.TYPE, dns.IN, ttl, record, auth=True)
-                    )
-            if not results:
-                results = cnames
-
-            for record in results + authority:
-                section = {dns.NS: additional, dns.CNAME: results, dns.MX: additional}.get(record.type)
-                if section is not None:
-                    n = str(record.payload.name)
-                    for rec in self.records.get(n.lower(), ()):
-                        if rec.TYPE == dns.A:
-                            section.append(
-                                dns.RRHeader(n, dns.A, dns.IN, rec.ttl or default_ttl, rec, auth=True)
-                            )
-
-            if not results and not authority:
-                # Empty response. Include SOA record to allow clients to cache
-                # this response.  RFC 1034, sections 3.7 and 4.3.4, and RFC 2181
-                # section 7.1.
+        if referral:
+            # NS record belong to a child zone: this is a referral.  As NS
+            # records are authoritative in the child zone, ours here are not.
+            # RFC 2181, section 6.1.
+            for ttl, record in owner.get(dns.NS, ()):
                 authority.append(
-                    dns.RRHeader(self.soa[0], dns.SOA, dns.IN, ttl, self.soa[1], auth=True)
-                    )
-            return defer.succeed((results, authority, additional))
+                    dns.RRHeader(name, record.TYPE, dns.IN, ttl, record, auth=False)
+                )
+        if type == dns.ALL_RECORDS:
+            matches = owner[dns.ALL_RECORDS]
+            if referral:
+                matches = [(ttl, record) for (ttl, record) in matches
+                           if record.TYPE != dns.NS]
+        elif referral and type == dns.NS:
+            matches = ()
         else:
-            if name.lower().endswith(self.soa[0].lower()):
-                # We are the authority and we didn't find it.  Goodbye.
-                return defer.fail(failure.Failure(dns.AuthoritativeDomainError(name)))
-            return defer.fail(failure.Failure(dns.DomainError(name)))
+            matches = owner.get(type, ())
+        if not matches:
+            matches = owner.get(dns.CNAME, ())
+        for ttl, record in matches:
+            results.append(
+                dns.RRHeader(name, record.TYPE, dns.IN, ttl, record, auth=True)
+            )
+
+        for record in results + authority:
+            section = {dns.NS: additional, dns.CNAME: results, dns.MX: additional}.get(record.type)
+            if section is not None:
+                n = str(record.payload.name)
+                target = index.get(n.lower())
+                if target is not None:
+                    for ttl, rec in target.get(dns.A, ()):
+                        section.append(
+                            dns.RRHeader(n, dns.A, dns.IN, rec.ttl or default_ttl, rec, auth=True)
+                        )
+
+        if not results and not authority:
+            # Empty response. Include SOA record to allow clients to cache
+            # this response.  RFC 1034, sections 3.7 and 4.3.4, and RFC 2181
+            # section 7.1.
+            ttl = owner[dns.ALL_RECORDS][-1][0]
+            authority.append(
+                dns.RRHeader(self.soa[0], dns.SOA, dns.IN, ttl, self.soa[1], auth=True)
+                )
+        return defer.succeed((results, authority, additional))
 
 
     def lookupZone(self, name, timeout = 10):
@@ -2,6 +2,9 @@
 # Copyright (c) Twisted Matrix Laboratories.
 # See LICENSE for details.
 
+import itertools
+from heapq import heappush, heappop, heapify
+
 from zope.interface import implements
 
 from twisted.names import dns, common
@@ -14,45 +17,135 @@ class CacheResolver(common.ResolverBase):
     """
     A resolver that serves records from a local, memory cache.
 
+    An entry expires when the smallest TTL of its records runs out, or, for
+    negative answers, as described in RFC 2308.  Expired entries are never
+    returned and are removed by a sweep, which a single delayed call
+    schedules for the earliest expiry.  When there are more than
+    C{maxEntries} entries, the least recently used ones are evicted.
+
     @ivar _reactor: A provider of L{interfaces.IReactorTime}.
+
+    @ivar maxEntries: The largest number of entries to keep, or C{None} to
+        keep all of them until they expire.
+
+    @ivar sweepInterval: The smallest number of seconds between two sweeps.
+
+    @ivar prefetchResolver: An L{interfaces.IResolver}, such as the upstream
+        L{twisted.names.client.Resolver}, which entries are refreshed from when
+        they are looked up shortly before they expire, or C{None} to let
+        entries expire.
+
+    @ivar prefetchWindow: The fraction of the lifetime of an entry, at its
+        end, during which lookups refresh it.
+
+    @ivar prefetchThreshold: The number of lookups an entry needs before it
+        is refreshed.
+
+    @ivar hits: The number of lookups answered from the cache.
+
+    @ivar misses: The number of lookups which found no unexpired entry.
+
+    @ivar evictions: The number of entries evicted to stay under
+        C{maxEntries}.
+
+    @ivar expirations: The number of entries removed because they expired.
+
+    @ivar prefetches: The number of entries refreshed from
+        C{prefetchResolver}.
+
+    @ivar _expires: A C{dict} mapping each cached L{dns.Query} to the time at
+        which its entry expires.
+
+    @ivar _expiryQueue: A heap of C{(expires, sequence, query)} tuples for the
+        sweep, which may include stale tuples for entries which have since
+        been replaced or removed.
+
+    @ivar _links: A C{dict} mapping each cached L{dns.Query} to its
+        C{[previous, next, query, lookups]} link in a circular list which
+        starts at C{_root}, ordered from the least to the most recently used.
+
+    @ivar _nameErrors: A C{set} of the queries whose entries record that the
+        name queried does not exist.
+
+    @ivar _prefetching: A C{set} of the queries being refreshed.
+
+    @ivar _sweepCall: The L{IDelayedCall} for the next sweep, or C{None}.
     """
 
     implements(interfaces.IResolver)
 
     cache = None
+    maxEntries = None
+    sweepInterval = 1
+    prefetchResolver = None
+    prefetchWindow = 0.1
+    prefetchThreshold = 3
+
+    hits = misses = evictions = expirations = prefetches = 0
 
-    def __init__(self, cache=None, verbose=0, reactor=None):
+    _sweepCall = None
+    _lastSweep = None
+
+    def __init__(self, cache=None, verbose=0, reactor=None, maxEntries=None,
+                 prefetchResolver=None):
         common.ResolverBase.__init__(self)
 
-        self.cache = {}
         self.verbose = verbose
-        self.cancel = {}
+        self.maxEntries = maxEntries
+        self.prefetchResolver = prefetchResolver
         if reactor is None:
             from twisted.internet import reactor
         self._reactor = reactor
+        self._reset()
 
         if cache:
             for query, (seconds, payload) in cache.items():
                 self.cacheResult(query, payload, seconds)
 
 
+    def _reset(self):
+        """
+        Forget every entry.
+        """
+        if self._sweepCall is not None and self._sweepCall.active():
+            self._sweepCall.cancel()
+        self._sweepCall = None
+        self.cache = {}
+        self._expires = {}
+        self._expiryQueue = []
+        self._sequence = itertools.count()
+        self._root = root = []
+        root[:] = [root, root, None, 0]
+        self._links = {}
+        self._nameErrors = set()
+        self._prefetching = set()
+
+
     def __setstate__(self, state):
         self.__dict__ = state
 
+        entries = self.cache
+        nameErrors = state.get('_nameErrors', ())
+        self._reset()
         now = self._reactor.seconds()
-        for (k, (when, (ans, add, ns))) in self.cache.items():
-            diff = now - when
-            for rec in ans + add + ns:
-                if rec.ttl < diff:
-                    del self.cache[k]
-                    break
+        for query, (when, payload) in entries.items():
+            if when + self._lifetime(payload) > now:
+                self._add(query, payload, when)
+                if query in nameErrors:
+                    self._nameErrors.add(query)
 
 
     def __getstate__(self):
-        for c in self.cancel.values():
-            c.cancel()
-        self.cancel.clear()
-        return self.__dict__
+        if self._sweepCall is not None and self._sweepCall.active():
+            self._sweepCall.cancel()
+        self._sweepCall = None
+        state = self.__dict__.copy()
+        # The order of use and the expiry queue are rebuilt from the entries
+        # when unpickling.
+        for name in ['_expires', '_expiryQueue', '_sequence', '_root',
+                     '_links', '_prefetching', '_sweepCall']:
+            state.pop(name, None)
+        return state
 
 
     def _lookup(self, name, cls, type, timeout):
@@ -61,26 +154,52 @@ class CacheResolver(common.ResolverBase):
         try:
             when, (ans, auth, add) = self.cache[q]
         except KeyError:
+            when = None
+        else:
+            expires = self._expires[q]
+            # Entries without any records have no TTL, and are served until
+            # the next sweep removes them.
+            if now > expires and (ans or auth or add):
+                self.clearEntry(q)
+                self.expirations += 1
+                when = None
+
+        if when is None:
+            self.misses += 1
             if self.verbose > 1:
                 log.msg('Cache miss for ' + repr(name))
             return defer.fail(failure.Failure(dns.DomainError(name)))
+
+        self.hits += 1
+        if self.verbose:
+            log.msg('Cache hit for ' + repr(name))
+        link = self._use(q)
+        link[3] += 1
+        if (self.prefetchResolver is not None
+            and link[3] >= self.prefetchThreshold
+            and q not in self._prefetching
+            and expires - now <= (expires - when) * self.prefetchWindow):
+            self._prefetch(q)
+
+        if q in self._nameErrors:
+            # This stops a ResolverChain from asking the resolvers after this
+            # one, as an authority for the name would.
+            return defer.fail(failure.Failure(
+                dns.AuthoritativeDomainError(name)))
+
+        diff = now - when
+        try:
+            result = (
+                [dns.RRHeader(str(r.name), r.type, r.cls, r.ttl - diff,
+                              r.payload) for r in ans],
+                [dns.RRHeader(str(r.name), r.type, r.cls, r.ttl - diff,
+                              r.payload) for r in auth],
+                [dns.RRHeader(str(r.name), r.type, r.cls, r.ttl - diff,
+                              r.payload) for r in add])
+        except ValueError:
+            return defer.fail(failure.Failure(dns.DomainError(name)))
         else:
-            if self.verbose:
-                log.msg('Cache hit for ' + repr(name))
-            diff = now - when
-
-            try:
-                result = (
-                    [dns.RRHeader(str(r.name), r.type, r.cls, r.ttl - diff,
-                                  r.payload) for r in ans],
-                    [dns.RRHeader(str(r.name), r.type, r.cls, r.ttl - diff,
-                                  r.payload) for r in auth],
-                    [dns.RRHeader(str(r.name), r.type, r.cls, r.ttl - diff,
-                                  r.payload) for r in add])
-            except ValueError:
-                return defer.fail(failure.Failure(dns.DomainError(name)))
-            else:
-                return defer.succeed(result)
+            return defer.succeed(result)
 
 
     def lookupAllRecords(self, name, timeout = None):
@@ -91,6 +210,10 @@ class CacheResolver(common.ResolverBase):
         """
         Cache a DNS entry.
 
+        An entry with no answers and an I{SOA} record in its authority section
+        is a negative answer, which is cached for no longer than the
+        I{MINIMUM} field of the I{SOA} record, as described in RFC 2308.
+
         @param query: a L{dns.Query} instance.
 
         @param payload: a 3-tuple of lists of L{dns.RRHeader} records, the
@@ -103,22 +226,190 @@ class CacheResolver(common.ResolverBase):
         if self.verbose > 1:
             log.msg('Adding %r to cache' % query)
 
-        self.cache[query] = (cacheTime or self._reactor.seconds(), payload)
+        self._nameErrors.discard(query)
+        self._add(query, payload, cacheTime)
+
+
+    def cacheNameError(self, query, authority, cacheTime=None):
+        """
+        Cache the answer that the name queried does not exist.
+
+        Until the entry expires, lookups for C{query} fail with
+        L{dns.AuthoritativeDomainError}.  As described in RFC 2308, the answer
+        is only cached if C{authority} includes an I{SOA} record, and for no
+        longer than the I{MINIMUM} field of the record.
+
+        @param query: a L{dns.Query} instance.
+
+        @param authority: A C{list} of the L{dns.RRHeader} records in the
+            authority section of the response.
+
+        @param cacheTime: The time (seconds since epoch) at which the entry is
+            considered to have been added to the cache. If C{None} is given,
+            the current time is used.
+        """
+        if not [r for r in authority if r.type == dns.SOA]:
+            return
+        if self.verbose > 1:
+            log.msg('Adding name error for %r to cache' % query)
+
+        self._add(query, ([], list(authority), []), cacheTime)
+        self._nameErrors.add(query)
 
-        if query in self.cancel:
-            self.cancel[query].cancel()
 
-        s = list(payload[0]) + list(payload[1]) + list(payload[2])
-        if s:
-            m = s[0].ttl
-            for r in s:
-                m = min(m, r.ttl)
+    def _lifetime(self, payload):
+        """
+        Return the number of seconds the entry C{payload} may be cached for.
+        """
+        ans, auth, add = payload
+        if not ans:
+            soas = [r for r in auth if r.type == dns.SOA]
+            if soas:
+                # RFC 2308, section 5
+                return min([min(r.ttl, getattr(r.payload, 'minimum', r.ttl))
+                            for r in soas])
+        ttls = [r.ttl for r in list(ans) + list(auth) + list(add)]
+        if ttls:
+            return min(ttls)
+        return 0
+
+
+    def _add(self, query, payload, cacheTime):
+        """
+        Store C{payload} as the entry for C{query}, evicting the least
+        recently used entries if there are too many.
+        """
+        when = cacheTime or self._reactor.seconds()
+        expires = when + self._lifetime(payload)
+        self.cache[query] = (when, payload)
+        self._expires[query] = expires
+
+        queue = self._expiryQueue
+        heappush(queue, (expires, self._sequence.next(), query))
+        if len(queue) > 2 * len(self._expires) + 100:
+            # Drop the stale tuples left by replaced and evicted entries.
+            queue[:] = [(e, self._sequence.next(), q)
+                        for (q, e) in self._expires.iteritems()]
+            heapify(queue)
+
+        if query in self._links:
+            self._use(query)[3] = 0
         else:
-            m = 0
+            root = self._root
+            last = root[0]
+            last[1] = root[0] = self._links[query] = [last, root, query, 0]
+
+        if self.maxEntries is not None:
+            root = self._root
+            while len(self.cache) > self.maxEntries:
+                self.clearEntry(root[1][2])
+                self.evictions += 1
 
-        self.cancel[query] = self._reactor.callLater(m, self.clearEntry, query)
+        self._scheduleSweep()
+
+
+    def _use(self, query):
+        """
+        Move the entry for C{query} to the most recently used end of the
+        list, and return its link.
+        """
+        link = self._links[query]
+        previous, next = link[0], link[1]
+        previous[1] = next
+        next[0] = previous
+        root = self._root
+        last = root[0]
+        last[1] = root[0] = link
+        link[0] = last
+        link[1] = root
+        return link
 
 
     def clearEntry(self, query):
+        """
+        Remove the entry for C{query} from the cache.
+        """
         del self.cache[query]
-        del self.cancel[query]
+        del self._expires[query]
+        self._nameErrors.discard(query)
+        previous, next = self._links.pop(query)[:2]
+        previous[1] = next
+        next[0] = previous
+
+
+    def _scheduleSweep(self):
+        """
+        Make sure a sweep is scheduled for the earliest expiry, or for
+        C{sweepInterval} seconds after the last sweep if that is later.
+        """
+        if not self._expiryQueue:
+            return
+        when = self._expiryQueue[0][0]
+        if self._lastSweep is not None:
+            when = max(when, self._lastSweep + self.sweepInterval)
+        call = self._sweepCall
+        if call is not None and call.active():
+            if call.getTime() <= when:
+                return
+            call.cancel()
+        self._sweepCall = self._reactor.callLater(
+            max(0, when - self._reactor.seconds()), self._sweep)
+
+
+    def _sweep(self):
+        """
+        Remove every entry which has expired, and schedule the next sweep.
+        """
+        self._sweepCall = None
+        now = self._lastSweep = self._reactor.seconds()
+        queue = self._expiryQueue
+        while queue and queue[0][0] <= now:
+            expires, sequence, query = heappop(queue)
+            if self._expires.get(query) == expires:
+                self.clearEntry(query)
+                self.expirations += 1
+        self._scheduleSweep()
+
+
+    def _prefetch(self, query):
+        """
+        Refresh the entry for C{query} from C{prefetchResolver}.
+        """
+        self._prefetching.add(query)
+        self.prefetches += 1
+        if self.verbose > 1:
+            log.msg('Prefetching %r' % (query,))
+
+        def cbPrefetched(result):
+            if result[0] or result[1] or result[2]:
+                self.cacheResult(query, result)
+
+        def ebPrefetched(reason):
+            if self.verbose:
+                log.msg('Prefetching %r failed: %s' % (
+                        query, reason.getErrorMessage()))
+
+        def prefetched(ignored):
+            self._prefetching.discard(query)
+
+        d = self.prefetchResolver.query(query)
+        d.addCallbacks(cbPrefetched, ebPrefetched)
+        d.addBoth(prefetched)
+
+
+    def getStats(self):
+        """
+        Return statistics about the use of this cache.
+
+        @return: A C{dict} with these keys:
+            - C{"entries"}: the number of entries cached.
+            - C{"hits"}, C{"misses"}, C{"evictions"}, C{"expirations"} and
+              C{"prefetches"}: the values of the attributes of the same
+              names.
+        """
+        return {"entries": len(self.cache),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "prefetches": self.prefetches}
@@ -45,6 +45,23 @@ class Resolver(common.ResolverBase):
     @ivar _reactor: A provider of L{IReactorTCP}, L{IReactorUDP}, and
         L{IReactorTime} which will be used to set up network resources and
         track timeouts.
+
+    @ivar udpPortPoolSize: The number of UDP ports, each bound to a random
+        port number, which are kept open and shared by queries.  If C{0},
+        every query is sent from a port of its own, which is closed once the
+        query completes.
+
+    @ivar udpPortQueries: The number of queries sent from each shared UDP
+        port before it is closed and replaced by one bound to another random
+        port number.
+
+    @ivar _udpPool: A C{list} of the shared L{dns.DNSDatagramProtocol}s which
+        new queries may be sent from, used in turn.
+
+    @ivar _udpUses: A C{dict} mapping each L{dns.DNSDatagramProtocol} with
+        queries outstanding, or in C{_udpPool}, to a two-element C{list} of the
+        number of further queries it may send and the number of its queries
+        which have not completed.
     """
     implements(interfaces.IResolver)
 
@@ -61,6 +78,9 @@ class Resolver(common.ResolverBase):
     _lastResolvTime = None
     _resolvReadInterval = 60
 
+    udpPortPoolSize = 0
+    udpPortQueries = 100
+
     def _getProtocol(self):
         getWarningMethod()(
             "Resolver.protocol is deprecated; use Resolver.queryUDP instead.",
@@ -126,6 +146,8 @@ class Resolver(common.ResolverBase):
         self.pending = []
 
         self._waiting = {}
+        self._udpPool = []
+        self._udpUses = {}
 
         self.maybeParseConfig()
 
@@ -134,6 +156,8 @@ class Resolver(common.ResolverBase):
         d = self.__dict__.copy()
         d['connections'] = []
         d['_parseCall'] = None
+        d['_udpPool'] = []
+        d['_udpUses'] = {}
         return d
 
 
@@ -257,11 +281,51 @@ class Resolver(common.ResolverBase):
         log.msg("Unexpected message (%d) received from %r" % (message.id, address))
 
 
+    def _pickProtocol(self):
+        """
+        Return the L{DNSDatagramProtocol} to send a query from: the next
+        shared one if C{udpPortPoolSize} is positive, or else a new one from
+        L{_connectedProtocol}.
+        """
+        pool = self._udpPool
+        if len(pool) < self.udpPortPoolSize:
+            protocol = self._connectedProtocol()
+            pool.append(protocol)
+            self._udpUses[protocol] = [self.udpPortQueries, 0]
+        elif pool:
+            protocol = pool.pop(0)
+            pool.append(protocol)
+        else:
+            protocol = self._connectedProtocol()
+            self._udpUses.setdefault(protocol, [0, 0])[0] += 1
+
+        uses = self._udpUses[protocol]
+        uses[0] -= 1
+        uses[1] += 1
+        if uses[0] <= 0 and protocol in pool:
+            # Let a port with a new random number take its place.
+            pool.remove(protocol)
+        return protocol
+
+
+    def _releaseProtocol(self, protocol):
+        """
+        Note that a query sent from C{protocol} has completed, and disconnect
+        it from its transport if it will send no more queries.
+        """
+        uses = self._udpUses[protocol]
+        uses[1] -= 1
+        if uses[0] <= 0 and not uses[1]:
+            del self._udpUses[protocol]
+            protocol.transport.stopListening()
+
+
     def _query(self, *args):
         """
-        Get a new L{DNSDatagramProtocol} instance from L{_connectedProtocol},
-        issue a query to it using C{*args}, and arrange for it to be
-        disconnected from its transport after the query completes.
+        Get a L{DNSDatagramProtocol} instance from L{_pickProtocol}, issue a
+        query to it using C{*args}, and arrange for it to be disconnected from
+        its transport once it has sent all the queries it may and they have
+        completed.
 
         @param *args: Positional arguments to be passed to
             L{DNSDatagramProtocol.query}.
@@ -269,10 +333,10 @@ class Resolver(common.ResolverBase):
         @return: A L{Deferred} which will be called back with the result of the
             query.
         """
-        protocol = self._connectedProtocol()
+        protocol = self._pickProtocol()
         d = protocol.query(*args)
         def cbQueried(result):
-            protocol.transport.stopListening()
+            self._releaseProtocol(protocol)
             return result
         d.addBoth(cbQueried)
         return d
@@ -344,6 +408,10 @@ class Resolver(common.ResolverBase):
         """
         Make a number of DNS queries via TCP.
 
+        Queries share one connection, which is kept open and has any number
+        of queries outstanding on it at once.  Queries made while it is being
+        established are sent once it is.
+
         @type queries: Any non-zero number of C{dns.Query} instances
         @param queries: The queries to make.
 
@@ -353,11 +421,12 @@ class Resolver(common.ResolverBase):
         @rtype: C{Deferred}
         """
         if not len(self.connections):
-            address = self.pickServer()
-            if address is None:
-                return defer.fail(IOError("No domain name servers available"))
-            host, port = address
-            self._reactor.connectTCP(host, port, self.factory)
+            if not self.pending:
+                address = self.pickServer()
+                if address is None:
+                    return defer.fail(IOError("No domain name servers available"))
+                host, port = address
+                self._reactor.connectTCP(host, port, self.factory)
             self.pending.append((defer.Deferred(), queries, timeout))
             return self.pending[-1][0]
         else:
@@ -519,6 +588,21 @@ class DNSClientFactory(protocol.ClientFactory):
         pass
 
 
+    def clientConnectionFailed(self, connector, reason):
+        """
+        Fail the queries waiting for the connection, if the controller has
+        any.
+        """
+        pending = getattr(self.controller, 'pending', None)
+        if pending:
+            # Copy the list first, as queries may be made again from the
+            # errbacks.
+            failed = pending[:]
+            del pending[:]
+            for d, queries, timeout in failed:
+                d.errback(reason)
+
+
     def buildProtocol(self, addr):
         p = dns.DNSProtocol(self.controller)
         p.factory = self
@@ -58,6 +58,8 @@ from zope.interface import implements, Interface, Attribute
 # Twisted imports
 from twisted.internet import protocol, defer
 from twisted.internet.error import CannotListenError
+from twisted.internet.interfaces import (
+    IDatagramBatchReceiver, IUDPBatchTransport)
 from twisted.python import log, failure
 from twisted.python import util as tputil
 from twisted.python import randbytes
@@ -188,6 +190,86 @@ def readPrecisely(file, l):
     return buff
 
 
+
+def _sliceFrom(data, offset, l):
+    """
+    Return the C{l} bytes of C{data} starting at C{offset}, like
+    L{readPrecisely} does for a file.
+
+    @raise EOFError: If C{data} ends before C{offset + l}.
+    """
+    buff = data[offset:offset + l]
+    if len(buff) < l:
+        raise EOFError
+    return buff
+
+
+
+_structs = {}
+
+def _unpackFrom(fmt, data, offset):
+    """
+    Unpack the fields described by the L{struct} format C{fmt} from C{data},
+    starting at C{offset}.
+
+    @raise EOFError: If C{data} ends before the fields do.
+    """
+    s = _structs.get(fmt)
+    if s is None:
+        s = _structs[fmt] = struct.Struct(fmt)
+    if offset + s.size > len(data):
+        raise EOFError
+    return s.unpack_from(data, offset)
+
+
+
+class _OffsetWriter(object):
+    """
+    A minimal file-like object which L{Message.toStr} passes to the
+    L{IEncodable.encode} method of objects which cannot append themselves to
+    a list of strings directly.
+
+    Only C{write} and C{tell} are supported, which is all that encoding a
+    payload needs.
+
+    @ivar parts: The C{list} of strings written so far for the message.
+
+    @ivar offset: The offset from the start of the message at which the next
+        string written will appear.
+    """
+
+    def __init__(self, parts, offset):
+        self.parts = parts
+        self.offset = offset
+
+
+    def write(self, data):
+        self.parts.append(data)
+        self.offset += len(data)
+
+
+    def tell(self):
+        # Positions in a stream are relative to the end of the message
+        # header, as in the body written by Message.encode.
+        return self.offset - Message.headerSize
+
+
+
+def _encodeInto(encodable, parts, offset, compDict):
+    """
+    Append the encoded form of the L{IEncodable} C{encodable}, which will
+    appear at C{offset} in a message, to C{parts}.
+
+    @return: The offset just after the encoded object.
+    """
+    encodeInto = getattr(encodable, '_encodeInto', None)
+    if encodeInto is not None:
+        return encodeInto(parts, offset, compDict)
+    strio = _OffsetWriter(parts, offset)
+    encodable.encode(strio, compDict)
+    return strio.offset
+
+
 class IEncodable(Interface):
     """
     Interface for something which can be encoded to and decoded
@@ -280,12 +362,116 @@ class Charstr(object):
 
 
 class Name:
+    """
+    A domain name.
+
+    @ivar _labelsFor: The value of C{name} which C{_labels} was computed for.
+
+    @ivar _labels: A C{list} of two-tuples of each suffix of C{name} and the
+        encoded label which starts it, so that encoding a L{Name} which is
+        part of a static record only splits it once.
+    """
     implements(IEncodable)
 
+    _labelsFor = None
+    _labels = ()
+
     def __init__(self, name=''):
         assert isinstance(name, types.StringTypes), "%r is not a string" % (name,)
         self.name = name
 
+
+    def _getLabels(self):
+        """
+        Return the suffixes and encoded labels of C{name}, splitting it only
+        if it has changed since the last call.
+        """
+        name = self.name
+        if self._labelsFor is not name:
+            labels = []
+            while name:
+                suffix = name
+                ind = name.find('.')
+                if ind > 0:
+                    label, name = name[:ind], name[ind + 1:]
+                else:
+                    label, name = name, ''
+                    ind = len(label)
+                labels.append((suffix, chr(ind) + label))
+            self._labels = labels
+            self._labelsFor = self.name
+        return self._labels
+
+
+    def _encodeInto(self, parts, offset, compDict=None):
+        """
+        Append the encoded form of this Name to C{parts}, as L{encode} would
+        write it to a stream.
+
+        @param offset: The offset from the start of the message at which the
+            encoded Name will appear.
+
+        @return: The offset just after the encoded Name.
+        """
+        for suffix, label in self._getLabels():
+            if compDict is not None:
+                pointer = compDict.get(suffix)
+                if pointer is not None:
+                    parts.append(struct.pack("!H", 0xc000 | pointer))
+                    return offset + 2
+                compDict[suffix] = offset
+            parts.append(label)
+            offset += len(label)
+        parts.append('\x00')
+        return offset + 1
+
+
+    def _decodeFrom(self, data, offset, length=None):
+        """
+        Decode this Name from C{data}, a whole message, starting at C{offset},
+        as L{decode} would read it from a stream.
+
+        @return: The offset just after the encoded Name.
+
+        @raise EOFError: Raised when C{data} ends before the Name does.
+
+        @raise ValueError: Raised when the name cannot be decoded (for example,
+            because it contains a loop).
+        """
+        labels = []
+        visited = None
+        resume = None
+        size = len(data)
+        while 1:
+            if offset >= size:
+                raise EOFError()
+            l = ord(data[offset])
+            offset += 1
+            if l == 0:
+                break
+            if (l >> 6) == 3:
+                if offset >= size:
+                    raise EOFError()
+                new_off = (l & 63) << 8 | ord(data[offset])
+                if visited is None:
+                    visited = set()
+                if new_off in visited:
+                    raise ValueError("Compression loop in encoded name")
+                visited.add(new_off)
+                if resume is None:
+                    resume = offset + 1
+                offset = new_off
+                continue
+            end = offset + l
+            if end > size:
+                raise EOFError()
+            labels.append(data[offset:end])
+            offset = end
+        self.name = '.'.join(labels)
+        if resume is not None:
+            return resume
+        return offset
+
     def encode(self, strio, compDict=None):
         """
         Encode this Name into the appropriate byte format.
@@ -299,8 +485,7 @@ class Name:
         and whose addresses may be backreferenced by this Name (for the purpose
         of reducing the message size).
         """
-        name = self.name
-        while name:
+        for name, label in self._getLabels():
             if compDict is not None:
                 if name in compDict:
                     strio.write(
@@ -308,13 +493,6 @@ class Name:
                     return
                 else:
                     compDict[name] = strio.tell() + Message.headerSize
-            ind = name.find('.')
-            if ind > 0:
-                label, name = name[:ind], name[ind + 1:]
-            else:
-                label, name = name, ''
-                ind = len(label)
-            strio.write(chr(ind))
             strio.write(label)
         strio.write(chr(0))
 
@@ -413,6 +591,18 @@ class Query:
         self.type, self.cls = struct.unpack("!HH", buff)
 
 
+    def _encodeInto(self, parts, offset, compDict=None):
+        offset = self.name._encodeInto(parts, offset, compDict)
+        parts.append(struct.pack("!HH", self.type, self.cls))
+        return offset + 4
+
+
+    def _decodeFrom(self, data, offset, length=None):
+        offset = self.name._decodeFrom(data, offset)
+        self.type, self.cls = _unpackFrom("!HH", data, offset)
+        return offset + 4
+
+
     def __hash__(self):
         return hash((str(self.name).lower(), self.type, self.cls))
 
@@ -517,6 +707,29 @@ class RRHeader(tputil.FancyEqMixin):
         self.type, self.cls, self.ttl, self.rdlength = r
 
 
+    def _encodeInto(self, parts, offset, compDict=None):
+        offset = self.name._encodeInto(parts, offset, compDict)
+        if self.payload:
+            # Leave a slot for the fixed fields, which end with the length
+            # of the payload.
+            fixed = len(parts)
+            parts.append(None)
+            start = offset + 10
+            end = _encodeInto(self.payload, parts, start, compDict)
+            parts[fixed] = struct.pack(
+                self.fmt, self.type, self.cls, self.ttl, end - start)
+            return end
+        parts.append(struct.pack(self.fmt, self.type, self.cls, self.ttl, 0))
+        return offset + 10
+
+
+    def _decodeFrom(self, data, offset, length=None):
+        offset = self.name._decodeFrom(data, offset)
+        r = _unpackFrom(self.fmt, data, offset)
+        self.type, self.cls, self.ttl, self.rdlength = r
+        return offset + 10
+
+
     def isAuthoritative(self):
         return self.auth
 
@@ -564,6 +777,15 @@ class SimpleRecord(tputil.FancyStrMixin, tputil.FancyEqMixin):
         self.name.decode(strio)
 
 
+    def _encodeInto(self, parts, offset, compDict=None):
+        return self.name._encodeInto(parts, offset, compDict)
+
+
+    def _decodeFrom(self, data, offset, length=None):
+        self.name = Name()
+        return self.name._decodeFrom(data, offset)
+
+
     def __hash__(self):
         return hash(self.name)
 
@@ -704,6 +926,16 @@ class Record_A(tputil.FancyEqMixin):
         self.address = readPrecisely(strio, 4)
 
 
+    def _encodeInto(self, parts, offset, compDict=None):
+        parts.append(self.address)
+        return offset + len(self.address)
+
+
+    def _decodeFrom(self, data, offset, length=None):
+        self.address = _sliceFrom(data, offset, 4)
+        return offset + 4
+
+
     def __hash__(self):
         return hash(self.address)
 
@@ -793,6 +1025,28 @@ class Record_SOA(tputil.FancyEqMixin, tputil.FancyStrMixin):
         self.serial, self.refresh, self.retry, self.expire, self.minimum = r
 
 
+    def _encodeInto(self, parts, offset, compDict=None):
+        offset = self.mname._encodeInto(parts, offset, compDict)
+        offset = self.rname._encodeInto(parts, offset, compDict)
+        parts.append(
+            struct.pack(
+                '!LlllL',
+                self.serial, self.refresh, self.retry, self.expire,
+                self.minimum
+            )
+        )
+        return offset + 20
+
+
+    def _decodeFrom(self, data, offset, length=None):
+        self.mname, self.rname = Name(), Name()
+        offset = self.mname._decodeFrom(data, offset)
+        offset = self.rname._decodeFrom(data, offset)
+        r = _unpackFrom('!LlllL', data, offset)
+        self.serial, self.refresh, self.retry, self.expire, self.minimum = r
+        return offset + 20
+
+
     def __hash__(self):
         return hash((
             self.serial, self.mname, self.rname,
@@ -927,6 +1181,16 @@ class Record_AAAA(tputil.FancyEqMixin, tputil.FancyStrMixin):
         self.address = readPrecisely(strio, 16)
 
 
+    def _encodeInto(self, parts, offset, compDict=None):
+        parts.append(self.address)
+        return offset + len(self.address)
+
+
+    def _decodeFrom(self, data, offset, length=None):
+        self.address = _sliceFrom(data, offset, 16)
+        return offset + 16
+
+
     def __hash__(self):
         return hash(self.address)
 
@@ -1078,6 +1342,19 @@ class Record_SRV(tputil.FancyEqMixin, tputil.FancyStrMixin):
         self.target.decode(strio)
 
 
+    def _encodeInto(self, parts, offset, compDict=None):
+        parts.append(struct.pack('!HHH', self.priority, self.weight, self.port))
+        # This can't be compressed
+        return self.target._encodeInto(parts, offset + 6, None)
+
+
+    def _decodeFrom(self, data, offset, length=None):
+        r = _unpackFrom('!HHH', data, offset)
+        self.priority, self.weight, self.port = r
+        self.target = Name()
+        return self.target._decodeFrom(data, offset + 6)
+
+
     def __hash__(self):
         return hash((self.priority, self.weight, self.port, self.target))
 
@@ -1415,6 +1692,17 @@ class Record_MX(tputil.FancyStrMixin, tputil.FancyEqMixin):
         self.name = Name()
         self.name.decode(strio)
 
+
+    def _encodeInto(self, parts, offset, compDict=None):
+        parts.append(struct.pack('!H', self.preference))
+        return self.name._encodeInto(parts, offset + 2, compDict)
+
+
+    def _decodeFrom(self, data, offset, length=None):
+        self.preference = _unpackFrom('!H', data, offset)[0]
+        self.name = Name()
+        return self.name._decodeFrom(data, offset + 2)
+
     def __hash__(self):
         return hash((self.preference, self.name))
 
@@ -1464,6 +1752,30 @@ class Record_TXT(tputil.FancyEqMixin, tputil.FancyStrMixin):
             )
 
 
+    def _encodeInto(self, parts, offset, compDict=None):
+        for d in self.data:
+            parts.append(struct.pack('!B', len(d)) + d)
+            offset += len(d) + 1
+        return offset
+
+
+    def _decodeFrom(self, data, offset, length=None):
+        soFar = 0
+        self.data = []
+        while soFar < length:
+            L = ord(_sliceFrom(data, offset, 1))
+            self.data.append(_sliceFrom(data, offset + 1, L))
+            offset += L + 1
+            soFar += L + 1
+        if soFar != length:
+            log.msg(
+                "Decoded %d bytes in %s record, but rdlength is %d" % (
+                    soFar, self.fancybasename, length
+                )
+            )
+        return offset
+
+
     def __hash__(self):
         return hash(tuple(self.data))
 
@@ -1512,6 +1824,18 @@ class UnknownRecord(tputil.FancyEqMixin, tputil.FancyStrMixin, object):
         self.data = readPrecisely(strio, length)
 
 
+    def _encodeInto(self, parts, offset, compDict=None):
+        parts.append(self.data)
+        return offset + len(self.data)
+
+
+    def _decodeFrom(self, data, offset, length=None):
+        if length is None:
+            raise Exception('must know length for unknown record types')
+        self.data = _sliceFrom(data, offset, length)
+        return offset + length
+
+
     def __hash__(self):
         return hash((self.data, self.ttl))
 
@@ -1578,21 +1902,21 @@ class Message:
 
 
     def encode(self, strio):
-        compDict = {}
-        body_tmp = StringIO.StringIO()
-        for q in self.queries:
-            q.encode(body_tmp, compDict)
-        for q in self.answers:
-            q.encode(body_tmp, compDict)
-        for q in self.authority:
-            q.encode(body_tmp, compDict)
-        for q in self.additional:
-            q.encode(body_tmp, compDict)
-        body = body_tmp.getvalue()
-        size = len(body) + self.headerSize
-        if self.maxSize and size > self.maxSize:
-            self.trunc = 1
-            body = body[:self.maxSize - self.headerSize]
+        strio.write(self.toStr())
+
+
+    def decode(self, strio, length=None):
+        # Compression pointers are offsets from the start of the stream.
+        start = strio.tell()
+        strio.seek(0)
+        data = strio.read()
+        strio.seek(self._decodeFrom(data, start))
+
+
+    def _encodeHeader(self):
+        """
+        Return the encoded header of this message.
+        """
         byte3 = (( ( self.answer & 1 ) << 7 )
                  | ((self.opCode & 0xf ) << 3 )
                  | ((self.auth & 1 ) << 2 )
@@ -1601,15 +1925,26 @@ class Message:
         byte4 = ( ( (self.recAv & 1 ) << 7 )
                   | (self.rCode & 0xf ) )
 
-        strio.write(struct.pack(self.headerFmt, self.id, byte3, byte4,
-                                len(self.queries), len(self.answers),
-                                len(self.authority), len(self.additional)))
-        strio.write(body)
+        return struct.pack(self.headerFmt, self.id, byte3, byte4,
+                           len(self.queries), len(self.answers),
+                           len(self.authority), len(self.additional))
 
 
-    def decode(self, strio, length=None):
+    def _decodeFrom(self, data, offset):
+        """
+        Decode a message from C{data}, starting at C{offset}.
+
+        Records are decoded directly from C{data}, except for those whose
+        type only supports L{IEncodable.decode}.
+
+        @return: The offset just after the decoded message, or the length of
+            C{data} if it ended before the message did.
+
+        @raise EOFError: If C{data} is too short to contain the header.
+        """
         self.maxSize = 0
-        header = readPrecisely(strio, self.headerSize)
+        header = _sliceFrom(data, offset, self.headerSize)
+        offset += self.headerSize
         r = struct.unpack(self.headerFmt, header)
         self.id, byte3, byte4, nqueries, nans, nns, nadd = r
         self.answer = ( byte3 >> 7 ) & 1
@@ -1621,17 +1956,48 @@ class Message:
         self.rCode = byte4 & 0xf
 
         self.queries = []
-        for i in range(nqueries):
-            q = Query()
-            try:
-                q.decode(strio)
-            except EOFError:
-                return
-            self.queries.append(q)
+        try:
+            for i in range(nqueries):
+                q = Query()
+                offset = q._decodeFrom(data, offset)
+                self.queries.append(q)
+
+            items = ((self.answers, nans), (self.authority, nns), (self.additional, nadd))
+            for (l, n) in items:
+                offset = self._parseRecordsFrom(l, n, data, offset)
+        except EOFError:
+            return len(data)
+        return offset
+
 
-        items = ((self.answers, nans), (self.authority, nns), (self.additional, nadd))
-        for (l, n) in items:
-            self.parseRecords(l, n, strio)
+    def _parseRecordsFrom(self, list, num, data, offset):
+        """
+        Decode C{num} records from C{data}, starting at C{offset}, and append
+        them to C{list}, like L{parseRecords}.
+
+        @return: The offset just after the last record.
+
+        @raise EOFError: If C{data} ends before the last record does.
+        """
+        strio = None
+        for i in range(num):
+            header = RRHeader(auth=self.auth)
+            offset = header._decodeFrom(data, offset)
+            t = self.lookupRecordType(header.type)
+            if not t:
+                continue
+            payload = header.payload = t(ttl=header.ttl)
+            decodeFrom = getattr(payload, '_decodeFrom', None)
+            if decodeFrom is not None:
+                offset = decodeFrom(data, offset, header.rdlength)
+            else:
+                if strio is None:
+                    strio = StringIO.StringIO(data)
+                strio.seek(offset)
+                payload.decode(strio, header.rdlength)
+                offset = strio.tell()
+            list.append(header)
+        return offset
 
 
     def parseRecords(self, list, num, strio):
@@ -1681,14 +2047,35 @@ class Message:
 
 
     def toStr(self):
-        strio = StringIO.StringIO()
-        self.encode(strio)
-        return strio.getvalue()
+        """
+        Encode this message.
+
+        The header, the queries and the records are appended to a single
+        list of strings, tracking the offset each will appear at for name
+        compression, and joined once.
+
+        @rtype: C{str}
+        """
+        compDict = {}
+        parts = []
+        offset = self.headerSize
+        for q in self.queries:
+            offset = _encodeInto(q, parts, offset, compDict)
+        for q in self.answers:
+            offset = _encodeInto(q, parts, offset, compDict)
+        for q in self.authority:
+            offset = _encodeInto(q, parts, offset, compDict)
+        for q in self.additional:
+            offset = _encodeInto(q, parts, offset, compDict)
+        body = ''.join(parts)
+        if self.maxSize and offset > self.maxSize:
+            self.trunc = 1
+            body = body[:self.maxSize - self.headerSize]
+        return self._encodeHeader() + body
 
 
     def fromStr(self, str):
-        strio = StringIO.StringIO(str)
-        self.decode(strio)
+        self._decodeFrom(str, 0)
 
 
 
@@ -1776,8 +2163,17 @@ class DNSMixin(object):
 class DNSDatagramProtocol(DNSMixin, protocol.DatagramProtocol):
     """
     DNS protocol over UDP.
+
+    @ivar _pendingWrites: While a batch of datagrams is being handled by
+        L{datagramsReceived}, a C{list} of the datagrams written meanwhile with
+        L{writeMessage}, which are sent together once the batch has been
+        handled.  C{None} otherwise.  Queries sent with L{query} are not
+        delayed, so that an error writing one fails its C{Deferred}.
     """
+    implements(IDatagramBatchReceiver)
+
     resends = None
+    _pendingWrites = None
 
     def stopProtocol(self):
         """
@@ -1800,7 +2196,10 @@ class DNSDatagramProtocol(DNSMixin, protocol.DatagramProtocol):
 
         @type message: L{Message}
         """
-        self.transport.write(message.toStr(), address)
+        if self._pendingWrites is not None:
+            self._pendingWrites.append((message.toStr(), address))
+        else:
+            self.transport.write(message.toStr(), address)
 
     def startListening(self):
         self._reactor.listenUDP(0, self, maxPacketSize=512)
@@ -1838,6 +2237,39 @@ class DNSDatagramProtocol(DNSMixin, protocol.DatagramProtocol):
                 self.controller.messageReceived(m, self, addr)
 
 
+    def datagramsReceived(self, datagrams):
+        """
+        Handle each of a batch of datagrams, and send any messages written
+        with L{writeMessage} while doing so together.  Errors writing them are
+        logged.
+        """
+        self._pendingWrites = pending = []
+        try:
+            for data, addr in datagrams:
+                try:
+                    self.datagramReceived(data, addr)
+                except:
+                    log.err()
+        finally:
+            self._pendingWrites = None
+
+        if not pending or self.transport is None:
+            return
+        if IUDPBatchTransport.providedBy(self.transport):
+            # Errors writing one datagram do not stop the others from being
+            # written.
+            try:
+                self.transport.writeDatagrams(pending)
+            except:
+                log.err()
+        else:
+            for data, addr in pending:
+                try:
+                    self.transport.write(data, addr)
+                except:
+                    log.err()
+
+
     def removeResend(self, id):
         """
         Mark message ID as no longer having duplication suppression.
@@ -1872,7 +2304,7 @@ class DNSDatagramProtocol(DNSMixin, protocol.DatagramProtocol):
             self.resends[id] = 1
 
         def writeMessage(m):
-            self.writeMessage(m, address)
+            self.transport.write(m.toStr(), address)
 
         return self._query(queries, timeout, id, writeMessage)
 
@@ -96,6 +96,8 @@ class SecondaryAuthority(common.ResolverBase):
     soa = records = None
     _port = 53
     _reactor = None
+    _reloadObservers = ()
+    _indexed = None
 
     def __init__(self, primaryIP, domain):
         common.ResolverBase.__init__(self)
@@ -153,16 +155,38 @@ class SecondaryAuthority(common.ResolverBase):
     #shouldn't we just subclass? :P
 
     lookupZone = FileAuthority.__dict__['lookupZone']
+    __getstate__ = FileAuthority.__dict__['__getstate__']
+    addReloadObserver = FileAuthority.__dict__['addReloadObserver']
+    _zoneReloaded = FileAuthority.__dict__['_zoneReloaded']
+    applyDiff = FileAuthority.__dict__['applyDiff']
+    _getIndex = FileAuthority.__dict__['_getIndex']
+    _indexOwner = FileAuthority.__dict__['_indexOwner']
 
     def _cbZone(self, zone):
         ans, _, _ = zone
-        self.records = r = {}
+        old = self.records
+        r = {}
         for rec in ans:
             if not self.soa and rec.type == dns.SOA:
                 self.soa = (str(rec.name).lower(), rec.payload)
             else:
                 r.setdefault(str(rec.name).lower(), []).append(rec.payload)
 
+        if not old:
+            self.records = r
+            self._zoneReloaded()
+            return
+
+        # Only change the owners whose records were transferred differently,
+        # so that the index of the others is kept.
+        removed, added = [], []
+        for name in set(old) | set(r):
+            before, after = old.get(name, []), r.get(name, [])
+            if before != after:
+                removed.extend([(name, rec) for rec in before])
+                added.extend([(name, rec) for rec in after])
+        self.applyDiff(removed, added)
+
     def _ebZone(self, failure):
         log.msg("Updating %s from %s failed during zone transfer" % (self.domain, self.primary))
         log.err(failure)
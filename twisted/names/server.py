@@ -17,25 +17,57 @@ for resolvers to deal with.  Fix it.
 @author: Jp Calderone
 """
 
-import time
+import time, struct
 
-from twisted.internet import protocol
+from twisted.internet import protocol, defer
 from twisted.names import dns, resolve
+from twisted.names.error import DNSNameError
 from twisted.python import log
 
 
+class _EncodedMessage(object):
+    """
+    A response which has already been encoded, which can be passed to the
+    C{writeMessage} method of L{dns.DNSDatagramProtocol} and
+    L{dns.DNSProtocol} in place of a L{dns.Message}.
+    """
+
+    def __init__(self, data):
+        self.data = data
+
+
+    def toStr(self):
+        return self.data
+
+
+
 class DNSServerFactory(protocol.ServerFactory):
     """
     Server factory and tracker for L{DNSProtocol} connections.  This
     class also provides records for responses to DNS queries.
 
+    A server which does not recurse, and whose authorities can all tell it
+    when their zones are reloaded (like L{authority.FileAuthority} and
+    L{secondary.SecondaryAuthority}), keeps the encoded responses to the
+    queries it answers.  It answers the same question again by patching the
+    message ID of the stored response, without asking the resolvers.
+
     @ivar connections: A list of all the connected L{DNSProtocol}
         instances using this object as their controller.
     @type connections: C{list} of L{DNSProtocol}
+
+    @ivar responseCacheSize: The largest number of encoded responses to
+        keep, or C{0} to not keep any.
+
+    @ivar _responses: A C{dict} mapping the keys returned by L{_responseKey}
+        to the encoded responses for them, without their message IDs.
+
+    @ivar _cacheResponses: Whether responses are kept.
     """
 
     protocol = dns.DNSProtocol
     cache = None
+    responseCacheSize = 10000
 
     def __init__(self, authorities = None, caches = None, clients = None, verbose = 0):
         resolvers = []
@@ -53,6 +85,62 @@ class DNSServerFactory(protocol.ServerFactory):
             self.cache = caches[-1]
         self.connections = []
 
+        self._responses = {}
+        self._cacheResponses = (
+            not self.canRecurse and self.responseCacheSize > 0 and
+            self._watchAuthorities(authorities or []))
+
+
+    def _watchAuthorities(self, resolvers):
+        """
+        Ask each of C{resolvers}, and the resolvers chained by any of them, to
+        tell this factory when their records are replaced.
+
+        @return: C{True} if all of them can, C{False} otherwise.
+        """
+        watched = True
+        for resolver in resolvers:
+            if isinstance(resolver, resolve.ResolverChain):
+                if not self._watchAuthorities(resolver.resolvers):
+                    watched = False
+            elif getattr(resolver, 'addReloadObserver', None) is not None:
+                resolver.addReloadObserver(self.clearResponseCache)
+            else:
+                watched = False
+        return watched
+
+
+    def clearResponseCache(self):
+        """
+        Discard every encoded response, so that the next answer to each
+        question is looked up again.
+        """
+        self._responses.clear()
+
+
+    def _responseKey(self, message):
+        """
+        Return the key the response to C{message} is kept under, or C{None}
+        if it should not be kept.
+
+        The key covers the question and every header field of the query which
+        is copied to the response.
+        """
+        if not self._cacheResponses or len(message.queries) != 1:
+            return None
+        query = message.queries[0]
+        return (str(query.name), query.type, query.cls, message.recDes,
+                message.trunc, message.maxSize)
+
+
+    def _keepResponse(self, key, message):
+        """
+        Encode C{message} and keep it under C{key}.
+        """
+        if len(self._responses) >= self.responseCacheSize:
+            self._responses.popitem()
+        self._responses[key] = message.toStr()[2:]
+
 
     def buildProtocol(self, addr):
         p = self.protocol(self)
@@ -96,6 +184,7 @@ class DNSServerFactory(protocol.ServerFactory):
 
 
     def gotResolverResponse(self, (ans, auth, add), protocol, message, address):
+        key = self._responseKey(message)
         message.rCode = dns.OK
         message.answers = ans
         for x in ans:
@@ -104,6 +193,8 @@ class DNSServerFactory(protocol.ServerFactory):
                 break
         message.authority = auth
         message.additional = add
+        if key is not None:
+            self._keepResponse(key, message)
         self.sendReply(protocol, message, address)
 
         l = len(ans) + len(auth) + len(add)
@@ -117,8 +208,11 @@ class DNSServerFactory(protocol.ServerFactory):
 
 
     def gotResolverError(self, failure, protocol, message, address):
+        key = self._responseKey(message)
         if failure.check(dns.DomainError, dns.AuthoritativeDomainError):
             message.rCode = dns.ENAME
+            if key is not None:
+                self._keepResponse(key, message)
         else:
             message.rCode = dns.ESERVER
             log.err(failure)
@@ -127,12 +221,35 @@ class DNSServerFactory(protocol.ServerFactory):
         if self.verbose:
             log.msg("Lookup failed")
 
+        if self.cache and failure.check(DNSNameError):
+            # The upstream server said the name does not exist; remember that
+            # as long as its SOA record allows.
+            response = failure.value.args and failure.value.args[0]
+            if isinstance(response, dns.Message):
+                cacheNameError = getattr(self.cache, 'cacheNameError', None)
+                if cacheNameError is not None:
+                    cacheNameError(message.queries[0], response.authority)
+
 
     def handleQuery(self, message, protocol, address):
         # Discard all but the first query!  HOO-AAH HOOOOO-AAAAH
         # (no other servers implement multi-query messages, so we won't either)
         query = message.queries[0]
 
+        key = self._responseKey(message)
+        if key is not None:
+            response = self._responses.get(key)
+            if response is not None:
+                response = _EncodedMessage(
+                    struct.pack('!H', message.id) + response)
+                if address is None:
+                    protocol.writeMessage(response)
+                else:
+                    protocol.writeMessage(response, address)
+                if self.verbose > 1:
+                    log.msg("Answered %s from the response cache" % (query,))
+                return defer.succeed(None)
+
         return self.resolver.query(query).addCallback(
             self.gotResolverResponse, protocol, message, address
         ).addErrback(
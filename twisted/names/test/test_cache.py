@@ -2,11 +2,12 @@
 # See LICENSE for details.
 
 import time
+import pickle
 
 from twisted.trial import unittest
 
 from twisted.names import dns, cache
-from twisted.internet import task
+from twisted.internet import task, defer
 
 class Caching(unittest.TestCase):
     """
@@ -127,3 +128,166 @@ class Caching(unittest.TestCase):
 
         return self.assertFailure(
             c.lookupAddress("example.com"), dns.DomainError)
+
+
+    def _result(self, name, ttl):
+        return ([dns.RRHeader(name, dns.A, dns.IN, ttl,
+                              dns.Record_A("127.0.0.1", ttl))], [], [])
+
+
+    def test_singleTimer(self):
+        """
+        L{cache.CacheResolver} schedules one delayed call for the earliest
+        expiry, however many results it caches, and reschedules it for the
+        next one after removing the expired entries.
+        """
+        clock = task.Clock()
+        c = cache.CacheResolver(reactor=clock)
+        for i in range(10):
+            c.cacheResult(dns.Query(name="host%d.example.com" % (i,)),
+                          self._result("host%d.example.com" % (i,), 10 + i))
+        self.assertEqual(len(clock.getDelayedCalls()), 1)
+        self.assertEqual(clock.getDelayedCalls()[0].getTime(), 10)
+
+        clock.advance(10)
+        self.assertEqual(len(c.cache), 9)
+        self.assertEqual(len(clock.getDelayedCalls()), 1)
+        self.assertEqual(c.expirations, 1)
+
+
+    def test_leastRecentlyUsedEvicted(self):
+        """
+        When there are more than C{maxEntries} entries, the least recently
+        added or looked up ones are evicted.
+        """
+        clock = task.Clock()
+        c = cache.CacheResolver(reactor=clock, maxEntries=2)
+        first = dns.Query(name="first.example.com")
+        second = dns.Query(name="second.example.com")
+        third = dns.Query(name="third.example.com")
+        c.cacheResult(first, self._result("first.example.com", 60))
+        c.cacheResult(second, self._result("second.example.com", 60))
+        c.lookupAddress("first.example.com")
+        c.cacheResult(third, self._result("third.example.com", 60))
+        self.assertEqual(set(c.cache), set([first, third]))
+        self.assertEqual(c.evictions, 1)
+
+
+    def _soa(self, ttl, minimum):
+        return dns.RRHeader("example.com", dns.SOA, dns.IN, ttl,
+                            dns.Record_SOA(minimum=minimum, ttl=ttl))
+
+
+    def test_negativeAnswerLifetime(self):
+        """
+        A result with no answers and an I{SOA} record in the authority section
+        expires after the smaller of the TTL and the I{MINIMUM} field of the
+        record, as described in RFC 2308.
+        """
+        clock = task.Clock()
+        c = cache.CacheResolver(reactor=clock)
+        query = dns.Query(name="example.com", type=dns.A, cls=dns.IN)
+        c.cacheResult(query, ([], [self._soa(3600, 300)], []))
+        clock.advance(299)
+        self.assertIn(query, c.cache)
+        clock.advance(1)
+        self.assertNotIn(query, c.cache)
+
+
+    def test_nameError(self):
+        """
+        L{cache.CacheResolver.cacheNameError} caches the non-existence of a
+        name, which lookups report with L{dns.AuthoritativeDomainError} so
+        that no other resolver is asked, until the I{MINIMUM} field of the
+        I{SOA} record runs out.
+        """
+        clock = task.Clock()
+        c = cache.CacheResolver(reactor=clock)
+        query = dns.Query(name="missing.example.com", type=dns.A, cls=dns.IN)
+        c.cacheNameError(query, [self._soa(3600, 300)])
+        d = self.assertFailure(
+            c.lookupAddress("missing.example.com"),
+            dns.AuthoritativeDomainError)
+        clock.advance(300)
+        self.assertNotIn(query, c.cache)
+        return d
+
+
+    def test_nameErrorWithoutSOA(self):
+        """
+        A name error without an I{SOA} record in its authority section is not
+        cached.
+        """
+        c = cache.CacheResolver(reactor=task.Clock())
+        c.cacheNameError(dns.Query(name="missing.example.com"), [])
+        self.assertEqual(c.cache, {})
+
+
+    def test_prefetch(self):
+        """
+        An entry which is looked up C{prefetchThreshold} times in the last
+        C{prefetchWindow} of its lifetime is refreshed from
+        C{prefetchResolver}.
+        """
+        queries = []
+        refreshed = self._result("hot.example.com", 100)
+        class Upstream(object):
+            def query(self, query, timeout=None):
+                queries.append(query)
+                return defer.succeed(refreshed)
+
+        clock = task.Clock()
+        c = cache.CacheResolver(reactor=clock, prefetchResolver=Upstream())
+        query = dns.Query(name="hot.example.com", type=dns.A, cls=dns.IN)
+        c.cacheResult(query, self._result("hot.example.com", 100))
+        for i in range(c.prefetchThreshold):
+            c.lookupAddress("hot.example.com")
+        self.assertEqual(queries, [])
+
+        clock.advance(95)
+        c.lookupAddress("hot.example.com")
+        self.assertEqual(queries, [query])
+        self.assertEqual(c.prefetches, 1)
+
+        clock.advance(10)
+        self.assertIn(query, c.cache)
+
+
+    def test_stats(self):
+        """
+        L{cache.CacheResolver.getStats} reports the number of entries and the
+        hits, misses, evictions, expirations and prefetches.
+        """
+        clock = task.Clock()
+        c = cache.CacheResolver(reactor=clock)
+        c.cacheResult(dns.Query(name="example.com", type=dns.A, cls=dns.IN),
+                      self._result("example.com", 60))
+        c.lookupAddress("example.com")
+        c.lookupAddress("example.com")
+        self.assertFailure(c.lookupAddress("example.org"), dns.DomainError)
+        self.assertEqual(
+            c.getStats(),
+            {"entries": 1, "hits": 2, "misses": 1, "evictions": 0,
+             "expirations": 0, "prefetches": 0})
+
+
+    def test_pickle(self):
+        """
+        Pickling a L{cache.CacheResolver} stops its timer and leaves out the
+        order of use of its entries, which are rebuilt from the entries which
+        have not expired when it is unpickled.
+        """
+        clock = task.Clock()
+        c = cache.CacheResolver(reactor=clock)
+        live = dns.Query(name="live.example.com", type=dns.A, cls=dns.IN)
+        dead = dns.Query(name="dead.example.com", type=dns.A, cls=dns.IN)
+        c.cacheResult(live, self._result("live.example.com", 60))
+        c.cacheResult(dead, self._result("dead.example.com", 10))
+        pickle.dumps(c)
+        self.assertEqual(clock.getDelayedCalls(), [])
+
+        clock.advance(20)
+        restored = pickle.loads(pickle.dumps(c))
+        self.assertEqual(restored.cache.keys(), [live])
+        self.assertEqual(restored.getStats()["entries"], 1)
+        self.assertEqual(len(restored._reactor.getDelayedCalls()), 1)
@@ -13,6 +13,8 @@ from twisted.internet import defer, error
 from twisted.python import failure
 from twisted.python.deprecate import getWarningMethod, setWarningMethod
 from twisted.python.compat import set
+from twisted.internet.task import Clock
+from twisted.test.proto_helpers import MemoryReactor, StringTransport
 
 
 class FakeResolver(ResolverBase):
@@ -430,6 +432,115 @@ class ResolverTests(unittest.TestCase):
         self.assertNotIn(protocol, resolver.connections)
 
 
+    def _pooledResolver(self, protocols, results):
+        """
+        Create a L{client.Resolver} which shares two UDP ports among its
+        queries, each for up to three queries, and which creates fake
+        protocols instead of binding them.
+
+        @param protocols: A C{list} to which each fake protocol is appended
+            when it is created.
+
+        @param results: A C{list} to which the L{defer.Deferred} returned for
+            each query is appended.
+        """
+        class FakeProtocol(object):
+            def __init__(self):
+                self.transport = StubPort()
+                protocols.append(self)
+
+            def query(self, address, query, timeout=10, id=None):
+                results.append(defer.Deferred())
+                return results[-1]
+
+        resolver = client.Resolver(servers=[('example.com', 53)])
+        resolver.udpPortPoolSize = 2
+        resolver.udpPortQueries = 3
+        resolver._connectedProtocol = FakeProtocol
+        return resolver
+
+
+    def test_udpPortPool(self):
+        """
+        If L{client.Resolver.udpPortPoolSize} is positive, queries are sent in
+        turn from that many protocols, which stay connected when the queries
+        complete.
+        """
+        protocols, results = [], []
+        resolver = self._pooledResolver(protocols, results)
+        for i in range(4):
+            resolver.query(dns.Query('%d.example.com' % (i,)))
+        self.assertEqual(len(protocols), 2)
+
+        for result in results:
+            result.callback(dns.Message())
+        self.assertFalse(protocols[0].transport.disconnected)
+        self.assertFalse(protocols[1].transport.disconnected)
+
+
+    def test_udpPortReplaced(self):
+        """
+        A protocol shared by queries is disconnected once it has sent
+        L{client.Resolver.udpPortQueries} queries and they have completed,
+        and another one takes its place.
+        """
+        protocols, results = [], []
+        resolver = self._pooledResolver(protocols, results)
+        for i in range(7):
+            resolver.query(dns.Query('%d.example.com' % (i,)))
+        self.assertEqual(len(protocols), 3)
+
+        for result in results[:-1]:
+            result.callback(dns.Message())
+        self.assertTrue(protocols[0].transport.disconnected)
+        # The last query from the second protocol has not completed.
+        self.assertFalse(protocols[1].transport.disconnected)
+
+        results[-1].callback(dns.Message())
+        self.assertTrue(protocols[1].transport.disconnected)
+        self.assertFalse(protocols[2].transport.disconnected)
+
+
+    def test_tcpSingleConnection(self):
+        """
+        Queries made by L{client.Resolver.queryTCP} while its connection is
+        being established wait for that connection instead of making others,
+        and are all sent once it is established.
+        """
+        reactor = MemoryReactor()
+        resolver = client.Resolver(
+            servers=[('example.com', 53)], reactor=reactor)
+        resolver.queryTCP([dns.Query('foo.example.com')])
+        resolver.queryTCP([dns.Query('bar.example.com')])
+        self.assertEqual(len(reactor.tcpClients), 1)
+
+        protocol = resolver.factory.buildProtocol(None)
+        protocol._reactor = Clock()
+        transport = StringTransport()
+        protocol.makeConnection(transport)
+        self.assertEqual(resolver.pending, [])
+        self.assertEqual(len(protocol.liveMessages), 2)
+
+
+    def test_tcpConnectionFailed(self):
+        """
+        If the connection for L{client.Resolver.queryTCP} cannot be
+        established, the queries waiting for it fail.
+        """
+        reactor = MemoryReactor()
+        resolver = client.Resolver(
+            servers=[('example.com', 53)], reactor=reactor)
+        first = resolver.queryTCP([dns.Query('foo.example.com')])
+        second = resolver.queryTCP([dns.Query('bar.example.com')])
+        host, port, factory, timeout, bindAddress = reactor.tcpClients[0]
+        factory.clientConnectionFailed(
+            None, failure.Failure(error.ConnectionRefusedError()))
+        self.assertEqual(resolver.pending, [])
+        return defer.gatherResults([
+                self.assertFailure(first, error.ConnectionRefusedError),
+                self.assertFailure(second, error.ConnectionRefusedError)])
+
+
 
 class ClientTestCase(unittest.TestCase):
 
@@ -10,9 +10,13 @@ from cStringIO import StringIO
 
 import struct
 
+from zope.interface import implements
+
 from twisted.python.failure import Failure
 from twisted.internet import address, task
-from twisted.internet.error import CannotListenError, ConnectionDone
+from twisted.internet.interfaces import IUDPBatchTransport
+from twisted.internet.error import (
+    CannotListenError, ConnectionDone, MessageLengthError)
 from twisted.trial import unittest
 from twisted.names import dns
 
@@ -426,6 +430,109 @@ class MessageTestCase(unittest.TestCase):
 
 
 
+class MessageCodecTests(unittest.TestCase):
+    """
+    Tests for the encoding and decoding of whole messages by
+    L{dns.Message.toStr} and L{dns.Message.fromStr}, which work directly on
+    strings for the common record types and fall back to
+    L{dns.IEncodable} for the others.
+    """
+
+    def _message(self):
+        """
+        Return a message with records of both kinds and many names to
+        compress.
+        """
+        message = dns.Message(id=7, answer=1, auth=1, maxSize=0)
+        message.addQuery('example.com', dns.MX)
+        payloads = [
+            dns.Record_A('1.2.3.4', ttl=10),
+            dns.Record_AAAA('::1', ttl=10),
+            dns.Record_MX(10, 'mail.example.com', ttl=10),
+            dns.Record_NS('ns.example.com', ttl=10),
+            dns.Record_SOA('ns.example.com', 'root.example.com', 1, 2, 3, 4,
+                           5, ttl=10),
+            dns.Record_TXT('foo', 'bar', ttl=10),
+            dns.Record_SRV(1, 2, 3, 'sip.example.com', ttl=10),
+            dns.Record_RP('root.example.com', 'txt.example.com', ttl=10),
+            dns.Record_HINFO('cpu', 'os', ttl=10),
+            dns.UnknownRecord('data', ttl=10),
+            ]
+        for payload in payloads:
+            message.answers.append(dns.RRHeader(
+                'example.com', getattr(payload, 'TYPE', 0xdead), ttl=10,
+                payload=payload, auth=True))
+        return message
+
+
+    def test_encodeMatchesEncodable(self):
+        """
+        The body of a message encoded by L{dns.Message.toStr} is the same as
+        the queries and records written one after the other with
+        L{dns.IEncodable.encode}, sharing one compression dictionary.
+        """
+        message = self._message()
+        stream = StringIO()
+        compression = {}
+        for item in message.queries + message.answers:
+            item.encode(stream, compression)
+        self.assertEqual(
+            message.toStr()[dns.Message.headerSize:], stream.getvalue())
+
+
+    def test_roundtrip(self):
+        """
+        A message decoded by L{dns.Message.fromStr} has the same queries and
+        records as the message its input was encoded from, including records
+        like L{dns.Record_RP} which are only decoded from a stream and whose
+        names point back into the rest of the message.
+        """
+        message = self._message()
+        decoded = dns.Message()
+        decoded.fromStr(message.toStr())
+        self.assertEqual(decoded.queries, message.queries)
+        self.assertEqual(decoded.answers, message.answers)
+
+
+    def test_decodeFromStream(self):
+        """
+        L{dns.Message.decode} decodes a message from the current position of
+        a stream and leaves the stream positioned just after it.
+        """
+        message = self._message()
+        stream = StringIO(message.toStr() + 'trailing')
+        decoded = dns.Message()
+        decoded.decode(stream)
+        self.assertEqual(decoded.answers, message.answers)
+        self.assertEqual(stream.read(), 'trailing')
+
+
+    def test_truncatedRecords(self):
+        """
+        L{dns.Message.fromStr} keeps the records which were complete when the
+        message ends in the middle of another.
+        """
+        message = self._message()
+        encoded = message.toStr()
+        decoded = dns.Message()
+        decoded.fromStr(encoded[:-1])
+        self.assertEqual(decoded.answers, message.answers[:-1])
+
+
+    def test_changedName(self):
+        """
+        A L{dns.Name} is encoded with its current value, even after it has
+        been encoded with another one.
+        """
+        name = dns.Name('example.com')
+        name.encode(StringIO())
+        name.name = 'example.org'
+        stream = StringIO()
+        name.encode(stream)
+        self.assertEqual(stream.getvalue(), '\x07example\x03org\x00')
+
+
+
 class TestController(object):
     """
     Pretend to be a DNS query processor for a DNSDatagramProtocol.
@@ -518,6 +625,110 @@ class DatagramProtocolTestCase(unittest.TestCase):
         return self.assertFailure(d, RuntimeError)
 
 
+    def test_datagramsReceived(self):
+        """
+        L{DNSDatagramProtocol.datagramsReceived} handles each datagram in a
+        batch, and the messages written meanwhile are sent together with the
+        transport's C{writeDatagrams} once the batch has been handled.
+        """
+        batches = []
+        class BatchTransport(proto_helpers.FakeDatagramTransport):
+            implements(IUDPBatchTransport)
+            def writeDatagrams(self, datagrams):
+                batches.append(datagrams)
+        self.proto.transport = BatchTransport()
+        def messageReceived(msg, proto, addr):
+            self.controller.messages.append((msg, proto, addr))
+            self.assertEqual(batches, [])
+            proto.writeMessage(msg, addr)
+        self.controller.messageReceived = messageReceived
+
+        first, second = dns.Message(id=1), dns.Message(id=2)
+        self.proto.datagramsReceived([
+            (first.toStr(), ('127.0.0.1', 1)),
+            (second.toStr(), ('127.0.0.1', 2))])
+        self.assertEqual(
+            [(msg.id, addr) for msg, proto, addr in self.controller.messages],
+            [(1, ('127.0.0.1', 1)), (2, ('127.0.0.1', 2))])
+        self.assertEqual(
+            batches,
+            [[(first.toStr(), ('127.0.0.1', 1)),
+              (second.toStr(), ('127.0.0.1', 2))]])
+        self.assertEqual(self.proto.transport.written, [])
+
+
+    def test_datagramsReceivedWriteError(self):
+        """
+        If writing one of the messages written while
+        L{DNSDatagramProtocol.datagramsReceived} handles a batch fails, the
+        error is logged and the other messages are still written.
+        """
+        written = []
+        def write(data, addr):
+            if addr[1] == 1:
+                raise MessageLengthError()
+            written.append((data, addr))
+        self.proto.transport.write = write
+        def messageReceived(msg, proto, addr):
+            proto.writeMessage(msg, addr)
+        self.controller.messageReceived = messageReceived
+
+        first, second = dns.Message(id=1), dns.Message(id=2)
+        self.proto.datagramsReceived([
+            (first.toStr(), ('127.0.0.1', 1)),
+            (second.toStr(), ('127.0.0.1', 2))])
+        self.assertEqual(written, [(second.toStr(), ('127.0.0.1', 2))])
+        self.assertEqual(len(self.flushLoggedErrors(MessageLengthError)), 1)
+
+
+    def test_datagramsReceivedWriteDatagramsError(self):
+        """
+        An error raised by the transport's C{writeDatagrams} method, once the
+        messages written while L{DNSDatagramProtocol.datagramsReceived}
+        handled a batch have been sent, is logged.
+        """
+        class BatchTransport(proto_helpers.FakeDatagramTransport):
+            implements(IUDPBatchTransport)
+            def writeDatagrams(self, datagrams):
+                raise MessageLengthError()
+        self.proto.transport = BatchTransport()
+        def messageReceived(msg, proto, addr):
+            proto.writeMessage(msg, addr)
+        self.controller.messageReceived = messageReceived
+
+        self.proto.datagramsReceived([
+            (dns.Message(id=1).toStr(), ('127.0.0.1', 1))])
+        self.assertEqual(len(self.flushLoggedErrors(MessageLengthError)), 1)
+
+
+    def test_datagramsReceivedQueryWriteError(self):
+        """
+        A query sent while L{DNSDatagramProtocol.datagramsReceived} handles a
+        batch is written at once, so that an error raised by the transport's
+        write method fails the C{Deferred} returned by
+        L{DNSDatagramProtocol.query}.
+        """
+        batches = []
+        class BatchTransport(proto_helpers.FakeDatagramTransport):
+            implements(IUDPBatchTransport)
+            def write(self, packet, addr):
+                raise MessageLengthError()
+            def writeDatagrams(self, datagrams):
+                batches.append(datagrams)
+        self.proto.transport = BatchTransport()
+        queries = []
+        def messageReceived(msg, proto, addr):
+            queries.append(proto.query(addr, [dns.Query('foo')]))
+        self.controller.messageReceived = messageReceived
+
+        self.proto.datagramsReceived([
+            (dns.Message(id=1).toStr(), ('127.0.0.1', 1))])
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(batches, [])
+        self.assertEqual(self.proto.liveMessages, {})
+        return self.assertFailure(queries[0], MessageLengthError)
+
+
     def test_listenError(self):
         """
         Exception L{CannotListenError} raised by C{listenUDP} should be turned
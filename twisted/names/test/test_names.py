@@ -506,6 +506,142 @@ class DNSServerFactoryTests(unittest.TestCase):
         self.assertEqual(factory.connections, [])
 
 
+    def test_nameErrorCached(self):
+        """
+        When a lookup fails because the upstream server answered that the name
+        does not exist, L{DNSServerFactory.gotResolverError} caches the
+        authority section of that answer with the cache's C{cacheNameError}.
+        """
+        cached = []
+        class FakeCache(object):
+            def cacheNameError(self, query, authority):
+                cached.append((query, authority))
+
+        class FakeProtocol(object):
+            def writeMessage(self, message, address):
+                pass
+
+        soa = dns.RRHeader("example.com", dns.SOA,
+                           payload=dns.Record_SOA(minimum=300))
+        response = Message(rCode=ENAME)
+        response.authority = [soa]
+        message = Message()
+        message.addQuery("missing.example.com", dns.A)
+
+        factory = server.DNSServerFactory(caches=[FakeCache()])
+        factory.gotResolverError(
+            failure.Failure(DNSNameError(response)), FakeProtocol(), message,
+            ("127.0.0.1", 53))
+        self.assertEqual(message.rCode, ENAME)
+        self.assertEqual(cached, [(message.queries[0], [soa])])
+
+
+    def _query(self, factory, id, name="test-domain.com"):
+        """
+        Pass a query for the address of C{name} with the message ID C{id} to
+        C{factory} and return the response written for it.
+        """
+        written = []
+        class FakeProtocol(object):
+            def writeMessage(self, message, address):
+                written.append(message.toStr())
+
+        message = Message(id=id, recDes=1)
+        message.addQuery(name, dns.A)
+        message.timeReceived = 0
+        factory.handleQuery(message, FakeProtocol(), ("127.0.0.1", 53))
+        self.assertEqual(len(written), 1)
+        return written[0]
+
+
+    def _countingAuthority(self):
+        """
+        Return a copy of C{test_domain_com} which counts its lookups in
+        C{self.lookups}.
+        """
+        self.lookups = 0
+        test = self
+        class CountingAuthority(NoFileAuthority):
+            def _lookup(self, *args):
+                test.lookups += 1
+                return NoFileAuthority._lookup(self, *args)
+        return CountingAuthority(test_domain_com.soa, test_domain_com.records)
+
+
+    def test_responseCached(self):
+        """
+        L{DNSServerFactory} keeps the encoded responses of a server which does
+        not recurse, and answers the same question again with the same
+        response and the message ID of the new query, without looking it up.
+        """
+        factory = server.DNSServerFactory([self._countingAuthority()])
+        first = self._query(factory, 1)
+        second = self._query(factory, 2)
+        self.assertEqual(self.lookups, 1)
+        self.assertEqual(second, '\x00\x02' + first[2:])
+
+        decoded = Message()
+        decoded.fromStr(second)
+        self.assertEqual(decoded.id, 2)
+        self.assertEqual(
+            [answer.payload for answer in decoded.answers],
+            [dns.Record_A('127.0.0.1', ttl=19283784)])
+
+
+    def test_nameErrorResponseCached(self):
+        """
+        Responses to queries for names which the authorities know do not
+        exist are kept as well.
+        """
+        factory = server.DNSServerFactory([self._countingAuthority()])
+        first = self._query(factory, 1, "missing.test-domain.com")
+        second = self._query(factory, 2, "missing.test-domain.com")
+        self.assertEqual(self.lookups, 1)
+        self.assertEqual(second, '\x00\x02' + first[2:])
+
+
+    def test_reloadClearsResponses(self):
+        """
+        The kept responses are discarded when one of the authorities of the
+        factory reloads its zone.
+        """
+        authority = self._countingAuthority()
+        factory = server.DNSServerFactory([authority])
+        self._query(factory, 1)
+        authority._zoneReloaded()
+        self._query(factory, 2)
+        self.assertEqual(self.lookups, 2)
+
+
+    def test_recursiveResponsesNotCached(self):
+        """
+        A server with clients to recurse to does not keep its responses,
+        whose TTLs change.
+        """
+        factory = server.DNSServerFactory(
+            [self._countingAuthority()], clients=[client.Resolver(
+                servers=[('127.0.0.1', 53)], reactor=Clock())])
+        self._query(factory, 1)
+        self._query(factory, 2)
+        self.assertEqual(self.lookups, 2)
+
+
+    def test_unwatchedAuthorityResponsesNotCached(self):
+        """
+        A server with an authority which cannot tell it when its records change
+        does not keep its responses.
+        """
+        class Unwatched(common.ResolverBase):
+            def _lookup(self, name, cls, type, timeout):
+                return defer.fail(dns.DomainError(name))
+
+        factory = server.DNSServerFactory(
+            [self._countingAuthority(), Unwatched()])
+        self._query(factory, 1)
+        self._query(factory, 2)
+        self.assertEqual(self.lookups, 2)
+
+
 class HelperTestCase(unittest.TestCase):
     def testSerialGenerator(self):
         f = self.mktemp()
@@ -757,6 +893,76 @@ class AuthorityTests(unittest.TestCase):
         self.assertEqual(additional, [])
 
 
+    def test_reload(self):
+        """
+        L{FileAuthority.reload} loads the zone from its file again and calls
+        the reload observers.
+        """
+        path = self.mktemp()
+        zone = open(path, 'w')
+        zone.write("zone = [SOA('example.com'), A('example.com', '1.2.3.4')]")
+        zone.close()
+        pysource = authority.PySourceAuthority(path)
+        reloads = []
+        pysource.addReloadObserver(lambda: reloads.append(True))
+
+        zone = open(path, 'w')
+        zone.write("zone = [SOA('example.com'), A('example.com', '5.6.7.8')]")
+        zone.close()
+        pysource.reload()
+        self.assertEqual(reloads, [True])
+        self.assertEqual(
+            pysource.records['example.com'][1], dns.Record_A('5.6.7.8'))
+
+
+    def test_applyDiff(self):
+        """
+        L{FileAuthority.applyDiff} removes and adds records, and lookups
+        answer from the changed records, including the additional section of
+        answers for other names.
+        """
+        zone = NoFileAuthority(
+            soa=('example.com', soa_record),
+            records={
+                'example.com': [soa_record, dns.Record_MX(10, 'mail.example.com')],
+                'mail.example.com': [dns.Record_A('1.2.3.4')]})
+        reloads = []
+        zone.addReloadObserver(lambda: reloads.append(True))
+        zone.lookupMailExchange('example.com')
+
+        zone.applyDiff(
+            [('mail.example.com', dns.Record_A('1.2.3.4'))],
+            [('mail.example.com', dns.Record_A('5.6.7.8')),
+             ('www.example.com', dns.Record_A('5.6.7.9'))])
+        self.assertEqual(reloads, [True])
+
+        result = []
+        zone.lookupMailExchange('example.com').addCallback(result.append)
+        zone.lookupAddress('www.example.com').addCallback(result.append)
+        answer, authority, additional = result[0]
+        self.assertEqual(
+            [r.payload for r in additional], [dns.Record_A('5.6.7.8')])
+        answer, authority, additional = result[1]
+        self.assertEqual(
+            [r.payload for r in answer], [dns.Record_A('5.6.7.9')])
+
+
+    def test_recordsReplaced(self):
+        """
+        Lookups answer from a new C{records} dictionary as soon as it replaces
+        the old one.
+        """
+        zone = NoFileAuthority(
+            soa=('example.com', soa_record),
+            records={'example.com': [soa_record, dns.Record_A('1.2.3.4')]})
+        zone.lookupAddress('example.com')
+        zone.records = {'example.com': [soa_record, dns.Record_A('5.6.7.8')]}
+        result = []
+        zone.lookupAddress('example.com').addCallback(result.append)
+        self.assertEqual(
+            [r.payload for r in result[0][0]], [dns.Record_A('5.6.7.8')])
+
+
     def _referralTest(self, method):
         """
         Create an authority and make a request against it.  Then verify that the
@@ -954,3 +1160,52 @@ class SecondaryAuthorityTests(unittest.TestCase):
 
         self.assertEqual(
             [dns.Query('example.com', dns.AXFR, dns.IN)], msg.queries)
+
+
+    def test_zoneTransferReloads(self):
+        """
+        The reload observers of a L{SecondaryAuthority} are called when a zone
+        transfer replaces its records.
+        """
+        secondary = SecondaryAuthority('192.168.1.1', 'example.com')
+        reloads = []
+        secondary.addReloadObserver(lambda: reloads.append(True))
+        secondary._cbZone((
+            [dns.RRHeader('example.com', dns.SOA, payload=dns.Record_SOA()),
+             dns.RRHeader('example.com', dns.A, payload=dns.Record_A())],
+            [], []))
+        self.assertEqual(reloads, [True])
+        self.assertEqual(secondary.records, {'example.com': [dns.Record_A()]})
+
+
+    def test_zoneTransferChanges(self):
+        """
+        A zone transfer for a L{SecondaryAuthority} which already has records
+        only changes the names whose records differ, and lookups answer from
+        the new records.
+        """
+        secondary = SecondaryAuthority('192.168.1.1', 'example.com')
+        soa = dns.RRHeader('example.com', dns.SOA, payload=dns.Record_SOA())
+        unchanged = dns.RRHeader(
+            'www.example.com', dns.A, payload=dns.Record_A('1.2.3.4'))
+        secondary._cbZone(([
+                    soa, unchanged,
+                    dns.RRHeader('example.com', dns.A,
+                                 payload=dns.Record_A('1.2.3.5')),
+                    soa], [], []))
+        www = secondary.records['www.example.com']
+        reloads = []
+        secondary.addReloadObserver(lambda: reloads.append(True))
+
+        secondary._cbZone(([
+                    soa, unchanged,
+                    dns.RRHeader('example.com', dns.A,
+                                 payload=dns.Record_A('1.2.3.6')),
+                    soa], [], []))
+        self.assertEqual(reloads, [True])
+        self.assertIdentical(secondary.records['www.example.com'], www)
+
+        result = []
+        secondary.lookupAddress('example.com').addCallback(result.append)
+        self.assertEqual(
+            [r.payload for r in result[0][0]], [dns.Record_A('1.2.3.6')])
@@ -32,6 +32,12 @@ poll = Reactor(
     'poll', 'twisted.internet.pollreactor', 'poll(2)-based reactor.')
 epoll = Reactor(
     'epoll', 'twisted.internet.epollreactor', 'epoll(4)-based reactor.')
+epollet = Reactor(
+    'epoll-et', 'twisted.internet.epolletreactor',
+    'Edge-triggered epoll(4)-based reactor.')
+uring = Reactor(
+    'uring', 'twisted.internet.uringreactor',
+    'io_uring(7)-based completion reactor for Linux.')
 cf = Reactor(
     'cf' , 'twisted.internet.cfreactor',
     'CoreFoundation integration reactor.')
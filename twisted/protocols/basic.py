@@ -10,8 +10,9 @@ Maintainer: Itamar Shtull-Trauring
 """
 
 # System imports
+import os
 import re
-from struct import pack, unpack, calcsize
+from struct import pack, unpack, unpack_from, calcsize
 import warnings
 import cStringIO
 import math
@@ -440,8 +441,12 @@ class LineOnlyReceiver(protocol.Protocol):
         """
         Translates bytes into lines, and calls lineReceived.
         """
-        lines  = (self._buffer+data).split(self.delimiter)
+        # Split every complete line out in one pass, keeping the single
+        # trailing partial line as the buffer.
+        lines = (self._buffer + data).split(self.delimiter)
         self._buffer = lines.pop(-1)
+        maxLength = self.MAX_LENGTH
+        lineReceived = self.lineReceived
         for line in lines:
             if self.transport.disconnecting:
                 # this is necessary because the transport may be told to lose
@@ -449,11 +454,11 @@ class LineOnlyReceiver(protocol.Protocol):
                 # important to disregard all the lines in that packet following
                 # the one that told it to close.
                 return
-            if len(line) > self.MAX_LENGTH:
+            if len(line) > maxLength:
                 return self.lineLengthExceeded(line)
             else:
-                self.lineReceived(line)
-        if len(self._buffer) > self.MAX_LENGTH:
+                lineReceived(line)
+        if len(self._buffer) > maxLength:
             return self.lineLengthExceeded(self._buffer)
 
 
@@ -525,6 +530,7 @@ class LineReceiver(protocol.Protocol, _PauseableMixin):
     """
     line_mode = 1
     __buffer = ''
+    __offset = 0
     delimiter = '\r\n'
     MAX_LENGTH = 16384
 
@@ -535,8 +541,9 @@ class LineReceiver(protocol.Protocol, _PauseableMixin):
         @return: All of the cleared buffered data.
         @rtype: C{str}
         """
-        b = self.__buffer
+        b = self.__buffer[self.__offset:]
         self.__buffer = ""
+        self.__offset = 0
         return b
 
 
@@ -546,30 +553,57 @@ class LineReceiver(protocol.Protocol, _PauseableMixin):
         Translates bytes into lines, and calls lineReceived (or
         rawDataReceived, depending on mode.)
         """
-        self.__buffer = self.__buffer+data
+        # Scan one buffer, delivering each line as it is found and moving an
+        # offset past it, rather than splitting the remainder of the buffer
+        # off after every line.  The offset is saved before each call to
+        # lineReceived, so that clearLineBuffer and calls to dataReceived made
+        # from it see only the unprocessed data.
+        buffer = self.__buffer
+        offset = self.__offset
+        if offset:
+            buffer = buffer[offset:]
+            offset = 0
+        buffer += data
+        self.__buffer = buffer
+        self.__offset = 0
         while self.line_mode and not self.paused:
-            try:
-                line, self.__buffer = self.__buffer.split(self.delimiter, 1)
-            except ValueError:
-                if len(self.__buffer) > self.MAX_LENGTH:
-                    line, self.__buffer = self.__buffer, ''
+            delimiter = self.delimiter
+            end = buffer.find(delimiter, offset)
+            if end == -1:
+                if len(buffer) - offset > self.MAX_LENGTH:
+                    line = buffer[offset:]
+                    self.__buffer = ''
+                    self.__offset = 0
                     return self.lineLengthExceeded(line)
                 break
-            else:
-                linelength = len(line)
-                if linelength > self.MAX_LENGTH:
-                    exceeded = line + self.__buffer
-                    self.__buffer = ''
-                    return self.lineLengthExceeded(exceeded)
-                why = self.lineReceived(line)
-                if why or self.transport and self.transport.disconnecting:
-                    return why
+            line = buffer[offset:end]
+            offset = end + len(delimiter)
+            if len(line) > self.MAX_LENGTH:
+                exceeded = line + buffer[offset:]
+                self.__buffer = ''
+                self.__offset = 0
+                return self.lineLengthExceeded(exceeded)
+            self.__offset = offset
+            why = self.lineReceived(line)
+            if self.__buffer is not buffer:
+                # lineReceived cleared the buffer or received more data
+                # itself; carry on from wherever that left things.
+                buffer = self.__buffer
+                offset = self.__offset
+            if why or self.transport and self.transport.disconnecting:
+                self.__buffer = buffer[offset:]
+                self.__offset = 0
+                return why
         else:
             if not self.paused:
-                data=self.__buffer
-                self.__buffer=''
+                data = buffer[offset:]
+                self.__buffer = ''
+                self.__offset = 0
                 if data:
                     return self.rawDataReceived(data)
+                return
+        self.__buffer = buffer[offset:]
+        self.__offset = 0
 
 
     def setLineMode(self, extra=''):
@@ -664,7 +698,11 @@ class _RecvdCompatHack(object):
     the default __set__ behavior in both new-style and old-style subclasses.
     """
     def __get__(self, oself, type=None):
-        return oself._unprocessed[oself._compatibilityOffset:]
+        unprocessed = oself._unprocessed[oself._compatibilityOffset:]
+        if isinstance(unprocessed, memoryview):
+            # In the middle of IntNStringReceiver.bufferReceived.
+            unprocessed = unprocessed.tobytes()
+        return unprocessed
 
 
 
@@ -672,10 +710,15 @@ class IntNStringReceiver(protocol.Protocol, _PauseableMixin):
     """
     Generic class for length prefixed protocols.
 
+    Messages are parsed straight out of the receive buffer of transports
+    which support L{interfaces.IBufferReceiver}, so that only the message
+    strings themselves are copied.
+
     @ivar _unprocessed: bytes received, but not yet broken up into messages /
         sent to stringReceived.  _compatibilityOffset must be updated when this
         value is updated so that the C{recvd} attribute can be generated
-        correctly.
+        correctly.  While L{bufferReceived} is delivering messages this is the
+        C{memoryview} it was passed.
     @type _unprocessed: C{bytes}
 
     @ivar structFormat: format used for struct packing/unpacking. Define it in
@@ -691,6 +734,8 @@ class IntNStringReceiver(protocol.Protocol, _PauseableMixin):
     @type _compatibilityOffset: C{int}
     """
 
+    implements(interfaces.IBufferReceiver)
+
     MAX_LENGTH = 99999
     _unprocessed = ""
     _compatibilityOffset = 0
@@ -772,6 +817,60 @@ class IntNStringReceiver(protocol.Protocol, _PauseableMixin):
         self._compatibilityOffset = 0
 
 
+    def bufferReceived(self, view):
+        """
+        Convert int prefixed strings in a view of the transport's receive
+        buffer into calls to stringReceived.
+
+        Only the strings themselves, and any trailing partial message, are
+        copied out of C{view}.  If part of a message is already buffered, or a
+        subclass overrides L{dataReceived}, this falls back to L{dataReceived}.
+
+        @type view: C{memoryview}
+        """
+        dataReceived = getattr(self.dataReceived, 'im_func', None)
+        if (self._unprocessed or
+                dataReceived is not IntNStringReceiver.dataReceived.im_func):
+            self.dataReceived(view.tobytes())
+            return
+
+        end = len(view)
+        currentOffset = 0
+        prefixLength = self.prefixLength
+        fmt = self.structFormat
+        self._unprocessed = view
+        try:
+            while end >= (currentOffset + prefixLength) and not self.paused:
+                messageStart = currentOffset + prefixLength
+                length, = unpack_from(fmt, view, currentOffset)
+                if length > self.MAX_LENGTH:
+                    self._unprocessed = view[currentOffset:].tobytes()
+                    self._compatibilityOffset = 0
+                    self.lengthLimitExceeded(length)
+                    return
+                messageEnd = messageStart + length
+                if end < messageEnd:
+                    break
+
+                currentOffset = messageEnd
+                self._compatibilityOffset = currentOffset
+                self.stringReceived(view[messageStart:messageEnd].tobytes())
+
+                # See the same check in dataReceived.
+                if 'recvd' in self.__dict__:
+                    self._unprocessed = ""
+                    self._compatibilityOffset = 0
+                    recvd = self.__dict__.pop('recvd')
+                    if recvd:
+                        self.dataReceived(recvd)
+                    return
+        finally:
+            # Whatever happens, stop referring to the view before returning.
+            if self._unprocessed is view:
+                self._unprocessed = view[currentOffset:].tobytes()
+                self._compatibilityOffset = 0
+
+
     def sendString(self, string):
         """
         Send a prefixed string to the other end of the connection.
@@ -874,6 +973,10 @@ class FileSender:
     This is a helper for protocols that, at some point, will take a
     file-like object, read its contents, and write them out to the network,
     optionally performing some transformation on the bytes in between.
+
+    If there is no transformation, the file is a real file and the consumer
+    provides L{interfaces.IFileTransport}, the rest of the file is handed to
+    the consumer's C{sendFile} instead of being read.
     """
     implements(interfaces.IProducer)
 
@@ -906,10 +1009,58 @@ class FileSender:
         self.transform = transform
 
         self.deferred = deferred = defer.Deferred()
-        self.consumer.registerProducer(self, False)
+        if not self._sendFile():
+            self.consumer.registerProducer(self, False)
         return deferred
 
 
+    def _sendFile(self):
+        """
+        Send the rest of the file with the consumer's
+        L{interfaces.IFileTransport.sendFile}, if possible.
+
+        @return: C{True} if the file is being sent this way, C{False}
+            otherwise.
+        """
+        if (self.transform is not None or
+                not interfaces.IFileTransport.providedBy(self.consumer) or
+                getattr(self.consumer, 'TLS', False)):
+            return False
+        try:
+            offset = self.file.tell()
+            size = os.fstat(self.file.fileno()).st_size
+        except (AttributeError, IOError, OSError):
+            return False
+        if size <= offset:
+            return False
+        d = self.consumer.sendFile(self.file, offset, size - offset)
+        d.addCallbacks(self._fileSent, self._fileFailed, (size,))
+        return True
+
+
+    def _fileSent(self, ignored, size):
+        """
+        Fire C{self.deferred} with the last byte of the file, leaving the file
+        positioned at its end as L{resumeProducing} would.
+        """
+        self.file.seek(size - 1)
+        self.lastSent = self.file.read(1)
+        self.file = None
+        if self.deferred:
+            self.deferred.callback(self.lastSent)
+            self.deferred = None
+
+
+    def _fileFailed(self, reason):
+        """
+        Fail C{self.deferred} with the reason the file could not be sent.
+        """
+        self.file = None
+        if self.deferred:
+            self.deferred.errback(reason)
+            self.deferred = None
+
+
     def resumeProducing(self):
         chunk = ''
         if self.file:
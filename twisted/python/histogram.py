@@ -0,0 +1,146 @@
+# -*- test-case-name: twisted.python.test.test_histogram -*-
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Compact histograms for latency and size measurements.
+"""
+
+__all__ = ['Histogram']
+
+
+
+class Histogram(object):
+    """
+    A histogram of non-negative values with a bounded relative error, in the
+    style of HdrHistogram.
+
+    Values are counted in whole multiples of C{resolution}, to the nearest
+    one.  Counts below C{2 ** significantBits} each have a bucket of their
+    own; above that, every power of two is split into
+    C{2 ** (significantBits - 1)} equal buckets, so that the error in any
+    value read back is less than one part in C{2 ** (significantBits - 1)}
+    however large it is.  Only buckets which have been used take up space.
+
+    @ivar resolution: The smallest difference between values which is
+        distinguished.  The default, C{1e-6}, suits durations in seconds.
+
+    @ivar count: The number of values recorded.
+
+    @ivar total: The sum of the values recorded.
+
+    @ivar min: The smallest value recorded, or C{None}.
+
+    @ivar max: The largest value recorded, or C{None}.
+
+    @ivar _counts: A C{dict} mapping bucket indexes to the number of values
+        recorded in them.
+    """
+
+    def __init__(self, significantBits=7, resolution=1e-6):
+        if significantBits < 2:
+            raise ValueError(
+                "significantBits must be at least 2, not %r" % (
+                    significantBits,))
+        self.resolution = resolution
+        self._scale = 1.0 / resolution
+        self._bits = significantBits
+        self._half = 1 << (significantBits - 1)
+        self.reset()
+
+
+    def reset(self):
+        """
+        Forget every value recorded so far.
+        """
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self._counts = {}
+
+
+    def _index(self, value):
+        """
+        Return the index of the bucket for C{value} multiples of the resolution.
+        """
+        if value < (self._half << 1):
+            return value
+        shift = len(bin(value)) - 2 - self._bits
+        return (shift + 1) * self._half + (value >> shift) - self._half
+
+
+    def _lowest(self, index):
+        """
+        Return the smallest multiple of the resolution in the bucket C{index}.
+        """
+        if index < (self._half << 1):
+            return index
+        shift = index // self._half - 1
+        return (self._half + index % self._half) << shift
+
+
+    def record(self, value):
+        """
+        Record one value.
+
+        @param value: The value.  Negative values are recorded as zero.
+        @type value: C{float}
+        """
+        value = max(value, 0.0)
+        index = self._index(int(value * self._scale + 0.5))
+        self._counts[index] = self._counts.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+
+    def percentile(self, percentile):
+        """
+        Return the value below which C{percentile} percent of the
+        recorded values fall, to within the precision of the histogram, or
+        C{None} if nothing has been recorded.
+        """
+        if not self.count:
+            return None
+        wanted = max(1, self.count * percentile / 100.0)
+        seen = 0
+        for index in sorted(self._counts):
+            seen += self._counts[index]
+            if seen >= wanted:
+                return min(self._lowest(index) / self._scale, self.max)
+        return self.max
+
+
+    def buckets(self):
+        """
+        Return the buckets which have values in them.
+
+        @return: A C{list} of two-tuples of the smallest value in each bucket
+            and the number of values recorded in it, in order.
+        """
+        return [(self._lowest(index) / self._scale, self._counts[index])
+                for index in sorted(self._counts)]
+
+
+    def update(self, other):
+        """
+        Add the values recorded by another histogram to this one.
+
+        @param other: A L{Histogram} with the same number of significant bits
+            and resolution as this one.
+        """
+        if (other._bits, other.resolution) != (self._bits, self.resolution):
+            raise ValueError(
+                "Cannot add a histogram with a different precision")
+        for index, count in other._counts.iteritems():
+            self._counts[index] = self._counts.get(index, 0) + count
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None and (self.min is None or other.min < self.min):
+            self.min = other.min
+        if other.max is not None and (self.max is None or other.max > self.max):
+            self.max = other.max
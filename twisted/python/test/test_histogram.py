@@ -0,0 +1,122 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Tests for L{twisted.python.histogram}.
+"""
+
+from twisted.python.histogram import Histogram
+from twisted.trial.unittest import TestCase
+
+
+
+class HistogramTests(TestCase):
+    """
+    Tests for L{Histogram}.
+    """
+    def test_empty(self):
+        """
+        An empty L{Histogram} has no percentiles or buckets.
+        """
+        histogram = Histogram()
+        self.assertEqual(histogram.count, 0)
+        self.assertIdentical(histogram.percentile(50), None)
+        self.assertEqual(histogram.buckets(), [])
+
+
+    def test_invalidBits(self):
+        """
+        L{Histogram} needs at least two significant bits.
+        """
+        self.assertRaises(ValueError, Histogram, 1)
+
+
+    def test_record(self):
+        """
+        L{Histogram.record} counts a value and updates the extremes and total.
+        """
+        histogram = Histogram()
+        histogram.record(0.5)
+        histogram.record(0.25)
+        histogram.record(-1)
+        self.assertEqual(histogram.count, 3)
+        self.assertEqual(histogram.min, 0.0)
+        self.assertEqual(histogram.max, 0.5)
+        self.assertEqual(histogram.total, 0.75)
+
+
+    def test_precision(self):
+        """
+        The value read back from a bucket is below the values recorded in it
+        by less than one part in C{2 ** (significantBits - 1)}.
+        """
+        histogram = Histogram(significantBits=4)
+        for micros in [0, 7, 15, 16, 17, 100, 1000, 123456, 9876543]:
+            histogram.reset()
+            histogram.record(micros / 1000000.0)
+            [(lowest, count)] = histogram.buckets()
+            self.assertEqual(count, 1)
+            self.assertTrue(lowest <= micros / 1000000.0)
+            self.assertTrue(micros - lowest * 1000000 <= micros / 8.0 + 1e-6)
+
+
+    def test_percentile(self):
+        """
+        L{Histogram.percentile} returns the value below which the given
+        percentage of values fall.
+        """
+        histogram = Histogram()
+        for micros in range(1, 101):
+            histogram.record(micros / 1000000.0)
+        self.assertEqual(histogram.percentile(50), 0.00005)
+        self.assertEqual(histogram.percentile(99), 0.000099)
+        self.assertEqual(histogram.percentile(100), 0.0001)
+
+
+    def test_reset(self):
+        """
+        L{Histogram.reset} forgets every value.
+        """
+        histogram = Histogram()
+        histogram.record(1)
+        histogram.reset()
+        self.assertEqual(histogram.count, 0)
+        self.assertIdentical(histogram.max, None)
+        self.assertEqual(histogram.buckets(), [])
+
+
+    def test_resolution(self):
+        """
+        Values are counted in multiples of the resolution given to
+        L{Histogram}.
+        """
+        histogram = Histogram(resolution=1)
+        for depth in [0, 3, 3, 1001]:
+            histogram.record(depth)
+        self.assertEqual(histogram.buckets(), [(0, 1), (3, 2), (1000, 1)])
+        self.assertEqual(histogram.percentile(50), 3)
+
+
+    def test_update(self):
+        """
+        L{Histogram.update} adds the values recorded by another histogram.
+        """
+        first = Histogram()
+        first.record(0.001)
+        second = Histogram()
+        second.record(0.001)
+        second.record(0.5)
+        first.update(second)
+        self.assertEqual(first.count, 3)
+        self.assertEqual(first.max, 0.5)
+        self.assertEqual(first.min, 0.001)
+        self.assertEqual(first.buckets(), [(0.001, 2), (0.499712, 1)])
+
+
+    def test_updateDifferentPrecision(self):
+        """
+        L{Histogram.update} raises L{ValueError} if the other histogram counts
+        values differently.
+        """
+        self.assertRaises(
+            ValueError, Histogram().update, Histogram(resolution=1))
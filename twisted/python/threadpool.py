@@ -9,11 +9,13 @@ In most cases you can just use C{reactor.callInThread} and friends
 instead of creating a thread pool directly.
 """
 
-import Queue
 import threading
+import time
 import copy
+from collections import deque
 
 from twisted.python import log, context, failure
+from twisted.python.histogram import Histogram
 
 
 WorkerStop = object()
@@ -26,7 +28,41 @@ class ThreadPool:
 
     L{callInThread} and L{stop} should only be called from
     a single thread, unless you make a subclass where L{stop} and
-    L{_startSomeWorkers} are synchronized.
+    L{_startSomeWorkers} are synchronized.  Work may also be submitted from
+    the threads of the pool itself.
+
+    Work is queued on one of several deques, each of which is the home of
+    some of the worker threads, and a semaphore counts the work queued in all
+    of them.  A worker takes work from its home deque first and steals it from
+    the others when that is empty, so no work waits while a thread is idle.
+
+    @ivar working: A C{list} of the threads which are running work.
+
+    @ivar q: An object with the C{qsize}, C{empty} and C{put} methods of the
+        C{Queue.Queue} work used to be queued on, kept for compatibility.
+
+    @ivar waiters: A C{list} of the threads waiting for work, kept for
+        compatibility.
+
+    @ivar _queues: A C{list} of C{deque}s of queued work.  It only ever
+        grows, so that work is never queued on a deque nobody looks at.
+
+    @ivar _pending: A semaphore counting the work in all of C{_queues}.
+
+    @ivar _queued: The amount of work in all of C{_queues}, so that it can be
+        found without looking at each of them.
+
+    @ivar _local: A C{threading.local} holding the home deque of each worker
+        thread as its C{queue} attribute.
+
+    @ivar _stats: A C{list} of the L{_WorkerStats} of every worker which is
+        running.
+
+    @ivar _retired: The L{_WorkerStats} of the workers which have exited,
+        added together.
+
+    @ivar _statsLock: A lock held while C{_stats}, C{_retired}, the
+        statistics in them, C{working} or C{_queued} change or are read.
     """
     min = 5
     max = 20
@@ -37,6 +73,7 @@ class ThreadPool:
 
     threadFactory = threading.Thread
     currentThread = staticmethod(threading.currentThread)
+    seconds = staticmethod(time.time)
 
     def __init__(self, minthreads=5, maxthreads=20, name=None):
         """
@@ -47,13 +84,98 @@ class ThreadPool:
         """
         assert minthreads >= 0, 'minimum is negative'
         assert minthreads <= maxthreads, 'minimum is greater than maximum'
-        self.q = Queue.Queue(0)
         self.min = minthreads
         self.max = maxthreads
         self.name = name
-        self.waiters = []
         self.threads = []
         self.working = []
+        self._queues = []
+        self._addQueues()
+        self._next = 0
+        self._queued = 0
+        self._pending = threading.Semaphore(0)
+        self._local = threading.local()
+        self._stats = []
+        self._retired = _WorkerStats()
+        self._statsLock = threading.Lock()
+        self.submitted = 0
+
+
+    def _addQueues(self):
+        """
+        Make sure there is a deque for each thread the pool may have.
+        """
+        while len(self._queues) < max(self.max, 1):
+            self._queues.append(deque())
+
+
+    def _put(self, o):
+        """
+        Queue C{o}, on the home deque of the current thread if it is a worker
+        of this pool, or on the next deque in turn otherwise.
+        """
+        queue = getattr(self._local, 'queue', None)
+        if queue is None:
+            queues = self._queues
+            queue = queues[self._next % len(queues)]
+            self._next += 1
+        self._statsLock.acquire()
+        try:
+            self._queued += 1
+        finally:
+            self._statsLock.release()
+        queue.append(o)
+        self._pending.release()
+
+
+    def _get(self, home):
+        """
+        Wait for work and take it from C{home}, or from another deque if
+        C{home} is empty.
+        """
+        self._pending.acquire()
+        self._statsLock.acquire()
+        try:
+            self._queued -= 1
+        finally:
+            self._statsLock.release()
+        while True:
+            try:
+                return home.popleft()
+            except IndexError:
+                pass
+            # The work counted by the semaphore is somewhere; it may move
+            # past this loop while it is being stolen, in which case look
+            # again.
+            for queue in self._queues:
+                try:
+                    return queue.popleft()
+                except IndexError:
+                    pass
+
+
+    def queued(self):
+        """
+        Return the amount of work waiting for a thread.
+        """
+        return self._queued
+
+
+    def _getQueue(self):
+        return _QueueView(self)
+
+    q = property(_getQueue)
+
+
+    def _getWaiters(self):
+        self._statsLock.acquire()
+        try:
+            return [thread for thread in self.threads
+                    if thread not in self.working]
+        finally:
+            self._statsLock.release()
+
+    waiters = property(_getWaiters)
 
 
     def start(self):
@@ -69,13 +191,15 @@ class ThreadPool:
     def startAWorker(self):
         self.workers += 1
         name = "PoolThread-%s-%s" % (self.name or id(self), self.workers)
-        newThread = self.threadFactory(target=self._worker, name=name)
+        home = self._queues[(self.workers - 1) % len(self._queues)]
+        newThread = self.threadFactory(
+            target=self._worker, name=name, args=(home,))
         self.threads.append(newThread)
         newThread.start()
 
 
     def stopAWorker(self):
-        self.q.put(WorkerStop)
+        self._put(WorkerStop)
         self.workers -= 1
 
 
@@ -92,7 +216,9 @@ class ThreadPool:
 
 
     def _startSomeWorkers(self):
-        neededSize = self.q.qsize() + len(self.working)
+        if self.workers >= self.max:
+            return
+        neededSize = self.queued() + len(self.working)
         # Create enough, but not too many
         while self.workers < min(self.max, neededSize):
             self.startAWorker()
@@ -144,25 +270,45 @@ class ThreadPool:
         if self.joined:
             return
         ctx = context.theContextTracker.currentContext().contexts[-1]
-        o = (ctx, func, args, kw, onResult)
-        self.q.put(o)
+        o = (ctx, func, args, kw, onResult, self.seconds())
+        self.submitted += 1
+        self._put(o)
         if self.started:
             self._startSomeWorkers()
 
 
-    def _worker(self):
+    def _worker(self, home):
         """
         Method used as target of the created threads: retrieve a task to run
         from the threadpool, run it, and proceed to the next task until
         threadpool is stopped.
+
+        @param home: The deque this thread takes work from first, and queues
+            the work it submits on.
         """
         ct = self.currentThread()
-        o = self.q.get()
+        seconds = self.seconds
+        lock = self._statsLock
+        stats = _WorkerStats()
+        lock.acquire()
+        try:
+            self._stats.append(stats)
+        finally:
+            lock.release()
+        self._local.queue = home
+        o = self._get(home)
         while o is not WorkerStop:
-            self.working.append(ct)
-            ctx, function, args, kwargs, onResult = o
+            ctx, function, args, kwargs, onResult, queuedAt = o
             del o
 
+            started = seconds()
+            lock.acquire()
+            try:
+                self.working.append(ct)
+                stats.wait.record(started - queuedAt)
+                stats.depth.record(self._queued)
+            finally:
+                lock.release()
             try:
                 result = context.call(ctx, function, *args, **kwargs)
                 success = True
@@ -173,10 +319,16 @@ class ThreadPool:
                     result = None
                 else:
                     result = failure.Failure()
+            finished = seconds()
 
             del function, args, kwargs
 
-            self.working.remove(ct)
+            lock.acquire()
+            try:
+                stats.run.record(finished - started)
+                self.working.remove(ct)
+            finally:
+                lock.release()
 
             if onResult is not None:
                 try:
@@ -186,13 +338,25 @@ class ThreadPool:
 
             del ctx, onResult, result
 
-            self.waiters.append(ct)
-            o = self.q.get()
-            self.waiters.remove(ct)
+            o = self._get(home)
 
+        self._retire(stats)
         self.threads.remove(ct)
 
 
+    def _retire(self, stats):
+        """
+        Add the L{_WorkerStats} of an exiting worker to C{_retired}, so that
+        they are still counted once the worker is gone.
+        """
+        self._statsLock.acquire()
+        try:
+            self._stats.remove(stats)
+            self._retired.update(stats)
+        finally:
+            self._statsLock.release()
+
+
     def stop(self):
         """
         Shutdown the threads in the threadpool.
@@ -200,7 +364,7 @@ class ThreadPool:
         self.joined = True
         threads = copy.copy(self.threads)
         while self.workers:
-            self.q.put(WorkerStop)
+            self._put(WorkerStop)
             self.workers -= 1
 
         # and let's just make sure
@@ -220,6 +384,7 @@ class ThreadPool:
 
         self.min = minthreads
         self.max = maxthreads
+        self._addQueues()
         if not self.started:
             return
 
@@ -233,8 +398,116 @@ class ThreadPool:
         self._startSomeWorkers()
 
 
+    def getStats(self):
+        """
+        Return statistics about the work done by this pool.
+
+        @return: A C{dict} with these keys:
+            - C{"submitted"}: the number of calls submitted.
+            - C{"queued"}: the number of calls waiting for a thread.
+            - C{"working"}: the number of threads running a call.
+            - C{"workers"}: the number of threads in the pool.
+            - C{"wait"}: a L{Histogram} of the seconds each call waited for a
+              thread.
+            - C{"run"}: a L{Histogram} of the seconds each call ran for.
+            - C{"depth"}: a L{Histogram} of the number of calls still waiting
+              when each call was started.
+        """
+        total = _WorkerStats()
+        self._statsLock.acquire()
+        try:
+            for stats in [self._retired] + self._stats:
+                total.update(stats)
+            working = len(self.working)
+            queued = self._queued
+        finally:
+            self._statsLock.release()
+        return {"submitted": self.submitted,
+                "queued": queued,
+                "working": working,
+                "workers": self.workers,
+                "wait": total.wait,
+                "run": total.run,
+                "depth": total.depth}
+
+
     def dumpStats(self):
-        log.msg('queue: %s'   % self.q.queue)
-        log.msg('waiters: %s' % self.waiters)
-        log.msg('workers: %s' % self.working)
+        self._statsLock.acquire()
+        try:
+            working = self.working[:]
+        finally:
+            self._statsLock.release()
+        log.msg('queue: %s'   % [list(queue) for queue in self._queues])
+        log.msg('workers: %s' % working)
         log.msg('total: %s'   % self.threads)
+        stats = self.getStats()
+        log.msg('submitted: %d, completed: %d' % (
+                stats['submitted'], stats['run'].count))
+        for name in ['wait', 'run', 'depth']:
+            histogram = stats[name]
+            if histogram.count:
+                log.msg('%s: mean %g, 50%% %g, 99%% %g, max %g' % (
+                        name, histogram.total / histogram.count,
+                        histogram.percentile(50), histogram.percentile(99),
+                        histogram.max))
+
+
+
+class _QueueView(object):
+    """
+    The parts of the C{Queue.Queue} interface which L{ThreadPool} used to
+    expose as its C{q} attribute, over the deques it now queues work on.
+    """
+
+    def __init__(self, pool):
+        self._pool = pool
+
+
+    def qsize(self):
+        return self._pool.queued()
+
+
+    def empty(self):
+        return not self._pool.queued()
+
+
+    def put(self, item):
+        self._pool._put(item)
+
+
+    def _getQueue(self):
+        queued = []
+        for queue in self._pool._queues:
+            queued.extend(queue)
+        return queued
+
+    queue = property(_getQueue)
+
+
+
+class _WorkerStats(object):
+    """
+    The statistics kept by one worker thread of a L{ThreadPool}, which only
+    that thread updates, while holding the pool's C{_statsLock}.
+
+    @ivar wait: A L{Histogram} of the seconds each call waited for a thread.
+
+    @ivar run: A L{Histogram} of the seconds each call ran for.
+
+    @ivar depth: A L{Histogram} of the number of calls still waiting when
+        each call was started.
+    """
+
+    def __init__(self):
+        self.wait = Histogram()
+        self.run = Histogram()
+        self.depth = Histogram(resolution=1)
+
+
+    def update(self, other):
+        """
+        Add the statistics recorded by another L{_WorkerStats} to these.
+        """
+        self.wait.update(other.wait)
+        self.run.update(other.run)
+        self.depth.update(other.depth)
@@ -2,7 +2,7 @@
 # Copyright (c) Twisted Matrix Laboratories.
 # See LICENSE for details.
 
-import os, errno, sys
+import os, errno, sys, signal
 
 from twisted.python import log, syslog, logfile, usage
 from twisted.python.util import switchUID, uidFromString, gidFromString
@@ -41,6 +41,11 @@ class ServerOptions(app.ServerOptions):
                      ['gid', 'g', None, "The gid to run as.", gidFromString],
                      ['umask', None, None,
                       "The (octal) file creation mask to apply.", _umask],
+                     ['workers', None, None,
+                      "Fork this many worker processes, each running the "
+                      "application with its own reactor.  TCP ports must be "
+                      "listened on with reuseport for the workers to share "
+                      "them.", int],
                     ]
 
     compData = usage.Completions(
@@ -64,6 +69,8 @@ class ServerOptions(app.ServerOptions):
         app.ServerOptions.postOptions(self)
         if self['pidfile']:
             self['pidfile'] = os.path.abspath(self['pidfile'])
+        if self['workers'] is not None and self['workers'] < 1:
+            raise usage.UsageError("--workers must be at least 1")
 
 
 def checkPID(pidfile):
@@ -195,6 +202,61 @@ def daemonize(reactor, os):
 
 
 
+def _replaceWaker(reactor):
+    """
+    Give C{reactor} a waker of its own, rather than the one inherited from the
+    process it was forked from, which would also wake up every other process
+    sharing it.
+    """
+    waker = getattr(reactor, 'waker', None)
+    if waker is None:
+        return
+    reactor.removeReader(waker)
+    reactor._internalReaders.discard(waker)
+    waker.connectionLost(None)
+    reactor.waker = None
+    reactor.installWaker()
+
+
+
+def forkWorkers(reactor, count, os):
+    """
+    Fork C{count} worker processes from this one.
+
+    Each worker goes on to start the application and run its own copy of
+    C{reactor}, while this process only waits for them.  State shared with
+    the kernel which must not be shared between workers, such as an epoll
+    instance or the reactor's waker, is recreated in each of them.
+
+    @param reactor: The reactor in use.  If it provides L{IReactorDaemonize},
+        its daemonization-related callbacks are used to recreate its kernel
+        state in each worker.
+
+    @param count: The number of workers to fork.
+
+    @param os: An object like the os module to use to perform the forking.
+
+    @return: A two-tuple.  In a worker, the index of that worker, counting
+        from C{0}, and an empty list.  In the original process, C{None} and
+        the list of the process IDs of the workers.
+    """
+    daemonizing = IReactorDaemonize.providedBy(reactor)
+    if daemonizing:
+        reactor.beforeDaemonize()
+
+    pids = []
+    for index in range(count):
+        pid = os.fork()
+        if not pid:
+            if daemonizing:
+                reactor.afterDaemonize()
+            _replaceWaker(reactor)
+            return index, []
+        pids.append(pid)
+    return None, pids
+
+
+
 def launchWithName(name):
     if name and name != sys.argv[0]:
         exe = os.path.realpath(sys.executable)
@@ -210,6 +272,13 @@ class UnixApplicationRunner(app.ApplicationRunner):
     """
     loggerFactory = UnixAppLogger
 
+    # The index of this process among the workers forked for the --workers
+    # option, or None if this is not a worker.
+    workerIndex = None
+
+    # The process IDs of the workers forked by this process.
+    workerPIDs = ()
+
     def preApplication(self):
         """
         Do pre-application-creation setup.
@@ -228,8 +297,43 @@ class UnixApplicationRunner(app.ApplicationRunner):
         clean up PID files and such.
         """
         self.startApplication(self.application)
-        self.startReactor(None, self.oldstdout, self.oldstderr)
-        self.removePID(self.config['pidfile'])
+        if self.workerPIDs:
+            self.waitForWorkers()
+        else:
+            self.startReactor(None, self.oldstdout, self.oldstderr)
+        if self.workerIndex is None:
+            self.removePID(self.config['pidfile'])
+
+
+    def waitForWorkers(self):
+        """
+        Wait for all of the worker processes forked by L{startApplication} to
+        exit, passing on any I{SIGTERM} or I{SIGINT} received to them.
+        """
+        pids = list(self.workerPIDs)
+
+        def forward(signum, frame):
+            for pid in pids:
+                try:
+                    os.kill(pid, signum)
+                except OSError:
+                    pass
+        signal.signal(signal.SIGTERM, forward)
+        signal.signal(signal.SIGINT, forward)
+
+        while pids:
+            try:
+                pid, status = os.wait()
+            except OSError, e:
+                if e.errno == errno.EINTR:
+                    continue
+                if e.errno == errno.ECHILD:
+                    break
+                raise
+            if pid in pids:
+                pids.remove(pid)
+                log.msg("Worker process %d exited with status %d" % (
+                        pid, status))
 
 
     def removePID(self, pidfile):
@@ -337,6 +441,16 @@ class UnixApplicationRunner(app.ApplicationRunner):
             self.config['nodaemon'], self.config['umask'],
             self.config['pidfile'])
 
+        if self.config.get('workers'):
+            from twisted.internet import reactor
+            self.workerIndex, self.workerPIDs = forkWorkers(
+                reactor, self.config['workers'], os)
+            if self.workerIndex is None:
+                log.msg("Forked worker processes %s" % (
+                        ", ".join(map(str, self.workerPIDs)),))
+                return
+            log.msg("Worker process %d started" % (self.workerIndex,))
+
         service.IService(application).privilegedStartService()
 
         uid, gid = self.config['uid'], self.config['gid']
@@ -538,6 +538,68 @@ class DeferredTestCase(unittest.TestCase):
         self.assertEqual(called, [1, 2, 3])
 
 
+    def test_reentrantCallbacksAfterResult(self):
+        """
+        A callback added to a L{Deferred} which already has a result by a
+        callback added after that result is run once the running callback
+        returns.
+        """
+        deferred = defer.succeed(None)
+        called = []
+        def callback2(result):
+            called.append(2)
+        def callback1(result):
+            called.append(1)
+            deferred.addCallback(callback2)
+            self.assertEqual(called, [1])
+            return 'result'
+        deferred.addCallback(callback1)
+        self.assertEqual(called, [1, 2])
+        self.assertEqual(deferred.callbacks, [])
+
+
+    def test_callbackAfterResultReturnsDeferred(self):
+        """
+        If a callback added to a L{Deferred} which already has a result
+        returns another L{Deferred}, the first waits for the result of the
+        second.
+        """
+        deferred = defer.succeed(None)
+        waitedOn = defer.Deferred()
+        deferred.addCallback(lambda ignored: waitedOn)
+        results = []
+        deferred.addCallback(results.append)
+        self.assertIdentical(deferred._chainedTo, waitedOn)
+        self.assertEqual(results, [])
+        waitedOn.callback('result')
+        self.assertEqual(results, ['result'])
+        self.assertIdentical(deferred._chainedTo, None)
+
+
+    def test_callbackAfterResultRaises(self):
+        """
+        If a callback added to a L{Deferred} which already has a result raises
+        an exception, the result becomes a L{failure.Failure} wrapping it.
+        """
+        deferred = defer.succeed(None)
+        deferred.addCallback(lambda ignored: 1 / 0)
+        self.assertIsInstance(deferred.result, failure.Failure)
+        self.assertFailure(deferred, ZeroDivisionError)
+        return deferred
+
+
+    def test_noInstanceDictionary(self):
+        """
+        L{Deferred} keeps its own state in slots, so an instance has no
+        dictionary until another attribute is set on it.
+        """
+        deferred = defer.succeed(None)
+        deferred.addCallback(lambda ignored: None)
+        self.assertEqual(vars(deferred), {})
+        deferred.extra = 'attribute'
+        self.assertEqual(vars(deferred), {'extra': 'attribute'})
+
+
     def test_nonReentrantCallbacks(self):
         """
         A callback added to a L{Deferred} by a callback on that L{Deferred}
@@ -337,6 +337,41 @@ a'''
         self.assertEqual(protocol.rest, '')
 
 
+    def test_manyLinesInOneCall(self):
+        """
+        Every line in data received all at once is delivered, in order, and
+        only the trailing partial line is kept.
+        """
+        a = LineTester()
+        a.makeConnection(protocol.FileWrapper(
+                proto_helpers.StringIOWithoutClosing()))
+        lines = ['line %d' % (i,) for i in range(1000)]
+        a.dataReceived('\n'.join(lines) + '\npartial')
+        self.assertEqual(a.received, lines)
+        self.assertEqual(a.clearLineBuffer(), 'partial')
+
+
+    def test_dataReceivedFromLineReceived(self):
+        """
+        If C{lineReceived} calls C{dataReceived}, the lines still buffered are
+        delivered by that call, followed by the new data, and are not delivered
+        again.
+        """
+        class ReentrantReceiver(basic.LineReceiver):
+            delimiter = '\n'
+            def connectionMade(self):
+                self.received = []
+            def lineReceived(self, line):
+                self.received.append(line)
+                if line == 'reenter':
+                    self.dataReceived('inner\n')
+
+        a = ReentrantReceiver()
+        a.makeConnection(proto_helpers.StringTransport())
+        a.dataReceived('reenter\nfirst\nsecond\n')
+        self.assertEqual(a.received, ['reenter', 'first', 'second', 'inner'])
+
+
 
 class LineOnlyReceiverTestCase(unittest.TestCase):
     """
@@ -779,6 +814,85 @@ class IntNTestCaseMixin(LPTestCaseMixin):
 
 
 
+class BufferReceiverTestsMixin(object):
+    """
+    Mixin defining tests for the C{bufferReceived} method of int-prefixed
+    protocols, to be mixed in with L{IntNTestCaseMixin} on a L{TestCase}
+    subclass.
+    """
+
+    def test_bufferReceived(self):
+        """
+        L{IntNStringReceiver.bufferReceived} delivers each complete string in
+        the C{memoryview} it is given to C{stringReceived}, as C{str}, and
+        buffers a trailing partial message for the next call.
+        """
+        r = self.getProtocol()
+        data = "".join([struct.pack(r.structFormat, len(s)) + s
+                        for s in self.strings])
+        partial = struct.pack(r.structFormat, 3) + "x"
+        r.bufferReceived(memoryview(data + partial))
+        self.assertEqual(r.received, self.strings)
+        self.assertEqual([type(s) for s in r.received],
+                         [str] * len(self.strings))
+        self.assertEqual(r._unprocessed, partial)
+        self.assertEqual(type(r._unprocessed), str)
+        r.bufferReceived(memoryview("yz"))
+        self.assertEqual(r.received, self.strings + ["xyz"])
+
+
+    def test_bufferReceivedOverriddenDataReceived(self):
+        """
+        If C{dataReceived} is overridden, L{IntNStringReceiver.bufferReceived}
+        passes the contents of the view to it, so that subclasses which
+        intercept received data keep working.
+        """
+        r = self.getProtocol()
+        received = []
+        r.dataReceived = received.append
+        r.bufferReceived(memoryview("some data"))
+        self.assertEqual(received, ["some data"])
+        self.assertEqual(r.received, [])
+
+
+    def test_bufferReceivedLengthLimitExceeded(self):
+        """
+        L{IntNStringReceiver.bufferReceived} calls C{lengthLimitExceeded} for
+        a length prefix greater than C{MAX_LENGTH}, and does not deliver the
+        string.
+        """
+        length = []
+        r = self.getProtocol()
+        r.lengthLimitExceeded = length.append
+        r.MAX_LENGTH = 10
+        r.bufferReceived(
+            memoryview(struct.pack(r.structFormat, 11) + 'x' * 11))
+        self.assertEqual(length, [11])
+        self.assertEqual(r.received, [])
+
+
+    def test_bufferReceivedPaused(self):
+        """
+        If C{stringReceived} pauses the protocol, the remainder of the
+        C{memoryview} passed to L{IntNStringReceiver.bufferReceived} is copied
+        and delivered once it is resumed.
+        """
+        r = self.getProtocol()
+        def stringReceived(receivedString):
+            r.received.append(receivedString)
+            r.pauseProducing()
+        r.stringReceived = stringReceived
+        data = "".join([struct.pack(r.structFormat, len(s)) + s
+                        for s in self.strings])
+        r.bufferReceived(memoryview(data))
+        self.assertEqual(r.received, self.strings[:1])
+        self.assertEqual(type(r._unprocessed), str)
+        while r.paused:
+            r.resumeProducing()
+        self.assertEqual(r.received, self.strings)
+
+
+
 class RecvdAttributeMixin(object):
     """
     Mixin defining tests for string receiving protocols with a C{recvd}
@@ -883,6 +997,30 @@ class RecvdAttributeMixin(object):
         self.assertEqual(result[1], message)
 
 
+    def test_recvdInBufferReceived(self):
+        """
+        In stringReceived, recvd contains the remaining data in the
+        C{memoryview} passed to L{IntNStringReceiver.bufferReceived} as a
+        C{str}, and changing it causes messages to be parsed from it instead.
+        """
+        r = self.getProtocol()
+        result = []
+        recvds = []
+        messageA = self.makeMessage(r, 'a' * 5)
+        messageB = self.makeMessage(r, 'b' * 5)
+        messageC = self.makeMessage(r, 'c' * 5)
+        def stringReceived(receivedString):
+            recvds.append(r.recvd)
+            if not result:
+                r.recvd = messageC
+            result.append(receivedString)
+        r.stringReceived = stringReceived
+        r.bufferReceived(memoryview(messageA + messageB))
+        self.assertEqual(result, ['a' * 5, 'c' * 5])
+        self.assertEqual(recvds, [messageB, ''])
+        self.assertEqual(r._unprocessed, '')
+
+
 
 class TestInt32(TestMixin, basic.Int32StringReceiver):
     """
@@ -893,7 +1031,8 @@ class TestInt32(TestMixin, basic.Int32StringReceiver):
 
 
 
-class Int32TestCase(unittest.TestCase, IntNTestCaseMixin, RecvdAttributeMixin):
+class Int32TestCase(unittest.TestCase, IntNTestCaseMixin,
+                     BufferReceiverTestsMixin, RecvdAttributeMixin):
     """
     Test case for int32-prefixed protocol
     """
@@ -923,7 +1062,8 @@ class TestInt16(TestMixin, basic.Int16StringReceiver):
 
 
 
-class Int16TestCase(unittest.TestCase, IntNTestCaseMixin, RecvdAttributeMixin):
+class Int16TestCase(unittest.TestCase, IntNTestCaseMixin,
+                     BufferReceiverTestsMixin, RecvdAttributeMixin):
     """
     Test case for int16-prefixed protocol
     """
@@ -978,7 +1118,8 @@ class TestInt8(TestMixin, basic.Int8StringReceiver):
 
 
 
-class Int8TestCase(unittest.TestCase, IntNTestCaseMixin, RecvdAttributeMixin):
+class Int8TestCase(unittest.TestCase, IntNTestCaseMixin,
+                    BufferReceiverTestsMixin, RecvdAttributeMixin):
     """
     Test case for int8-prefixed protocol
     """
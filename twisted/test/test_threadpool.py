@@ -5,10 +5,10 @@
 Tests for L{twisted.python.threadpool}
 """
 
-import pickle, time, weakref, gc, threading
+import pickle, time, weakref, gc, threading, random
 
 from twisted.trial import unittest
-from twisted.python import threadpool, threadable, failure, context
+from twisted.python import threadpool, threadable, failure, context, log
 from twisted.internet import reactor
 from twisted.internet.defer import Deferred
 
@@ -459,6 +459,113 @@ class ThreadPoolTestCase(unittest.TestCase):
 
 
 
+    def test_workStealing(self):
+        """
+        Work submitted by a worker thread is queued on that thread's own
+        deque, and is run by another thread while the first is busy.
+        """
+        tp = threadpool.ThreadPool(2, 2)
+        tp.start()
+        self.addCleanup(tp.stop)
+        stolen = threading.Event()
+        done = threading.Lock()
+        done.acquire()
+        def submitAndWait():
+            tp.callInThread(stolen.set)
+            stolen.wait(self.getTimeout())
+            if stolen.isSet():
+                done.release()
+        tp.callInThread(submitAndWait)
+        self._waitForLock(done)
+
+
+    def test_stats(self):
+        """
+        L{ThreadPool.getStats} reports how many calls have been submitted and
+        how long they waited and ran for.
+        """
+        now = [0]
+        tp = threadpool.ThreadPool(0, 1)
+        tp.seconds = lambda: now[0]
+        def advance():
+            now[0] += 2
+        done = threading.Lock()
+        done.acquire()
+        tp.callInThread(advance)
+        tp.callInThread(done.release)
+        now[0] = 3
+        tp.start()
+        self.addCleanup(tp.stop)
+        self._waitForLock(done)
+        tp.stop()
+
+        stats = tp.getStats()
+        self.assertEqual(stats["submitted"], 2)
+        self.assertEqual(stats["queued"], 0)
+        self.assertEqual(stats["workers"], 0)
+        self.assertEqual(stats["run"].count, 2)
+        self.assertEqual(stats["run"].max, 2)
+        self.assertEqual(stats["wait"].min, 3)
+        self.assertEqual(stats["wait"].max, 5)
+        self.assertEqual(stats["depth"].max, 1)
+
+
+    def test_statsOfExitedWorkers(self):
+        """
+        L{ThreadPool} stops keeping the statistics of each worker separately
+        once it has exited, but L{ThreadPool.getStats} still counts them.
+        """
+        tp = threadpool.ThreadPool(3, 3)
+        tp.start()
+        self.addCleanup(tp.stop)
+        done = threading.Lock()
+        done.acquire()
+        tp.callInThread(done.release)
+        self._waitForLock(done)
+        tp.stop()
+
+        self.assertEqual(tp._stats, [])
+        self.assertEqual(tp.getStats()["run"].count, 1)
+
+
+    def test_statsWhileWorking(self):
+        """
+        L{ThreadPool.getStats} and L{ThreadPool.dumpStats} can be called while
+        the workers are recording statistics.
+        """
+        tp = threadpool.ThreadPool(8, 8)
+        # Scattered times make the workers add buckets to their histograms
+        # all the time.
+        tp.seconds = lambda: random.random() * 1000
+        tp.start()
+        self.addCleanup(tp.stop)
+        calls = 2000
+        for i in xrange(calls):
+            tp.callInThread(time.sleep, 0.0001)
+        self.patch(log, "msg", lambda *args, **kwargs: None)
+        while tp.getStats()["run"].count < calls:
+            tp.dumpStats()
+        tp.stop()
+        self.assertEqual(tp.getStats()["run"].count, calls)
+
+
+    def test_compatibility(self):
+        """
+        L{ThreadPool} still has the C{q}, C{waiters} and C{working} attributes
+        which it had before work was queued on several deques.
+        """
+        tp = threadpool.ThreadPool(0, 1)
+        self.assertEqual(tp.q.qsize(), 0)
+        self.assertTrue(tp.q.empty())
+        tp.callInThread(lambda: None)
+        self.assertEqual(tp.q.qsize(), 1)
+        self.assertFalse(tp.q.empty())
+        self.assertEqual(len(tp.q.queue), 1)
+        self.assertEqual(tp.waiters, [])
+        self.assertEqual(tp.working, [])
+
+
+
 class RaceConditionTestCase(unittest.TestCase):
     def setUp(self):
         self.event = threading.Event()
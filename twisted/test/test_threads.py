@@ -320,6 +320,40 @@ class DeferToThreadPoolTestCase(unittest.TestCase):
 
 
 
+    def test_batchedResults(self):
+        """
+        Results which arrive before the reactor has delivered earlier ones
+        are delivered with the same call to C{callFromThread}.
+        """
+        class FakeReactor(object):
+            def __init__(self):
+                self.calls = []
+            def callFromThread(self, f, *args, **kwargs):
+                self.calls.append((f, args, kwargs))
+
+        class SynchronousThreadPool(object):
+            def callInThreadWithCallback(self, onResult, f, *args, **kwargs):
+                onResult(True, f(*args, **kwargs))
+
+        fakeReactor = FakeReactor()
+        pool = SynchronousThreadPool()
+        results = []
+        for value in [1, 2]:
+            d = threads.deferToThreadPool(
+                fakeReactor, pool, lambda value=value: value)
+            d.addCallback(results.append)
+        self.assertEqual(len(fakeReactor.calls), 1)
+        self.assertEqual(results, [])
+
+        f, args, kwargs = fakeReactor.calls.pop()
+        f(*args, **kwargs)
+        self.assertEqual(results, [1, 2])
+
+        threads.deferToThreadPool(fakeReactor, pool, lambda: 3)
+        self.assertEqual(len(fakeReactor.calls), 1)
+
+
+
 _callBeforeStartupProgram = """
 import time
 import %(reactor)s
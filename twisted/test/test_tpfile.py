@@ -3,10 +3,12 @@
 # See LICENSE for details.
 
 
+from zope.interface import implements
+
 from twisted.trial import unittest
 from twisted.protocols import loopback
 from twisted.protocols import basic
-from twisted.internet import protocol, abstract
+from twisted.internet import protocol, abstract, defer, interfaces
 
 import StringIO
 
@@ -50,3 +52,68 @@ class FileSenderTestCase(unittest.TestCase):
         self.failUnless(d.called, 
                         'producer unregistered with deferred being called')
 
+
+
+    def testSendingRealFile(self):
+        """
+        When the file is a real file and there is no transform, the rest of
+        the file is sent with the consumer's C{sendFile} if it provides
+        L{interfaces.IFileTransport}.
+        """
+        path = self.mktemp()
+        f = open(path, 'wb')
+        f.write('abcdef')
+        f.close()
+        f = open(path, 'rb')
+        self.addCleanup(f.close)
+        f.read(2)
+
+        s = BufferingServer()
+        class Client(protocol.Protocol):
+            def connectionMade(self):
+                self.sendFileCalls = []
+                sendFile = self.transport.sendFile
+                def recordingSendFile(fileObject, offset, count):
+                    self.sendFileCalls.append((offset, count))
+                    return sendFile(fileObject, offset, count)
+                self.transport.sendFile = recordingSendFile
+                d = basic.FileSender().beginFileTransfer(f, self.transport)
+                d.addCallback(self.sent)
+
+            def sent(self, lastSent):
+                self.lastSent = lastSent
+                self.transport.loseConnection()
+        c = Client()
+
+        d = loopback.loopbackTCP(s, c)
+        def check(ignored):
+            self.assertEqual(c.sendFileCalls, [(2, 4)])
+            self.assertEqual(c.lastSent, 'f')
+            self.assertEqual(s.buffer, 'cdef')
+        d.addCallback(check)
+        return d
+
+
+    def testSendFileFailure(self):
+        """
+        If the consumer's C{sendFile} fails, so does the L{Deferred} returned
+        by L{basic.FileSender.beginFileTransfer}.
+        """
+        class FileConsumer(object):
+            implements(interfaces.IFileTransport, interfaces.IConsumer)
+
+            def sendFile(self, fileObject, offset, count):
+                self.sending = defer.Deferred()
+                return self.sending
+
+        path = self.mktemp()
+        f = open(path, 'wb')
+        f.write('abcdef')
+        f.close()
+        f = open(path, 'rb')
+        self.addCleanup(f.close)
+
+        consumer = FileConsumer()
+        d = basic.FileSender().beginFileTransfer(f, consumer)
+        consumer.sending.errback(IOError())
+        return self.assertFailure(d, IOError)
@@ -35,6 +35,7 @@ from twisted.python.log import ILogObserver
 from twisted.python.versions import Version
 from twisted.python.components import Componentized
 from twisted.internet.defer import Deferred
+from twisted.internet.task import Clock
 from twisted.internet.interfaces import IReactorDaemonize
 from twisted.python.fakepwd import UserDatabase
 
@@ -313,9 +314,40 @@ class ServerOptionsTest(unittest.TestCase):
         config = twistd.ServerOptions()
         self.assertRaises(UsageError, config.parseOptions, ['--umask', 'abcdef'])
 
+
+    def test_reactorStats(self):
+        """
+        The value given for the C{reactor-stats} option is parsed as a number
+        of seconds.
+        """
+        config = twistd.ServerOptions()
+        self.assertEqual(config['reactor-stats'], None)
+        config.parseOptions(['--reactor-stats', '2.5'])
+        self.assertEqual(config['reactor-stats'], 2.5)
+
+
+    def test_workers(self):
+        """
+        The value given for the C{workers} option is parsed as an integer.
+        """
+        config = twistd.ServerOptions()
+        self.assertEqual(config['workers'], None)
+        config.parseOptions(['--workers', '4'])
+        self.assertEqual(config['workers'], 4)
+
+
+    def test_invalidWorkers(self):
+        """
+        If the value given for the C{workers} option is less than one,
+        L{UsageError} is raised by L{ServerOptions.parseOptions}.
+        """
+        config = twistd.ServerOptions()
+        self.assertRaises(UsageError, config.parseOptions, ['--workers', '0'])
+
     if _twistd_unix is None:
         msg = "twistd unix not available"
         test_defaultUmask.skip = test_umask.skip = test_invalidUmask.skip = msg
+        test_workers.skip = test_invalidWorkers.skip = msg
 
 
     def test_unimportableConfiguredLogObserver(self):
@@ -579,6 +611,38 @@ class ApplicationRunnerTest(unittest.TestCase):
             reactor.called, "startReactor did not call reactor.run()")
 
 
+    def test_startReactorWithStats(self):
+        """
+        If the C{reactor-stats} option is given, L{startReactor} installs a
+        L{LoopInstrumentation} in the reactor, and logs and resets it every
+        interval and at shutdown.
+        """
+        reactor = InstrumentableReactor()
+        runner = app.ApplicationRunner({
+                "profile": False,
+                "profiler": "profile",
+                "debug": False,
+                "reactor-stats": 10})
+        messages = []
+        log.addObserver(messages.append)
+        self.addCleanup(log.removeObserver, messages.append)
+        runner.startReactor(reactor, None, None)
+        self.assertTrue(reactor.called)
+        instrumentation = reactor.instrumentation
+        instrumentation.selectableRun("selectable", 1)
+
+        reactor.advance(10)
+        self.assertIn("slow selectable",
+                      "".join(messages[-1]["message"]))
+        self.assertEqual(instrumentation.getSlowest(), [])
+
+        [(phase, event, trigger)] = reactor.triggers
+        self.assertEqual((phase, event), ('before', 'shutdown'))
+        trigger()
+        self.assertIn("Reactor loop statistics",
+                      "".join(messages[-1]["message"]))
+
+
 
 class UnixApplicationRunnerSetupEnvironmentTests(unittest.TestCase):
     """
@@ -878,6 +942,111 @@ class ReactorDaemonizationTests(unittest.TestCase):
 
 
 
+class FakeWakingReactor(FakeDaemonizingReactor):
+    """
+    A dummy reactor with a waker, recording the calls made to replace it.
+    """
+
+    def __init__(self):
+        FakeDaemonizingReactor.__init__(self)
+        self.waker = self.originalWaker = FakeWaker()
+        self._internalReaders = set([self.waker])
+        self.removed = []
+
+
+    def removeReader(self, reader):
+        self.removed.append(reader)
+
+
+    def installWaker(self):
+        self.waker = FakeWaker()
+
+
+
+class FakeWaker(object):
+    """
+    A dummy waker, recording whether it has been closed.
+    """
+    lost = False
+
+    def connectionLost(self, reason):
+        self.lost = True
+
+
+
+class ForkWorkersTests(unittest.TestCase):
+    """
+    Tests for L{_twistd_unix.forkWorkers}.
+    """
+    if _twistd_unix is None:
+        skip = "twistd unix not available"
+
+    def test_parent(self):
+        """
+        In the original process, L{_twistd_unix.forkWorkers} forks the given
+        number of workers and returns C{None} and their process IDs, without
+        setting the reactor up again.
+        """
+        reactor = FakeWakingReactor()
+        os = MockOS()
+        os.child = False
+        index, pids = _twistd_unix.forkWorkers(reactor, 3, os)
+        self.assertIdentical(index, None)
+        self.assertEqual(pids, [21, 21, 21])
+        self.assertEqual([action[0] for action in os.actions], ['fork'] * 3)
+        self.assertTrue(reactor._beforeDaemonizeCalled)
+        self.assertFalse(reactor._afterDaemonizeCalled)
+        self.assertIdentical(reactor.waker, reactor.originalWaker)
+
+
+    def test_child(self):
+        """
+        In a worker, L{_twistd_unix.forkWorkers} returns the index of the
+        worker, after calling L{IReactorDaemonize.afterDaemonize} and replacing
+        the waker of the reactor.
+        """
+        reactor = FakeWakingReactor()
+        os = MockOS()
+        index, pids = _twistd_unix.forkWorkers(reactor, 3, os)
+        self.assertEqual((index, pids), (0, []))
+        self.assertTrue(reactor._afterDaemonizeCalled)
+        self.assertEqual(reactor.removed, [reactor.originalWaker])
+        self.assertTrue(reactor.originalWaker.lost)
+        self.assertNotIdentical(reactor.waker, reactor.originalWaker)
+        self.assertEqual(reactor._internalReaders, set())
+
+
+    def test_startApplicationWorkers(self):
+        """
+        With the C{workers} option, L{UnixApplicationRunner.startApplication}
+        does not start the application in the original process, and
+        L{UnixApplicationRunner.postApplication} waits for the workers
+        instead of running the reactor.
+        """
+        options = twistd.ServerOptions()
+        options.parseOptions(['--nodaemon', '--workers', '2', '--pidfile', ''])
+        runner = UnixApplicationRunner(options)
+        runner.application = service.Application("test_workers")
+        runner.oldstdout = runner.oldstderr = None
+
+        self.patch(UnixApplicationRunner, 'setupEnvironment',
+                   lambda *a, **kw: None)
+        self.patch(_twistd_unix, 'forkWorkers',
+                   lambda reactor, count, os: (None, [7] * count))
+        events = []
+        self.patch(UnixApplicationRunner, 'waitForWorkers',
+                   lambda self: events.append('wait'))
+        self.patch(UnixApplicationRunner, 'startReactor',
+                   lambda *a: events.append('reactor'))
+        self.patch(app, 'startApplication',
+                   lambda *a: events.append('application'))
+        runner.postApplication()
+
+        self.assertEqual(runner.workerPIDs, [7, 7])
+        self.assertEqual(events, ['wait'])
+
+
+
 class DummyReactor(object):
     """
     A dummy reactor, only providing a C{run} method and checking that it
@@ -898,6 +1067,27 @@ class DummyReactor(object):
 
 
 
+class InstrumentableReactor(Clock, DummyReactor):
+    """
+    A L{DummyReactor} with a clock, which records the instrumentation and
+    system event triggers installed in it.
+    """
+    instrumentation = None
+
+    def __init__(self):
+        Clock.__init__(self)
+        self.triggers = []
+
+
+    def installInstrumentation(self, instrumentation):
+        self.instrumentation = instrumentation
+
+
+    def addSystemEventTrigger(self, phase, event, f):
+        self.triggers.append((phase, event, f))
+
+
+
 class AppProfilingTestCase(unittest.TestCase):
     """
     Tests for L{app.AppProfiler}.
@@ -6,6 +6,8 @@
 Tests for implementations of L{IReactorUDP} and L{IReactorMulticast}.
 """
 
+from zope.interface import implements
+
 from twisted.trial import unittest
 
 from twisted.internet.defer import Deferred, gatherResults, maybeDeferred
@@ -111,6 +113,33 @@ class BadClient(protocol.DatagramProtocol):
 
 
 
+class BatchServer(Server):
+    """
+    A L{Server} which also records the batches of datagrams it is given.
+    """
+    implements(interfaces.IDatagramBatchReceiver)
+
+    expected = 0
+
+    def __init__(self):
+        Server.__init__(self)
+        self.batches = []
+
+
+    def datagramReceived(self, data, addr):
+        self.packets.append((data, addr))
+        if len(self.packets) == self.expected:
+            d, self.packetReceived = self.packetReceived, None
+            d.callback(None)
+
+
+    def datagramsReceived(self, datagrams):
+        self.batches.append(datagrams)
+        for data, addr in datagrams:
+            self.datagramReceived(data, addr)
+
+
+
 class UDPTestCase(unittest.TestCase):
 
     def test_oldAddress(self):
@@ -441,6 +470,84 @@ class UDPTestCase(unittest.TestCase):
         return d
 
 
+    def test_batches(self):
+        """
+        Datagrams sent with the transport's C{writeDatagrams} method are
+        received in order.  If the platform can receive several datagrams at
+        once, a protocol which provides L{interfaces.IDatagramBatchReceiver}
+        is given them in batches.
+        """
+        server = BatchServer()
+        server.expected = 10
+        received = server.packetReceived = defer.Deferred()
+        port1 = reactor.listenUDP(0, server, interface="127.0.0.1")
+        self.addCleanup(port1.stopListening)
+        client = Server()
+        port2 = reactor.listenUDP(0, client, interface="127.0.0.1")
+        self.addCleanup(port2.stopListening)
+
+        sAddr = server.transport.getHost()
+        cAddr = client.transport.getHost()
+        packets = [str(i) for i in range(10)]
+        client.transport.writeDatagrams(
+            [(packet, (sAddr.host, sAddr.port)) for packet in packets])
+
+        def cbReceived(ignored):
+            self.assertEqual(
+                server.packets,
+                [(packet, (cAddr.host, cAddr.port)) for packet in packets])
+            if udp._mmsg is not None:
+                self.assertNotEqual(server.batches, [])
+        return received.addCallback(cbReceived)
+
+
+    def test_writeDatagramsMessageLength(self):
+        """
+        L{udp.Port.writeDatagrams} raises L{error.MessageLengthError} for a
+        packet which is too long, after sending the packets before and after
+        it.
+        """
+        server = BatchServer()
+        server.expected = 2
+        received = server.packetReceived = defer.Deferred()
+        port1 = reactor.listenUDP(0, server, interface="127.0.0.1")
+        self.addCleanup(port1.stopListening)
+        client = Server()
+        port2 = reactor.listenUDP(0, client, interface="127.0.0.1")
+        self.addCleanup(port2.stopListening)
+
+        sAddr = server.transport.getHost()
+        addr = (sAddr.host, sAddr.port)
+        self.assertRaises(
+            error.MessageLengthError, client.transport.writeDatagrams,
+            [("a", addr), ("x" * 2 ** 17, addr), ("b", addr)])
+
+        def cbReceived(ignored):
+            self.assertEqual(
+                [data for data, addr in server.packets], ["a", "b"])
+        return received.addCallback(cbReceived)
+
+
+    def test_writeDatagramsIPv6(self):
+        """
+        L{udp.Port.writeDatagrams} sends datagrams addressed to IPv6 hosts
+        together as well.
+        """
+        batches = []
+        class FakeMMsg(object):
+            def send(self, fd, datagrams, connected):
+                batches.append(datagrams)
+                return len(datagrams)
+        port = reactor.listenUDP(0, Server(), interface="127.0.0.1")
+        self.addCleanup(port.stopListening)
+        self.patch(udp, '_mmsg', FakeMMsg())
+
+        datagrams = [("a", ("::1", 1234)), ("b", ("127.0.0.1", 1234)),
+                     ("c", ("fe80::1", 1234, 0, 0))]
+        port.writeDatagrams(datagrams)
+        self.assertEqual(batches, [datagrams])
+
+
     def test_NoWarningOnBroadcast(self):
         """
         C{'<broadcast>'} is an alternative way to say C{'255.255.255.255'}
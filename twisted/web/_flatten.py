@@ -94,6 +94,85 @@ def _getSlotValue(name, slotData, default=None):
         raise UnfilledSlot(name)
 
 
+class _LoadedDocument(list):
+    """
+    A list of Stan objects loaded from an XML template, which is compiled the
+    first time it is flattened.
+
+    Compiling turns the document into a list in which the parts that are the
+    same for every render, such as tags without render directives, text,
+    comments and attributes, have been serialized and escaped already and
+    joined together.  Only what is left, such as slots and tags with render
+    directives, is flattened for each render.  Changes made to the document
+    after it was first flattened are not seen.
+
+    @ivar _compiled: C{None}, or a C{list} of C{str}, for the static parts,
+        and C{(root, inAttribute)} tuples, for the parts to flatten.
+    """
+    _compiled = None
+
+    def compile(self):
+        """
+        Return the compiled form of this document, compiling it if needed.
+        """
+        if self._compiled is None:
+            parts = []
+            _compileElement(self, False, parts)
+            compiled = []
+            for part in parts:
+                if type(part) is str and compiled and (
+                    type(compiled[-1]) is str):
+                    compiled[-1] += part
+                else:
+                    compiled.append(part)
+            self._compiled = compiled
+        return self._compiled
+
+
+
+def _compileElement(root, inAttribute, parts):
+    """
+    Append the serialized form of C{root} to C{parts}, as
+    L{_flattenElement} would flatten it, leaving the parts of it which
+    depend on the render as C{(root, inAttribute)} tuples.
+    """
+    if isinstance(root, (str, unicode)):
+        parts.append(escapedData(root, inAttribute))
+    elif isinstance(root, CDATA):
+        parts.append('<![CDATA[' + escapedCDATA(root.data) + ']]>')
+    elif isinstance(root, Comment):
+        parts.append('<!--' + escapedComment(root.data) + '-->')
+    elif isinstance(root, CharRef):
+        parts.append('&#%d;' % (root.ordinal,))
+    elif (isinstance(root, Tag) and root.render is None and
+          root.slotData is None):
+        if not root.tagName:
+            _compileElement(root.children, False, parts)
+            return
+        if isinstance(root.tagName, unicode):
+            tagName = root.tagName.encode('ascii')
+        else:
+            tagName = str(root.tagName)
+        parts.append('<' + tagName)
+        for k, v in root.attributes.iteritems():
+            if isinstance(k, unicode):
+                k = k.encode('ascii')
+            parts.append(' ' + k + '="')
+            _compileElement(v, True, parts)
+            parts.append('"')
+        if root.children or tagName not in voidElements:
+            parts.append('>')
+            _compileElement(root.children, False, parts)
+            parts.append('</' + tagName + '>')
+        else:
+            parts.append(' />')
+    elif isinstance(root, (tuple, list)):
+        for element in root:
+            _compileElement(element, inAttribute, parts)
+    else:
+        parts.append((root, inAttribute))
+
+
 def _flattenElement(request, root, slotData, renderFactory, inAttribute):
     """
     Make C{root} slightly more flat by yielding all its immediate contents 
@@ -169,6 +248,13 @@ def _flattenElement(request, root, slotData, renderFactory, inAttribute):
         else:
             yield ' />'
 
+    elif type(root) is _LoadedDocument and not inAttribute:
+        for part in root.compile():
+            if type(part) is str:
+                yield part
+            else:
+                yield _flattenElement(request, part[0], slotData,
+                                      renderFactory, part[1])
     elif isinstance(root, (tuple, list, GeneratorType)):
         for element in root:
             yield _flattenElement(request, element, slotData, renderFactory,
@@ -7,6 +7,7 @@ HTTP client.
 """
 
 import os, types
+from collections import deque
 from urlparse import urlunparse
 from urllib import splithost, splittype
 import zlib
@@ -811,6 +812,25 @@ class FileBodyProducer(object):
 
 
 
+class _PooledHTTP11ClientProtocol(HTTP11ClientProtocol):
+    """
+    An L{HTTP11ClientProtocol} which tells the L{HTTPConnectionPool} it
+    belongs to when its connection is lost.
+
+    @ivar _lostCallback: A callable taking this protocol, called after
+        L{HTTP11ClientProtocol.connectionLost}.
+    """
+    def __init__(self, quiescentCallback, lostCallback):
+        HTTP11ClientProtocol.__init__(self, quiescentCallback)
+        self._lostCallback = lostCallback
+
+
+    def connectionLost(self, reason):
+        HTTP11ClientProtocol.connectionLost(self, reason)
+        self._lostCallback(self)
+
+
+
 class _HTTP11ClientFactory(protocol.Factory):
     """
     A factory for L{HTTP11ClientProtocol}, used by L{HTTPConnectionPool}.
@@ -818,14 +838,21 @@ class _HTTP11ClientFactory(protocol.Factory):
     @ivar _quiescentCallback: The quiescent callback to be passed to protocol
         instances, used to return them to the connection pool.
 
+    @ivar _lostCallback: A callable to be called with protocol instances when
+        their connection is lost, or C{None}.
+
     @since: 11.1
     """
-    def __init__(self, quiescentCallback):
+    def __init__(self, quiescentCallback, lostCallback=None):
         self._quiescentCallback = quiescentCallback
+        self._lostCallback = lostCallback
 
 
     def buildProtocol(self, addr):
-        return HTTP11ClientProtocol(self._quiescentCallback)
+        if self._lostCallback is None:
+            return HTTP11ClientProtocol(self._quiescentCallback)
+        return _PooledHTTP11ClientProtocol(
+            self._quiescentCallback, self._lostCallback)
 
 
 
@@ -891,6 +918,10 @@ class HTTPConnectionPool(object):
     Features:
      - Cached connections will eventually time out.
      - Limits on maximum number of persistent connections.
+     - Optional limits on the number of connections in use at once, with
+       requests for more connections waiting in line.
+     - Optional tracking of connections, which drops cached connections
+       closed by the server at once and keeps statistics.
 
     Connections are stored using keys, which should be chosen such that any
     connections stored under a given key can be used interchangeably.
@@ -906,6 +937,22 @@ class HTTPConnectionPool(object):
         connections for a C{host:port} destination.
     @type maxPersistentPerHost: C{int}
 
+    @ivar maxActivePerHost: The maximum number of connections for a key which
+        may be in use, or being opened, at once, or C{None} for no limit.
+        Calls to L{getConnection} beyond it wait, first come first served,
+        until a connection for the key is returned to the pool or lost.  A
+        retried request may briefly take one more.  It should be set before
+        the pool is used.  Setting it also turns on C{trackConnections}.
+    @type maxActivePerHost: C{int} or C{NoneType}
+
+    @ivar trackConnections: C{bool} indicating whether connections are
+        tracked: cached connections closed by the server are dropped at
+        once, rather than when they are next used, and L{getStats} reports on
+        them.  While they are tracked, C{_factory} is also given a callable to
+        call with protocols whose connection is lost.  It should be set before
+        the pool is used.
+    @type trackConnections: C{bool}
+
     @ivar cachedConnectionTimeout: Number of seconds a cached persistent
         connection will stay open before disconnecting.
 
@@ -920,11 +967,29 @@ class HTTPConnectionPool(object):
     @ivar _timeouts: Map L{HTTP11ClientProtocol} instances to a
         C{IDelayedCall} instance of their timeout.
 
+    @ivar _active: Map keys to the number of connections for them which are
+        in use or being opened.
+
+    @ivar _activeConnections: Map the L{HTTP11ClientProtocol} instances in
+        use to the time they were handed out.
+
+    @ivar _waiting: Map keys to a C{deque} of C{(Deferred, endpoint, time)}
+        tuples for the calls to L{getConnection} waiting for a connection, in
+        the order they were made.
+
+    @ivar _stats: Map keys to a C{dict} of counters, as described in
+        L{getStats}.
+
+    @ivar _prewarming: Map keys to the number of connections L{prewarm} is
+        still opening for them.
+
     @since: 12.1
     """
 
     _factory = _HTTP11ClientFactory
     maxPersistentPerHost = 2
+    maxActivePerHost = None
+    trackConnections = False
     cachedConnectionTimeout = 240
     retryAutomatically = True
 
@@ -933,8 +998,20 @@ class HTTPConnectionPool(object):
         self.persistent = persistent
         self._connections = {}
         self._timeouts = {}
+        self._active = {}
+        self._activeConnections = {}
+        self._waiting = {}
+        self._stats = {}
+        self._prewarming = {}
 
 
+    def _tracking(self):
+        """
+        Return whether connections are tracked, either because
+        C{trackConnections} is set or because C{maxActivePerHost} is.
+        """
+        return self.trackConnections or self.maxActivePerHost is not None
+
     def getConnection(self, key, endpoint):
         """
         Retrieve a connection, either new or cached, to be used for a HTTP
@@ -949,6 +1026,10 @@ class HTTPConnectionPool(object):
         will be returned to this pool automatically. As such, only a single
         request should be sent using the returned connection.
 
+        If C{maxActivePerHost} connections for C{key} are already in use, the
+        returned C{Deferred} only fires once one of them is returned to the
+        pool or lost, and after any earlier calls which are waiting too.
+
         @param key: A unique key identifying connections that can be used
             interchangeably.
 
@@ -958,6 +1039,24 @@ class HTTPConnectionPool(object):
         @return: A C{Deferred} that will fire with a L{HTTP11ClientProtocol}
            (or a wrapper) that can be used to send a single HTTP request.
         """
+        if not self._tracking():
+            return self._getConnection(key, endpoint)
+        limit = self.maxActivePerHost
+        if limit is not None and self._active.get(key, 0) >= limit:
+            d = defer.Deferred()
+            self._waiting.setdefault(key, deque()).append(
+                (d, endpoint, self._reactor.seconds()))
+            self._statsFor(key)['queued'] += 1
+            return d
+        self._active[key] = self._active.get(key, 0) + 1
+        return self._getConnection(key, endpoint)
+
+
+    def _getConnection(self, key, endpoint):
+        """
+        Retrieve a connection for L{getConnection}, once C{key} has been
+        counted in C{_active} for it if connections are tracked.
+        """
         # Try to get cached version:
         connections = self._connections.get(key)
         while connections:
@@ -966,13 +1065,36 @@ class HTTPConnectionPool(object):
             self._timeouts[connection].cancel()
             del self._timeouts[connection]
             if connection.state == "QUIESCENT":
-                if self.retryAutomatically:
+                if not self._tracking():
                     newConnection = lambda: self._newConnection(key, endpoint)
+                else:
+                    self._activate(key, connection)
+                    def newConnection():
+                        self._active[key] = self._active.get(key, 0) + 1
+                        return self._connect(key, endpoint)
+                if self.retryAutomatically:
                     connection = _RetryingHTTP11ClientProtocol(
                         connection, newConnection)
                 return defer.succeed(connection)
 
-        return self._newConnection(key, endpoint)
+        if not self._tracking():
+            return self._newConnection(key, endpoint)
+        return self._connect(key, endpoint)
+
+
+    def _connect(self, key, endpoint):
+        """
+        Create a new connection to be handed out while connections are
+        tracked, once C{key} has been counted in C{_active} for it.
+        """
+        def connected(connection):
+            self._activate(key, connection)
+            return connection
+        def failed(reason):
+            self._releaseSlot(key)
+            return reason
+        d = defer.maybeDeferred(self._newConnection, key, endpoint)
+        return d.addCallbacks(connected, failed)
 
 
     def _newConnection(self, key, endpoint):
@@ -981,9 +1103,18 @@ class HTTPConnectionPool(object):
 
         This implements the new connection code path for L{getConnection}.
         """
-        def quiescentCallback(protocol):
-            self._putConnection(key, protocol)
-        factory = self._factory(quiescentCallback)
+        if not self._tracking():
+            def quiescentCallback(protocol):
+                self._putConnection(key, protocol)
+            factory = self._factory(quiescentCallback)
+        else:
+            def quiescentCallback(protocol):
+                self._putConnection(key, protocol)
+                self._releaseConnection(key, protocol)
+            def lostCallback(protocol):
+                self._connectionLost(key, protocol)
+            self._statsFor(key)['connections'] += 1
+            factory = self._factory(quiescentCallback, lostCallback)
         return endpoint.connect(factory)
 
 
@@ -1022,6 +1153,158 @@ class HTTPConnectionPool(object):
         self._timeouts[connection] = cid
 
 
+    def _connectionLost(self, key, connection):
+        """
+        Forget a connection which has been lost, whether it was cached, and
+        so closed by the server, or in use.
+        """
+        if connection in self._timeouts:
+            self._timeouts.pop(connection).cancel()
+            self._connections[key].remove(connection)
+            self._statsFor(key)['evictions'] += 1
+        self._releaseConnection(key, connection)
+
+
+    def _activate(self, key, connection):
+        """
+        Record that C{connection} has been handed out for C{key}.
+        """
+        self._activeConnections[connection] = self._reactor.seconds()
+        self._statsFor(key)['requests'] += 1
+
+
+    def _releaseConnection(self, key, connection):
+        """
+        Record that C{connection} is no longer in use, if it was handed out
+        for C{key}, and let the next waiting call to L{getConnection} have a
+        connection.
+        """
+        started = self._activeConnections.pop(connection, None)
+        if started is None:
+            return
+        self._statsFor(key)['requestTime'] += self._reactor.seconds() - started
+        self._releaseSlot(key)
+
+
+    def _releaseSlot(self, key):
+        """
+        Hand a connection for C{key} which is no longer counted as in use to
+        the first waiting call to L{getConnection}, if there is one.
+        """
+        waiting = self._waiting.get(key)
+        if waiting:
+            d, endpoint, queued = waiting.popleft()
+            if not waiting:
+                del self._waiting[key]
+            # The connection stays counted in _active for the waiting call.
+            # That call gets it from the reactor, because this may be called
+            # while the protocol returned to the pool is still finishing its
+            # previous response.
+            self._reactor.callLater(
+                0, self._serveWaiting, key, endpoint, d, queued)
+        else:
+            self._active[key] -= 1
+            if not self._active[key]:
+                del self._active[key]
+
+
+    def _serveWaiting(self, key, endpoint, d, queued):
+        """
+        Retrieve a connection for a call to L{getConnection} which waited for
+        one since C{queued}, and fire C{d} with it.
+        """
+        stats = self._statsFor(key)
+        waited = self._reactor.seconds() - queued
+        stats['queueTime'] += waited
+        stats['maxQueueTime'] = max(stats['maxQueueTime'], waited)
+        self._getConnection(key, endpoint).chainDeferred(d)
+
+
+    def prewarm(self, key, endpoint, count=1):
+        """
+        Open connections ahead of requests, until there are C{count} cached
+        connections for C{key}, or C{maxPersistentPerHost} of them, counting
+        those earlier calls are still opening.
+
+        @param key: A unique key identifying connections that can be used
+            interchangeably.
+
+        @param endpoint: An endpoint that can be used to open the
+            connections.
+
+        @param count: The number of cached connections wanted.
+
+        @return: A C{Deferred} which fires with C{None} once the connections
+            have been opened, or fails with L{defer.FirstError} if one of
+            them could not be.
+        """
+        count = min(count, self.maxPersistentPerHost)
+        count -= len(self._connections.get(key, ()))
+        count -= self._prewarming.get(key, 0)
+        def opened(connection):
+            self._putConnection(key, connection)
+        def done(result):
+            self._prewarming[key] -= 1
+            if not self._prewarming[key]:
+                del self._prewarming[key]
+            return result
+        results = []
+        for i in range(count):
+            self._prewarming[key] = self._prewarming.get(key, 0) + 1
+            d = defer.maybeDeferred(self._newConnection, key, endpoint)
+            d.addBoth(done)
+            d.addCallback(opened)
+            results.append(d)
+        return defer.gatherResults(results, consumeErrors=True).addCallback(
+            lambda ign: None)
+
+
+    def _statsFor(self, key):
+        """
+        Return the C{dict} of counters for C{key}.
+        """
+        try:
+            return self._stats[key]
+        except KeyError:
+            stats = self._stats[key] = {
+                'connections': 0, 'evictions': 0, 'requests': 0,
+                'requestTime': 0, 'queued': 0, 'queueTime': 0,
+                'maxQueueTime': 0}
+            return stats
+
+
+    def getStats(self):
+        """
+        Return statistics about the use of this pool, which are only kept
+        while connections are tracked, as described for C{trackConnections}.
+
+        @return: A C{dict} mapping each key connections have been requested
+            for to a C{dict} with these keys:
+            - C{"active"}: the number of connections in use or being opened.
+            - C{"idle"}: the number of cached connections.
+            - C{"waiting"}: the number of calls to L{getConnection} waiting
+              for a connection.
+            - C{"connections"}: the number of connections opened.
+            - C{"evictions"}: the number of cached connections dropped
+              because the server closed them.
+            - C{"requests"}: the number of connections handed out.
+            - C{"requestTime"}: the total number of seconds connections were
+              in use for, counting only those returned to the pool or lost.
+            - C{"queued"}: the number of calls to L{getConnection} which had
+              to wait.
+            - C{"queueTime"} and C{"maxQueueTime"}: the total and the
+              longest number of seconds those calls waited.
+        """
+        result = {}
+        for key, stats in self._stats.iteritems():
+            stats = stats.copy()
+            stats['active'] = self._active.get(key, 0)
+            stats['idle'] = len(self._connections.get(key, ()))
+            stats['waiting'] = len(self._waiting.get(key, ()))
+            result[key] = stats
+        return result
+
+
     def closeCachedConnections(self):
         """
         Close all persistent connections and remove them from the pool.
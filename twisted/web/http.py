@@ -22,6 +22,8 @@ import time
 import calendar
 import warnings
 import os
+import re
+import threading
 from urlparse import urlparse as _urlparse
 
 from zope.interface import implements
@@ -29,8 +31,10 @@ from zope.interface import implements
 # twisted imports
 from twisted.internet import interfaces, reactor, protocol, address
 from twisted.internet.defer import Deferred
+from twisted.internet.threads import deferToThreadPool
 from twisted.protocols import policies, basic
 from twisted.python import log
+from twisted.python.threadpool import ThreadPool
 from urllib import unquote
 
 from twisted.web.http_headers import _DictHeaders, Headers
@@ -1415,63 +1419,60 @@ class _ChunkedTransferDecoder(object):
         self.finishCallback = finishCallback
         self._buffer = ''
 
-    def _dataReceived_CHUNK_LENGTH(self, data):
-        if '\r\n' in data:
-            line, rest = data.split('\r\n', 1)
-            parts = line.split(';')
-            self.length = int(parts[0], 16)
-            if self.length == 0:
-                self.state = 'TRAILER'
-            else:
-                self.state = 'BODY'
-            return rest
-        else:
-            self._buffer = data
-            return ''
-
-    def _dataReceived_CRLF(self, data):
-        if data.startswith('\r\n'):
-            self.state = 'CHUNK_LENGTH'
-            return data[2:]
-        else:
-            self._buffer = data
-            return ''
-
-    def _dataReceived_TRAILER(self, data):
-        if data.startswith('\r\n'):
-            data = data[2:]
-            self.state = 'FINISHED'
-            self.finishCallback(data)
-        else:
-            self._buffer = data
-        return ''
-
-    def _dataReceived_BODY(self, data):
-        if len(data) >= self.length:
-            chunk, data = data[:self.length], data[self.length:]
-            self.dataCallback(chunk)
-            self.state = 'CRLF'
-            return data
-        elif len(data) < self.length:
-            self.length -= len(data)
-            self.dataCallback(data)
-            return ''
-
-    def _dataReceived_FINISHED(self, data):
-        raise RuntimeError(
-            "_ChunkedTransferDecoder.dataReceived called after last "
-            "chunk was processed")
-
-
     def dataReceived(self, data):
         """
         Interpret data from a request or response body which uses the
         I{chunked} Transfer-Encoding.
         """
-        data = self._buffer + data
-        self._buffer = ''
-        while data:
-            data = getattr(self, '_dataReceived_%s' % (self.state,))(data)
+        if self._buffer:
+            data = self._buffer + data
+            self._buffer = ''
+        # Move an offset through the data, rather than slicing off the part
+        # which has been interpreted after each step.
+        offset = 0
+        end = len(data)
+        while offset < end:
+            state = self.state
+            if state == 'BODY':
+                if end - offset >= self.length:
+                    chunkEnd = offset + self.length
+                    self.dataCallback(data[offset:chunkEnd])
+                    self.state = 'CRLF'
+                    offset = chunkEnd
+                else:
+                    self.length -= end - offset
+                    if offset:
+                        data = data[offset:]
+                    self.dataCallback(data)
+                    return
+            elif state == 'CHUNK_LENGTH':
+                lineEnd = data.find('\r\n', offset)
+                if lineEnd == -1:
+                    self._buffer = data[offset:]
+                    return
+                self.length = int(data[offset:lineEnd].split(';', 1)[0], 16)
+                if self.length == 0:
+                    self.state = 'TRAILER'
+                else:
+                    self.state = 'BODY'
+                offset = lineEnd + 2
+            elif state == 'CRLF':
+                if not data.startswith('\r\n', offset):
+                    self._buffer = data[offset:]
+                    return
+                self.state = 'CHUNK_LENGTH'
+                offset += 2
+            elif state == 'TRAILER':
+                if data.startswith('\r\n', offset):
+                    self.state = 'FINISHED'
+                    self.finishCallback(data[offset + 2:])
+                else:
+                    self._buffer = data[offset:]
+                return
+            else:
+                raise RuntimeError(
+                    "_ChunkedTransferDecoder.dataReceived called after last "
+                    "chunk was processed")
 
 
     def noMoreData(self):
@@ -1490,12 +1491,29 @@ class HTTPChannel(basic.LineReceiver, policies.TimeoutMixin):
     """
     A receiver for HTTP requests.
 
+    The headers of a request which have all been received are parsed in one
+    pass, rather than line by line through L{lineReceived}, which is only
+    used for the request line and for heads which arrive in pieces.
+
+    Pipelined requests are processed as soon as they have been received,
+    and the responses to all but the first are buffered until the responses
+    before them have been written, so that they are written in order.
+
+    @ivar maxPipelineDepth: The largest number of requests which may be
+        processed or waiting for earlier responses at once, or C{None} for no
+        limit.  Once it is reached, no more is read from the transport until
+        a response has finished.
+
     @ivar _transferDecoder: C{None} or an instance of
         L{_ChunkedTransferDecoder} if the request body uses the I{chunked}
         Transfer-Encoding.
+
+    @ivar _pipelinePaused: C{True} if reading from the transport has been
+        paused because C{maxPipelineDepth} was reached, C{False} otherwise.
     """
 
     maxHeaders = 500 # max number of headers allowed per request
+    maxPipelineDepth = None
 
     length = 0
     persistent = 1
@@ -1508,6 +1526,7 @@ class HTTPChannel(basic.LineReceiver, policies.TimeoutMixin):
 
     _savedTimeOut = None
     _receivedHeaderCount = 0
+    _pipelinePaused = False
 
     def __init__(self):
         # the request queue
@@ -1518,6 +1537,91 @@ class HTTPChannel(basic.LineReceiver, policies.TimeoutMixin):
     def connectionMade(self):
         self.setTimeout(self.timeOut)
 
+
+    def dataReceived(self, data):
+        """
+        Translate bytes into requests.
+
+        Request lines are handed to L{lineReceived}.  After one, if all of the
+        headers of the request have been received, they are split from the
+        data at once and handed to L{headerReceived} without going through
+        L{lineReceived}.  Anything else is left to
+        L{basic.LineReceiver.dataReceived}.
+        """
+        buffered = self.clearLineBuffer()
+        if buffered:
+            data = buffered + data
+        offset = 0
+        while self.line_mode and self.persistent and not self.paused:
+            if self.__first_line:
+                lineEnd = data.find('\r\n', offset)
+                if lineEnd == -1 or lineEnd - offset > self.MAX_LENGTH:
+                    break
+                line = data[offset:lineEnd]
+                offset = lineEnd + 2
+                self.lineReceived(line)
+            elif not self.__header:
+                # The request line has been received, and no header yet.
+                if data.startswith('\r\n', offset):
+                    lines = ()
+                    offset += 2
+                else:
+                    headEnd = data.find('\r\n\r\n', offset)
+                    if headEnd == -1 or headEnd - offset > self.MAX_LENGTH:
+                        break
+                    lines = data[offset:headEnd].split('\r\n')
+                    offset = headEnd + 4
+                self.resetTimeout()
+                if self._headersReceived(lines):
+                    return
+                if not self.line_mode:
+                    # The request has a body.
+                    data = data[offset:]
+                    if data:
+                        return self.rawDataReceived(data)
+                    return
+            else:
+                break
+            if self.transport.disconnecting:
+                return
+        if offset:
+            data = data[offset:]
+        if data:
+            return basic.LineReceiver.dataReceived(self, data)
+
+
+    def _headersReceived(self, lines):
+        """
+        Handle all of the header lines of a request at once, as
+        L{lineReceived} does one at a time, and the empty line after them.
+
+        @param lines: A sequence of the header lines, without delimiters.
+
+        @return: C{True} if the connection is being closed because of the
+            headers, C{False} otherwise.
+        """
+        header = ''
+        for line in lines:
+            if line[0] in ' \t':
+                header = header + '\n' + line
+            else:
+                if header:
+                    self.headerReceived(header)
+                    if self.transport.disconnecting:
+                        return True
+                header = line
+        if header:
+            self.headerReceived(header)
+            if self.transport.disconnecting:
+                return True
+        self.allHeadersReceived()
+        if self.length == 0:
+            self.allContentReceived()
+        else:
+            self.setRawMode()
+        return False
+
+
     def lineReceived(self, line):
         self.resetTimeout()
 
@@ -1623,6 +1727,12 @@ class HTTPChannel(basic.LineReceiver, policies.TimeoutMixin):
         req = self.requests[-1]
         req.requestReceived(command, path, version)
 
+        if (self.maxPipelineDepth is not None and self.persistent
+            and not self._pipelinePaused
+            and len(self.requests) >= self.maxPipelineDepth):
+            self._pipelinePaused = True
+            self.pauseProducing()
+
     def rawDataReceived(self, data):
         self.resetTimeout()
         self._transferDecoder.dataReceived(data)
@@ -1701,6 +1811,10 @@ class HTTPChannel(basic.LineReceiver, policies.TimeoutMixin):
             else:
                 if self._savedTimeOut:
                     self.setTimeout(self._savedTimeOut)
+            if (self._pipelinePaused
+                and len(self.requests) < self.maxPipelineDepth):
+                self._pipelinePaused = False
+                self.resumeProducing()
         else:
             self.transport.loseConnection()
 
@@ -1714,6 +1828,181 @@ class HTTPChannel(basic.LineReceiver, policies.TimeoutMixin):
             request.connectionLost(reason)
 
 
+class _BufferedLogFile(object):
+    """
+    A file-like object which collects the lines written to it and writes them
+    to a log file in batches, from a thread of its own, so that a slow disk
+    does not block the reactor.
+
+    Lines are written once C{bufferSize} bytes of them have been collected,
+    or C{flushInterval} seconds after the first of them, whichever is sooner.
+    Only one batch is written at a time.  While it is, lines are collected
+    for the next one, up to C{maxBufferSize} bytes; lines beyond that are
+    dropped, and counted in C{dropped}.
+
+    Only the thread uses the log file, except for L{rotate} and L{close},
+    which wait for the batch being written.  L{twisted.python.logfile.LogFile}
+    and L{twisted.python.logfile.DailyLogFile} therefore still rotate
+    themselves when they are written to.
+
+    @ivar logFile: The file the lines are written to.
+
+    @ivar written: The number of lines written to C{logFile}.
+
+    @ivar dropped: The number of lines dropped.
+
+    @ivar _reactor: The reactor the lines are written from.
+
+    @ivar _pending: A C{list} of the lines collected for the next batch.
+
+    @ivar _pendingSize: The number of bytes in C{_pending}.
+
+    @ivar _writing: C{True} while a batch is being written.
+
+    @ivar _flushCall: The L{IDelayedCall} for the next flush, or C{None}.
+
+    @ivar _lock: A lock held while C{logFile} is used.
+
+    @ivar _threadpool: The L{ThreadPool}, of one thread, in which batches are
+        written.
+    """
+
+    written = dropped = 0
+
+    def __init__(self, logFile, reactor, bufferSize=64 * 1024,
+                 flushInterval=1, maxBufferSize=4 * 1024 * 1024):
+        self.logFile = logFile
+        self.bufferSize = bufferSize
+        self.flushInterval = flushInterval
+        self.maxBufferSize = maxBufferSize
+        self._reactor = reactor
+        self._pending = []
+        self._pendingSize = 0
+        self._writing = False
+        self._flushCall = None
+        self._lock = threading.Lock()
+        self._threadpool = ThreadPool(1, 1, "HTTP log writer")
+
+
+    def write(self, line):
+        """
+        Collect C{line} to be written, or drop it if too many bytes are
+        waiting to be written already.
+        """
+        if self._pendingSize + len(line) > self.maxBufferSize:
+            self.dropped += 1
+            return
+        self._pending.append(line)
+        self._pendingSize += len(line)
+        if self._pendingSize >= self.bufferSize:
+            self.flush()
+        elif self._flushCall is None:
+            self._flushCall = self._reactor.callLater(
+                self.flushInterval, self.flush)
+
+
+    def flush(self):
+        """
+        Start writing the lines collected, unless a batch is being written
+        already, in which case they are written after it.
+        """
+        if self._flushCall is not None:
+            if self._flushCall.active():
+                self._flushCall.cancel()
+            self._flushCall = None
+        if self._writing or not self._pending:
+            return
+        lines = self._pending
+        self._pending = []
+        self._pendingSize = 0
+        self._writing = True
+        if not self._threadpool.started:
+            self._threadpool.start()
+        d = deferToThreadPool(
+            self._reactor, self._threadpool, self._write, lines)
+        d.addCallbacks(self._written, self._failed, (len(lines),))
+
+
+    def _write(self, lines):
+        """
+        Write C{lines} to the log file.  Called in the thread.
+        """
+        self._lock.acquire()
+        try:
+            self.logFile.write(''.join(lines))
+            self.logFile.flush()
+        finally:
+            self._lock.release()
+
+
+    def _written(self, ignored, count):
+        """
+        Count the lines of the batch just written, and start the next batch
+        if enough lines are waiting.
+        """
+        self.written += count
+        self._writing = False
+        if self._pendingSize >= self.bufferSize:
+            self.flush()
+        elif self._pending and self._flushCall is None:
+            self._flushCall = self._reactor.callLater(
+                self.flushInterval, self.flush)
+
+
+    def _failed(self, reason):
+        """
+        Log the failure to write a batch, and carry on.
+        """
+        log.err(reason, "Writing the HTTP log failed")
+        self._written(None, 0)
+
+
+    def rotate(self):
+        """
+        Rotate the log file, once the batch being written has been.
+        """
+        self._lock.acquire()
+        try:
+            self.logFile.rotate()
+        finally:
+            self._lock.release()
+
+
+    def close(self):
+        """
+        Write every line collected, waiting for the batch being written, and
+        close the log file.
+        """
+        if self._flushCall is not None:
+            if self._flushCall.active():
+                self._flushCall.cancel()
+            self._flushCall = None
+        if self._threadpool.started:
+            self._threadpool.stop()
+        lines = self._pending
+        self._pending = []
+        self._pendingSize = 0
+        if lines:
+            self.logFile.write(''.join(lines))
+            self.written += len(lines)
+        self.logFile.close()
+
+
+    def getStats(self):
+        """
+        Return statistics about the lines written to this file.
+
+        @return: A C{dict} with these keys:
+            - C{"written"} and C{"dropped"}: the values of the attributes of
+              the same names.
+            - C{"buffered"}: the number of lines waiting to be written.
+        """
+        return {"written": self.written,
+                "dropped": self.dropped,
+                "buffered": len(self._pending)}
+
+
+
 class HTTPFactory(protocol.ServerFactory):
     """
     Factory for HTTP server.
@@ -1725,11 +2014,26 @@ class HTTPFactory(protocol.ServerFactory):
     @ivar _logDateTimeCall: A delayed call for the next update to the cached log
         datetime string.
     @type _logDateTimeCall: L{IDelayedCall} provided
+
+    @ivar logBufferSize: If not C{None}, the log file opened for C{logPath}
+        is written to from a thread, in batches of about this many bytes, by
+        a L{_BufferedLogFile}, rather than as each request is logged.
+    @type logBufferSize: C{int} or C{NoneType}
+
+    @ivar logFlushInterval: The longest number of seconds a line may wait to
+        be written when C{logBufferSize} is set.
+
+    @ivar maxLogBufferSize: The largest number of bytes of lines which may
+        wait to be written when C{logBufferSize} is set.  Lines logged beyond
+        it are dropped, and counted by the L{_BufferedLogFile}.
     """
 
     protocol = HTTPChannel
 
     logPath = None
+    logBufferSize = None
+    logFlushInterval = 1
+    maxLogBufferSize = 4 * 1024 * 1024
 
     timeOut = 60 * 60 * 12
 
@@ -1769,6 +2073,10 @@ class HTTPFactory(protocol.ServerFactory):
 
         if self.logPath:
             self.logFile = self._openLogFile(self.logPath)
+            if self.logBufferSize is not None:
+                self.logFile = _BufferedLogFile(
+                    self.logFile, reactor, self.logBufferSize,
+                    self.logFlushInterval, self.maxLogBufferSize)
         else:
             self.logFile = log.logfile
 
@@ -1791,9 +2099,13 @@ class HTTPFactory(protocol.ServerFactory):
         f = open(path, "a", 1)
         return f
 
+    _needsEscape = re.compile(r'[^\x20-\x7e]|["\\]').search
+
     def _escape(self, s):
         # pain in the ass. Return a string like python repr, but always
         # escaped as if surrounding quotes were "".
+        if type(s) is str and not self._needsEscape(s):
+            return s
         r = repr(s)
         if r[0] == "'":
             return r[1:-1].replace('"', '\\"').replace("\\'", "'")
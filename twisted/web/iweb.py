@@ -517,10 +517,69 @@ class IResponse(Interface):
 
 
 
+class ISessionStore(Interface):
+    """
+    A place where a L{twisted.web.server.Site} keeps its sessions, so that
+    they can be found again from the session cookie of later requests.
+
+    @since: 12.1
+    """
+
+    def addSession(session):
+        """
+        Keep a new session.
+
+        @param session: The L{twisted.web.server.Session} to keep.
+        """
+
+
+    def getSession(site, uid):
+        """
+        Find a session which has not expired.
+
+        @param site: The L{twisted.web.server.Site} the session belongs to,
+            which stores may use to create a session object for a session
+            they only have the data of.
+
+        @param uid: The C{str} unique ID of the session, as found in a
+            cookie.
+
+        @raise KeyError: If there is no such session, or it has expired.
+
+        @return: The L{twisted.web.server.Session}.
+        """
+
+
+    def touchSession(session):
+        """
+        Record that C{session} was used, which delays its expiry.
+
+        @param session: A L{twisted.web.server.Session} kept by this store.
+        """
+
+
+    def saveSession(session):
+        """
+        Record the current data of C{session}, keeping it if it is not kept
+        already.
+
+        @param session: A L{twisted.web.server.Session}.
+        """
+
+
+    def removeSession(session):
+        """
+        Forget C{session}, if it is kept.
+
+        @param session: A L{twisted.web.server.Session}.
+        """
+
+
+
 UNKNOWN_LENGTH = u"twisted.web.iweb.UNKNOWN_LENGTH"
 
 __all__ = [
     "IUsernameDigestHash", "ICredentialFactory", "IRequest",
-    "IBodyProducer", "IRenderable", "IResponse",
+    "IBodyProducer", "IRenderable", "IResponse", "ISessionStore",
 
     "UNKNOWN_LENGTH"]
@@ -15,6 +15,9 @@ import string
 import types
 import copy
 import os
+import re
+import errno
+import cPickle as pickle
 from urllib import quote
 
 from zope.interface import implements
@@ -402,15 +405,24 @@ class Session(components.Componentized):
     This utility class contains no functionality, but is used to
     represent a session.
 
+    The session store of the site, if it has one, keeps the session: sessions
+    are saved to it, touched in it and removed from it when they expire.
+
     @ivar _reactor: An object providing L{IReactorTime} to use for scheduling
         expiration.
     @ivar sessionTimeout: timeout of a session, in seconds.
+    @ivar sessionNamespaces: A C{dict} of the data of this session, which
+        L{save} records in the session store.
     @ivar loopFactory: Deprecated in Twisted 9.0.  Does nothing.  Do not use.
+    @ivar _stored: C{False} while the session has not been added to the
+        session store of its site, which L{Site.makeSession} delays until
+        the session is first written when L{Site.lazySessions} is set.
     """
     sessionTimeout = 900
     loopFactory = task.LoopingCall
 
     _expireCall = None
+    _stored = True
 
     def __init__(self, site, uid, reactor=None):
         """
@@ -446,18 +458,56 @@ class Session(components.Componentized):
             self.sessionTimeout, self.expire)
 
 
+    def _getStore(self):
+        """
+        Return the L{iweb.ISessionStore} of the site, or C{None} if it keeps
+        its sessions in a plain C{sessions} dictionary.
+        """
+        return getattr(self.site, 'sessionStore', None)
+
+
+    def setComponent(self, interfaceClass, component):
+        """
+        Set a component of this session, and keep the session if it is not
+        kept yet.
+        """
+        components.Componentized.setComponent(self, interfaceClass, component)
+        if not self._stored:
+            self.save()
+
+
     def notifyOnExpire(self, callback):
         """
         Call this callback when the session expires or logs out.
         """
         self.expireCallbacks.append(callback)
+        if not self._stored:
+            self.save()
+
+
+    def save(self):
+        """
+        Record the data in C{sessionNamespaces} in the session store of the
+        site, keeping the session if it is not kept yet.
+
+        Stores shared by several processes only share this data, so it
+        should be saved again whenever it is changed.
+        """
+        self._stored = True
+        store = self._getStore()
+        if store is not None:
+            store.saveSession(self)
 
 
     def expire(self):
         """
         Expire/logout of the session.
         """
-        del self.site.sessions[self.uid]
+        store = self._getStore()
+        if store is None:
+            del self.site.sessions[self.uid]
+        else:
+            store.removeSession(self)
         for c in self.expireCallbacks:
             c()
         self.expireCallbacks = []
@@ -474,6 +524,10 @@ class Session(components.Componentized):
         self.lastModified = self._reactor.seconds()
         if self._expireCall is not None:
             self._expireCall.reset(self.sessionTimeout)
+        if self._stored:
+            store = self._getStore()
+            if store is not None:
+                store.touchSession(self)
 
 
     def checkExpired(self):
@@ -486,6 +540,331 @@ class Session(components.Componentized):
             stacklevel=2, category=DeprecationWarning)
 
 
+class MemorySessionStore(object):
+    """
+    An L{iweb.ISessionStore} which keeps sessions in a C{dict} in memory.
+
+    Rather than giving each session a delayed call of its own, a single
+    delayed call sweeps away the expired sessions every C{sweepInterval}
+    seconds, and sessions which expired since the last sweep are expired when
+    they are looked up.
+
+    @ivar sessions: A C{dict} mapping the unique IDs of the sessions kept to
+        the L{Session}s.
+
+    @ivar sweepInterval: The number of seconds between two sweeps.
+
+    @ivar expirations: The number of sessions expired by this store.
+
+    @ivar _reactor: A provider of L{IReactorTime}, or C{None} to use the
+        global reactor.
+
+    @ivar _sweepCall: The L{IDelayedCall} for the next sweep, or C{None}.
+    """
+    implements(iweb.ISessionStore)
+
+    sweepInterval = 60
+    expirations = 0
+
+    _reactor = None
+    _sweepCall = None
+
+    def __init__(self, reactor=None):
+        self._reactor = reactor
+        self.sessions = {}
+
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['sessions'] = {}
+        state.pop('_reactor', None)
+        state.pop('_sweepCall', None)
+        return state
+
+
+    def _getReactor(self):
+        """
+        Return the L{IReactorTime} provider to use.
+        """
+        if self._reactor is None:
+            from twisted.internet import reactor
+            self._reactor = reactor
+        return self._reactor
+
+
+    def _expired(self, session):
+        """
+        Return whether C{session} has not been used for its
+        C{sessionTimeout}, by the clock of the session, which is the one
+        C{lastModified} was recorded with.
+        """
+        now = session._reactor.seconds()
+        return now - session.lastModified >= session.sessionTimeout
+
+
+    def _scheduleSweep(self):
+        """
+        Make sure a sweep is scheduled while there are sessions.
+        """
+        if self.sessions and self._sweepCall is None:
+            self._sweepCall = self._getReactor().callLater(
+                self.sweepInterval, self._sweep)
+
+
+    def _sweep(self):
+        """
+        Expire every session which has not been used for its
+        C{sessionTimeout}, and schedule the next sweep.
+        """
+        self._sweepCall = None
+        for session in self.sessions.values():
+            if self._expired(session):
+                self.expirations += 1
+                session.expire()
+        self._scheduleSweep()
+
+
+    def addSession(self, session):
+        self.sessions[session.uid] = session
+        self._scheduleSweep()
+
+
+    def getSession(self, site, uid):
+        session = self.sessions[uid]
+        if self._expired(session):
+            self.expirations += 1
+            session.expire()
+            raise KeyError(uid)
+        return session
+
+
+    def touchSession(self, session):
+        # The session records when it was last used itself.
+        pass
+
+
+    def saveSession(self, session):
+        if self.sessions.get(session.uid) is not session:
+            self.addSession(session)
+
+
+    def removeSession(self, session):
+        if self.sessions.get(session.uid) is session:
+            del self.sessions[session.uid]
+        if not self.sessions and self._sweepCall is not None:
+            self._sweepCall.cancel()
+            self._sweepCall = None
+
+
+    def getStats(self):
+        """
+        Return statistics about the sessions kept.
+
+        @return: A C{dict} with the keys C{"sessions"}, the number of sessions
+            kept, and C{"expirations"}.
+        """
+        return {"sessions": len(self.sessions),
+                "expirations": self.expirations}
+
+
+
+class DirectorySessionStore(MemorySessionStore):
+    """
+    An L{iweb.ISessionStore} which keeps sessions in files in a directory,
+    so that several server processes on one host, such as the workers of a
+    pre-forked server, share them.  A directory on a memory file system, such
+    as C{/dev/shm}, keeps this cheap.
+
+    Each session is a file named after its unique ID holding the pickled
+    C{sessionNamespaces} of the session, whose modification time is the time
+    the session was last used.  Every process makes its own L{Session} for a
+    session the first time it is looked up there, and loads the data again
+    when another process has saved it since.  Only the C{sessionNamespaces} are
+    shared: components and expiry callbacks stay in the process which set
+    them, and expiry callbacks only run if that process notices the expiry.
+
+    Since the files are unpickled, the directory must only be writable by the
+    user the server runs as.
+
+    @ivar path: The path of the directory.
+
+    @ivar sessionTimeout: The timeout, in seconds, of the sessions this
+        process has no L{Session} for, which sweeps use.
+
+    @ivar sessions: A C{dict} mapping unique IDs to the L{Session}s this
+        process made or loaded.
+
+    @ivar _inodes: A C{dict} mapping unique IDs to the inode of the file the
+        data of the session in C{sessions} was last loaded from or saved to.
+        Saving replaces the file, so a different inode means another process
+        saved the session.
+    """
+    sessionTimeout = Session.sessionTimeout
+
+    _validUID = re.compile(r'^[A-Za-z0-9_-]+$')
+
+    def __init__(self, path, reactor=None):
+        MemorySessionStore.__init__(self, reactor)
+        self.path = path
+        self._inodes = {}
+        try:
+            os.mkdir(path, 0700)
+        except OSError, e:
+            if e.errno != errno.EEXIST:
+                raise
+
+
+    def __getstate__(self):
+        state = MemorySessionStore.__getstate__(self)
+        state['_inodes'] = {}
+        return state
+
+
+    def _pathFor(self, uid):
+        """
+        Return the path of the file for the session C{uid}, or raise
+        C{KeyError} if C{uid} cannot be a file name.
+        """
+        if not self._validUID.match(uid):
+            raise KeyError(uid)
+        return os.path.join(self.path, uid)
+
+
+    def _forget(self, uid):
+        """
+        Expire the local L{Session} for C{uid}, if there is one, after the
+        file for it went away.
+        """
+        session = self.sessions.get(uid)
+        if session is not None:
+            self.expirations += 1
+            session.expire()
+
+
+    def _sweep(self):
+        """
+        Remove the file of every session which has not been used for
+        L{Session.sessionTimeout}, expire the local L{Session}s of those
+        sessions, and schedule the next sweep.
+        """
+        self._sweepCall = None
+        now = self._getReactor().seconds()
+        names = os.listdir(self.path)
+        for uid in names:
+            if uid.startswith('.'):
+                continue
+            path = os.path.join(self.path, uid)
+            try:
+                st = os.stat(path)
+            except OSError:
+                self._forget(uid)
+                continue
+            session = self.sessions.get(uid)
+            if session is None:
+                timeout = self.sessionTimeout
+            else:
+                timeout = session.sessionTimeout
+            if now - st.st_mtime >= timeout:
+                self._unlink(path)
+                self._forget(uid)
+        for uid in set(self.sessions).difference(names):
+            self._forget(uid)
+        self._scheduleSweep()
+
+
+    def _unlink(self, path):
+        """
+        Remove the file at C{path}, which another process may have removed
+        already.
+        """
+        try:
+            os.unlink(path)
+        except OSError, e:
+            if e.errno != errno.ENOENT:
+                raise
+
+
+    def addSession(self, session):
+        self.saveSession(session)
+
+
+    def getSession(self, site, uid):
+        path = self._pathFor(uid)
+        try:
+            st = os.stat(path)
+        except OSError:
+            self._forget(uid)
+            raise KeyError(uid)
+        session = self.sessions.get(uid)
+        if session is None:
+            session = site.sessionFactory(site, uid)
+        now = self._getReactor().seconds()
+        if now - st.st_mtime >= session.sessionTimeout:
+            self._unlink(path)
+            self._forget(uid)
+            raise KeyError(uid)
+        if self._inodes.get(uid) != st.st_ino:
+            try:
+                f = open(path, 'rb')
+                try:
+                    session.sessionNamespaces = pickle.load(f)
+                finally:
+                    f.close()
+            except IOError:
+                raise KeyError(uid)
+            self._inodes[uid] = st.st_ino
+            self.sessions[uid] = session
+            self._scheduleSweep()
+        session.lastModified = st.st_mtime
+        return session
+
+
+    def _utime(self, path):
+        """
+        Set the modification time of the file at C{path} to now.
+        """
+        now = self._getReactor().seconds()
+        os.utime(path, (now, now))
+
+
+    def touchSession(self, session):
+        if self.sessions.get(session.uid) is session:
+            try:
+                self._utime(self._pathFor(session.uid))
+            except OSError, e:
+                if e.errno != errno.ENOENT:
+                    raise
+
+
+    def saveSession(self, session):
+        path = self._pathFor(session.uid)
+        temporary = os.path.join(
+            self.path, '.%s.%d' % (session.uid, os.getpid()))
+        f = open(temporary, 'wb')
+        try:
+            try:
+                pickle.dump(
+                    session.sessionNamespaces, f, pickle.HIGHEST_PROTOCOL)
+            finally:
+                f.close()
+        except:
+            self._unlink(temporary)
+            raise
+        self._utime(temporary)
+        os.rename(temporary, path)
+        self._inodes[session.uid] = os.stat(path).st_ino
+        self.sessions[session.uid] = session
+        self._scheduleSweep()
+
+
+    def removeSession(self, session):
+        if self.sessions.get(session.uid) is session:
+            self._unlink(self._pathFor(session.uid))
+            self._inodes.pop(session.uid, None)
+        MemorySessionStore.removeSession(self, session)
+
+
+
 version = "TwistedWeb/%s" % copyright.version
 
 
@@ -499,12 +878,23 @@ class Site(http.HTTPFactory):
     @ivar displayTracebacks: if set, Twisted internal errors are displayed on
         rendered pages. Default to C{True}.
     @ivar sessionFactory: factory for sessions objects. Default to L{Session}.
+    @ivar sessionStore: The L{iweb.ISessionStore} which keeps the sessions.
+        Default to a L{MemorySessionStore}.
+    @ivar sessions: The C{sessions} of C{sessionStore}.  Setting it sets
+        them.
+    @ivar lazySessions: If set, new sessions are only added to
+        C{sessionStore} when they are first written to, with L{Session.save},
+        L{Session.setComponent} or L{Session.notifyOnExpire}, so that clients
+        which never store anything in their session cost nothing to keep.
+        Adapters cached by L{Session.getComponent} do not count as writes.
+        Default to C{False}.
     @ivar sessionCheckTime: Deprecated.  See L{Session.sessionTimeout} instead.
     """
     counter = 0
     requestFactory = Request
     displayTracebacks = True
     sessionFactory = Session
+    lazySessions = False
     sessionCheckTime = 1800
 
     def __init__(self, resource, logPath=None, timeout=60*60*12):
@@ -512,7 +902,7 @@ class Site(http.HTTPFactory):
         Initialize.
         """
         http.HTTPFactory.__init__(self, logPath=logPath, timeout=timeout)
-        self.sessions = {}
+        self.sessionStore = MemorySessionStore()
         self.resource = resource
 
     def _openLogFile(self, path):
@@ -520,9 +910,32 @@ class Site(http.HTTPFactory):
         return logfile.LogFile(os.path.basename(path), os.path.dirname(path))
 
     def __getstate__(self):
-        d = self.__dict__.copy()
-        d['sessions'] = {}
-        return d
+        # The session store leaves its sessions out.
+        return self.__dict__.copy()
+
+
+    def __setstate__(self, state):
+        # Sites pickled before there were session stores have an empty
+        # sessions dictionary of their own.
+        state.pop('sessions', None)
+        self.__dict__ = state
+        if state.get('sessionStore') is None:
+            self.sessionStore = MemorySessionStore()
+
+
+    def _getSessions(self):
+        return self.sessionStore.sessions
+
+    sessions = property(_getSessions)
+
+
+    def __setattr__(self, name, value):
+        # Site is a classic class, so the sessions property cannot have a
+        # setter of its own.
+        if name == 'sessions':
+            self.sessionStore.sessions = value
+        else:
+            self.__dict__[name] = value
 
     def _mkuid(self):
         """
@@ -538,8 +951,11 @@ class Site(http.HTTPFactory):
         Generate a new Session instance, and store it for future reference.
         """
         uid = self._mkuid()
-        session = self.sessions[uid] = self.sessionFactory(self, uid)
-        session.startCheckingExpiration()
+        session = self.sessionFactory(self, uid)
+        if self.lazySessions:
+            session._stored = False
+        else:
+            self.sessionStore.addSession(session)
         return session
 
     def getSession(self, uid):
@@ -547,7 +963,7 @@ class Site(http.HTTPFactory):
         Get a previously generated session, by its unique ID.
         This raises a KeyError if the session is not found.
         """
-        return self.sessions[uid]
+        return self.sessionStore.getSession(self, uid)
 
     def buildProtocol(self, addr):
         """
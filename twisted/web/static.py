@@ -13,6 +13,7 @@ import urllib
 import itertools
 import cgi
 import time
+import zlib
 
 from zope.interface import implements
 
@@ -22,7 +23,7 @@ from twisted.web import http
 from twisted.web.util import redirectTo
 
 from twisted.python import components, filepath, log
-from twisted.internet import abstract, interfaces
+from twisted.internet import abstract, interfaces, error
 from twisted.persisted import styles
 from twisted.python.util import InsensitiveDict
 from twisted.python.runtime import platformType
@@ -167,6 +168,10 @@ class File(resource.Resource, styles.Versioned, filepath.FilePath):
     return the contents of /tmp/foo/bar.html .
 
     @cvar childNotFound: L{Resource} used to render 404 Not Found error pages.
+
+    @ivar cache: A L{FileCache} to serve small files from, shared with the
+        L{File}s created for children, or C{None} to read files for every
+        request.
     """
 
     contentTypes = loadMimeTypes()
@@ -182,6 +187,8 @@ class File(resource.Resource, styles.Versioned, filepath.FilePath):
 
     type = None
 
+    cache = None
+
     ### Versioning
 
     persistenceVersion = 6
@@ -569,19 +576,22 @@ class File(resource.Resource, styles.Versioned, filepath.FilePath):
         if byteRange is None:
             self._setContentHeaders(request)
             request.setResponseCode(http.OK)
-            return NoRangeStaticProducer(request, fileForReading)
+            return self._makeNoRangeProducer(request, fileForReading)
         try:
             parsedRanges = self._parseRangeHeader(byteRange)
         except ValueError:
             log.msg("Ignoring malformed Range header %r" % (byteRange,))
             self._setContentHeaders(request)
             request.setResponseCode(http.OK)
-            return NoRangeStaticProducer(request, fileForReading)
+            return self._makeNoRangeProducer(request, fileForReading)
 
         if len(parsedRanges) == 1:
             offset, size = self._doSingleRangeRequest(
                 request, parsedRanges[0])
             self._setContentHeaders(request, size)
+            if _canSendFile(request):
+                return SendFileStaticProducer(
+                    request, fileForReading, offset, size)
             return SingleRangeStaticProducer(
                 request, fileForReading, offset, size)
         else:
@@ -590,6 +600,16 @@ class File(resource.Resource, styles.Versioned, filepath.FilePath):
                 request, fileForReading, rangeInfo)
 
 
+    def _makeNoRangeProducer(self, request, fileForReading):
+        """
+        Make a L{StaticProducer} for the whole of this file.
+        """
+        if _canSendFile(request):
+            return SendFileStaticProducer(
+                request, fileForReading, 0, self.getFileSize())
+        return NoRangeStaticProducer(request, fileForReading)
+
+
     def render_GET(self, request):
         """
         Begin sending the contents of this L{File} (or a subset of the
@@ -603,6 +623,12 @@ class File(resource.Resource, styles.Versioned, filepath.FilePath):
                                                           self.contentEncodings,
                                                           self.defaultType)
 
+        if (self.cache is not None and self.isfile() and
+            request.getHeader('range') is None):
+            entry = self.cache.getEntry(self)
+            if entry is not None:
+                return self._renderCached(request, entry)
+
         if not self.exists():
             return self.childNotFound.render(request)
 
@@ -635,6 +661,34 @@ class File(resource.Resource, styles.Versioned, filepath.FilePath):
     render_HEAD = render_GET
 
 
+    def _renderCached(self, request, entry):
+        """
+        Answer C{request} with the body of the L{FileCache} entry C{entry},
+        or with its gzip encoding if it has one and the request accepts it.
+        """
+        request.setHeader('accept-ranges', 'bytes')
+        body, encoding, etag = entry.body, entry.encoding, entry.etag
+        if entry.gzipped is not None:
+            request.setHeader('vary', 'Accept-Encoding')
+            if _acceptsGzip(request):
+                body, encoding = entry.gzipped, 'gzip'
+                etag = etag[:-1] + '-gzip"'
+
+        if http.CACHED in (request.setLastModified(entry.mtime),
+                           request.setETag(etag)):
+            return ''
+
+        request.setResponseCode(http.OK)
+        request.setHeader('content-length', str(len(body)))
+        if entry.type:
+            request.setHeader('content-type', entry.type)
+        if encoding:
+            request.setHeader('content-encoding', encoding)
+        if request.method == 'HEAD':
+            return ''
+        return body
+
+
     def redirect(self, request):
         return redirectTo(addSlash(request), request)
 
@@ -656,10 +710,338 @@ class File(resource.Resource, styles.Versioned, filepath.FilePath):
         f.processors = self.processors
         f.indexNames = self.indexNames[:]
         f.childNotFound = self.childNotFound
+        f.cache = self.cache
         return f
 
 
 
+def _acceptsGzip(request):
+    """
+    Determine whether the I{Accept-Encoding} header of C{request} allows a
+    gzip encoded response.
+    """
+    accept = request.getHeader('accept-encoding')
+    if not accept:
+        return False
+    for coding in accept.split(','):
+        params = coding.split(';')
+        if params[0].strip().lower() not in ('gzip', 'x-gzip'):
+            continue
+        for param in params[1:]:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    return float(value) > 0
+                except ValueError:
+                    return False
+        return True
+    return False
+
+
+
+def _statValidator(st):
+    """
+    Return the parts of the C{os.stat} result C{st} which change when a file
+    is replaced or written to.
+    """
+    return (st.st_size, st.st_mtime, st.st_ino, st.st_dev)
+
+
+
+class _FileCacheEntry(object):
+    """
+    The cached body of a file, with the headers to serve it with.
+
+    @ivar path: The path of the file.
+    @ivar validator: The L{_statValidator} of the file when it was read.
+    @ivar gzipValidator: The L{_statValidator} of the precompressed sibling
+        C{gzipped} was read from, or C{None}.
+    @ivar body: The contents of the file.
+    @ivar gzipped: The gzip encoding of C{body}, or C{None} if there is none
+        worth serving.
+    @ivar type: The I{Content-Type} of the file.
+    @ivar encoding: The I{Content-Encoding} of the file, or C{None}.
+    @ivar etag: The entity tag of C{body}.
+    @ivar mtime: The modification time of the file.
+    @ivar size: The number of bytes of C{body} and C{gzipped}.
+    @ivar previous: The entry used just less recently than this one.
+    @ivar next: The entry used just more recently than this one.
+    """
+    previous = next = None
+
+    def __init__(self, path, validator, body, type, encoding, etag, mtime):
+        self.path = path
+        self.validator = validator
+        self.gzipValidator = None
+        self.body = body
+        self.gzipped = None
+        self.type = type
+        self.encoding = encoding
+        self.etag = etag
+        self.mtime = mtime
+        self.size = len(body)
+
+
+
+class FileCache(object):
+    """
+    A memory cache of the bodies of small files served by L{File}, bounded by
+    the number of bytes it holds.
+
+    To use one, set it as the C{cache} attribute of a L{File}; the L{File}s
+    it creates for its children share it.  Requests without a I{Range} header
+    for cached files are then answered from memory, with an I{ETag}.
+
+    An entry is only used while the size, modification time and inode of its
+    file are those it was read with, which L{File.render_GET} learns from the
+    C{stat} it makes for every request anyway.  When a request accepts gzip,
+    a sibling file with a C{.gz} extension which is not older than the file
+    is served instead, as long as it is unchanged too.  Otherwise files of
+    the types in C{compressTypes} are compressed once, when they are read.
+    A sibling which appears after a file was cached is found once the file
+    changes or its entry is evicted.
+
+    @ivar maxBytes: The largest number of bytes of file contents, including
+        their gzip encodings, to keep.  The least recently used entries are
+        evicted to stay under it.
+
+    @ivar maxFileSize: The size of the largest file to cache.  Larger files
+        are served by L{File} as if there were no cache.
+
+    @ivar compressTypes: The prefixes of the I{Content-Type}s of the files to
+        compress.
+
+    @ivar compressLevel: The C{zlib} compression level to use.
+
+    @ivar hits: The number of requests answered from the cache.
+
+    @ivar misses: The number of requests for which a file was read.
+
+    @ivar evictions: The number of entries evicted to stay under
+        C{maxBytes}.
+
+    @ivar _entries: A C{dict} mapping the paths of cached files to their
+        L{_FileCacheEntry}.
+
+    @ivar _root: A L{_FileCacheEntry} which starts a circular list of the
+        entries, ordered from the least to the most recently used.
+
+    @ivar _size: The number of bytes held by the entries.
+    """
+
+    compressTypes = ('text/', 'application/javascript',
+                     'application/x-javascript', 'application/json',
+                     'application/xml', 'image/svg+xml')
+    compressLevel = 6
+
+    hits = misses = evictions = 0
+
+    def __init__(self, maxBytes=16 * 1024 * 1024, maxFileSize=256 * 1024):
+        self.maxBytes = maxBytes
+        self.maxFileSize = maxFileSize
+        self._reset()
+
+
+    def _reset(self):
+        """
+        Forget every entry.
+        """
+        self._entries = {}
+        self._root = root = _FileCacheEntry(None, None, '', None, None, None,
+                                            None)
+        root.previous = root.next = root
+        self._size = 0
+
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        # File contents are read again after unpickling.
+        for name in ['_entries', '_root', '_size']:
+            del state[name]
+        return state
+
+
+    def __setstate__(self, state):
+        self.__dict__ = state
+        self._reset()
+
+
+    def getEntry(self, file):
+        """
+        Return the entry for C{file}, reading it if it is not cached or has
+        changed.
+
+        @param file: A L{File} for a regular file, on which C{restat} has just
+            been called.
+
+        @return: A L{_FileCacheEntry}, or C{None} if the file is too large to
+            cache or could not be read.
+        """
+        st = file.statinfo
+        if not st or st.st_size > self.maxFileSize:
+            return None
+        validator = _statValidator(st)
+        entry = self._entries.get(file.path)
+        if entry is not None:
+            if (entry.validator == validator and
+                self._siblingUnchanged(entry)):
+                self.hits += 1
+                self._unlink(entry)
+                self._append(entry)
+                return entry
+            self._remove(entry)
+
+        self.misses += 1
+        entry = self._read(file, validator)
+        if entry is None or entry.size > self.maxBytes:
+            return entry
+        self._entries[entry.path] = entry
+        self._append(entry)
+        self._size += entry.size
+        while self._size > self.maxBytes:
+            self._remove(self._root.next)
+            self.evictions += 1
+        return entry
+
+
+    def _siblingUnchanged(self, entry):
+        """
+        Determine whether the precompressed sibling C{entry} was read with,
+        if any, is unchanged.
+        """
+        if entry.gzipValidator is None:
+            return True
+        try:
+            st = os.stat(entry.path + '.gz')
+        except OSError:
+            return False
+        return _statValidator(st) == entry.gzipValidator
+
+
+    def _read(self, file, validator):
+        """
+        Make an entry for C{file}.
+        """
+        try:
+            fileForReading = file.openForReading()
+        except IOError:
+            return None
+        try:
+            body = fileForReading.read()
+        finally:
+            fileForReading.close()
+
+        if file.type is None:
+            type, encoding = getTypeAndEncoding(file.basename(),
+                                                file.contentTypes,
+                                                file.contentEncodings,
+                                                file.defaultType)
+        else:
+            type, encoding = file.type, file.encoding
+        mtime = file.getmtime()
+        etag = '"%x-%x-%x"' % (validator[2], len(body), int(mtime))
+        entry = _FileCacheEntry(file.path, validator, body, type, encoding,
+                                etag, mtime)
+        if encoding is None:
+            entry.gzipped, entry.gzipValidator = self._gzip(entry)
+            if entry.gzipped is not None:
+                entry.size += len(entry.gzipped)
+        return entry
+
+
+    def _gzip(self, entry):
+        """
+        Return the gzip encoding of the body of C{entry} and the
+        L{_statValidator} of the sibling it was read from, if there is one.
+        """
+        sibling = entry.path + '.gz'
+        try:
+            st = os.stat(sibling)
+        except OSError:
+            pass
+        else:
+            if st.st_mtime >= entry.mtime and st.st_size <= self.maxFileSize:
+                try:
+                    f = open(sibling, 'rb')
+                    try:
+                        return f.read(), _statValidator(st)
+                    finally:
+                        f.close()
+                except IOError:
+                    pass
+
+        if entry.type is None or not entry.type.startswith(
+            self.compressTypes):
+            return None, None
+        compressor = zlib.compressobj(
+            self.compressLevel, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        gzipped = compressor.compress(entry.body) + compressor.flush()
+        if len(gzipped) >= len(entry.body):
+            return None, None
+        return gzipped, None
+
+
+    def _append(self, entry):
+        """
+        Link C{entry} at the most recently used end of the list.
+        """
+        root = self._root
+        last = root.previous
+        last.next = root.previous = entry
+        entry.previous = last
+        entry.next = root
+
+
+    def _unlink(self, entry):
+        """
+        Unlink C{entry} from the list.
+        """
+        entry.previous.next = entry.next
+        entry.next.previous = entry.previous
+
+
+    def _remove(self, entry):
+        """
+        Forget C{entry}.
+        """
+        self._unlink(entry)
+        del self._entries[entry.path]
+        self._size -= entry.size
+
+
+    def getStats(self):
+        """
+        Return statistics about the use of this cache.
+
+        @return: A C{dict} with these keys:
+            - C{"entries"}: the number of files cached.
+            - C{"bytes"}: the number of bytes they hold.
+            - C{"hits"}, C{"misses"} and C{"evictions"}: the values of the
+              attributes of the same names.
+        """
+        return {"entries": len(self._entries),
+                "bytes": self._size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions}
+
+
+
+def _canSendFile(request):
+    """
+    Determine whether the body of the response to C{request} can be sent with
+    the L{interfaces.IFileTransport.sendFile} of its transport: the request is
+    a I{GET} and the transport can send files without TLS.  The response has
+    a I{Content-Length}, so it is never chunked.
+    """
+    transport = getattr(request, 'transport', None)
+    return (request.method == 'GET' and
+            not getattr(request, '_inFakeHead', False) and
+            interfaces.IFileTransport.providedBy(transport) and
+            not getattr(transport, 'TLS', False))
+
+
+
 class StaticProducer(object):
     """
     Superclass for classes that implement the business of producing.
@@ -768,6 +1150,54 @@ class SingleRangeStaticProducer(StaticProducer):
 
 
 
+class SendFileStaticProducer(StaticProducer):
+    """
+    A L{StaticProducer} that has the request's transport send a chunk of a
+    file itself, with L{interfaces.IFileTransport.sendFile}.
+    """
+
+    def __init__(self, request, fileObject, offset, size):
+        """
+        Initialize the instance.
+
+        @param request: See L{StaticProducer}.
+        @param fileObject: See L{StaticProducer}.
+        @param offset: The offset into the file of the chunk to be written.
+        @param size: The size of the chunk to write.
+        """
+        StaticProducer.__init__(self, request, fileObject)
+        self.offset = offset
+        self.size = size
+
+
+    def start(self):
+        # Write the response headers, then queue the file after them.
+        self.request.write('')
+        self.request.sentLength += self.size
+        d = self.request.transport.sendFile(
+            self.fileObject, self.offset, self.size)
+        d.addCallbacks(self._sent, self._failed)
+
+
+    def resumeProducing(self):
+        pass
+
+
+    def _sent(self, ignored):
+        if self.request:
+            self.request.finish()
+            self.stopProducing()
+
+
+    def _failed(self, reason):
+        if self.request:
+            if not reason.check(error.ConnectionClosed):
+                log.err(reason, "Sending file failed")
+            self.request.transport.loseConnection()
+            self.stopProducing()
+
+
+
 class MultipleRangeStaticProducer(StaticProducer):
     """
     A L{StaticProducer} that writes several chunks of a file to the request.
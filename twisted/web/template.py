@@ -335,7 +335,7 @@ def _flatsaxParse(fl):
     @param fl: The XML document to be parsed.
     @type fl: A file object or filename.
 
-    @return: a C{list} of Stan objects.
+    @return: a L{_LoadedDocument} of Stan objects.
     """
     parser = make_parser()
     parser.setFeature(handler.feature_validation, 0)
@@ -350,7 +350,7 @@ def _flatsaxParse(fl):
 
     parser.parse(fl)
 
-    return s.document
+    return _LoadedDocument(s.document)
 
 
 class TagLoader(object):
@@ -562,5 +562,5 @@ def renderElement(request, element,
 
 
 from twisted.web._element import Element, renderer
-from twisted.web._flatten import flatten, flattenString
+from twisted.web._flatten import flatten, flattenString, _LoadedDocument
 import twisted.web.util
@@ -121,6 +121,21 @@ class HTTP1_0TestCase(unittest.TestCase, ResponseTestMixin):
         self.assertResponseEquals(value, self.expected_response)
 
 
+    def test_bufferAtOnce(self):
+        """
+        Send requests over a channel all in one string, as pipelined requests
+        arrive, and check responses match what is expected.
+        """
+        b = StringTransport()
+        a = http.HTTPChannel()
+        a.requestFactory = DummyHTTPHandler
+        a.makeConnection(b)
+        a.dataReceived(self.requests)
+        a.connectionLost(IOError("all one"))
+        value = b.value()
+        self.assertResponseEquals(value, self.expected_response)
+
+
     def test_requestBodyTimeout(self):
         """
         L{HTTPChannel} resets its timeout whenever data from a request body is
@@ -186,6 +201,34 @@ class HTTP1_1TestCase(HTTP1_0TestCase):
 
 
 
+class HTTP1_1ChunkedTestCase(HTTP1_0TestCase):
+
+    requests = (
+        "POST / HTTP/1.1\r\n"
+        "Transfer-Encoding: chunked\r\n"
+        "X-Folded: first\r\n"
+        " second\r\n"
+        "\r\n"
+        "3\r\nabc\r\n7; x=y\r\n0123456\r\n0\r\n\r\n"
+        "GET / HTTP/1.1\r\n"
+        "\r\n")
+
+    expected_response = [
+        ("HTTP/1.1 200 OK",
+         "Request: /",
+         "Command: POST",
+         "Version: HTTP/1.1",
+         "Content-Length: 23",
+         "'''\nNone\nabc0123456'''\n"),
+        ("HTTP/1.1 200 OK",
+         "Request: /",
+         "Command: GET",
+         "Version: HTTP/1.1",
+         "Content-Length: 13",
+         "'''\nNone\n'''\n")]
+
+
+
 class HTTP1_1_close_TestCase(HTTP1_0TestCase):
 
     requests = (
@@ -1661,3 +1704,272 @@ class Expect100ContinueServerTests(unittest.TestCase):
                          "Version: HTTP/1.1\r\n"
                          "Request: /foo\r\n\r\n"
                          "'''\n4\ndefg'''\n")
+
+
+
+class PipeliningTests(unittest.TestCase):
+    """
+    Tests for the handling of pipelined requests by L{HTTPChannel}.
+    """
+
+    def setUp(self):
+        self.processing = processing = []
+
+        class DelayedRequest(http.Request):
+            def process(self):
+                processing.append(self)
+
+        self.transport = StringTransport()
+        self.channel = http.HTTPChannel()
+        self.channel.requestFactory = DelayedRequest
+        self.channel.makeConnection(self.transport)
+
+
+    def _respond(self, request, body):
+        request.write(body)
+        request.finish()
+
+
+    def test_concurrentResponsesInOrder(self):
+        """
+        Pipelined requests are all processed as soon as they are received,
+        and their responses are written in the order of the requests, even if
+        later ones finish first.
+        """
+        self.channel.dataReceived("GET /a HTTP/1.1\r\n\r\n" * 3)
+        self.assertEqual(len(self.processing), 3)
+        first, second, third = self.processing
+
+        self._respond(third, 'third')
+        self._respond(second, 'second')
+        self.assertEqual(self.transport.value(), '')
+
+        self._respond(first, 'first')
+        value = self.transport.value()
+        self.assertTrue(
+            value.find('first') < value.find('second') < value.find('third'))
+
+
+    def test_maxPipelineDepth(self):
+        """
+        Once L{HTTPChannel.maxPipelineDepth} requests are being processed, the
+        channel stops reading from its transport, and handles the requests
+        already received once a response finishes.
+        """
+        self.channel.maxPipelineDepth = 2
+        self.channel.dataReceived("GET /a HTTP/1.1\r\n\r\n" * 3)
+        self.assertEqual(len(self.processing), 2)
+        self.assertEqual(self.transport.producerState, 'paused')
+
+        self._respond(self.processing[1], 'second')
+        self.assertEqual(len(self.processing), 2)
+
+        self._respond(self.processing[0], 'first')
+        self.assertEqual(len(self.processing), 3)
+        self.assertEqual(self.transport.producerState, 'producing')
+
+
+
+class FakeLogFile(object):
+    """
+    A log file which records what is done to it.
+
+    @ivar written: The strings written to it, in order.
+    @ivar events: The names of the methods called, in order.
+    """
+    def __init__(self):
+        self.written = []
+        self.events = []
+
+
+    def write(self, data):
+        self.written.append(data)
+        self.events.append('write')
+
+
+    def flush(self):
+        self.events.append('flush')
+
+
+    def rotate(self):
+        self.events.append('rotate')
+
+
+    def close(self):
+        self.events.append('close')
+
+
+
+class FakeThreadPool(object):
+    """
+    A thread pool which runs calls only when told to.
+
+    @ivar calls: The calls made in the pool, as C{(onResult, f, args)}
+        tuples, which have not been run yet.
+    """
+    started = False
+    stopped = False
+
+    def __init__(self):
+        self.calls = []
+
+
+    def start(self):
+        self.started = True
+
+
+    def stop(self):
+        self.stopped = True
+
+
+    def callInThreadWithCallback(self, onResult, f, *args):
+        self.calls.append((onResult, f, args))
+
+
+    def runCall(self):
+        """
+        Run the oldest call made in the pool, and report its result.
+        """
+        onResult, f, args = self.calls.pop(0)
+        onResult(True, f(*args))
+
+
+
+class ThreadlessClock(Clock):
+    """
+    A L{Clock} which runs functions called from threads at once.
+    """
+    def callFromThread(self, f, *args):
+        f(*args)
+
+
+
+class BufferedLogFileTests(unittest.TestCase):
+    """
+    Tests for L{http._BufferedLogFile}.
+    """
+    def setUp(self):
+        self.clock = ThreadlessClock()
+        self.logFile = FakeLogFile()
+        self.buffered = http._BufferedLogFile(
+            self.logFile, self.clock, bufferSize=10, flushInterval=5,
+            maxBufferSize=20)
+        self.threadpool = self.buffered._threadpool = FakeThreadPool()
+
+
+    def test_flushOnSize(self):
+        """
+        Once C{bufferSize} bytes of lines have been written, they are written
+        to the log file together, in the thread pool.
+        """
+        self.buffered.write('abcd\n')
+        self.assertEqual(self.threadpool.calls, [])
+        self.buffered.write('efgh\n')
+        self.assertTrue(self.threadpool.started)
+        self.assertEqual(len(self.threadpool.calls), 1)
+        self.assertEqual(self.logFile.written, [])
+
+        self.threadpool.runCall()
+        self.assertEqual(self.logFile.written, ['abcd\nefgh\n'])
+        self.assertEqual(self.logFile.events, ['write', 'flush'])
+        self.assertEqual(self.buffered.getStats(),
+                         {"written": 2, "dropped": 0, "buffered": 0})
+
+
+    def test_flushOnTime(self):
+        """
+        Lines are written C{flushInterval} seconds after the first of them,
+        even if there are fewer than C{bufferSize} bytes of them.
+        """
+        self.buffered.write('ab\n')
+        self.clock.advance(4)
+        self.buffered.write('cd\n')
+        self.assertEqual(self.threadpool.calls, [])
+        self.clock.advance(1)
+        self.threadpool.runCall()
+        self.assertEqual(self.logFile.written, ['ab\ncd\n'])
+        self.assertEqual(self.clock.getDelayedCalls(), [])
+
+
+    def test_oneBatchAtATime(self):
+        """
+        Lines written while a batch is being written are written after it,
+        and lines beyond C{maxBufferSize} bytes are dropped.
+        """
+        self.buffered.write('0123456789')
+        self.buffered.write('abcdefghij')
+        self.buffered.write('klmnopqrst')
+        self.buffered.write('dropped')
+        self.assertEqual(len(self.threadpool.calls), 1)
+        self.assertEqual(self.buffered.getStats(),
+                         {"written": 0, "dropped": 1, "buffered": 2})
+
+        self.threadpool.runCall()
+        self.assertEqual(len(self.threadpool.calls), 1)
+        self.threadpool.runCall()
+        self.assertEqual(self.logFile.written,
+                         ['0123456789', 'abcdefghijklmnopqrst'])
+        self.assertEqual(self.buffered.getStats(),
+                         {"written": 3, "dropped": 1, "buffered": 0})
+
+
+    def test_writeFailed(self):
+        """
+        If writing a batch fails, the failure is logged and later lines are
+        still written.
+        """
+        def write(data):
+            raise IOError("disk full")
+        self.logFile.write = write
+        self.buffered.write('0123456789')
+        onResult, f, args = self.threadpool.calls.pop(0)
+        try:
+            f(*args)
+        except IOError:
+            onResult(False, Failure())
+        self.assertEqual(len(self.flushLoggedErrors(IOError)), 1)
+
+        del self.logFile.write
+        self.buffered.write('abcdefghij')
+        self.threadpool.runCall()
+        self.assertEqual(self.logFile.written, ['abcdefghij'])
+
+
+    def test_close(self):
+        """
+        L{http._BufferedLogFile.close} stops the thread pool, writes the lines
+        waiting and closes the log file.
+        """
+        self.buffered.write('0123456789')
+        self.buffered.write('abc\n')
+        self.buffered.close()
+        self.assertTrue(self.threadpool.stopped)
+        self.assertEqual(self.logFile.written, ['abc\n'])
+        self.assertEqual(self.logFile.events, ['write', 'close'])
+        self.assertEqual(self.clock.getDelayedCalls(), [])
+
+
+    def test_rotate(self):
+        """
+        L{http._BufferedLogFile.rotate} rotates the log file.
+        """
+        self.buffered.rotate()
+        self.assertEqual(self.logFile.events, ['rotate'])
+
+
+    def test_factory(self):
+        """
+        L{http.HTTPFactory} writes its log through a L{http._BufferedLogFile}
+        if C{logBufferSize} is set.
+        """
+        factory = http.HTTPFactory(self.mktemp())
+        factory.logBufferSize = 100
+        factory.startFactory()
+        self.assertIsInstance(factory.logFile, http._BufferedLogFile)
+        factory.logFile.write('line\n')
+        factory.stopFactory()
+        f = open(factory.logPath)
+        try:
+            self.assertEqual(f.read(), 'line\n')
+        finally:
+            f.close()
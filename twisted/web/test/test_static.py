@@ -5,11 +5,12 @@
 Tests for L{twisted.web.static}.
 """
 
-import os, re, StringIO
+import os, re, StringIO, zlib
 
+from zope.interface import implements
 from zope.interface.verify import verifyObject
 
-from twisted.internet import abstract, interfaces
+from twisted.internet import abstract, interfaces, defer, error
 from twisted.python.compat import set
 from twisted.python.runtime import platform
 from twisted.python.filepath import FilePath
@@ -310,6 +311,236 @@ class StaticFileTests(TestCase):
 
 
 
+class FileCacheTests(TestCase):
+    """
+    Tests for serving files from a L{static.FileCache}.
+    """
+    def setUp(self):
+        self.base = FilePath(self.mktemp())
+        self.base.makedirs()
+        self.root = static.File(self.base.path)
+        self.cache = self.root.cache = static.FileCache()
+
+
+    def render(self, name, **headers):
+        """
+        Render the child C{name} of C{self.root} for a I{GET} request with
+        the given headers, and return the request and the response body.
+        """
+        request = DummyRequest([name])
+        request.headers.update(headers)
+        child = resource.getChildForRequest(self.root, request)
+        return request, child.render(request)
+
+
+    def test_cached(self):
+        """
+        A file is read once and then served from the cache, with its
+        I{Content-Type}, I{Content-Length} and an I{ETag}.
+        """
+        self.base.child('foo.png').setContent('baz')
+        for i in range(2):
+            request, body = self.render('foo.png')
+            self.assertEqual(body, 'baz')
+            self.assertEqual(request.responseCode, http.OK)
+            self.assertEqual(request.outgoingHeaders['content-type'],
+                             'image/png')
+            self.assertEqual(request.outgoingHeaders['content-length'], '3')
+            self.assertEqual(request.outgoingHeaders['accept-ranges'], 'bytes')
+        self.assertEqual(self.cache.getStats(), {
+                "entries": 1, "bytes": 3, "hits": 1, "misses": 1,
+                "evictions": 0})
+
+
+    def test_changed(self):
+        """
+        A file which changed since it was cached is read again.
+        """
+        self.base.child('foo.png').setContent('baz')
+        self.render('foo.png')
+        self.base.child('foo.png').setContent('quux')
+        request, body = self.render('foo.png')
+        self.assertEqual(body, 'quux')
+        self.assertEqual(self.cache.misses, 2)
+        self.assertEqual(self.cache.getStats()["bytes"], 4)
+
+
+    def test_etag(self):
+        """
+        A request whose I{If-None-Match} header has the I{ETag} of a cached
+        file is answered without a body.
+        """
+        self.base.child('foo.png').setContent('baz')
+        self.render('foo.png')
+        etag = self.cache._entries[self.base.child('foo.png').path].etag
+
+        request = DummyRequest(['foo.png'])
+        request.headers['if-none-match'] = etag
+        request.setETag = lambda tag: tag == etag and http.CACHED
+        child = resource.getChildForRequest(self.root, request)
+        self.assertEqual(child.render(request), '')
+
+
+    def test_head(self):
+        """
+        A cached file is served without a body for a I{HEAD} request.
+        """
+        self.base.child('foo.png').setContent('baz')
+        self.render('foo.png')
+        request = DummyRequest(['foo.png'])
+        request.method = 'HEAD'
+        child = resource.getChildForRequest(self.root, request)
+        self.assertEqual(child.render(request), '')
+        self.assertEqual(request.outgoingHeaders['content-length'], '3')
+        self.assertEqual(self.cache.hits, 1)
+
+
+    def test_gzip(self):
+        """
+        Files of compressible types are compressed once, and served gzip
+        encoded to requests which accept it.
+        """
+        content = 'hello world ' * 100
+        self.base.child('foo.txt').setContent(content)
+        request, body = self.render('foo.txt', **{'accept-encoding': 'gzip'})
+        self.assertEqual(zlib.decompress(body, 16 + zlib.MAX_WBITS), content)
+        self.assertEqual(request.outgoingHeaders['content-encoding'], 'gzip')
+        self.assertEqual(request.outgoingHeaders['content-type'],
+                         'text/plain')
+        self.assertEqual(request.outgoingHeaders['vary'], 'Accept-Encoding')
+        self.assertEqual(request.outgoingHeaders['content-length'],
+                         str(len(body)))
+
+        request, body = self.render('foo.txt')
+        self.assertEqual(body, content)
+        self.assertNotIn('content-encoding', request.outgoingHeaders)
+        self.assertEqual(request.outgoingHeaders['vary'], 'Accept-Encoding')
+        self.assertEqual(self.cache.misses, 1)
+
+
+    def test_gzipRefused(self):
+        """
+        A file is not served gzip encoded to a request which gives gzip a
+        quality of zero.
+        """
+        content = 'hello world ' * 100
+        self.base.child('foo.txt').setContent(content)
+        request, body = self.render(
+            'foo.txt', **{'accept-encoding': 'gzip;q=0, deflate'})
+        self.assertEqual(body, content)
+
+
+    def test_notCompressed(self):
+        """
+        Files whose types are not in C{compressTypes} are not compressed.
+        """
+        content = 'hello world ' * 100
+        self.base.child('foo.png').setContent(content)
+        request, body = self.render('foo.png', **{'accept-encoding': 'gzip'})
+        self.assertEqual(body, content)
+        self.assertNotIn('vary', request.outgoingHeaders)
+
+
+    def test_precompressed(self):
+        """
+        A sibling file with a C{.gz} extension is served to requests which
+        accept gzip, until it changes.
+        """
+        self.base.child('foo.png').setContent('baz')
+        self.base.child('foo.png.gz').setContent('compressed baz')
+        request, body = self.render('foo.png', **{'accept-encoding': 'gzip'})
+        self.assertEqual(body, 'compressed baz')
+        self.assertEqual(request.outgoingHeaders['content-encoding'], 'gzip')
+        self.assertEqual(request.outgoingHeaders['content-type'], 'image/png')
+
+        self.base.child('foo.png.gz').setContent('compressed baz again')
+        request, body = self.render('foo.png', **{'accept-encoding': 'gzip'})
+        self.assertEqual(body, 'compressed baz again')
+        self.assertEqual(self.cache.misses, 2)
+
+
+    def test_range(self):
+        """
+        Requests with a I{Range} header are not served from the cache.
+        """
+        self.base.child('foo.png').setContent('baz')
+        request, body = self.render('foo.png', range='bytes=0-1')
+        self.assertEqual(''.join(request.written), 'ba')
+        self.assertEqual((self.cache.hits, self.cache.misses), (0, 0))
+
+
+    def test_maxFileSize(self):
+        """
+        Files larger than C{maxFileSize} are not cached.
+        """
+        self.cache.maxFileSize = 2
+        self.base.child('foo.png').setContent('baz')
+        request, body = self.render('foo.png')
+        self.assertEqual(''.join(request.written), 'baz')
+        self.assertEqual(self.cache.getStats()["entries"], 0)
+
+
+    def test_maxBytes(self):
+        """
+        The least recently used entries are evicted to keep the size of the
+        cache under C{maxBytes}.
+        """
+        self.cache.maxBytes = 7
+        for name in 'a.png', 'b.png', 'c.png':
+            self.base.child(name).setContent('baz')
+        self.render('a.png')
+        self.render('b.png')
+        self.render('a.png')
+        self.render('c.png')
+        self.assertEqual(sorted(self.cache._entries),
+                         [self.base.child('a.png').path,
+                          self.base.child('c.png').path])
+        self.assertEqual(self.cache.getStats(), {
+                "entries": 2, "bytes": 6, "hits": 1, "misses": 3,
+                "evictions": 1})
+
+
+
+class FileTransport(object):
+    """
+    A fake L{interfaces.IFileTransport}.
+
+    @ivar sendFileCalls: A C{list} of the arguments passed to C{sendFile},
+        each followed by the L{Deferred} it returned.
+    @ivar lost: C{True} once C{loseConnection} has been called.
+    """
+    implements(interfaces.IFileTransport)
+
+    TLS = False
+    lost = False
+
+    def __init__(self):
+        self.sendFileCalls = []
+
+
+    def sendFile(self, fileObject, offset, count):
+        d = defer.Deferred()
+        self.sendFileCalls.append((fileObject, offset, count, d))
+        return d
+
+
+    def loseConnection(self):
+        self.lost = True
+
+
+
+def fileTransportRequest(method='GET'):
+    """
+    Make a L{DummyRequest} whose transport is a L{FileTransport}.
+    """
+    request = DummyRequest([])
+    request.method = method
+    request.transport = FileTransport()
+    request.sentLength = 0
+    return request
+
+
+
 class StaticMakeProducerTests(TestCase):
     """
     Tests for L{File.makeProducer}.
@@ -399,6 +630,56 @@ class StaticMakeProducerTests(TestCase):
         self.assertIsInstance(producer, static.SingleRangeStaticProducer)
 
 
+    def test_noRangeHeaderGivesSendFileStaticProducer(self):
+        """
+        makeProducer when no Range header is set returns a
+        L{static.SendFileStaticProducer} for the whole file if the request's
+        transport provides L{interfaces.IFileTransport}.
+        """
+        resource = self.makeResourceWithContent('abcdef')
+        request = fileTransportRequest()
+        producer = resource.makeProducer(request, resource.openForReading())
+        self.assertIsInstance(producer, static.SendFileStaticProducer)
+        self.assertEqual((producer.offset, producer.size), (0, 6))
+
+
+    def test_singleRangeGivesSendFileStaticProducer(self):
+        """
+        makeProducer when the Range header requests a single byte range
+        returns a L{static.SendFileStaticProducer} for that range if the
+        request's transport provides L{interfaces.IFileTransport}.
+        """
+        resource = self.makeResourceWithContent('abcdef')
+        request = fileTransportRequest()
+        request.headers['range'] = 'bytes=1-3'
+        producer = resource.makeProducer(request, resource.openForReading())
+        self.assertIsInstance(producer, static.SendFileStaticProducer)
+        self.assertEqual((producer.offset, producer.size), (1, 3))
+
+
+    def test_noSendFileOverTLS(self):
+        """
+        makeProducer does not return a L{static.SendFileStaticProducer} if TLS
+        has been started on the request's transport.
+        """
+        resource = self.makeResourceWithContent('abcdef')
+        request = fileTransportRequest()
+        request.transport.TLS = True
+        producer = resource.makeProducer(request, resource.openForReading())
+        self.assertIsInstance(producer, static.NoRangeStaticProducer)
+
+
+    def test_noSendFileForHEAD(self):
+        """
+        makeProducer does not return a L{static.SendFileStaticProducer} for a
+        I{HEAD} request.
+        """
+        resource = self.makeResourceWithContent('abcdef')
+        request = fileTransportRequest('HEAD')
+        producer = resource.makeProducer(request, resource.openForReading())
+        self.assertIsInstance(producer, static.NoRangeStaticProducer)
+
+
     def test_singleRangeSets206PartialContent(self):
         """
         makeProducer when the Range header requests a single, satisfiable byte
@@ -770,6 +1051,82 @@ class SingleRangeStaticProducerTests(TestCase):
 
 
 
+class SendFileStaticProducerTests(TestCase):
+    """
+    Tests for L{SendFileStaticProducer}.
+    """
+
+    def test_implementsIPullProducer(self):
+        """
+        L{SendFileStaticProducer} implements L{IPullProducer}.
+        """
+        verifyObject(
+            interfaces.IPullProducer,
+            static.SendFileStaticProducer(None, None, None, None))
+
+
+    def test_start(self):
+        """
+        L{SendFileStaticProducer.start} starts the response and passes the
+        file, offset and size to the C{sendFile} method of the request's
+        transport.
+        """
+        request = fileTransportRequest()
+        fileObject = StringIO.StringIO('abcdef')
+        producer = static.SendFileStaticProducer(request, fileObject, 1, 3)
+        producer.start()
+        self.assertEqual(request.written, [''])
+        self.assertEqual(request.sentLength, 3)
+        [(sentFile, offset, count, d)] = request.transport.sendFileCalls
+        self.assertEqual((sentFile, offset, count), (fileObject, 1, 3))
+
+
+    def test_finishCalledWhenSent(self):
+        """
+        Once the file has been sent, L{SendFileStaticProducer} finishes the
+        request and closes the file.
+        """
+        request = fileTransportRequest()
+        finished = []
+        request.notifyFinish().addCallback(finished.append)
+        fileObject = StringIO.StringIO('abcdef')
+        producer = static.SendFileStaticProducer(request, fileObject, 0, 6)
+        producer.start()
+        request.transport.sendFileCalls[0][3].callback(None)
+        self.assertEqual(finished, [None])
+        self.assertTrue(fileObject.closed)
+
+
+    def test_sendFailed(self):
+        """
+        If sending the file fails, L{SendFileStaticProducer} logs the failure,
+        closes the connection and closes the file.
+        """
+        request = fileTransportRequest()
+        fileObject = StringIO.StringIO('abcdef')
+        producer = static.SendFileStaticProducer(request, fileObject, 0, 6)
+        producer.start()
+        request.transport.sendFileCalls[0][3].errback(IOError())
+        self.assertEqual(len(self.flushLoggedErrors(IOError)), 1)
+        self.assertTrue(request.transport.lost)
+        self.assertTrue(fileObject.closed)
+
+
+    def test_connectionLost(self):
+        """
+        If the connection is lost while the file is being sent,
+        L{SendFileStaticProducer} closes the file without logging an error.
+        """
+        request = fileTransportRequest()
+        fileObject = StringIO.StringIO('abcdef')
+        producer = static.SendFileStaticProducer(request, fileObject, 0, 6)
+        producer.start()
+        request.transport.sendFileCalls[0][3].errback(error.ConnectionLost())
+        self.assertEqual(self.flushLoggedErrors(), [])
+        self.assertTrue(fileObject.closed)
+
+
+
 class MultipleRangeStaticProducerTests(TestCase):
     """
     Tests for L{MultipleRangeStaticProducer}.
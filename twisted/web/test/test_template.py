@@ -591,6 +591,70 @@ class FlattenIntegrationTests(FlattenTestCase):
 
 
 
+class CompiledTemplateTests(FlattenTestCase):
+    """
+    Tests for the compilation of templates loaded by L{XMLString} and
+    L{XMLFile} when they are flattened.
+    """
+    def test_compiled(self):
+        """
+        The first time a loaded template is flattened, its static parts are
+        serialized and joined together, and it is rendered from them then and
+        after.
+        """
+        loader = XMLString(
+            '<div xmlns:t="http://twistedmatrix.com/ns/twisted.web.template/0.1"'
+            ' class="a&amp;b"><p>Hello, <!-- comment --> world.</p>'
+            '<t:slot name="name" default="x" /><br /></div>')
+        document = loader.load()
+        slot = document[0].children[1]
+        self.assertFlattensImmediately(
+            Element(loader=loader),
+            '<div class="a&amp;b"><p>Hello, <!-- comment --> world.</p>'
+            'x<br /></div>')
+        self.assertEqual(
+            document._compiled,
+            ['<div class="a&amp;b"><p>Hello, <!-- comment --> world.</p>',
+             (slot, False),
+             '<br /></div>'])
+
+        # The compiled template is reused:
+        compiled = document._compiled
+        self.assertFlattensImmediately(
+            Element(loader=loader),
+            '<div class="a&amp;b"><p>Hello, <!-- comment --> world.</p>'
+            'x<br /></div>')
+        self.assertIdentical(document._compiled, compiled)
+
+
+    def test_dynamicAttribute(self):
+        """
+        Slots in the attributes of a compiled template are filled for each
+        render.
+        """
+        inner = XMLString(
+            '<a xmlns:t="http://twistedmatrix.com/ns/twisted.web.template/0.1">'
+            '<t:attr name="href">/<t:slot name="path" /></t:attr>link</a>')
+
+        class SlotElement(Element):
+            loader = TagLoader(tags.p(render="fill"))
+            @renderer
+            def fill(self, request, tag):
+                return tag.fillSlots(path=self.path)(Element(loader=inner))
+
+        element = SlotElement()
+        element.path = 'a&b'
+        self.assertFlattensImmediately(
+            element, '<p><a href="/a&amp;b">link</a></p>')
+        element.path = 'c'
+        self.assertFlattensImmediately(element, '<p><a href="/c">link</a></p>')
+
+        slot = inner.load()[0].attributes['href'].children[1]
+        self.assertEqual(inner.load()._compiled,
+                         ['<a href="/', (slot, False), '">link</a>'])
+
+
+
 class TagLoaderTests(FlattenTestCase):
     """
     Tests for L{TagLoader}.
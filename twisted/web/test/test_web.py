@@ -5,6 +5,7 @@
 Tests for various parts of L{twisted.web}.
 """
 
+import os
 from cStringIO import StringIO
 
 from zope.interface import implements
@@ -243,6 +244,9 @@ class DummyChannel:
         def registerProducer(self, producer, streaming):
             self.producers.append((producer, streaming))
 
+        def unregisterProducer(self):
+            del self.producers[:]
+
         def loseConnection(self):
             self.disconnected = True
 
@@ -406,6 +410,262 @@ class SessionTest(unittest.TestCase):
         self.assertEqual(len(warnings), 1)
 
 
+
+class MemorySessionStoreTests(unittest.TestCase):
+    """
+    Tests for L{server.MemorySessionStore} and its use by L{server.Site}.
+    """
+    def setUp(self):
+        self.clock = task.Clock()
+        self.site = server.Site(resource.Resource())
+        self.site.sessionFactory = self.sessionFactory
+        self.store = self.site.sessionStore = server.MemorySessionStore(
+            self.clock)
+
+
+    def sessionFactory(self, site, uid):
+        return server.Session(site, uid, self.clock)
+
+
+    def test_interface(self):
+        """
+        L{server.MemorySessionStore} provides L{iweb.ISessionStore}, and is
+        the default session store of L{server.Site}, which shares its
+        C{sessions}.
+        """
+        self.assertTrue(verifyObject(iweb.ISessionStore, self.store))
+        site = server.Site(resource.Resource())
+        self.assertIsInstance(site.sessionStore, server.MemorySessionStore)
+        self.assertIdentical(site.sessions, site.sessionStore.sessions)
+
+
+    def test_sessions(self):
+        """
+        L{server.Site.sessions} are the C{sessions} of the site's current
+        session store, and setting them sets those.
+        """
+        site = server.Site(resource.Resource())
+        store = site.sessionStore = server.MemorySessionStore(self.clock)
+        self.assertIdentical(site.sessions, store.sessions)
+        sessions = site.sessions = {}
+        self.assertIdentical(store.sessions, sessions)
+        session = server.Session(site, 'abc', self.clock)
+        site.sessions['abc'] = session
+        self.assertIdentical(site.getSession('abc'), session)
+
+
+    def test_sessionClock(self):
+        """
+        Whether a session has expired is measured with the clock of the
+        session, which need not be the store's.
+        """
+        site = server.Site(resource.Resource())
+        session = server.Session(site, 'abc', self.clock)
+        site.sessions['abc'] = session
+        expired = []
+        session.notifyOnExpire(lambda: expired.append(True))
+        self.assertIdentical(site.getSession('abc'), session)
+        self.assertEqual(expired, [])
+
+        self.clock.advance(session.sessionTimeout)
+        self.assertRaises(KeyError, site.getSession, 'abc')
+        self.assertEqual(expired, [True])
+
+
+    def test_makeSession(self):
+        """
+        L{server.Site.makeSession} adds the session to the store, where
+        L{server.Site.getSession} finds it, without starting a delayed call
+        for it.
+        """
+        session = self.site.makeSession()
+        self.assertIdentical(self.site.getSession(session.uid), session)
+        self.assertIdentical(session._expireCall, None)
+        self.assertEqual(len(self.clock.calls), 1)
+        self.assertRaises(KeyError, self.site.getSession, 'unknown')
+
+
+    def test_sweep(self):
+        """
+        A single delayed call expires the sessions which have not been used
+        for their C{sessionTimeout}, and stops once there are no sessions
+        left.
+        """
+        expired = []
+        first = self.site.makeSession()
+        first.notifyOnExpire(lambda: expired.append(first))
+        self.clock.advance(self.store.sweepInterval)
+        second = self.site.makeSession()
+        second.notifyOnExpire(lambda: expired.append(second))
+        self.assertEqual(len(self.clock.calls), 1)
+
+        self.clock.pump([self.store.sweepInterval] * (
+                first.sessionTimeout // self.store.sweepInterval - 1))
+        self.assertEqual(expired, [first])
+        self.assertEqual(self.store.sessions, {second.uid: second})
+
+        self.clock.advance(self.store.sweepInterval)
+        self.assertEqual(expired, [first, second])
+        self.assertEqual(self.store.sessions, {})
+        self.assertEqual(self.clock.calls, [])
+        self.assertEqual(self.store.getStats(),
+                         {"sessions": 0, "expirations": 2})
+
+
+    def test_expiredBeforeSweep(self):
+        """
+        A session which has not been used for its C{sessionTimeout} is
+        expired when it is looked up, even if no sweep removed it yet.
+        """
+        session = self.site.makeSession()
+        self.clock.advance(session.sessionTimeout - 1)
+        session.touch()
+        self.clock.advance(session.sessionTimeout - 1)
+        self.assertIdentical(self.site.getSession(session.uid), session)
+        self.clock.advance(1)
+        self.assertRaises(KeyError, self.site.getSession, session.uid)
+        self.assertNotIn(session.uid, self.store.sessions)
+
+
+    def test_lazySessions(self):
+        """
+        If L{server.Site.lazySessions} is set, a new session is only added to
+        the store once it is written to.
+        """
+        self.site.lazySessions = True
+        session = self.site.makeSession()
+        session.touch()
+        self.assertRaises(KeyError, self.site.getSession, session.uid)
+        self.assertEqual(self.clock.calls, [])
+
+        session.setComponent(iweb.IRequest, object())
+        self.assertIdentical(self.site.getSession(session.uid), session)
+
+        other = self.site.makeSession()
+        other.save()
+        self.assertIdentical(self.site.getSession(other.uid), other)
+
+
+    def test_lazySessionsRequest(self):
+        """
+        L{server.Request.getSession} sets the session cookie for a lazy
+        session, which is only found by later requests if it was written to.
+        """
+        self.site.lazySessions = True
+        request = server.Request(DummyChannel(), 1)
+        request.site = self.site
+        request.sitepath = []
+        session = request.getSession()
+        self.assertEqual(request.cookies,
+                         ['TWISTED_SESSION=%s; Path=/' % (session.uid,)])
+        self.assertEqual(self.store.sessions, {})
+        session.save()
+        self.assertEqual(self.store.sessions, {session.uid: session})
+
+
+
+class DirectorySessionStoreTests(unittest.TestCase):
+    """
+    Tests for L{server.DirectorySessionStore}.
+    """
+    def setUp(self):
+        self.clock = task.Clock()
+        self.clock.advance(1000000)
+        self.path = self.mktemp()
+        self.first = self.makeSite()
+        self.second = self.makeSite()
+
+
+    def makeSite(self):
+        """
+        Make a L{server.Site} keeping its sessions in C{self.path}, as a
+        process of a server would.
+        """
+        site = server.Site(resource.Resource())
+        site.sessionFactory = lambda site, uid: server.Session(
+            site, uid, self.clock)
+        site.sessionStore = server.DirectorySessionStore(self.path, self.clock)
+        return site
+
+
+    def test_interface(self):
+        """
+        L{server.DirectorySessionStore} provides L{iweb.ISessionStore}.
+        """
+        self.assertTrue(
+            verifyObject(iweb.ISessionStore, self.first.sessionStore))
+
+
+    def test_shared(self):
+        """
+        A session made by one site can be found by another using the same
+        directory, which loads the data saved by the first and saves data the
+        first loads.
+        """
+        session = self.first.makeSession()
+        session.sessionNamespaces['user'] = 'alice'
+        session.save()
+
+        other = self.second.getSession(session.uid)
+        self.assertNotIdentical(other, session)
+        self.assertEqual(other.sessionNamespaces, {'user': 'alice'})
+
+        other.sessionNamespaces['user'] = 'bob'
+        other.save()
+        self.assertIdentical(self.first.getSession(session.uid), session)
+        self.assertEqual(session.sessionNamespaces, {'user': 'bob'})
+
+
+    def test_touch(self):
+        """
+        Touching a session in one site delays its expiry in the others.
+        """
+        session = self.first.makeSession()
+        other = self.second.getSession(session.uid)
+        self.clock.advance(session.sessionTimeout - 1)
+        other.touch()
+        self.clock.advance(session.sessionTimeout - 1)
+        self.assertIdentical(self.first.getSession(session.uid), session)
+
+
+    def test_expire(self):
+        """
+        A session which expires in one site is not found by the others, which
+        expire their own L{server.Session} for it.
+        """
+        expired = []
+        session = self.first.makeSession()
+        other = self.second.getSession(session.uid)
+        other.notifyOnExpire(lambda: expired.append(other))
+        session.expire()
+        self.assertEqual(os.listdir(self.path), [])
+        self.assertRaises(KeyError, self.second.getSession, session.uid)
+        self.assertEqual(expired, [other])
+
+
+    def test_sweep(self):
+        """
+        Sweeps remove the files of sessions which have not been used for
+        their C{sessionTimeout}.
+        """
+        session = self.first.makeSession()
+        store = self.first.sessionStore
+        self.clock.pump([store.sweepInterval] * (
+                session.sessionTimeout // store.sweepInterval))
+        self.assertEqual(os.listdir(self.path), [])
+        self.assertEqual(store.sessions, {})
+        self.assertEqual(self.clock.calls, [])
+
+
+    def test_invalidUID(self):
+        """
+        Unique IDs which could name files outside of the directory are not
+        found.
+        """
+        self.assertRaises(KeyError, self.first.getSession, '../passwd')
+        self.assertRaises(KeyError, self.first.getSession, '')
+
+
 # Conditional requests:
 # If-None-Match, If-Modified-Since
 
@@ -1037,6 +1297,16 @@ class TestLogEscaping(unittest.TestCase):
             self.site.logFile.read(),
             '1.2.3.4 - - [25/Oct/2004:12:31:59 +0000] "GET /dummy HTTP/1.0" 123 - "-" "Malicious Web\\" Evil"\n')
 
+    def testUnprintableQuote(self):
+        self.site._logDateTime = "[%02d/%3s/%4d:%02d:%02d:%02d +0000]" % (
+            25, 'Oct', 2004, 12, 31, 59)
+        self.request.uri = "/dummy\\it's\t\xe2\x98\x83"
+        self.site.log(self.request)
+        self.site.logFile.seek(0)
+        self.assertEqual(
+            self.site.logFile.read(),
+            '1.2.3.4 - - [25/Oct/2004:12:31:59 +0000] "GET /dummy\\\\it\'s\\t\\xe2\\x98\\x83 HTTP/1.0" 123 - "-" "-"\n')
+
 
 
 class ServerAttributesTestCase(unittest.TestCase):
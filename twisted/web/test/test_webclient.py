@@ -1407,7 +1407,7 @@ class DummyFactory(Factory):
     """
     Create C{StubHTTPProtocol} instances.
     """
-    def __init__(self, quiescentCallback):
+    def __init__(self, quiescentCallback, lostCallback=None):
         pass
 
     protocol = StubHTTPProtocol
@@ -1703,6 +1703,224 @@ class HTTPConnectionPoolTests(unittest.TestCase, FakeReactorAndConnectMixin):
         self.assertEqual(result, [None])
 
 
+    def _limitedPool(self):
+        """
+        Return a L{HTTPConnectionPool} using L{HTTP11ClientProtocol}, which
+        allows one active connection per key.
+        """
+        pool = HTTPConnectionPool(self.fakeReactor)
+        pool.retryAutomatically = False
+        pool.maxActivePerHost = 1
+        return pool
+
+
+    def test_maxActivePerHost(self):
+        """
+        Once C{maxActivePerHost} connections for a key are in use, calls to
+        L{HTTPConnectionPool.getConnection} for it wait, in order, until a
+        connection is returned to the pool or lost.
+        """
+        pool = self._limitedPool()
+        key = ("http", "example.com", 80)
+        first, second, third = [], [], []
+        pool.getConnection(key, DummyEndpoint()).addCallback(first.append)
+        pool.getConnection(key, DummyEndpoint()).addCallback(second.append)
+        pool.getConnection(key, DummyEndpoint()).addCallback(third.append)
+        protocol = first[0]
+        self.assertEqual((second, third), ([], []))
+        self.assertEqual(pool.getStats()[key]["waiting"], 2)
+
+        # Other keys are not limited by this one:
+        other = []
+        pool.getConnection("other", DummyEndpoint()).addCallback(other.append)
+        self.assertEqual(len(other), 1)
+
+        # The connection is returned to the pool, and handed to the first
+        # waiting call:
+        protocol._quiescentCallback(protocol)
+        self.assertEqual(second, [])
+        self.fakeReactor.advance(0)
+        self.assertEqual(second, [protocol])
+        self.assertEqual(third, [])
+
+        # The connection is lost, so the next waiting call gets a new one:
+        protocol.connectionLost(Failure(ConnectionDone()))
+        self.fakeReactor.advance(0)
+        self.assertEqual(len(third), 1)
+        self.assertNotIdentical(third[0], protocol)
+        stats = pool.getStats()[key]
+        self.assertEqual((stats["active"], stats["waiting"]), (1, 0))
+
+
+    def test_maxActivePerHostConnectionFailed(self):
+        """
+        If opening a connection fails, a call to
+        L{HTTPConnectionPool.getConnection} waiting for the key gets to try.
+        """
+        attempt = Deferred()
+        class FailingEndpoint(object):
+            def connect(self, factory):
+                return attempt
+
+        pool = self._limitedPool()
+        failed, result = [], []
+        pool.getConnection("key", FailingEndpoint()).addErrback(failed.append)
+        pool.getConnection("key", DummyEndpoint()).addCallback(result.append)
+        self.assertEqual(result, [])
+        attempt.errback(ConnectionRefusedError())
+        self.assertEqual(len(failed), 1)
+        self.fakeReactor.advance(0)
+        self.assertEqual(len(result), 1)
+
+
+    def test_closedCachedConnectionRemoved(self):
+        """
+        While C{maxActivePerHost} is set, a cached connection which the
+        server closes is removed from the pool at once, and its timeout is
+        cancelled.
+        """
+        pool = self._limitedPool()
+        key = ("http", "example.com", 80)
+        result = []
+        pool.getConnection(key, DummyEndpoint()).addCallback(result.append)
+        protocol = result[0]
+        protocol._quiescentCallback(protocol)
+        self.assertEqual(pool._connections[key], [protocol])
+        timeout = pool._timeouts[protocol]
+
+        protocol.connectionLost(Failure(ConnectionDone()))
+        self.assertEqual(pool._connections[key], [])
+        self.assertEqual(pool._timeouts, {})
+        self.assertTrue(timeout.cancelled)
+        self.assertEqual(pool.getStats()[key]["evictions"], 1)
+
+
+    def test_trackConnections(self):
+        """
+        While C{trackConnections} is set, without C{maxActivePerHost}, a
+        cached connection which the server closes is removed from the pool at
+        once and statistics are kept, but calls to
+        L{HTTPConnectionPool.getConnection} never wait.
+        """
+        pool = HTTPConnectionPool(self.fakeReactor)
+        pool.retryAutomatically = False
+        pool.trackConnections = True
+        key = ("http", "example.com", 80)
+        result = []
+        for i in range(3):
+            pool.getConnection(key, DummyEndpoint()).addCallback(
+                result.append)
+        self.assertEqual(len(result), 3)
+        stats = pool.getStats()[key]
+        self.assertEqual(
+            (stats["active"], stats["waiting"], stats["connections"],
+             stats["requests"]), (3, 0, 3, 3))
+
+        protocol = result[0]
+        protocol._quiescentCallback(protocol)
+        self.assertEqual(pool._connections[key], [protocol])
+        protocol.connectionLost(Failure(ConnectionDone()))
+        self.assertEqual(pool._connections[key], [])
+        self.assertEqual(pool._timeouts, {})
+        stats = pool.getStats()[key]
+        self.assertEqual((stats["active"], stats["evictions"]), (2, 1))
+
+
+    def test_untracked(self):
+        """
+        By default, L{HTTPConnectionPool.getStats} keeps no statistics.
+        """
+        pool = HTTPConnectionPool(self.fakeReactor)
+        pool.getConnection("key", DummyEndpoint())
+        self.assertEqual(pool.getStats(), {})
+
+
+    def test_prewarm(self):
+        """
+        L{HTTPConnectionPool.prewarm} opens connections and caches them, up to
+        C{maxPersistentPerHost}.
+        """
+        key = ("http", "example.com", 80)
+        self.pool.maxActivePerHost = 2
+        protocol = StubHTTPProtocol()
+        protocol.makeConnection(StringTransport())
+        self.pool._putConnection(key, protocol)
+
+        result = []
+        self.pool.prewarm(key, DummyEndpoint(), 3).addCallback(result.append)
+        self.assertEqual(result, [None])
+        connections = self.pool._connections[key]
+        self.assertEqual(len(connections), 2)
+        self.assertIdentical(connections[0], protocol)
+        self.assertEqual(self.pool.getStats()[key]["connections"], 1)
+
+
+    def test_prewarmInFlight(self):
+        """
+        L{HTTPConnectionPool.prewarm} counts the connections an earlier call
+        is still opening, so it does not open more than asked for.
+        """
+        attempts = []
+        class SlowEndpoint(object):
+            def connect(self, factory):
+                attempts.append(Deferred())
+                return attempts[-1]
+
+        key = ("http", "example.com", 80)
+        first = self.pool.prewarm(key, SlowEndpoint(), 2)
+        second = self.pool.prewarm(key, SlowEndpoint(), 2)
+        self.assertEqual(len(attempts), 2)
+        result = []
+        second.addCallback(result.append)
+        self.assertEqual(result, [None])
+
+        for attempt in attempts:
+            protocol = StubHTTPProtocol()
+            protocol.makeConnection(StringTransport())
+            attempt.callback(protocol)
+        first.addCallback(result.append)
+        self.assertEqual(result, [None, None])
+        self.assertEqual(len(self.pool._connections[key]), 2)
+        self.assertEqual(self.pool._prewarming, {})
+
+        # A failed attempt no longer counts either:
+        failing = self.pool.prewarm("other", SlowEndpoint(), 1)
+        failing.addErrback(result.append)
+        attempts[-1].errback(ConnectionRefusedError())
+        self.assertEqual(self.pool._prewarming, {})
+        self.pool.prewarm("other", SlowEndpoint(), 1)
+        self.assertEqual(len(attempts), 4)
+
+
+    def test_getStats(self):
+        """
+        L{HTTPConnectionPool.getStats} reports, for each key, how many
+        connections are in use, cached and waited for, and how long they were
+        used and waited for.
+        """
+        pool = self._limitedPool()
+        key = ("http", "example.com", 80)
+        result = []
+        pool.getConnection(key, DummyEndpoint()).addCallback(result.append)
+        pool.getConnection(key, DummyEndpoint()).addCallback(result.append)
+        self.assertEqual(pool.getStats(), {key: {
+                    "active": 1, "idle": 0, "waiting": 1, "connections": 1,
+                    "evictions": 0, "requests": 1, "requestTime": 0,
+                    "queued": 1, "queueTime": 0, "maxQueueTime": 0}})
+
+        self.fakeReactor.advance(5)
+        protocol = result[0]
+        protocol._quiescentCallback(protocol)
+        self.fakeReactor.advance(0)
+        self.assertEqual(result, [protocol, protocol])
+        stats = pool.getStats()[key]
+        self.assertEqual(
+            (stats["active"], stats["idle"], stats["waiting"],
+             stats["requests"], stats["requestTime"], stats["queueTime"],
+             stats["maxQueueTime"]),
+            (1, 0, 0, 2, 5, 5, 5))
+
+
 
 class AgentTests(unittest.TestCase, FakeReactorAndConnectMixin):
     """
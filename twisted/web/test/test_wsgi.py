@@ -10,6 +10,7 @@ __metaclass__ = type
 from sys import exc_info
 from urllib import quote
 from thread import get_ident
+from threading import Event, Thread
 import StringIO, cStringIO, tempfile
 
 from zope.interface.verify import verifyObject
@@ -1570,3 +1571,242 @@ class ApplicationTests(WSGITestsMixin, TestCase):
                 raise RuntimeError("This application had some error.")
 
         return self._connectionClosedTest(Application, responseContent)
+
+
+
+class QueuingReactorThreads:
+    """
+    An implementation of part of the L{IReactorThreads} interface which keeps
+    the functions passed to C{callFromThread} until L{runCalls} is called,
+    as a reactor busy with other work would.
+
+    @ivar calls: A C{list} of the C{(f, a, kw)} tuples not run yet.
+    """
+    def __init__(self):
+        self.calls = []
+
+
+    def callFromThread(self, f, *a, **kw):
+        self.calls.append((f, a, kw))
+
+
+    def runCalls(self):
+        """
+        Run the functions passed to C{callFromThread} so far, in order.
+        """
+        while self.calls:
+            f, a, kw = self.calls.pop(0)
+            f(*a, **kw)
+
+
+
+class ThreadPerCallPool:
+    """
+    An implementation of part of the L{ThreadPool} interface which runs every
+    function in a new thread.
+
+    @ivar threads: A C{list} of the L{Thread}s started.
+    """
+    def __init__(self):
+        self.threads = []
+
+
+    def callInThread(self, f, *a, **kw):
+        thread = Thread(target=f, args=a, kwargs=kw)
+        thread.start()
+        self.threads.append(thread)
+
+
+    def join(self):
+        """
+        Wait for every thread started to end.
+        """
+        for thread in self.threads:
+            thread.join(10)
+
+
+
+class FlowControlTests(WSGITestsMixin, TestCase):
+    """
+    Tests for the coalescing of the writes of the application and for the
+    flow control between the application and the transport.
+    """
+    def setUp(self):
+        self.reactor = QueuingReactorThreads()
+        self.threadpool = ThreadPerCallPool()
+        self.gate = Event()
+        self.wrote = Event()
+
+
+    def blockedApplicationFactory(self):
+        """
+        Return an application which writes C{'foo'} once C{self.gate} is set,
+        and then sets C{self.wrote}.
+        """
+        def application(environ, startResponse):
+            write = startResponse('200 OK', [])
+            self.gate.wait(10)
+            write('foo')
+            self.wrote.set()
+            return iter(())
+        return application
+
+
+    def render(self, applicationFactory, requestFactory=Request):
+        return self.lowLevelRender(
+            requestFactory, applicationFactory, DummyChannel,
+            'GET', '1.1', [], [''])
+
+
+    def test_coalesced(self):
+        """
+        Strings written by the application while a write to the request is
+        scheduled are written to the request together.
+        """
+        self.threadpool = SynchronousThreadPool()
+        writes = []
+
+        class RecordingRequest(Request):
+            def write(self, bytes):
+                writes.append(bytes)
+                return Request.write(self, bytes)
+
+        def applicationFactory():
+            def application(environ, startResponse):
+                write = startResponse('200 OK', [])
+                write('foo')
+                write('bar')
+                return iter(['baz', 'quux'])
+            return application
+
+        request = self.render(applicationFactory, RecordingRequest)
+        self.assertEqual(len(self.reactor.calls), 2)
+        self.reactor.runCalls()
+        self.assertEqual(writes, ['foobarbazquux'])
+        self.assertTrue(request.finished)
+        self.assertEqual(request.transport.producers, [])
+
+
+    def test_paused(self):
+        """
+        While the transport has paused the response, the application blocks
+        when it writes, until the transport resumes the response.
+        """
+        request = self.render(self.blockedApplicationFactory)
+        request.producer.pauseProducing()
+        self.gate.set()
+        self.wrote.wait(0.1)
+        self.assertFalse(self.wrote.isSet())
+
+        request.producer.resumeProducing()
+        self.wrote.wait(10)
+        self.assertTrue(self.wrote.isSet())
+        self.threadpool.join()
+        self.reactor.runCalls()
+        self.assertIn('foo', request.transport.written.getvalue())
+        self.assertTrue(request.finished)
+
+
+    def test_maxPending(self):
+        """
+        When more than L{WSGIResource.maxPending} bytes wait to be written to
+        the request, the application blocks when it writes, until they are
+        written.
+        """
+        self.patch(WSGIResource, 'maxPending', 2)
+        request = self.render(self.blockedApplicationFactory)
+        self.gate.set()
+        # Wait for the write to be scheduled.
+        for i in range(1000):
+            if self.reactor.calls:
+                break
+            self.wrote.wait(0.01)
+        self.assertEqual(len(self.reactor.calls), 1)
+        self.assertFalse(self.wrote.isSet())
+
+        self.reactor.runCalls()
+        self.wrote.wait(10)
+        self.assertTrue(self.wrote.isSet())
+        self.threadpool.join()
+        self.reactor.runCalls()
+        self.assertTrue(request.finished)
+
+
+    def test_connectionLostWhilePaused(self):
+        """
+        If the connection of the request is lost while the application is
+        blocked, the application is let go.
+        """
+        request = self.render(self.blockedApplicationFactory)
+        d = request.notifyFinish()
+        request.producer.pauseProducing()
+        self.gate.set()
+        request.connectionLost(Failure(ConnectionLost("All gone")))
+        self.wrote.wait(10)
+        self.assertTrue(self.wrote.isSet())
+        self.threadpool.join()
+        self.reactor.runCalls()
+        self.assertFalse(request.finished)
+        return self.assertFailure(d, ConnectionLost)
+
+
+
+class WSGIResourceStatsTests(WSGITestsMixin, TestCase):
+    """
+    Tests for L{WSGIResource.getStats} and the thread pool L{WSGIResource}
+    makes when it is not given one.
+    """
+    def test_getStats(self):
+        """
+        L{WSGIResource.getStats} counts the requests handled and the strings
+        written by the application.
+        """
+        def application(environ, startResponse):
+            write = startResponse('200 OK', [])
+            write('foo')
+            return iter(['bar'])
+
+        resource = WSGIResource(self.reactor, self.threadpool, application)
+        self.assertEqual(resource.getStats()['requests'], 0)
+        for i in range(2):
+            channel = DummyChannel()
+            channel.site = Site(resource)
+            request = Request(channel, False)
+            request.gotLength(0)
+            request.requestReceived('GET', '/', 'HTTP/1.1')
+            self.assertTrue(request.finished)
+
+        stats = resource.getStats()
+        self.assertEqual(
+            dict([(key, stats[key]) for key in
+                  ['requests', 'active', 'waiting', 'writes', 'flushes',
+                   'pauses']]),
+            {'requests': 2, 'active': 0, 'waiting': 0, 'writes': 4,
+             'flushes': 4, 'pauses': 0})
+        self.assertTrue(stats['responseTime'] >= stats['queueTime'] >= 0)
+        self.assertTrue(stats['queueTime'] >= stats['maxQueueTime'] >= 0)
+
+
+    def test_defaultThreadPool(self):
+        """
+        If no thread pool is given to L{WSGIResource}, it makes one which
+        starts when the reactor starts and stops after it shuts down.
+        """
+        class FakeReactor:
+            def __init__(self):
+                self.whenRunning = []
+                self.triggers = []
+
+            def callWhenRunning(self, f, *a, **kw):
+                self.whenRunning.append(f)
+
+            def addSystemEventTrigger(self, phase, event, f, *a, **kw):
+                self.triggers.append((phase, event, f))
+
+        fakeReactor = FakeReactor()
+        resource = WSGIResource(fakeReactor, None, lambda e, s: iter(()))
+        pool = resource._threadpool
+        self.assertTrue(isinstance(pool, ThreadPool))
+        self.assertEqual(fakeReactor.whenRunning, [pool.start])
+        self.assertEqual(
+            fakeReactor.triggers, [('after', 'shutdown', pool.stop)])
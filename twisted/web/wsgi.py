@@ -8,12 +8,16 @@ U{Web Resource Gateway Interface<http://www.python.org/dev/peps/pep-0333/>}.
 
 __metaclass__ = type
 
+import time
 from sys import exc_info
+from threading import Condition, Lock
 
 from zope.interface import implements
 
 from twisted.python.log import msg, err
 from twisted.python.failure import Failure
+from twisted.python.threadpool import ThreadPool
+from twisted.internet.interfaces import IPushProducer
 from twisted.web.resource import IResource
 from twisted.web.server import NOT_DONE_YET
 from twisted.web.http import INTERNAL_SERVER_ERROR
@@ -130,6 +134,87 @@ class _InputStream:
 
 
 
+class _WSGIStats:
+    """
+    Statistics about the requests a L{WSGIResource} handles, which are
+    updated from the I/O thread and the WSGI application threads.
+
+    @ivar requests: The number of requests which were finished.
+
+    @ivar active: The number of requests started and not finished yet.
+
+    @ivar waiting: The number of requests waiting for a thread.
+
+    @ivar queueTime: The total number of seconds requests waited for a thread.
+
+    @ivar maxQueueTime: The longest number of seconds a request waited for a
+        thread.
+
+    @ivar responseTime: The total number of seconds between the start of
+        finished requests and the end of their responses.
+
+    @ivar writes: The number of strings written by the application.
+
+    @ivar flushes: The number of writes to requests those strings were
+        coalesced into.
+
+    @ivar pauses: The number of times the application was paused because
+        the transport could not keep up.
+
+    @ivar _lock: A lock held while the statistics are updated or read.
+    """
+    def __init__(self):
+        self._lock = Lock()
+        self.requests = self.active = self.waiting = 0
+        self.writes = self.flushes = self.pauses = 0
+        self.queueTime = self.maxQueueTime = self.responseTime = 0.0
+
+
+    def update(self, **changes):
+        """
+        Add each of the given values to the statistic of the same name.
+        """
+        self._lock.acquire()
+        try:
+            for name, change in changes.iteritems():
+                setattr(self, name, getattr(self, name) + change)
+        finally:
+            self._lock.release()
+
+
+    def queued(self, queueTime):
+        """
+        Record that a request waited C{queueTime} seconds for a thread.
+        """
+        self._lock.acquire()
+        try:
+            self.waiting -= 1
+            self.queueTime += queueTime
+            self.maxQueueTime = max(self.maxQueueTime, queueTime)
+        finally:
+            self._lock.release()
+
+
+    def asDict(self):
+        """
+        Return the statistics as a C{dict}.
+        """
+        self._lock.acquire()
+        try:
+            return {"requests": self.requests,
+                    "active": self.active,
+                    "waiting": self.waiting,
+                    "queueTime": self.queueTime,
+                    "maxQueueTime": self.maxQueueTime,
+                    "responseTime": self.responseTime,
+                    "writes": self.writes,
+                    "flushes": self.flushes,
+                    "pauses": self.pauses}
+        finally:
+            self._lock.release()
+
+
+
 class _WSGIResponse:
     """
     Helper for L{WSGIResource} which drives the WSGI application using a
@@ -158,19 +243,57 @@ class _WSGIResponse:
     @ivar headers: A list of HTTP response headers supplied to the WSGI
         I{start_response} callable by the application.
 
+    @ivar maxPending: The number of bytes written by the application which
+        may wait to be written to the request before the application is
+        blocked until they are.
+
+    @ivar stats: A L{_WSGIStats} to update, or C{None}.
+
     @ivar _requestFinished: A flag which indicates whether it is possible to
         generate more response data or not.  This is C{False} until
         L{Request.notifyFinish} tells us the request is done, then C{True}.
+
+    @ivar _condition: A L{Condition} held while C{_pending} and the flags
+        shared by the I/O thread and the WSGI application thread are used,
+        and notified when the application may be able to write again.
+
+    @ivar _pending: A C{list} of the strings written by the application and
+        not written to the request yet.  Writes made while a flush is
+        scheduled are added to it, and written to the request together.
+
+    @ivar _pendingSize: The total length of the strings in C{_pending}.
+
+    @ivar _flushScheduled: C{True} while a call to L{_flush} is scheduled in
+        the I/O thread.
+
+    @ivar _sendHeaders: C{True} if the next L{_flush} must set the response
+        status and headers on the request.
+
+    @ivar _paused: C{True} while the transport of the request asked us to
+        stop producing, which blocks the application in L{write}.
+
+    @ivar _queuedAt: The time at which the response was created.
     """
+    implements(IPushProducer)
+
+    maxPending = 2 ** 16
 
     _requestFinished = False
+    _flushScheduled = False
+    _sendHeaders = False
+    _paused = False
 
-    def __init__(self, reactor, threadpool, application, request):
+    def __init__(self, reactor, threadpool, application, request, stats=None):
         self.started = False
         self.reactor = reactor
         self.threadpool = threadpool
         self.application = application
         self.request = request
+        self.stats = stats
+        self._condition = Condition()
+        self._pending = []
+        self._pendingSize = 0
+        self._queuedAt = time.time()
         self.request.notifyFinish().addBoth(self._finished)
 
         if request.prepath:
@@ -243,7 +366,60 @@ class _WSGIResponse:
         Record the end of the response generation for the request being
         serviced.
         """
-        self._requestFinished = True
+        self._condition.acquire()
+        try:
+            self._requestFinished = True
+            self._condition.notifyAll()
+        finally:
+            self._condition.release()
+        if self.stats is not None:
+            self.stats.update(
+                requests=1, active=-1,
+                responseTime=time.time() - self._queuedAt)
+
+
+    def pauseProducing(self):
+        """
+        Block the application the next time it writes, until
+        L{resumeProducing} is called.
+
+        This is called in the I/O thread.
+        """
+        self._condition.acquire()
+        try:
+            self._paused = True
+        finally:
+            self._condition.release()
+        if self.stats is not None:
+            self.stats.update(pauses=1)
+
+
+    def resumeProducing(self):
+        """
+        Let the application write again.
+
+        This is called in the I/O thread.
+        """
+        self._condition.acquire()
+        try:
+            self._paused = False
+            self._condition.notifyAll()
+        finally:
+            self._condition.release()
+
+
+    def stopProducing(self):
+        """
+        Stop the application from writing, because the connection was lost.
+
+        This is called in the I/O thread.
+        """
+        self._condition.acquire()
+        try:
+            self._requestFinished = True
+            self._condition.notifyAll()
+        finally:
+            self._condition.release()
 
 
     def startResponse(self, status, headers, excInfo=None):
@@ -266,14 +442,64 @@ class _WSGIResponse:
         The given bytes will be written to the response body, possibly flushing
         the status and headers first.
 
+        Only one call to L{_flush} is scheduled in the I/O thread at a time,
+        and it writes all the bytes written until it runs.  If the transport
+        asked to stop producing, or more than C{maxPending} bytes are waiting
+        to be written, this blocks until that is no longer the case.
+
         This will be called in a non-I/O thread.
         """
-        def wsgiWrite(started):
-            if not started:
-                self._sendResponseHeaders()
-            self.request.write(bytes)
-        self.reactor.callFromThread(wsgiWrite, self.started)
-        self.started = True
+        self._condition.acquire()
+        try:
+            if not self.started:
+                self._sendHeaders = True
+            self.started = True
+            self._pending.append(bytes)
+            self._pendingSize += len(bytes)
+            schedule = not self._flushScheduled
+            self._flushScheduled = True
+        finally:
+            self._condition.release()
+        if self.stats is not None:
+            self.stats.update(writes=1)
+        if schedule:
+            self.reactor.callFromThread(self._flush)
+
+        self._condition.acquire()
+        try:
+            while ((self._paused or self._pendingSize > self.maxPending)
+                   and not self._requestFinished):
+                self._condition.wait()
+        finally:
+            self._condition.release()
+
+
+    def _flush(self):
+        """
+        Write the bytes written by the application since the last flush to the
+        request, setting the response status and headers first if they have
+        not been set yet.
+
+        This must be called in the I/O thread.
+        """
+        self._condition.acquire()
+        try:
+            pending = self._pending
+            sendHeaders = self._sendHeaders
+            self._pending = []
+            self._pendingSize = 0
+            self._flushScheduled = self._sendHeaders = False
+            self._condition.notifyAll()
+        finally:
+            self._condition.release()
+        if sendHeaders:
+            self._sendResponseHeaders()
+        if self.stats is not None:
+            self.stats.update(flushes=1)
+        if len(pending) == 1:
+            self.request.write(pending[0])
+        else:
+            self.request.write(''.join(pending))
 
 
     def _sendResponseHeaders(self):
@@ -297,13 +523,28 @@ class _WSGIResponse:
 
     def start(self):
         """
-        Start the WSGI application in the threadpool.
+        Start the WSGI application in the threadpool, after registering as
+        the producer of the request so that the transport can pause the
+        application.
 
         This must be called in the I/O thread.
         """
+        if self.stats is not None:
+            self.stats.update(active=1, waiting=1)
+        self.request.registerProducer(self, True)
         self.threadpool.callInThread(self.run)
 
 
+    def _unregisterProducer(self):
+        """
+        Stop being the producer of the request, before it is finished.
+
+        This must be called in the I/O thread.
+        """
+        if not self._requestFinished:
+            self.request.unregisterProducer()
+
+
     def run(self):
         """
         Call the WSGI application object, iterate it, and handle its output.
@@ -311,6 +552,8 @@ class _WSGIResponse:
         This must be called in a non-I/O thread (ie, a WSGI application
         thread).
         """
+        if self.stats is not None:
+            self.stats.queued(time.time() - self._queuedAt)
         try:
             appIterator = self.application(self.environ, self.startResponse)
             for elem in appIterator:
@@ -324,6 +567,7 @@ class _WSGIResponse:
         except:
             def wsgiError(started, type, value, traceback):
                 err(Failure(value, type, traceback), "WSGI application error")
+                self._unregisterProducer()
                 if started:
                     self.request.transport.loseConnection()
                 else:
@@ -333,6 +577,7 @@ class _WSGIResponse:
         else:
             def wsgiFinish(started):
                 if not self._requestFinished:
+                    self._unregisterProducer()
                     if not started:
                         self._sendResponseHeaders()
                     self.request.finish()
@@ -350,9 +595,17 @@ class WSGIResource:
         L{_WSGIResponse} to schedule calls in the I/O thread.
 
     @ivar _threadpool: A L{ThreadPool} which will be passed on to
-        L{_WSGIResponse} to run the WSGI application object.
+        L{_WSGIResponse} to run the WSGI application object.  If C{None} is
+        given for it, the resource makes a L{ThreadPool} of its own, which
+        starts and stops with C{_reactor}, so that the application does not
+        share threads with the rest of the process.
 
     @ivar _application: The WSGI application object.
+
+    @ivar maxPending: The number of bytes the application may write ahead of
+        the request, which is passed on to L{_WSGIResponse}.
+
+    @ivar _stats: The L{_WSGIStats} of the requests this resource handles.
     """
     implements(IResource)
 
@@ -360,10 +613,17 @@ class WSGIResource:
     # handle.
     isLeaf = True
 
+    maxPending = _WSGIResponse.maxPending
+
     def __init__(self, reactor, threadpool, application):
+        if threadpool is None:
+            threadpool = ThreadPool(name='WSGIResource')
+            reactor.callWhenRunning(threadpool.start)
+            reactor.addSystemEventTrigger('after', 'shutdown', threadpool.stop)
         self._reactor = reactor
         self._threadpool = threadpool
         self._application = application
+        self._stats = _WSGIStats()
 
 
     def render(self, request):
@@ -377,11 +637,34 @@ class WSGIResource:
         will the status, headers, and the response body.
         """
         response = _WSGIResponse(
-            self._reactor, self._threadpool, self._application, request)
+            self._reactor, self._threadpool, self._application, request,
+            self._stats)
+        response.maxPending = self.maxPending
         response.start()
         return NOT_DONE_YET
 
 
+    def getStats(self):
+        """
+        Return statistics about the requests this resource handled.
+
+        @return: A C{dict} with these keys:
+            - C{"requests"}: the number of requests finished.
+            - C{"active"}: the number of requests being handled.
+            - C{"waiting"}: the number of requests waiting for a thread.
+            - C{"queueTime"} and C{"maxQueueTime"}: the total and longest
+              number of seconds requests waited for a thread.
+            - C{"responseTime"}: the total number of seconds taken by finished
+              requests.
+            - C{"writes"}: the number of strings the application wrote.
+            - C{"flushes"}: the number of writes to requests they were
+              coalesced into.
+            - C{"pauses"}: the number of times the transport paused the
+              application.
+        """
+        return self._stats.asDict()
+
+
     def getChildWithDefault(self, name, request):
         """
         Reject attempts to retrieve a child resource.  All path segments beyond